@@ -11,6 +11,7 @@ setup(
         'SQLAlchemy',
         'pandas',
         'numpy',
+        'openpyxl', # pandas.read_excel (importação de tabelas .xlsx)
     ],
     entry_points={
         'console_scripts': [
@@ -13,7 +13,131 @@ if not os.path.exists(DATA_DIR):
     os.makedirs(DATA_DIR)
 
 # Define o caminho completo para o arquivo do banco de dados SQLite
-DATABASE_PATH = os.path.join(DATA_DIR, "nutricional.db")
+# (NUTRIAPP_DB_PATH substitui o padrão; em tempo de execução, ver database.use_database())
+DATABASE_PATH = os.environ.get("NUTRIAPP_DB_PATH") or os.path.join(DATA_DIR, "nutricional.db")
+
+# Configurações do pool de conexões SQLite (ver core/database.py)
+# Número máximo de conexões abertas simultaneamente (GUI + workers em segundo plano)
+DB_POOL_SIZE = 4
+# Tempo máximo (s) que uma thread espera por uma conexão livre no pool
+DB_POOL_TIMEOUT = 30.0
+
+# Perfis de armazenamento SQLite (PRAGMAs aplicadas em core/database.create_connection)
+# - desktop-safe: WAL com fsync a cada commit; padrão seguro para o disco local da clínica
+# - fast-local:   WAL com synchronous=NORMAL (fsync só no checkpoint) e cache/mmap maiores;
+#                 um commit pode ser perdido numa queda de energia, mas o banco nunca corrompe
+# - shared-drive: banco em pasta de rede. WAL exige memória compartilhada entre processos,
+#                 o que não funciona em SMB/NFS, então este perfil mantém o journal DELETE
+#                 e desliga o mmap
+STORAGE_PROFILES = {
+    "desktop-safe": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "mmap_size": 64 * 1024 * 1024,
+        "cache_size": -16384, # Negativo = KiB (16 MiB)
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000, # ms
+    },
+    "fast-local": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -65536, # 64 MiB
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "shared-drive": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "mmap_size": 0,
+        "cache_size": -8192, # 8 MiB
+        "temp_store": "MEMORY",
+        "busy_timeout": 15000, # Rede lenta: esperar mais por locks de outras estações
+    },
+}
+# Perfil em uso (pode ser trocado pela variável de ambiente NUTRIAPP_STORAGE_PROFILE)
+STORAGE_PROFILE = os.environ.get("NUTRIAPP_STORAGE_PROFILE", "desktop-safe")
+
+# Instrumentação das consultas (ver core/instrumentation.py)
+# Comandos SQL mais lentos que isto (ms) são registrados no log de consultas lentas
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("NUTRIAPP_SLOW_QUERY_MS", "100"))
+SLOW_QUERY_LOG_PATH = os.path.join(DATA_DIR, "slow_queries.log")
+# Histogramas de latência exportados em formato OpenMetrics ao encerrar a aplicação
+METRICS_PATH = os.path.join(DATA_DIR, "query_metrics.prom")
+
+# Fila de escrita em segundo plano (ver core/write_queue.py)
+# Write-behind: as edições da GUI são gravadas por uma única thread escritora, que
+# agrupa rajadas de escritas numa só transação (um fsync por lote em vez de por linha)
+WRITE_BEHIND_ENABLED = os.environ.get("NUTRIAPP_WRITE_BEHIND", "0") == "1"
+# Máximo de escritas por transação e quanto tempo (ms) esperar por mais escritas
+# depois da primeira de um lote
+WRITE_QUEUE_MAX_BATCH = 500
+WRITE_QUEUE_GROUP_WINDOW_MS = 5
+
+# Importação de tabelas de composição (ver core/importers.py)
+# Linhas gravadas por transação
+IMPORT_CHUNK_SIZE = 1000
+
+# Leitura em lotes (cursor.fetchmany) para exportações e iteração sobre tabelas grandes
+FETCH_CHUNK_SIZE = 500
+
+# Ids por consulta "WHERE id IN (?, ...)" nas buscas de vários registros (get_many):
+# abaixo do limite de variáveis por comando de versões antigas do SQLite (999)
+SQL_IN_CHUNK_SIZE = 900
+
+# Backup online (ver core/backup.py)
+# Cópias feitas pela API de backup do SQLite, em passos de BACKUP_PAGES_PER_STEP
+# páginas com uma pausa entre eles, para não competir com a GUI
+BACKUP_DIR = os.path.join(DATA_DIR, "backups")
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_PAUSE_MS = 5
+# Intervalo entre backups automáticos (0 desliga o agendamento) e backup ao sair
+BACKUP_INTERVAL_MINUTES = float(os.environ.get("NUTRIAPP_BACKUP_INTERVAL_MIN", "60"))
+BACKUP_ON_EXIT = True
+# Quantos snapshots manter (os mais antigos são apagados)
+BACKUP_KEEP = 10
+
+# Repositório de backups deduplicado (ver core/backup_store.py): cada backup agendado
+# também é gravado em blocos de BACKUP_STORE_CHUNK_SIZE bytes (múltiplo do tamanho de
+# página), e só os blocos ainda não vistos ocupam disco
+BACKUP_STORE_ENABLED = True
+BACKUP_STORE_DIR = os.path.join(DATA_DIR, "backup_store")
+BACKUP_STORE_CHUNK_SIZE = 64 * 1024
+# Pontos de restauração mantidos no repositório
+BACKUP_STORE_KEEP = 90
+
+# Manutenção automática do banco em momentos ociosos (ver core/maintenance.py)
+# Segundos sem uso da interface para começar, intervalo entre execuções de cada
+# tarefa e duração alvo de cada passo (a manutenção para no fim do passo atual
+# assim que o usuário volta a usar a aplicação)
+MAINTENANCE_ENABLED = True
+MAINTENANCE_IDLE_SECONDS = 120
+MAINTENANCE_INTERVAL_HOURS = 24
+MAINTENANCE_STEP_BUDGET_MS = 200
+# Páginas livres mínimas para valer um vacuum incremental, e tamanho máximo (MiB) do
+# banco para a conversão única para auto_vacuum=INCREMENTAL feita na inicialização
+# (exige um VACUUM completo, que bloqueia as escritas até terminar; bancos maiores
+# só são convertidos quando pedido, ver MaintenanceScheduler.convert_to_incremental)
+MAINTENANCE_VACUUM_MIN_FREE_PAGES = 64
+MAINTENANCE_MAX_CONVERSION_MB = 16
+# Dias de histórico mantidos na tabela manutencao_log
+MAINTENANCE_LOG_DAYS = 90
+
+# Arquivo de dados frios (ver core/archive.py)
+# Avaliações e planos alimentares (com seus itens) mais antigos que ARCHIVE_AFTER_YEARS
+# anos podem ser movidos para um banco separado ao lado do principal
+# (nutricional.db -> nutricional_arquivo.db), anexado só quando o histórico completo
+# é pedido. A mudança é feita em lotes de ARCHIVE_BATCH_SIZE registros por transação
+ARCHIVE_AFTER_YEARS = 3
+ARCHIVE_BATCH_SIZE = 500
+
+# Catálogo de alimentos em memória (ver core/food_catalog.py)
+# Entradas mais recentes mantidas no registro de alterações de alimentos quando a
+# manutenção o poda; um catálogo que ficou para trás da poda é recarregado por inteiro
+FOOD_CATALOG_LOG_KEEP = 10000
+# Itens de planos lidos e recalculados por lote no recálculo em lote dos nutrientes
+# (services.recalcular_planos, após importar ou corrigir alimentos)
+RECALCULO_CHUNK_SIZE = 5000
 
 # Outras configurações podem ser adicionadas aqui no futuro
 # Ex: DEBUG = True
@@ -0,0 +1,241 @@
+# src/core/archive.py
+
+import logging
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Tenta importar de forma relativa primeiro
+try:
+    from ..config import ARCHIVE_AFTER_YEARS, ARCHIVE_BATCH_SIZE
+except ImportError:
+    from config import ARCHIVE_AFTER_YEARS, ARCHIVE_BATCH_SIZE
+
+try:
+    from .database import ConnectionPool, get_pool, savepoint
+except ImportError:
+    from src.core.database import ConnectionPool, get_pool, savepoint
+
+# Arquivo de dados frios. Avaliações e planos alimentares (com seus itens) mais
+# antigos que ARCHIVE_AFTER_YEARS anos saem do banco principal e vão para um banco
+# separado, ao lado dele (nutricional.db -> nutricional_arquivo.db). O banco principal
+# fica pequeno (backups, manutenção e consultas do dia a dia mais rápidos); o arquivo
+# só é anexado (ATTACH ... AS arquivo) quando o usuário pede o histórico completo.
+# A avaliação e o plano mais recentes de cada paciente nunca são arquivados.
+#
+# O arquivo tem as mesmas tabelas e colunas, sem chaves estrangeiras (pacientes e
+# alimentos continuam só no banco principal), e fica em journal_mode DELETE (um único
+# arquivo, raramente gravado). Os ids são preservados: as tabelas usam AUTOINCREMENT,
+# então um id arquivado nunca volta a ser usado no banco principal. Cada lote é copiado
+# e apagado na mesma transação, mas em WAL ela não é atômica entre os dois arquivos:
+# por isso a cópia usa INSERT OR REPLACE (refazer um lote interrompido é seguro) e, na
+# leitura, um id presente nos dois bancos vale pela versão do banco principal.
+
+SCHEMA = "arquivo"
+
+ARCHIVED_TABLES = ("avaliacoes", "planos_alimentares", "itens_plano_alimentar")
+
+# Índices do arquivo, os mesmos que as consultas dos repositórios usam no banco principal
+ARCHIVE_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS arquivo.idx_avaliacoes_paciente_data ON avaliacoes (paciente_id, data_avaliacao)",
+    "CREATE INDEX IF NOT EXISTS arquivo.idx_planos_paciente_data ON planos_alimentares (paciente_id, data_criacao)",
+    "CREATE INDEX IF NOT EXISTS arquivo.idx_itens_plano ON itens_plano_alimentar (plano_alimentar_id)",
+)
+
+# Registros candidatos ao arquivo: anteriores ao corte e com outro mais recente do mesmo paciente
+_AVALIACOES_ANTIGAS = """SELECT id FROM main.avaliacoes a
+                         WHERE a.data_avaliacao < ?
+                           AND EXISTS (SELECT 1 FROM main.avaliacoes r
+                                       WHERE r.paciente_id = a.paciente_id AND r.data_avaliacao > a.data_avaliacao)
+                         ORDER BY a.id LIMIT ?"""
+_PLANOS_ANTIGOS = """SELECT id FROM main.planos_alimentares p
+                     WHERE p.data_criacao < ?
+                       AND EXISTS (SELECT 1 FROM main.planos_alimentares r
+                                   WHERE r.paciente_id = p.paciente_id AND r.data_criacao > p.data_criacao)
+                     ORDER BY p.id LIMIT ?"""
+
+@dataclass
+class ArchiveResult:
+    """Resumo de uma execução de archive_old_records()."""
+    caminho: str
+    corte: str
+    avaliacoes: int = 0
+    planos: int = 0
+    itens: int = 0
+    segundos: float = 0.0
+
+def archive_path_for(database_path: str) -> Optional[str]:
+    """Caminho do arquivo de dados frios do banco (None para bancos em memória)."""
+    if not database_path or database_path == ":memory:" or database_path.startswith("file:"):
+        return None
+    root, ext = os.path.splitext(database_path)
+    return f"{root}_arquivo{ext or '.db'}"
+
+def cutoff_date(years: float = ARCHIVE_AFTER_YEARS, today: Optional[date] = None) -> str:
+    """Data de corte (YYYY-MM-DD): registros anteriores a ela são considerados frios."""
+    today = today or date.today()
+    anos = int(years)
+    try:
+        corte = today.replace(year=today.year - anos)
+    except ValueError: # 29 de fevereiro num ano não bissexto
+        corte = today.replace(year=today.year - anos, day=28)
+    return corte.isoformat()
+
+def is_attached(conn: sqlite3.Connection) -> bool:
+    return any(row["name"] == SCHEMA for row in conn.execute("PRAGMA database_list").fetchall())
+
+def _columns(conn: sqlite3.Connection, schema: str, table: str) -> List[Tuple[str, str]]:
+    return [(row["name"], row["type"]) for row in conn.execute(f"PRAGMA {schema}.table_info({table})").fetchall()]
+
+def _user_version(conn: sqlite3.Connection, schema: str) -> int:
+    row = conn.execute(f"PRAGMA {schema}.user_version").fetchone()
+    return row["user_version"] if isinstance(row, dict) else row[0]
+
+def ensure_archive_schema(conn: sqlite3.Connection):
+    """Cria (ou completa) no banco anexado as tabelas e índices do arquivo.
+
+    As colunas vêm do banco principal, então colunas adicionadas por migrações
+    posteriores também são acrescentadas ao arquivo. O arquivo guarda no seu
+    user_version a versão do esquema principal que ele acompanha (ver attached_archive).
+    """
+    for tabela in ARCHIVED_TABLES:
+        principais = _columns(conn, "main", tabela)
+        existentes = {nome for nome, _ in _columns(conn, SCHEMA, tabela)}
+        if not existentes:
+            colunas = ", ".join("id INTEGER PRIMARY KEY" if nome == "id" else f"{nome} {tipo}".strip()
+                                for nome, tipo in principais)
+            conn.execute(f"CREATE TABLE {SCHEMA}.{tabela} ({colunas})")
+            logging.info(f"Tabela {tabela} criada no arquivo de dados frios.")
+            continue
+        for nome, tipo in principais:
+            if nome not in existentes:
+                conn.execute(f"ALTER TABLE {SCHEMA}.{tabela} ADD COLUMN {nome} {tipo}".strip())
+                logging.info(f"Coluna {tabela}.{nome} acrescentada ao arquivo de dados frios.")
+    for sql in ARCHIVE_INDEXES:
+        conn.execute(sql)
+    conn.execute(f"PRAGMA {SCHEMA}.user_version = {int(_user_version(conn, 'main'))}")
+
+@contextmanager
+def attached_archive(conn: sqlite3.Connection, archive_path: Optional[str], create: bool = False) -> Iterator[bool]:
+    """Anexa o arquivo à conexão durante o bloco `with`, como o esquema `arquivo`.
+
+    Produz False (sem anexar nada) se o arquivo ainda não existe e `create` é falso.
+    Se a conexão já tem o arquivo anexado, ele é reutilizado e continua anexado no
+    fim. ATTACH/DETACH não podem ocorrer dentro de uma transação aberta.
+    As leituras só anexam: o esquema do arquivo é criado ou completado com `create`
+    (ao arquivar) ou quando o user_version do arquivo ficou atrás do banco principal
+    (migração aplicada depois da última vez que o arquivo foi gravado).
+    """
+    if is_attached(conn):
+        yield True
+        return
+    if archive_path is None or (not create and not os.path.exists(archive_path)):
+        yield False
+        return
+    conn.execute(f"ATTACH DATABASE ? AS {SCHEMA}", (archive_path,))
+    try:
+        if create or _user_version(conn, SCHEMA) < _user_version(conn, "main"):
+            conn.execute(f"PRAGMA {SCHEMA}.journal_mode = DELETE")
+            ensure_archive_schema(conn)
+        yield True
+    finally:
+        conn.execute(f"DETACH DATABASE {SCHEMA}")
+
+def merge_archived(atuais: List, arquivados: List, key: str, reverse: bool = False) -> List:
+    """Junta registros do banco principal e do arquivo, ordenados por `key`.
+
+    Um id presente nos dois (lote interrompido, ver o comentário do módulo) vale pela
+    versão do banco principal.
+    """
+    ids = {obj.id for obj in atuais}
+    todos = atuais + [obj for obj in arquivados if obj.id not in ids]
+    # As duas listas já chegam ordenadas: o sort só intercala as duas sequências
+    todos.sort(key=lambda obj: getattr(obj, key) or "", reverse=reverse)
+    return todos
+
+def _move_batches(conn, sql_ids: str, corte: str, batch_size: int, passos: Sequence[Tuple[str, str]],
+                  progress: Optional[Callable[[str, int], None]] = None) -> Dict[str, int]:
+    """Move para o arquivo, lote a lote, os registros selecionados por `sql_ids`.
+
+    `passos` são pares (tabela, coluna) copiados na ordem e apagados na ordem inversa
+    (itens antes dos planos). Cada lote é uma transação.
+    """
+    movidos = {tabela: 0 for tabela, _ in passos}
+    colunas = {tabela: ", ".join(nome for nome, _ in _columns(conn, "main", tabela)) for tabela, _ in passos}
+    while True:
+        ids = [row["id"] for row in conn.execute(sql_ids, (corte, batch_size)).fetchall()]
+        if not ids:
+            return movidos
+        marcadores = ", ".join("?" * len(ids))
+        with savepoint(conn):
+            for tabela, chave in passos:
+                conn.execute(f"INSERT OR REPLACE INTO {SCHEMA}.{tabela} ({colunas[tabela]}) "
+                             f"SELECT {colunas[tabela]} FROM main.{tabela} WHERE {chave} IN ({marcadores})", ids)
+            for tabela, chave in reversed(passos):
+                movidos[tabela] += conn.execute(f"DELETE FROM main.{tabela} WHERE {chave} IN ({marcadores})", ids).rowcount
+        if progress:
+            progress(passos[0][0], movidos[passos[0][0]])
+
+def archive_old_records(pool: Optional[ConnectionPool] = None, years: float = ARCHIVE_AFTER_YEARS,
+                        cutoff: Optional[str] = None, archive_path: Optional[str] = None,
+                        batch_size: int = ARCHIVE_BATCH_SIZE,
+                        progress: Optional[Callable[[str, int], None]] = None) -> ArchiveResult:
+    """Move para o arquivo as avaliações e os planos (com itens) anteriores ao corte.
+
+    `cutoff` (YYYY-MM-DD) tem precedência sobre `years`. `progress(tabela, movidos)`
+    é chamado após cada lote. Retorna as quantidades movidas.
+    """
+    pool = pool or get_pool()
+    archive_path = archive_path or archive_path_for(pool.database_path)
+    if archive_path is None:
+        raise ValueError(f"O banco {pool.database_path} não tem arquivo de dados frios (banco em memória).")
+    result = ArchiveResult(caminho=archive_path, corte=cutoff or cutoff_date(years))
+    inicio = time.perf_counter()
+    try:
+        with pool.connection() as conn, attached_archive(conn, archive_path, create=True):
+            avaliacoes = _move_batches(conn, _AVALIACOES_ANTIGAS, result.corte, batch_size,
+                                       [("avaliacoes", "id")], progress)
+            planos = _move_batches(conn, _PLANOS_ANTIGOS, result.corte, batch_size,
+                                   [("planos_alimentares", "id"), ("itens_plano_alimentar", "plano_alimentar_id")], progress)
+    except Exception:
+        logging.exception(f"Erro ao arquivar registros anteriores a {result.corte} em {archive_path}:")
+        raise
+    result.avaliacoes = avaliacoes["avaliacoes"]
+    result.planos = planos["planos_alimentares"]
+    result.itens = planos["itens_plano_alimentar"]
+    result.segundos = time.perf_counter() - inicio
+    logging.info(f"Arquivo de dados frios ({archive_path}): {result.avaliacoes} avaliação(ões), {result.planos} plano(s) "
+                 f"e {result.itens} item(ns) anteriores a {result.corte} movidos em {result.segundos:.2f}s.")
+    return result
+
+def purge_paciente(archive_path: Optional[str], paciente_id: int) -> int:
+    """Apaga do arquivo os registros de um paciente excluído. Retorna as linhas apagadas.
+
+    Usa uma conexão própria com o arquivo (sem o perfil de armazenamento do banco
+    principal, que o passaria para WAL), então pode ser chamada logo depois do
+    commit da exclusão no banco principal.
+    """
+    if archive_path is None or not os.path.exists(archive_path):
+        return 0
+    conn = sqlite3.connect(archive_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM itens_plano_alimentar WHERE plano_alimentar_id IN "
+                       "(SELECT id FROM planos_alimentares WHERE paciente_id = ?)", (paciente_id,))
+        apagadas = cursor.rowcount
+        cursor.execute("DELETE FROM planos_alimentares WHERE paciente_id = ?", (paciente_id,))
+        apagadas += cursor.rowcount
+        cursor.execute("DELETE FROM avaliacoes WHERE paciente_id = ?", (paciente_id,))
+        apagadas += cursor.rowcount
+        conn.commit()
+        return apagadas
+    except sqlite3.OperationalError as e:
+        if "no such table" in str(e): # Arquivo criado mas ainda vazio
+            return 0
+        raise
+    finally:
+        conn.close()
@@ -0,0 +1,246 @@
+# src/core/backup.py
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+
+# Tenta importar de forma relativa primeiro
+try:
+    from ..config import (BACKUP_DIR, BACKUP_PAGES_PER_STEP, BACKUP_STEP_PAUSE_MS,
+                          BACKUP_INTERVAL_MINUTES, BACKUP_KEEP, BACKUP_STORE_KEEP)
+except ImportError:
+    from config import (BACKUP_DIR, BACKUP_PAGES_PER_STEP, BACKUP_STEP_PAUSE_MS,
+                        BACKUP_INTERVAL_MINUTES, BACKUP_KEEP, BACKUP_STORE_KEEP)
+
+try:
+    from .database import get_database_path
+    from .archive import archive_path_for
+except ImportError:
+    from src.core.database import get_database_path
+    from src.core.archive import archive_path_for
+
+# Backup online do banco pela API de backup do SQLite (sqlite3.Connection.backup).
+# Copiar o arquivo .db com a aplicação aberta pode gerar uma cópia rasgada (páginas
+# de antes e de depois de um commit, ou sem o conteúdo ainda no -wal). Aqui a cópia
+# anda em passos de N páginas com uma pausa entre eles, é verificada com PRAGMA
+# quick_check e só então recebe o nome definitivo. Em WAL, uma transação de leitura
+# fica aberta na origem durante toda a cópia: todos os passos enxergam o mesmo
+# retrato do banco e as escritas da aplicação seguem normalmente. Nos outros modos
+# (perfil "shared-drive", journal DELETE) essa transação seguraria um SHARED lock e
+# bloquearia as gravações durante as pausas; lá a cópia é feita num único passo,
+# sem pausas, e o lock dura só o tempo da cópia.
+# O arquivo de dados frios (core/archive.py), quando existe, é copiado junto, ao lado
+# do snapshot e com o mesmo nome do banco: nutricional-<data>.db ->
+# nutricional-<data>_arquivo.db. Restaurar os dois lado a lado devolve também os
+# registros arquivados.
+
+SNAPSHOT_PREFIX = "nutricional-"
+SNAPSHOT_SUFFIX = ".db"
+
+# (páginas copiadas, total de páginas)
+BackupProgressCallback = Callable[[int, int], None]
+
+@dataclass
+class BackupResult:
+    """Resumo de um backup."""
+    caminho: str = ""
+    paginas: int = 0
+    passos: int = 0
+    segundos: float = 0.0
+    verificacao: str = ""
+    arquivo: Optional[str] = None # Cópia do arquivo de dados frios, se o banco tiver um
+
+def snapshot_path(backup_dir: str = BACKUP_DIR, when: Optional[datetime] = None) -> str:
+    """Caminho de um novo snapshot, com data e hora no nome (ordem alfabética = cronológica)."""
+    when = when or datetime.now()
+    return os.path.join(backup_dir, f"{SNAPSHOT_PREFIX}{when.strftime('%Y%m%d-%H%M%S-%f')}{SNAPSHOT_SUFFIX}")
+
+def list_snapshots(backup_dir: str = BACKUP_DIR) -> List[str]:
+    """Snapshots existentes em `backup_dir`, do mais antigo para o mais recente."""
+    if not os.path.isdir(backup_dir):
+        return []
+    nomes = sorted(n for n in os.listdir(backup_dir) if n.startswith(SNAPSHOT_PREFIX) and n.endswith(SNAPSHOT_SUFFIX))
+    # As cópias do arquivo de dados frios acompanham o snapshot e não contam como snapshots
+    arquivos = {os.path.basename(archive_path_for(n)) for n in nomes}
+    return [os.path.join(backup_dir, n) for n in nomes if n not in arquivos]
+
+def rotate_snapshots(backup_dir: str = BACKUP_DIR, keep: int = BACKUP_KEEP) -> List[str]:
+    """Apaga os snapshots mais antigos, mantendo os `keep` mais recentes. Retorna os apagados."""
+    antigos = list_snapshots(backup_dir)[:-keep] if keep > 0 else []
+    for path in antigos:
+        os.remove(path)
+        arquivo = archive_path_for(path)
+        if os.path.exists(arquivo):
+            os.remove(arquivo)
+        logging.info(f"Snapshot antigo removido: {path}")
+    return antigos
+
+def verify_snapshot(path: str) -> Tuple[bool, str]:
+    """Roda PRAGMA quick_check no arquivo. Retorna (ok, mensagem do SQLite)."""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        linhas = [row[0] for row in conn.execute("PRAGMA quick_check").fetchall()]
+    except sqlite3.DatabaseError as e:
+        return False, str(e)
+    finally:
+        conn.close()
+    return linhas == ["ok"], "; ".join(linhas)
+
+def backup_database(dest_path: Optional[str] = None, source_path: Optional[str] = None,
+                    pages_per_step: int = BACKUP_PAGES_PER_STEP, pause_ms: float = BACKUP_STEP_PAUSE_MS,
+                    progress: Optional[BackupProgressCallback] = None) -> BackupResult:
+    """Copia o banco `source_path` para `dest_path` (padrão: novo snapshot em BACKUP_DIR).
+
+    Usa conexões próprias (não as do pool), então pode rodar em qualquer thread.
+    A cópia é gravada num arquivo temporário; se a verificação falhar, ele é
+    descartado e sqlite3.DatabaseError é lançado.
+    """
+    inicio = time.perf_counter()
+    source_path = source_path or get_database_path()
+    dest_path = dest_path or snapshot_path()
+    os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+    temp_path = f"{dest_path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    result = BackupResult(caminho=dest_path)
+    def on_step(status, remaining, total):
+        result.passos += 1
+        result.paginas = total
+        if progress:
+            progress(total - remaining, total)
+        if pause_ms and remaining:
+            time.sleep(pause_ms / 1000.0) # Cede o disco e o GIL à aplicação entre os passos
+
+    source = sqlite3.connect(source_path, timeout=30.0, isolation_level=None, uri=source_path.startswith("file:"))
+    dest = sqlite3.connect(temp_path)
+    try:
+        if source.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal":
+            # Transação de leitura aberta durante toda a cópia: retrato consistente,
+            # sem recomeçar a cópia quando a aplicação grava no meio dela
+            source.execute("BEGIN")
+            source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            source.backup(dest, pages=max(1, int(pages_per_step)), progress=on_step)
+            source.execute("COMMIT")
+        else:
+            # Sem WAL, o retrato só é consistente com o SHARED lock: cópia num passo só
+            source.backup(dest, pages=-1, progress=on_step)
+        # O snapshot deve ser um arquivo único, sem depender de -wal/-shm
+        dest.execute("PRAGMA journal_mode = DELETE")
+        dest.close()
+        ok, mensagem = verify_snapshot(temp_path)
+        result.verificacao = mensagem
+        if not ok:
+            raise sqlite3.DatabaseError(f"Snapshot reprovado no quick_check: {mensagem}")
+        os.replace(temp_path, dest_path)
+    except Exception:
+        logging.exception(f"Erro ao fazer backup de {source_path} para {dest_path}:")
+        dest.close()
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    finally:
+        source.close()
+
+    result.segundos = time.perf_counter() - inicio
+    logging.info(f"Backup concluído: {dest_path} ({result.paginas} páginas em {result.passos} passos, "
+                 f"{result.segundos:.2f}s, quick_check: {result.verificacao})")
+    return result
+
+def backup_archive(snapshot: str, source_path: Optional[str] = None, **kwargs) -> Optional[BackupResult]:
+    """Copia o arquivo de dados frios de `source_path` para junto do snapshot `snapshot`.
+
+    Retorna None se o banco não tiver arquivo. Deve ser chamada depois do backup do
+    banco principal: um arquivamento feito entre as duas cópias deixa os registros
+    movidos nas duas (duplicados, e não perdidos).
+    """
+    origem = archive_path_for(source_path or get_database_path())
+    if not origem or not os.path.exists(origem):
+        return None
+    return backup_database(archive_path_for(snapshot), origem, **kwargs)
+
+class BackupScheduler:
+    """Faz backups periódicos numa thread em segundo plano e mantém os últimos `keep`.
+
+    start() inicia o agendamento (a cada `interval_minutes`; 0 = só sob demanda),
+    run_now() pede um backup imediato e stop(final_backup=True) encerra a thread
+    fazendo um último backup, como no fechamento da aplicação. `listener(result,
+    erro)` é chamado na thread de backup após cada tentativa. Com `store`
+    (core.backup_store.BackupStore), cada snapshot também é gravado no repositório
+    deduplicado, que mantém `store_keep` pontos de restauração.
+    """
+    def __init__(self, source_path: Optional[str] = None, backup_dir: str = BACKUP_DIR,
+                 interval_minutes: float = BACKUP_INTERVAL_MINUTES, keep: int = BACKUP_KEEP,
+                 listener: Optional[Callable[[Optional[BackupResult], Optional[BaseException]], None]] = None,
+                 store=None, store_keep: int = BACKUP_STORE_KEEP):
+        self.source_path = source_path
+        self.backup_dir = backup_dir
+        self.interval_s = interval_minutes * 60.0
+        self.keep = keep
+        self.listener = listener
+        self.store = store
+        self.store_keep = store_keep
+        self.last_result: Optional[BackupResult] = None
+        self._wake = threading.Event()
+        self._stop = False
+        self._lock = threading.Lock() # Um backup por vez (agendado, sob demanda ou final)
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="nutriapp-backup", daemon=True)
+            self._thread.start()
+
+    def run_now(self):
+        """Pede um backup imediato à thread de agendamento (não bloqueia)."""
+        self.start()
+        self._wake.set()
+
+    def backup(self) -> BackupResult:
+        """Faz um backup na thread atual, aplica a rotação e notifica o listener."""
+        with self._lock:
+            try:
+                result = backup_database(snapshot_path(self.backup_dir), self.source_path)
+                arquivo = backup_archive(result.caminho, self.source_path)
+                result.arquivo = arquivo.caminho if arquivo else None
+                if self.store is not None:
+                    self.store.add_file(result.caminho, origem=result.caminho, arquivo=result.arquivo)
+                    self.store.prune(self.store_keep)
+                rotate_snapshots(self.backup_dir, self.keep)
+            except Exception as e:
+                if self.listener:
+                    self.listener(None, e)
+                raise
+            self.last_result = result
+            if self.listener:
+                self.listener(result, None)
+            return result
+
+    def stop(self, final_backup: bool = False, timeout: Optional[float] = None):
+        """Encerra o agendamento; com `final_backup`, faz um último backup antes de retornar."""
+        self._stop = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if final_backup:
+            try:
+                self.backup()
+            except Exception as e:
+                logging.error(f"Backup ao encerrar falhou: {e}")
+
+    def _loop(self):
+        while not self._stop:
+            self._wake.wait(self.interval_s if self.interval_s > 0 else None)
+            self._wake.clear()
+            if self._stop:
+                return
+            try:
+                self.backup()
+            except Exception as e:
+                logging.error(f"Backup agendado falhou: {e}")
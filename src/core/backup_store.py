@@ -0,0 +1,362 @@
+# src/core/backup_store.py
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+# Tenta importar de forma relativa primeiro
+try:
+    from ..config import BACKUP_DIR, BACKUP_KEEP, BACKUP_STORE_DIR, BACKUP_STORE_CHUNK_SIZE, BACKUP_STORE_KEEP
+except ImportError:
+    from config import BACKUP_DIR, BACKUP_KEEP, BACKUP_STORE_DIR, BACKUP_STORE_CHUNK_SIZE, BACKUP_STORE_KEEP
+
+try:
+    from .backup import backup_database, backup_archive, verify_snapshot, snapshot_path, rotate_snapshots
+    from .archive import archive_path_for
+except ImportError:
+    from src.core.backup import backup_database, backup_archive, verify_snapshot, snapshot_path, rotate_snapshots
+    from src.core.archive import archive_path_for
+
+# Repositório de backups deduplicado por conteúdo. Cada snapshot do banco é
+# dividido em blocos de tamanho fixo (múltiplo do tamanho de página do SQLite,
+# então cada bloco cobre sempre as mesmas páginas); cada bloco é identificado
+# pelo SHA-256 do conteúdo e gravado comprimido (zlib) uma única vez. O manifesto
+# do snapshot lista os hashes na ordem. Entre dois backups diários quase todas
+# as páginas são iguais, então só os blocos alterados ocupam disco e geram I/O.
+# O arquivo de dados frios (core/archive.py), quando existe, entra no mesmo
+# manifesto (campo `arquivo`) e é restaurado junto, ao lado do banco.
+# Os blocos são lidos de um snapshot comum de core/backup.py (o BackupScheduler passa
+# o que acabou de gravar; snapshot() grava um em `backup_dir`, sujeito à mesma
+# rotação): a API de backup do SQLite só copia para outro banco, então não há como
+# dividir em blocos direto da origem, mas também não há uma cópia de trabalho a mais.
+#
+# Estrutura em disco:
+#   <raiz>/chunks/ab/abcdef...   bloco comprimido (nome = sha256 do conteúdo original)
+#   <raiz>/manifests/<id>.json   um manifesto por snapshot
+#   <raiz>/store.lock            trava do repositório (ver BackupStore._locked)
+#
+# Linha de comando: python -m src.core.backup_store {snapshot,list,verify,restore,prune}
+
+# Espera máxima pela trava do repositório e idade a partir da qual uma trava é
+# considerada abandonada (processo encerrado no meio de uma gravação)
+LOCK_TIMEOUT_S = 60.0
+LOCK_STALE_S = 6 * 3600.0
+
+@dataclass
+class Manifest:
+    """Descrição de um snapshot: os blocos, na ordem, que reconstroem o arquivo."""
+    id: str
+    criado_em: str
+    origem: str
+    tamanho: int
+    chunk_size: int
+    sha256: str # Hash do arquivo inteiro, conferido na restauração
+    chunks: List[str] = field(default_factory=list)
+    # Arquivo de dados frios: {"tamanho", "sha256", "chunks"} (None se o banco não tinha)
+    arquivo: Optional[Dict] = None
+
+    def all_chunks(self) -> List[str]:
+        """Blocos do banco e do arquivo de dados frios."""
+        return self.chunks + (self.arquivo["chunks"] if self.arquivo else [])
+
+@dataclass
+class StoreResult:
+    """Resumo da gravação de um snapshot no repositório."""
+    manifest: Manifest
+    blocos_novos: int = 0
+    bytes_gravados: int = 0 # Comprimidos, só dos blocos novos
+    segundos: float = 0.0
+
+class BackupStore:
+    """Snapshots deduplicados do banco em `root`. Ver o comentário do módulo.
+
+    `backup_dir` é a pasta dos snapshots comuns que snapshot() grava (e rotaciona,
+    mantendo `backup_keep`) antes de dividi-los em blocos.
+    """
+    def __init__(self, root: str = BACKUP_STORE_DIR, chunk_size: int = BACKUP_STORE_CHUNK_SIZE,
+                 backup_dir: str = BACKUP_DIR, backup_keep: int = BACKUP_KEEP):
+        if chunk_size <= 0 or chunk_size % 512:
+            raise ValueError("chunk_size deve ser um múltiplo positivo de 512 bytes (tamanho mínimo de página do SQLite).")
+        self.root = root
+        self.chunk_size = chunk_size
+        self.backup_dir = backup_dir
+        self.backup_keep = backup_keep
+        self.chunks_dir = os.path.join(root, "chunks")
+        self.manifests_dir = os.path.join(root, "manifests")
+        os.makedirs(self.chunks_dir, exist_ok=True)
+        os.makedirs(self.manifests_dir, exist_ok=True)
+
+    # --- Trava ---
+    @contextmanager
+    def _locked(self, timeout: float = LOCK_TIMEOUT_S) -> Iterator[None]:
+        """Trava o repositório (arquivo store.lock) durante o bloco `with`.
+
+        O manifesto de um snapshot só é gravado depois dos seus blocos: sem a trava,
+        um prune() concorrente (outra thread, a linha de comando) veria esses blocos
+        como sem referência e os apagaria. Também vale entre processos.
+        """
+        path = os.path.join(self.root, "store.lock")
+        limite = time.monotonic() + timeout
+        while True:
+            try:
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(path) > LOCK_STALE_S:
+                        logging.warning(f"Trava abandonada removida do repositório de backups: {path}")
+                        os.remove(path)
+                        continue
+                except FileNotFoundError:
+                    continue # Liberada entre o open e o getmtime
+                if time.monotonic() >= limite:
+                    raise TimeoutError(f"Repositório de backups em uso por outra operação ({path}).")
+                time.sleep(0.05)
+        try:
+            os.write(fd, f"{os.getpid()}\n".encode())
+            os.close(fd)
+            yield
+        finally:
+            os.remove(path)
+
+    # --- Blocos ---
+    def _chunk_path(self, digest: str) -> str:
+        return os.path.join(self.chunks_dir, digest[:2], digest)
+
+    def _write_chunk(self, digest: str, data: bytes) -> int:
+        """Grava o bloco se ainda não existir. Retorna os bytes gravados (0 se já existia)."""
+        path = self._chunk_path(digest)
+        if os.path.exists(path):
+            return 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressed = zlib.compress(data, 6)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(compressed)
+        os.replace(temp_path, path)
+        return len(compressed)
+
+    def _read_chunk(self, digest: str) -> bytes:
+        with open(self._chunk_path(digest), "rb") as f:
+            data = zlib.decompress(f.read())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Bloco {digest} corrompido (hash não confere).")
+        return data
+
+    def _add_chunks(self, path: str, result: "StoreResult") -> Tuple[int, str, List[str]]:
+        """Grava os blocos de um arquivo. Retorna (tamanho, sha256, hashes dos blocos na ordem)."""
+        tamanho, chunks = 0, []
+        total = hashlib.sha256()
+        with open(path, "rb") as f:
+            while True:
+                data = f.read(self.chunk_size)
+                if not data:
+                    break
+                total.update(data)
+                digest = hashlib.sha256(data).hexdigest()
+                gravados = self._write_chunk(digest, data)
+                if gravados:
+                    result.blocos_novos += 1
+                    result.bytes_gravados += gravados
+                chunks.append(digest)
+                tamanho += len(data)
+        return tamanho, total.hexdigest(), chunks
+
+    def _rebuild(self, snapshot_id: str, chunks: List[str], sha256: str, temp_path: str):
+        """Reconstrói um arquivo em `temp_path`, conferindo o hash de cada bloco e do arquivo."""
+        total = hashlib.sha256()
+        with open(temp_path, "wb") as f:
+            for digest in chunks:
+                data = self._read_chunk(digest)
+                total.update(data)
+                f.write(data)
+        if total.hexdigest() != sha256:
+            raise ValueError(f"Snapshot {snapshot_id}: hash do arquivo restaurado não confere.")
+        ok, mensagem = verify_snapshot(temp_path)
+        if not ok:
+            raise sqlite3.DatabaseError(f"Snapshot {snapshot_id} restaurado reprovado no quick_check: {mensagem}")
+
+    # --- Snapshots ---
+    def add_file(self, path: str, origem: Optional[str] = None, snapshot_id: Optional[str] = None,
+                 arquivo: Optional[str] = None) -> StoreResult:
+        """Grava no repositório um arquivo de banco já consistente (ex: saída de backup_database).
+
+        `arquivo` é a cópia do arquivo de dados frios do mesmo banco (ver backup_archive),
+        gravada no mesmo snapshot.
+        """
+        inicio = time.perf_counter()
+        agora = datetime.now()
+        manifest = Manifest(id=snapshot_id or agora.strftime("%Y%m%d-%H%M%S-%f"), criado_em=agora.isoformat(timespec="seconds"),
+                            origem=origem or path, tamanho=0, chunk_size=self.chunk_size, sha256="")
+        result = StoreResult(manifest=manifest)
+        with self._locked():
+            if os.path.exists(self._manifest_path(manifest.id)):
+                raise ValueError(f"Já existe um snapshot com id {manifest.id}.")
+            manifest.tamanho, manifest.sha256, manifest.chunks = self._add_chunks(path, result)
+            if arquivo:
+                tamanho, sha256, chunks = self._add_chunks(arquivo, result)
+                manifest.arquivo = {"tamanho": tamanho, "sha256": sha256, "chunks": chunks}
+            # Manifesto por último: um snapshot só existe depois que todos os blocos estão no disco
+            temp_path = f"{self._manifest_path(manifest.id)}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(asdict(manifest), f)
+            os.replace(temp_path, self._manifest_path(manifest.id))
+        result.segundos = time.perf_counter() - inicio
+        logging.info(f"Snapshot {manifest.id} gravado: {len(manifest.all_chunks())} blocos, {result.blocos_novos} novos "
+                     f"({result.bytes_gravados / 1024:.0f} KiB gravados de {manifest.tamanho / 1024:.0f} KiB"
+                     f"{' + arquivo de dados frios' if manifest.arquivo else ''}) em {result.segundos:.2f}s")
+        return result
+
+    def snapshot(self, source_path: Optional[str] = None) -> StoreResult:
+        """Faz um backup online do banco (e do seu arquivo de dados frios) e grava-o no repositório.
+
+        A cópia consistente é um snapshot comum em `backup_dir`, que fica lá como os do
+        BackupScheduler (rotação em `backup_keep`); os blocos são lidos dela.
+        """
+        copia = backup_database(snapshot_path(self.backup_dir), source_path)
+        try:
+            arquivo = backup_archive(copia.caminho, source_path)
+            return self.add_file(copia.caminho, origem=source_path, arquivo=arquivo.caminho if arquivo else None)
+        finally:
+            rotate_snapshots(self.backup_dir, self.backup_keep)
+
+    def _manifest_path(self, snapshot_id: str) -> str:
+        return os.path.join(self.manifests_dir, f"{snapshot_id}.json")
+
+    def list_snapshots(self) -> List[Manifest]:
+        """Manifestos do repositório, do mais antigo para o mais recente."""
+        nomes = sorted(n for n in os.listdir(self.manifests_dir) if n.endswith(".json"))
+        return [self.load_manifest(n[:-len(".json")]) for n in nomes]
+
+    def load_manifest(self, snapshot_id: str) -> Manifest:
+        path = self._manifest_path(snapshot_id)
+        if not os.path.exists(path):
+            raise KeyError(f"Snapshot não encontrado: {snapshot_id}")
+        with open(path, encoding="utf-8") as f:
+            return Manifest(**json.load(f))
+
+    def restore(self, snapshot_id: str, dest_path: str) -> Manifest:
+        """Reconstrói o snapshot em `dest_path`, conferindo o hash de cada bloco e do arquivo.
+
+        Se o snapshot tiver o arquivo de dados frios, ele é restaurado ao lado
+        (archive_path_for(dest_path)), onde os repositórios o procuram.
+        """
+        manifest = self.load_manifest(snapshot_id)
+        partes = [(dest_path, manifest.chunks, manifest.sha256)]
+        if manifest.arquivo:
+            partes.append((archive_path_for(dest_path), manifest.arquivo["chunks"], manifest.arquivo["sha256"]))
+        for destino, _, _ in partes:
+            if os.path.exists(destino):
+                raise FileExistsError(f"O destino já existe: {destino}. Escolha outro caminho.")
+        try:
+            # Os dois arquivos são conferidos antes de qualquer um receber o nome definitivo
+            with self._locked(): # Um prune() no meio apagaria blocos ainda não lidos
+                for destino, chunks, sha256 in partes:
+                    self._rebuild(snapshot_id, chunks, sha256, f"{destino}.tmp")
+            for destino, _, _ in partes:
+                os.replace(f"{destino}.tmp", destino)
+        except Exception:
+            logging.exception(f"Erro ao restaurar o snapshot {snapshot_id} em {dest_path}:")
+            for destino, _, _ in partes:
+                if os.path.exists(f"{destino}.tmp"):
+                    os.remove(f"{destino}.tmp")
+            raise
+        logging.info(f"Snapshot {snapshot_id} restaurado em {dest_path}"
+                     f"{' (com o arquivo de dados frios)' if manifest.arquivo else ''}.")
+        return manifest
+
+    def verify(self, snapshot_id: Optional[str] = None) -> Dict[str, List[str]]:
+        """Confere os blocos de um snapshot (ou de todos). Retorna {id: [problemas]}; vazio = ok."""
+        manifests = [self.load_manifest(snapshot_id)] if snapshot_id else self.list_snapshots()
+        erros_por_bloco: Dict[str, Optional[str]] = {} # Blocos compartilhados são lidos uma vez só
+        problemas: Dict[str, List[str]] = {}
+        for manifest in manifests:
+            erros = []
+            for digest in manifest.all_chunks():
+                if digest not in erros_por_bloco:
+                    try:
+                        self._read_chunk(digest)
+                        erros_por_bloco[digest] = None
+                    except (OSError, ValueError, zlib.error) as e:
+                        erros_por_bloco[digest] = str(e)
+                if erros_por_bloco[digest]:
+                    erros.append(f"bloco {digest[:12]}: {erros_por_bloco[digest]}")
+            if erros:
+                problemas[manifest.id] = erros
+        return problemas
+
+    def prune(self, keep: int = BACKUP_STORE_KEEP) -> int:
+        """Remove os snapshots além dos `keep` mais recentes e os blocos sem referência.
+
+        `keep` deve ser pelo menos 1 (ValueError): o snapshot mais recente nunca é
+        apagado por aqui. Retorna quantos blocos foram apagados.
+        """
+        if keep < 1:
+            raise ValueError(f"keep deve ser pelo menos 1 (recebido: {keep}).")
+        with self._locked():
+            for manifest in self.list_snapshots()[:-keep]:
+                os.remove(self._manifest_path(manifest.id))
+                logging.info(f"Snapshot {manifest.id} removido do repositório de backups.")
+            em_uso: Set[str] = {digest for m in self.list_snapshots() for digest in m.all_chunks()}
+            apagados = 0
+            for prefixo in os.listdir(self.chunks_dir):
+                pasta = os.path.join(self.chunks_dir, prefixo)
+                for nome in os.listdir(pasta):
+                    if nome not in em_uso:
+                        os.remove(os.path.join(pasta, nome))
+                        apagados += 1
+        return apagados
+
+# --- Linha de comando ---
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.core.backup_store",
+                                     description="Backups deduplicados do banco de dados nutricional.")
+    parser.add_argument("--store", default=BACKUP_STORE_DIR, help="Pasta do repositório de backups")
+    parser.add_argument("--backup-dir", default=BACKUP_DIR, help="Pasta dos snapshots comuns (cópia de origem do snapshot)")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    p = sub.add_parser("snapshot", help="Grava um novo snapshot do banco")
+    p.add_argument("--db", default=None, help="Banco de origem (padrão: config.DATABASE_PATH)")
+    sub.add_parser("list", help="Lista os snapshots")
+    p = sub.add_parser("verify", help="Confere os blocos de um snapshot (ou de todos)")
+    p.add_argument("id", nargs="?")
+    p = sub.add_parser("restore", help="Restaura um snapshot num novo arquivo")
+    p.add_argument("id")
+    p.add_argument("destino")
+    p = sub.add_parser("prune", help="Mantém só os snapshots mais recentes e apaga blocos sem uso")
+    p.add_argument("--keep", type=int, default=BACKUP_STORE_KEEP)
+    args = parser.parse_args(argv)
+
+    store = BackupStore(args.store, backup_dir=args.backup_dir)
+    if args.comando == "snapshot":
+        result = store.snapshot(args.db)
+        print(f"{result.manifest.id}: {result.blocos_novos} bloco(s) novo(s), {result.bytes_gravados} bytes gravados")
+    elif args.comando == "list":
+        for m in store.list_snapshots():
+            print(f"{m.id}  {m.criado_em}  {m.tamanho} bytes  {len(m.chunks)} blocos"
+                  f"{'  + arquivo de dados frios' if m.arquivo else ''}")
+    elif args.comando == "verify":
+        problemas = store.verify(args.id)
+        for snapshot_id, erros in problemas.items():
+            for erro in erros:
+                print(f"{snapshot_id}: {erro}")
+        print("OK" if not problemas else f"{len(problemas)} snapshot(s) com problemas")
+        return 1 if problemas else 0
+    elif args.comando == "restore":
+        store.restore(args.id, args.destino)
+        print(f"Restaurado em {args.destino}")
+    elif args.comando == "prune":
+        print(f"{store.prune(args.keep)} bloco(s) apagado(s)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,50 +3,319 @@
 import sqlite3
 import logging
 import os # Importar os para usar no initialize_database
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
 
 # Adiciona o diretório src ao sys.path para permitir importações relativas
 # Isso pode ser necessário se este módulo for executado diretamente ou importado de forma complexa
 # import sys
-# src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), \'..\'))
+# src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 # sys.path.insert(0, src_path)
 
 # Tenta importar de forma relativa primeiro, depois absoluta se falhar (para flexibilidade)
 try:
-    from .config import DATABASE_PATH
+    from ..config import DATABASE_PATH, DB_POOL_SIZE, DB_POOL_TIMEOUT, STORAGE_PROFILES, STORAGE_PROFILE, FETCH_CHUNK_SIZE
 except ImportError:
-    from config import DATABASE_PATH # Fallback para execução direta ou testes
+    from config import DATABASE_PATH, DB_POOL_SIZE, DB_POOL_TIMEOUT, STORAGE_PROFILES, STORAGE_PROFILE, FETCH_CHUNK_SIZE # Fallback para execução direta ou testes
+
+try:
+    from .text_utils import chave_ordenacao
+    from .instrumentation import InstrumentedConnection
+except ImportError:
+    from text_utils import chave_ordenacao
+    from instrumentation import InstrumentedConnection
 
 # Configuração básica de logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def create_connection():
-    """Cria e retorna uma conexão com o banco de dados SQLite."""
-    conn = None
+def dict_factory(cursor: sqlite3.Cursor, row: tuple) -> dict:
+    """Row factory que retorna cada linha como dict {coluna: valor} (usado pelos repositórios)."""
+    return {col[0]: row[idx] for idx, col in enumerate(cursor.description)}
+
+# Valores retornados pelo SQLite ao ler de volta as PRAGMAs enumeradas
+_SYNCHRONOUS_NAMES = {0: "OFF", 1: "NORMAL", 2: "FULL", 3: "EXTRA"}
+_TEMP_STORE_NAMES = {0: "DEFAULT", 1: "FILE", 2: "MEMORY"}
+
+def get_storage_profile(name: Optional[str] = None) -> Dict[str, Any]:
+    """Retorna as PRAGMAs do perfil de armazenamento `name` (ou do perfil configurado)."""
+    name = name or STORAGE_PROFILE
+    if name not in STORAGE_PROFILES:
+        raise ValueError(f"Perfil de armazenamento desconhecido: {name!r}. Opções: {', '.join(STORAGE_PROFILES)}")
+    return STORAGE_PROFILES[name]
+
+def apply_storage_profile(conn: sqlite3.Connection, name: Optional[str] = None):
+    """Aplica as PRAGMAs do perfil de armazenamento na conexão."""
+    profile = get_storage_profile(name)
+    # busy_timeout primeiro: trocar o journal_mode precisa de lock exclusivo
+    conn.execute(f"PRAGMA busy_timeout = {int(profile['busy_timeout'])}")
+    conn.execute(f"PRAGMA journal_mode = {profile['journal_mode']}")
+    conn.execute(f"PRAGMA synchronous = {profile['synchronous']}")
+    conn.execute(f"PRAGMA mmap_size = {int(profile['mmap_size'])}")
+    conn.execute(f"PRAGMA cache_size = {int(profile['cache_size'])}")
+    conn.execute(f"PRAGMA temp_store = {profile['temp_store']}")
+
+def read_storage_settings(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """Lê de volta os valores em vigor das PRAGMAs controladas pelos perfis."""
+    def pragma(name):
+        row = conn.execute(f"PRAGMA {name}").fetchone()
+        if row is None: # mmap_size não retorna nada se o mmap estiver desabilitado na compilação
+            return None
+        return next(iter(row.values())) if isinstance(row, dict) else row[0]
+    return {
+        "journal_mode": str(pragma("journal_mode")).upper(),
+        "synchronous": _SYNCHRONOUS_NAMES.get(pragma("synchronous"), "?"),
+        "mmap_size": pragma("mmap_size"),
+        "cache_size": pragma("cache_size"),
+        "temp_store": _TEMP_STORE_NAMES.get(pragma("temp_store"), "?"),
+        "busy_timeout": pragma("busy_timeout"),
+    }
+
+def verify_storage_profile(conn: Optional[sqlite3.Connection] = None, name: Optional[str] = None) -> Dict[str, Any]:
+    """Confere se o perfil de armazenamento foi aplicado e registra no log o que está em vigor.
+
+    Retorna um dict {pragma: valor em vigor}. Divergências (ex.: WAL recusado pelo
+    sistema de arquivos, mmap limitado pela compilação do SQLite) geram um aviso.
+    """
+    name = name or STORAGE_PROFILE
+    expected = get_storage_profile(name)
+    conn = conn or get_db_connection()
+    effective = read_storage_settings(conn)
+    mismatches = []
+    for key, wanted in expected.items():
+        got = effective.get(key)
+        wanted_cmp = wanted.upper() if isinstance(wanted, str) else wanted
+        if got != wanted_cmp:
+            mismatches.append(f"{key}={got} (esperado {wanted})")
+    settings = ", ".join(f"{k}={v}" for k, v in effective.items())
+    logging.info(f"Perfil de armazenamento '{name}' em vigor: {settings}")
+    if mismatches:
+        logging.warning(f"Perfil de armazenamento '{name}' aplicado parcialmente: {'; '.join(mismatches)}")
+    return effective
+
+def create_connection(database_path: Optional[str] = None, profile: Optional[str] = None) -> Optional[sqlite3.Connection]:
+    """Cria e retorna uma conexão já configurada com o banco de dados SQLite.
+
+    As PRAGMAs por conexão (foreign_keys e as do perfil de armazenamento), a row
+    factory e a função SQL chave_ordenacao() são aplicadas aqui, uma única vez; o pool reutiliza a conexão depois disso.
+    Os cursores da conexão são cronometrados (ver instrumentation.InstrumentedCursor)
+    e commit()/rollback() respeitam os escopos de savepoint() (ver PooledConnection).
+    """
+    database_path = database_path or get_database_path()
     try:
         # Garante que o diretório pai do banco de dados exista
-        db_dir = os.path.dirname(DATABASE_PATH)
-        if not os.path.exists(db_dir):
+        db_dir = os.path.dirname(database_path)
+        if db_dir and not os.path.exists(db_dir):
             os.makedirs(db_dir)
             logging.info(f"Diretório do banco de dados criado em: {db_dir}")
-            
-        conn = sqlite3.connect(DATABASE_PATH)
+
+        # check_same_thread=False: a conexão pode mudar de thread ao voltar para o pool,
+        # mas o pool garante que apenas uma thread a usa por vez.
+        conn = sqlite3.connect(database_path, check_same_thread=False, factory=PooledConnection,
+                               uri=database_path.startswith("file:"))
+        conn.row_factory = dict_factory
+        conn.create_function("chave_ordenacao", 1, chave_ordenacao, deterministic=True)
         conn.execute("PRAGMA foreign_keys = ON")
-        logging.info(f"Conexão com SQLite DB em {DATABASE_PATH} bem-sucedida.")
+        apply_storage_profile(conn, profile)
+        logging.info(f"Conexão com SQLite DB em {database_path} bem-sucedida.")
         return conn
     except sqlite3.Error as e:
         logging.error(f"Erro ao conectar ao banco de dados SQLite: {e}")
         return None
 
+# Banco padrão: config.DATABASE_PATH (ou NUTRIAPP_DB_PATH), a menos que trocado por use_database()
+_database_path: Optional[str] = None
+
+def get_database_path() -> str:
+    """Caminho do banco usado quando nenhum é informado (pool compartilhado, backups, manutenção)."""
+    return _database_path or DATABASE_PATH
+
 def close_connection(conn):
     """Fecha a conexão com o banco de dados."""
     if conn:
         conn.close()
         # logging.info("Conexão SQLite fechada.") # Log menos verboso
 
+class PooledConnection(InstrumentedConnection):
+    """Conexão criada por create_connection().
+
+    Dentro de um bloco savepoint(), os commit() e rollback() chamados pelos
+    repositórios não encerram a transação externa: o commit fica para quem abriu
+    o escopo e o rollback desfaz apenas o savepoint mais interno.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.savepoints: List[str] = []
+
+    def commit(self):
+        if not self.savepoints:
+            super().commit()
+
+    def rollback(self):
+        if self.savepoints:
+            self.execute(f"ROLLBACK TO {self.savepoints[-1]}")
+        else:
+            super().rollback()
+
+@contextmanager
+def savepoint(conn: PooledConnection):
+    """Executa o bloco dentro de um SAVEPOINT da conexão.
+
+    Sem transação aberta, o savepoint inicia uma e o RELEASE final faz o commit;
+    dentro de uma transação, apenas marca um ponto que é desfeito se o bloco falhar.
+    """
+    name = f"sp_{len(conn.savepoints) + 1}"
+    conn.execute(f"SAVEPOINT {name}")
+    conn.savepoints.append(name)
+    try:
+        yield conn
+    except BaseException:
+        conn.savepoints.pop()
+        conn.execute(f"ROLLBACK TO {name}")
+        conn.execute(f"RELEASE {name}")
+        raise
+    conn.savepoints.pop()
+    conn.execute(f"RELEASE {name}")
+
+def iter_rows(cursor: sqlite3.Cursor, size: int = FETCH_CHUNK_SIZE) -> Iterator[Any]:
+    """Percorre o resultado de um cursor já executado em lotes de `size` linhas (fetchmany).
+
+    Só um lote fica em memória por vez, qualquer que seja o tamanho do resultado.
+    """
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
+
+class ConnectionPool:
+    """Pool limitado de conexões SQLite pré-configuradas, entregues por thread.
+
+    Cada thread recebe sempre a mesma conexão enquanto a mantiver: a thread da GUI
+    pega a sua na primeira consulta e fica com ela; workers em segundo plano usam
+    `connection()` para pegar uma conexão e devolvê-la ao pool ao terminar.
+    Quando todas as `max_size` conexões estão em uso, `acquire()` espera até
+    `timeout` segundos por uma conexão livre.
+    """
+    def __init__(self, database_path: Optional[str] = None, max_size: int = DB_POOL_SIZE,
+                 timeout: float = DB_POOL_TIMEOUT, profile: Optional[str] = None):
+        self.database_path = database_path or get_database_path()
+        self.profile = profile
+        self.max_size = max_size
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._idle: List[sqlite3.Connection] = []
+        self._all: List[sqlite3.Connection] = []
+        self._local = threading.local()
+
+    def acquire(self) -> sqlite3.Connection:
+        """Retorna a conexão da thread atual, pegando uma do pool se necessário."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        with self._cond:
+            while not self._idle and len(self._all) >= self.max_size:
+                if not self._cond.wait(self.timeout):
+                    raise sqlite3.OperationalError(
+                        f"Pool de conexões esgotado ({self.max_size} em uso) após {self.timeout}s de espera.")
+            if self._idle:
+                conn = self._idle.pop()
+            else:
+                conn = create_connection(self.database_path, self.profile)
+                if conn is None:
+                    raise sqlite3.OperationalError(f"Não foi possível conectar ao banco de dados em {self.database_path}.")
+                self._all.append(conn)
+        self._local.conn = conn
+        return conn
+
+    def release(self):
+        """Devolve ao pool a conexão da thread atual (transação pendente é desfeita)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        if conn.in_transaction:
+            logging.warning("Conexão devolvida ao pool com transação pendente; executando rollback.")
+            conn.rollback()
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Empresta uma conexão à thread atual durante o bloco `with`.
+
+        Se a thread já possui uma conexão (ex.: thread da GUI), ela é reutilizada
+        e não é devolvida ao sair do bloco.
+        """
+        already_held = getattr(self._local, "conn", None) is not None
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            if not already_held:
+                self.release()
+
+    def close_all(self):
+        """Fecha todas as conexões criadas pelo pool (usado no encerramento e nos testes)."""
+        with self._cond:
+            for conn in self._all:
+                close_connection(conn)
+            count = len(self._all)
+            self._all.clear()
+            self._idle.clear()
+            self._cond.notify_all()
+        self._local = threading.local()
+        logging.info(f"Pool de conexões encerrado ({count} conexão(ões) fechada(s)).")
+
+# Instância única compartilhada por todos os repositórios
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """Retorna o pool de conexões compartilhado, criando-o na primeira chamada."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+def get_db_connection() -> sqlite3.Connection:
+    """Retorna a conexão da thread atual a partir do pool compartilhado."""
+    return get_pool().acquire()
+
+def close_pool():
+    """Fecha todas as conexões do pool compartilhado e descarta a instância."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close_all()
+
+@contextmanager
+def use_database(database_path: str) -> Iterator[str]:
+    """Troca o banco padrão durante o bloco `with` (ex: testes com um banco em memória).
+
+    O pool compartilhado é fechado na entrada e na saída, para que as conexões
+    seguintes sejam abertas no banco em vigor. Aceita URIs "file:...", como
+    "file:nome?mode=memory&cache=shared" (banco em memória compartilhado pelas conexões).
+    """
+    global _database_path
+    anterior = _database_path
+    close_pool()
+    _database_path = database_path
+    try:
+        yield database_path
+    finally:
+        close_pool()
+        _database_path = anterior
+
 def execute_query(query, params=(), is_script=False):
     """Executa uma query SQL (INSERT, UPDATE, DELETE, CREATE). Retorna True em sucesso, False em falha."""
-    conn = create_connection()
-    if conn is None:
+    try:
+        conn = get_db_connection()
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao obter conexão do pool: {e}")
         return False
     cursor = conn.cursor()
     try:
@@ -62,15 +331,15 @@ def execute_query(query, params=(), is_script=False):
         conn.rollback()
         return False
     finally:
-        close_connection(conn)
+        cursor.close()
 
 def fetch_one(query, params=()):
-    """Executa uma query SELECT e retorna uma única linha."""
-    conn = create_connection()
-    if conn is None:
+    """Executa uma query SELECT e retorna uma única linha (como dict)."""
+    try:
+        conn = get_db_connection()
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao obter conexão do pool: {e}")
         return None
-    # Configurar para retornar dicionários pode ser útil, mas vamos manter tuplas por enquanto
-    # conn.row_factory = sqlite3.Row 
     cursor = conn.cursor()
     try:
         cursor.execute(query, params)
@@ -81,14 +350,15 @@ def fetch_one(query, params=()):
         logging.error(f"Erro ao executar fetch_one: {e}\nQuery: {query}\nParams: {params}")
         return None
     finally:
-        close_connection(conn)
+        cursor.close()
 
 def fetch_all(query, params=()):
-    """Executa uma query SELECT e retorna todas as linhas."""
-    conn = create_connection()
-    if conn is None:
+    """Executa uma query SELECT e retorna todas as linhas (como dicts)."""
+    try:
+        conn = get_db_connection()
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao obter conexão do pool: {e}")
         return None
-    # conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     try:
         cursor.execute(query, params)
@@ -99,105 +369,26 @@ def fetch_all(query, params=()):
         logging.error(f"Erro ao executar fetch_all: {e}\nQuery: {query}\nParams: {params}")
         return None
     finally:
-        close_connection(conn)
+        cursor.close()
 
 def initialize_database():
-    """Cria as tabelas do banco de dados se elas não existirem."""
-    
-    sql_statements = []
-
-    # Tabela Pacientes
-    sql_statements.append("""
-    CREATE TABLE IF NOT EXISTS pacientes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nome_completo TEXT NOT NULL,
-        data_nascimento TEXT NOT NULL, -- Formato YYYY-MM-DD
-        sexo TEXT,
-        telefone TEXT,
-        email TEXT UNIQUE,
-        endereco TEXT,
-        objetivo_consulta TEXT,
-        historico_clinico TEXT,
-        observacoes TEXT,
-        data_cadastro TEXT DEFAULT CURRENT_TIMESTAMP
-    );
-    """)
-
-    # Tabela Avaliacoes
-    sql_statements.append("""
-    CREATE TABLE IF NOT EXISTS avaliacoes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        paciente_id INTEGER NOT NULL,
-        data_avaliacao TEXT DEFAULT CURRENT_TIMESTAMP,
-        peso REAL,
-        altura REAL,
-        circunferencia_cintura REAL,
-        circunferencia_quadril REAL,
-        anamnese_resumo TEXT,
-        exames_resumo TEXT,
-        observacoes TEXT,
-        FOREIGN KEY (paciente_id) REFERENCES pacientes (id) ON DELETE CASCADE
-    );
-    """)
-
-    # Tabela Alimentos
-    sql_statements.append("""
-    CREATE TABLE IF NOT EXISTS alimentos (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        nome TEXT NOT NULL UNIQUE,
-        grupo TEXT,
-        unidade_padrao TEXT DEFAULT \'g\',
-        kcal_por_unidade REAL,
-        cho_por_unidade REAL,
-        ptn_por_unidade REAL,
-        lip_por_unidade REAL,
-        fonte_dados TEXT
-    );
-    """)
-
-    # Tabela Planos Alimentares
-    sql_statements.append("""
-    CREATE TABLE IF NOT EXISTS planos_alimentares (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        paciente_id INTEGER NOT NULL,
-        nome_plano TEXT NOT NULL,
-        data_criacao TEXT DEFAULT CURRENT_TIMESTAMP,
-        objetivo TEXT,
-        meta_kcal REAL,
-        meta_cho_perc REAL,
-        meta_ptn_perc REAL,
-        meta_lip_perc REAL,
-        observacoes_gerais TEXT,
-        FOREIGN KEY (paciente_id) REFERENCES pacientes (id) ON DELETE CASCADE
-    );
-    """)
-
-    # Tabela Itens do Plano Alimentar
-    sql_statements.append("""
-    CREATE TABLE IF NOT EXISTS itens_plano_alimentar (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        plano_alimentar_id INTEGER NOT NULL,
-        refeicao TEXT NOT NULL,
-        alimento_id INTEGER NOT NULL,
-        quantidade REAL NOT NULL,
-        unidade_medida TEXT NOT NULL,
-        FOREIGN KEY (plano_alimentar_id) REFERENCES planos_alimentares (id) ON DELETE CASCADE,
-        FOREIGN KEY (alimento_id) REFERENCES alimentos (id) ON DELETE RESTRICT -- Evita deletar alimento usado em plano
-    );
-    """)
-
-    logging.info("Inicializando/Verificando tabelas do banco de dados...")
-    all_success = True
-    for i, statement in enumerate(sql_statements):
-        if not execute_query(statement, is_script=True):
-            logging.error(f"Falha ao verificar/criar tabela (Statement {i+1}).")
-            all_success = False
-            
-    if all_success:
-        logging.info("Banco de dados inicializado/verificado com sucesso.")
-    else:
-        logging.error("Ocorreram erros durante a inicialização do banco de dados.")
-    return all_success
+    """Cria ou atualiza o esquema do banco de dados aplicando as migrações pendentes."""
+    # Import tardio: migrations depende deste módulo
+    try:
+        from .migrations import migrate
+    except ImportError:
+        from migrations import migrate
+
+    logging.info("Inicializando/Verificando esquema do banco de dados...")
+    try:
+        version = migrate()
+    except Exception as e:
+        logging.error(f"Ocorreram erros durante a inicialização do banco de dados: {e}")
+        return False
+
+    logging.info(f"Banco de dados inicializado/verificado com sucesso (esquema versão {version}).")
+    verify_storage_profile()
+    return True
 
 # Não chamar initialize_database() automaticamente na importação.
 # Deve ser chamado explicitamente no ponto de entrada da aplicação (main.py).
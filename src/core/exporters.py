@@ -0,0 +1,200 @@
+# src/core/exporters.py
+
+import csv
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Tenta importar de forma relativa primeiro
+try:
+    from ..config import FETCH_CHUNK_SIZE
+except ImportError:
+    from config import FETCH_CHUNK_SIZE
+
+try:
+    from .database import ConnectionPool, get_pool, iter_rows, savepoint
+except ImportError:
+    from src.core.database import ConnectionPool, get_pool, iter_rows, savepoint
+
+# Exportação de dados em streaming: cada consulta é lida com fetchmany (iter_rows)
+# e cada linha é escrita no arquivo assim que chega, então a memória usada não
+# depende do número de registros. As consultas seguem a ordem dos índices para
+# que o SQLite não precise ordenar o resultado inteiro antes da primeira linha.
+# O arquivo é gravado num temporário e renomeado no fim: uma exportação
+# cancelada ou com erro não deixa arquivo pela metade.
+
+# (feitas, total) -> chamado a cada lote; retornar True cancela a exportação
+ExportProgressCallback = Callable[[int, int], Optional[bool]]
+
+FORMATS = ("csv", "ndjson", "xlsx")
+
+# Nome do conjunto -> (título, consulta de contagem, consulta dos dados)
+DATASETS: Dict[str, Tuple[str, str, str]] = {
+    "pacientes": (
+        "Pacientes",
+        "SELECT COUNT(*) AS n FROM pacientes",
+        """SELECT id, nome_completo, data_nascimento, sexo, telefone, email, endereco,
+                  objetivo_consulta, historico_clinico, observacoes, data_cadastro
+           FROM pacientes ORDER BY nome_ordenacao""",
+    ),
+    "avaliacoes": (
+        "Avaliações",
+        "SELECT COUNT(*) AS n FROM avaliacoes",
+        """SELECT av.id, av.paciente_id, p.nome_completo AS paciente, av.data_avaliacao,
+                  av.peso, av.altura, av.circunferencia_cintura, av.circunferencia_quadril,
+                  av.circunferencia_braco, av.dobra_tricipital, av.dobra_subescapular,
+                  av.dobra_suprailiaca, av.dobra_abdominal, av.anamnese_resumo,
+                  av.exames_resumo, av.observacoes
+           FROM avaliacoes av
+           JOIN pacientes p ON p.id = av.paciente_id
+           ORDER BY av.paciente_id, av.data_avaliacao""",
+    ),
+    # Planos expandidos: uma linha por item, com o nome do alimento e os nutrientes.
+    # Itens gravados sem os valores calculados usam quantidade x valor por unidade.
+    "planos": (
+        "Planos alimentares",
+        "SELECT COUNT(*) AS n FROM itens_plano_alimentar",
+        """SELECT pl.id AS plano_id, pl.paciente_id, p.nome_completo AS paciente, pl.nome_plano,
+                  pl.data_criacao, pl.objetivo, pl.meta_kcal, i.id AS item_id, i.refeicao,
+                  i.alimento_id, a.nome AS alimento, i.quantidade, i.unidade_medida,
+                  COALESCE(i.kcal_calculado, i.quantidade * a.kcal_por_unidade) AS kcal,
+                  COALESCE(i.cho_calculado, i.quantidade * a.cho_por_unidade) AS cho_g,
+                  COALESCE(i.ptn_calculado, i.quantidade * a.ptn_por_unidade) AS ptn_g,
+                  COALESCE(i.lip_calculado, i.quantidade * a.lip_por_unidade) AS lip_g,
+                  i.quantidade * a.fibras_por_unidade AS fibras_g,
+                  i.quantidade * a.sodio_mg_por_unidade AS sodio_mg,
+                  i.observacoes
+           FROM planos_alimentares pl
+           JOIN pacientes p ON p.id = pl.paciente_id
+           JOIN itens_plano_alimentar i ON i.plano_alimentar_id = pl.id
+           LEFT JOIN alimentos a ON a.id = i.alimento_id
+           ORDER BY pl.id, i.id""",
+    ),
+}
+
+@dataclass
+class ExportResult:
+    """Resumo de uma exportação."""
+    caminho: str = ""
+    linhas: int = 0
+    segundos: float = 0.0
+    cancelada: bool = False
+
+def format_for_path(path: str) -> str:
+    """Formato de exportação pela extensão do arquivo (.csv, .ndjson/.jsonl, .xlsx)."""
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    fmt = "ndjson" if ext == "jsonl" else ext
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato de exportação não suportado: '.{ext}'. Use {', '.join('.' + f for f in FORMATS)}.")
+    return fmt
+
+def iter_dataset(conn, dataset: str, fetch_size: int = FETCH_CHUNK_SIZE) -> Tuple[List[str], Iterator[Dict[str, Any]]]:
+    """Executa a consulta do conjunto e retorna (colunas, gerador de linhas)."""
+    if dataset not in DATASETS:
+        raise ValueError(f"Conjunto de dados desconhecido: {dataset!r}. Opções: {', '.join(DATASETS)}")
+    cursor = conn.cursor()
+    cursor.execute(DATASETS[dataset][2])
+    colunas = [col[0] for col in cursor.description]
+    return colunas, iter_rows(cursor, fetch_size)
+
+# --- Escritores (uma linha por vez) ---
+class _CsvWriter:
+    # ";" e BOM UTF-8: abre direto no Excel em português
+    def __init__(self, path: str, colunas: List[str], titulo: str):
+        self._file = open(path, "w", encoding="utf-8-sig", newline="")
+        self._writer = csv.writer(self._file, delimiter=";")
+        self._writer.writerow(colunas)
+
+    def write(self, row: Dict[str, Any]):
+        self._writer.writerow(row.values())
+
+    def close(self):
+        self._file.close()
+
+class _NdjsonWriter:
+    def __init__(self, path: str, colunas: List[str], titulo: str):
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, row: Dict[str, Any]):
+        self._file.write(json.dumps(row, ensure_ascii=False))
+        self._file.write("\n")
+
+    def close(self):
+        self._file.close()
+
+class _XlsxWriter:
+    # Workbook write_only: as linhas vão para o disco à medida que são adicionadas
+    def __init__(self, path: str, colunas: List[str], titulo: str):
+        try:
+            from openpyxl import Workbook
+        except ImportError as e:
+            raise RuntimeError("Exportar para XLSX requer o pacote 'openpyxl'.") from e
+        self._path = path
+        self._workbook = Workbook(write_only=True)
+        self._sheet = self._workbook.create_sheet(titulo[:31])
+        self._sheet.append(colunas)
+
+    def write(self, row: Dict[str, Any]):
+        self._sheet.append(list(row.values()))
+
+    def close(self):
+        self._workbook.save(self._path)
+
+_WRITERS = {"csv": _CsvWriter, "ndjson": _NdjsonWriter, "xlsx": _XlsxWriter}
+
+def export_dataset(dataset: str, path: str, fmt: Optional[str] = None, pool: Optional[ConnectionPool] = None,
+                   fetch_size: int = FETCH_CHUNK_SIZE, progress: Optional[ExportProgressCallback] = None) -> ExportResult:
+    """Exporta um conjunto de DATASETS ("pacientes", "avaliacoes" ou "planos") para `path`.
+
+    O formato vem de `fmt` ou da extensão do arquivo. Contagem e leitura rodam na
+    mesma transação de leitura (mesmo retrato do banco, sem bloquear escritas em WAL).
+    Pode ser chamada de uma thread de trabalho: usa a conexão do pool dessa thread.
+    """
+    inicio = time.perf_counter()
+    fmt = fmt or format_for_path(path)
+    if fmt not in _WRITERS:
+        raise ValueError(f"Formato de exportação não suportado: {fmt!r}. Opções: {', '.join(FORMATS)}")
+    titulo, sql_contagem, _ = DATASETS.get(dataset, (None, None, None))
+    if titulo is None:
+        raise ValueError(f"Conjunto de dados desconhecido: {dataset!r}. Opções: {', '.join(DATASETS)}")
+
+    result = ExportResult(caminho=path)
+    temp_path = f"{path}.parcial"
+    writer = None
+    try:
+        with (pool or get_pool()).connection() as conn, savepoint(conn):
+            total = conn.execute(sql_contagem).fetchone()["n"]
+            colunas, rows = iter_dataset(conn, dataset, fetch_size)
+            writer = _WRITERS[fmt](temp_path, colunas, titulo)
+            for row in rows:
+                writer.write(row)
+                result.linhas += 1
+                if progress and result.linhas % fetch_size == 0 and progress(result.linhas, total):
+                    result.cancelada = True
+                    break
+            if progress and not result.cancelada:
+                progress(result.linhas, total)
+        writer.close()
+        writer = None
+        if result.cancelada:
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, path)
+    except Exception:
+        logging.exception(f"Erro ao exportar '{dataset}' para {path}:")
+        if writer is not None:
+            try:
+                writer.close()
+            except Exception:
+                pass
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    result.segundos = time.perf_counter() - inicio
+    estado = "cancelada" if result.cancelada else "concluída"
+    logging.info(f"Exportação de '{dataset}' ({fmt}) {estado}: {result.linhas} linha(s) em {result.segundos:.2f}s -> {path}")
+    return result
@@ -0,0 +1,244 @@
+# src/core/food_catalog.py
+
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Tenta importar de forma relativa primeiro
+try:
+    from .database import ConnectionPool, get_pool, get_database_path
+    from .models import NUTRIENTES
+except ImportError:
+    from src.core.database import ConnectionPool, get_pool, get_database_path
+    from src.core.models import NUTRIENTES
+
+# Catálogo de alimentos em memória, em formato colunar: em vez de uma lista de objetos
+# Alimento (um dataclass por linha), cada atributo usado em cálculos fica num array
+# NumPy contíguo, na mesma ordem de linhas:
+#     ids       int64   id do alimento
+#     valores   float64 (n, 4): kcal, cho, ptn, lip por unidade (NaN quando não informado)
+#     unidades  int16   código da unidade padrão (ver `nomes_unidades`)
+#     grupos    int16   código do grupo (ver `nomes_grupos`)
+#     nomes     object  nome do alimento (exibição)
+# Um índice denso id -> linha (int32, -1 para ids inexistentes) torna a busca por id
+# uma indexação de array, também para muitos ids de uma vez (rows_for).
+# 50 mil alimentos ocupam poucos MB (a maior parte nos nomes).
+#
+# Recarga incremental: a migração 7 registra em alimentos_alteracoes (por triggers)
+# cada alimento inserido, alterado ou excluído. refresh() relê só os alimentos com
+# seq maior que o último visto; se o registro foi podado além desse ponto, ou o banco
+# foi trocado (restauração de backup), recarrega tudo.
+
+# Acima desta fração do catálogo alterada, a recarga completa sai mais barata
+_FRACAO_RECARGA_COMPLETA = 0.5
+
+_COLUNAS = "id, nome, grupo, unidade_padrao, kcal_por_unidade, cho_por_unidade, ptn_por_unidade, lip_por_unidade"
+
+class FoodCatalog:
+    """Cópia colunar (NumPy) da tabela `alimentos`, mantida em dia por refresh().
+
+    Os arrays públicos podem ser substituídos a cada refresh(); não guarde
+    referências a eles entre chamadas.
+    """
+    def __init__(self, pool: Optional[ConnectionPool] = None):
+        self._pool = pool
+        self.database_path = (pool or get_pool()).database_path
+        self._lock = threading.Lock()
+        self._seq: Optional[int] = None # Última alteração aplicada (None = nunca carregado)
+        self.nomes_unidades: List[str] = []
+        self.nomes_grupos: List[Optional[str]] = []
+        self._codigos_unidades: Dict[str, int] = {}
+        self._codigos_grupos: Dict[Optional[str], int] = {}
+        self._set_rows([])
+
+    @property
+    def conn(self):
+        return (self._pool or get_pool()).acquire()
+
+    # --- Carga ---
+    def refresh(self) -> bool:
+        """Aplica as alterações feitas em `alimentos` desde a última carga.
+
+        Na primeira chamada carrega o catálogo inteiro. Retorna True se algo mudou.
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.row_factory = None
+            primeira, ultima = cursor.execute(
+                "SELECT (SELECT MIN(seq) FROM alimentos_alteracoes), (SELECT MAX(seq) FROM alimentos_alteracoes)").fetchone()
+            ultima = ultima or 0
+            if self._seq is not None and ultima == self._seq:
+                return False
+            if (self._seq is None or ultima < self._seq
+                    or (primeira is not None and primeira > self._seq + 1)
+                    or ultima - self._seq > len(self) * _FRACAO_RECARGA_COMPLETA):
+                self._load_all(ultima)
+            else:
+                self._load_changes(self._seq, ultima)
+            return True
+
+    def reload(self):
+        """Descarta o conteúdo e recarrega o catálogo inteiro."""
+        with self._lock:
+            self._seq = None
+        self.refresh()
+
+    def _load_all(self, seq: int):
+        # A posição no registro é lida antes dos dados: uma alteração feita no meio
+        # da leitura é reaplicada no próximo refresh(), o que é inofensivo
+        cursor = self.conn.cursor()
+        cursor.row_factory = None
+        cursor.execute(f"SELECT {_COLUNAS} FROM alimentos ORDER BY id")
+        self._set_rows(cursor.fetchall())
+        self._seq = seq
+        logging.info(f"Catálogo de alimentos carregado: {len(self)} alimentos, {self.nbytes / 1e6:.1f} MB.")
+
+    def _load_changes(self, desde: int, ate: int):
+        cursor = self.conn.cursor()
+        cursor.row_factory = None
+        # Alimentos excluídos voltam com existe = 0 (sem linha em `alimentos`)
+        cursor.execute("""SELECT c.alimento_id, a.id IS NOT NULL AS existe, a.nome, a.grupo, a.unidade_padrao,
+                          a.kcal_por_unidade, a.cho_por_unidade, a.ptn_por_unidade, a.lip_por_unidade
+                          FROM (SELECT DISTINCT alimento_id FROM alimentos_alteracoes WHERE seq > ? AND seq <= ?) c
+                          LEFT JOIN alimentos a ON a.id = c.alimento_id""", (desde, ate))
+        alterados = cursor.fetchall()
+        removidos = np.array([r[0] for r in alterados if not r[1]], dtype=np.int64)
+        presentes = [(r[0],) + tuple(r[2:]) for r in alterados if r[1]]
+
+        if removidos.size:
+            linhas = self.rows_for(removidos)
+            manter = np.ones(len(self), dtype=bool)
+            manter[linhas[linhas >= 0]] = False
+            self._keep(manter)
+        if presentes:
+            ids, nomes, valores, unidades, grupos = self._columns(presentes)
+            linhas = self.rows_for(ids)
+            existentes = linhas >= 0
+            alvo = linhas[existentes]
+            self.nomes[alvo] = nomes[existentes]
+            self.valores[alvo] = valores[existentes]
+            self.unidades[alvo] = unidades[existentes]
+            self.grupos[alvo] = grupos[existentes]
+            novos = ~existentes
+            if novos.any():
+                self._append(ids[novos], nomes[novos], valores[novos], unidades[novos], grupos[novos])
+        self._seq = ate
+        logging.debug(f"Catálogo de alimentos atualizado: {len(presentes)} alterado(s), {removidos.size} removido(s).")
+
+    # --- Montagem dos arrays ---
+    def _code(self, tabela: Dict, nomes: List, valor) -> int:
+        codigo = tabela.get(valor)
+        if codigo is None:
+            codigo = tabela[valor] = len(nomes)
+            nomes.append(valor)
+        return codigo
+
+    def _columns(self, rows: List[tuple]) -> Tuple[np.ndarray, ...]:
+        n = len(rows)
+        colunas = list(zip(*rows)) if rows else [()] * 8
+        ids = np.array(colunas[0], dtype=np.int64)
+        nomes = np.empty(n, dtype=object)
+        nomes[:] = colunas[1]
+        # None vira NaN com dtype=float
+        valores = np.array(list(zip(*colunas[4:8])), dtype=np.float64).reshape(n, len(NUTRIENTES))
+        unidades = np.array([self._code(self._codigos_unidades, self.nomes_unidades, (u or "").strip().lower())
+                             for u in colunas[3]], dtype=np.int16)
+        grupos = np.array([self._code(self._codigos_grupos, self.nomes_grupos, g) for g in colunas[2]], dtype=np.int16)
+        return ids, nomes, valores, unidades, grupos
+
+    def _set_rows(self, rows: List[tuple]):
+        self.ids, self.nomes, self.valores, self.unidades, self.grupos = self._columns(rows)
+        self._reindex()
+
+    def _append(self, ids, nomes, valores, unidades, grupos):
+        self.ids = np.concatenate([self.ids, ids])
+        self.nomes = np.concatenate([self.nomes, nomes])
+        self.valores = np.concatenate([self.valores, valores])
+        self.unidades = np.concatenate([self.unidades, unidades])
+        self.grupos = np.concatenate([self.grupos, grupos])
+        self._reindex()
+
+    def _keep(self, manter: np.ndarray):
+        self.ids, self.nomes, self.valores = self.ids[manter], self.nomes[manter], self.valores[manter]
+        self.unidades, self.grupos = self.unidades[manter], self.grupos[manter]
+        self._reindex()
+
+    def _reindex(self):
+        tamanho = int(self.ids.max()) + 1 if self.ids.size else 0
+        self._linha = np.full(tamanho, -1, dtype=np.int32)
+        self._linha[self.ids] = np.arange(self.ids.size, dtype=np.int32)
+
+    # --- Consulta ---
+    def __len__(self) -> int:
+        return int(self.ids.size)
+
+    def __contains__(self, alimento_id) -> bool:
+        return self.row_of(alimento_id) >= 0
+
+    def row_of(self, alimento_id: int) -> int:
+        """Linha do alimento nos arrays, ou -1 se ele não existe."""
+        if alimento_id is None or not 0 <= alimento_id < self._linha.size:
+            return -1
+        return int(self._linha[alimento_id])
+
+    def rows_for(self, alimento_ids: Iterable[int]) -> np.ndarray:
+        """Linhas de vários alimentos de uma vez (-1 para ids inexistentes)."""
+        ids = np.asarray(alimento_ids, dtype=np.int64).ravel()
+        linhas = np.full(ids.size, -1, dtype=np.int32)
+        validos = (ids >= 0) & (ids < self._linha.size)
+        linhas[validos] = self._linha[ids[validos]]
+        return linhas
+
+    def nutrients_for(self, alimento_ids: Iterable[int]) -> np.ndarray:
+        """Matriz (n, 4) de kcal/cho/ptn/lip por unidade; ausentes e não informados valem 0."""
+        linhas = self.rows_for(alimento_ids)
+        resultado = np.zeros((linhas.size, len(NUTRIENTES)), dtype=np.float64)
+        encontrados = linhas >= 0
+        resultado[encontrados] = np.nan_to_num(self.valores[linhas[encontrados]])
+        return resultado
+
+    def units_for(self, alimento_ids: Iterable[int]) -> np.ndarray:
+        """Unidade padrão de vários alimentos de uma vez ("" para ids inexistentes)."""
+        linhas = self.rows_for(alimento_ids)
+        codigos = np.full(linhas.size, len(self.nomes_unidades), dtype=np.int32)
+        encontrados = linhas >= 0
+        codigos[encontrados] = self.unidades[linhas[encontrados]]
+        return np.array(self.nomes_unidades + [""], dtype=object)[codigos]
+
+    def nome(self, alimento_id: int) -> Optional[str]:
+        linha = self.row_of(alimento_id)
+        return self.nomes[linha] if linha >= 0 else None
+
+    def unidade(self, alimento_id: int) -> Optional[str]:
+        linha = self.row_of(alimento_id)
+        return self.nomes_unidades[self.unidades[linha]] if linha >= 0 else None
+
+    def grupo(self, alimento_id: int) -> Optional[str]:
+        linha = self.row_of(alimento_id)
+        return self.nomes_grupos[self.grupos[linha]] if linha >= 0 else None
+
+    @property
+    def nbytes(self) -> int:
+        """Memória aproximada do catálogo (arrays, índice e textos dos nomes)."""
+        arrays = (self.ids, self.nomes, self.valores, self.unidades, self.grupos, self._linha)
+        return sum(a.nbytes for a in arrays) + sum(len(nome) + 49 for nome in self.nomes if nome)
+
+# Catálogo do banco padrão, compartilhado pela aplicação
+_catalog: Optional[FoodCatalog] = None
+_catalog_lock = threading.Lock()
+
+def get_catalog() -> FoodCatalog:
+    """Retorna o catálogo do banco em uso (get_database_path), já atualizado.
+
+    O catálogo é criado (e carregado) na primeira chamada e refeito se o banco padrão
+    for trocado; nas demais chamadas, refresh() custa uma consulta indexada.
+    """
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None or _catalog.database_path != get_database_path():
+            _catalog = FoodCatalog()
+        catalog = _catalog
+    catalog.refresh()
+    return catalog
@@ -0,0 +1,256 @@
+# src/core/importers.py
+
+import csv
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Tenta importar de forma relativa primeiro
+try:
+    from ..config import IMPORT_CHUNK_SIZE
+except ImportError:
+    from config import IMPORT_CHUNK_SIZE
+
+try:
+    from .models import Alimento
+    from .repositories import AlimentoRepository
+    from .text_utils import chave_ordenacao
+except ImportError:
+    from src.core.models import Alimento
+    from src.core.repositories import AlimentoRepository
+    from src.core.text_utils import chave_ordenacao
+
+# Importação em lote de tabelas de composição de alimentos (TACO, IBGE/POF).
+# As tabelas trazem os nutrientes por 100 g (ou por uma porção em gramas, quando há
+# uma coluna de porção). Os valores são normalizados para 100 g, validados de forma
+# vetorizada e gravados por grama (unidade_padrao "g"), que é como os
+# *_por_unidade são usados no cálculo dos planos (valor × quantidade em g).
+# A gravação é feita por AlimentoRepository.upsert_batch em blocos de
+# IMPORT_CHUNK_SIZE linhas, um bloco por transação.
+
+# Campo do modelo -> padrão (sobre o cabeçalho normalizado) das colunas aceitas
+COLUMN_PATTERNS: Dict[str, str] = {
+    "nome": r"^(descricao|nome|alimento)",
+    "grupo": r"^(grupo|categoria)",
+    "kcal": r"(^energia.*kcal|^kcal|^calorias)",
+    "cho": r"^carboidrato",
+    "ptn": r"^proteina",
+    "lip": r"^lipid",
+    "fibras": r"^fibra",
+    "sodio": r"^sodio",
+    "porcao_g": r"^(porcao|base|quantidade).*\bg\b",
+}
+NUTRIENT_FIELDS = ("kcal", "cho", "ptn", "lip", "fibras", "sodio")
+# Campo do importador -> coluna do modelo Alimento
+MODEL_FIELDS = {
+    "kcal": "kcal_por_unidade", "cho": "cho_por_unidade", "ptn": "ptn_por_unidade",
+    "lip": "lip_por_unidade", "fibras": "fibras_por_unidade", "sodio": "sodio_mg_por_unidade",
+}
+# Marcadores das tabelas: "Tr" (traços) vale zero; "NA"/"*"/"-" são dados ausentes
+TRACE_MARKERS = {"TR", "TRACOS", "TRAÇOS"}
+MISSING_MARKERS = {"", "NA", "N/A", "ND", "*", "-", "NAN"}
+# Limites físicos por 100 g usados na validação
+MAX_KCAL_100G = 900.0
+MAX_MACROS_100G = 105.0 # Pequena folga para arredondamentos das tabelas
+# Quantas linhas do início do arquivo examinar procurando o cabeçalho
+HEADER_SCAN_ROWS = 15
+
+# Exemplos de registros rejeitados guardados no resultado (os demais só são contados)
+MAX_REJECTED_EXAMPLES = 100
+
+ProgressCallback = Callable[[int, int], None]
+
+@dataclass
+class ImportResult:
+    """Resumo de uma importação."""
+    lidos: int = 0
+    gravados: int = 0
+    # Primeiros MAX_REJECTED_EXAMPLES rejeitados (linha, nome, motivo); o total fica em n_rejeitados
+    rejeitados: List[Tuple[int, str, str]] = field(default_factory=list)
+    n_rejeitados: int = 0
+    segundos: float = 0.0
+
+    def rejeitar(self, linha: int, nome: str, motivo: str):
+        """Conta um registro rejeitado, guardando-o como exemplo enquanto houver espaço."""
+        self.n_rejeitados += 1
+        if len(self.rejeitados) < MAX_REJECTED_EXAMPLES:
+            self.rejeitados.append((linha, nome, motivo))
+
+def normalize_header(header) -> str:
+    """Cabeçalho sem acentos/caixa e sem pontuação (ex: "Proteína (g)" -> "proteina g")."""
+    return " ".join(re.sub(r"[^\w]+", " ", chave_ordenacao(str(header))).split())
+
+def map_columns(columns) -> Dict[str, str]:
+    """Associa cada campo do importador à primeira coluna cujo cabeçalho casa com o padrão."""
+    mapping: Dict[str, str] = {}
+    for column in columns:
+        key = normalize_header(column)
+        for campo, pattern in COLUMN_PATTERNS.items():
+            if campo not in mapping and re.search(pattern, key):
+                mapping[campo] = column
+                break
+    return mapping
+
+def _find_header(rows) -> Optional[int]:
+    """Índice da primeira linha que tem colunas de nome e de energia."""
+    for i, row in enumerate(rows):
+        mapping = map_columns(["" if pd.isna(c) else c for c in row])
+        if "nome" in mapping and "kcal" in mapping:
+            return i
+    return None
+
+def _sniff_csv(path: str) -> Tuple[str, str, int]:
+    """Descobre (encoding, separador, linha do cabeçalho) de um CSV."""
+    for encoding in ("utf-8-sig", "latin-1"): # Tabelas oficiais costumam vir em latin-1
+        try:
+            with open(path, encoding=encoding, newline="") as f:
+                sample = [f.readline() for _ in range(HEADER_SCAN_ROWS)]
+            break
+        except UnicodeDecodeError:
+            continue
+    # Vírgula costuma ser o separador decimal nas tabelas brasileiras: ";" e tab têm prioridade
+    text = "".join(sample)
+    sep = next((c for c in (";", "\t") if c in text), ",")
+    header = _find_header(csv.reader(sample, delimiter=sep))
+    if header is None:
+        raise ValueError("Cabeçalho não encontrado: o arquivo precisa de colunas de descrição/nome do alimento e de energia (kcal).")
+    return encoding, sep, header
+
+def read_table(path: str, sheet_name=0) -> pd.DataFrame:
+    """Lê um CSV ou XLSX como texto, localizando a linha de cabeçalho automaticamente.
+
+    As planilhas da TACO/IBGE costumam ter títulos antes do cabeçalho; a primeira
+    linha (entre as HEADER_SCAN_ROWS iniciais) que tiver uma coluna de nome e uma
+    de energia é usada como cabeçalho. O índice do DataFrame é a linha no arquivo.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".xlsx", ".xls"):
+        raw = pd.read_excel(path, sheet_name=sheet_name, header=None, dtype=str)
+        header = _find_header(raw.head(HEADER_SCAN_ROWS).itertuples(index=False, name=None))
+        if header is None:
+            raise ValueError("Cabeçalho não encontrado: o arquivo precisa de colunas de descrição/nome do alimento e de energia (kcal).")
+        df = raw.iloc[header + 1:].reset_index(drop=True)
+        df.columns = ["" if pd.isna(c) else str(c) for c in raw.iloc[header]]
+    else:
+        encoding, sep, header = _sniff_csv(path)
+        df = pd.read_csv(path, sep=sep, skiprows=header, header=0, dtype=str, encoding=encoding,
+                         keep_default_na=False, skip_blank_lines=False)
+    df.index = df.index + header + 2 # Primeira linha de dados = linha header + 2 (contando de 1)
+    # Linhas totalmente vazias (rodapés, separadores) não contam como rejeitadas
+    preenchidas = df.fillna("").astype(str).apply(lambda col: col.str.strip() != "").any(axis=1)
+    return df[preenchidas]
+
+def to_number(column: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """Converte textos numéricos (vírgula decimal, "Tr", "NA") para float.
+
+    Retorna (valores, invalidos): `invalidos` marca células preenchidas que não
+    são número nem marcador conhecido.
+    """
+    text = column.fillna("").astype(str).str.strip()
+    upper = text.str.upper()
+    text = text.mask(upper.isin(TRACE_MARKERS), "0")
+    missing = upper.isin(MISSING_MARKERS)
+    values = pd.to_numeric(text.str.replace(",", ".", regex=False).mask(missing), errors="coerce")
+    return values, values.isna() & ~missing
+
+def prepare_dataframe(df: pd.DataFrame, base_g: float = 100.0) -> Tuple[pd.DataFrame, pd.Series]:
+    """Mapeia as colunas, converte e normaliza os nutrientes para 100 g e valida tudo.
+
+    Retorna (dados, motivo): `dados` tem as colunas nome, grupo e os nutrientes
+    por 100 g; `motivo` é o motivo de rejeição de cada linha (NaN = linha válida).
+    `base_g` é a quantidade a que os valores se referem quando não há coluna de porção.
+    """
+    mapping = map_columns(df.columns)
+    if "nome" not in mapping or "kcal" not in mapping:
+        raise ValueError("Colunas obrigatórias ausentes: descrição/nome do alimento e energia (kcal).")
+
+    dados = pd.DataFrame(index=df.index)
+    dados["nome"] = df[mapping["nome"]].fillna("").astype(str).str.strip()
+    dados["grupo"] = df[mapping["grupo"]].fillna("").astype(str).str.strip() if "grupo" in mapping else ""
+    motivo = pd.Series(np.nan, index=df.index, dtype=object)
+
+    def reject(mask: pd.Series, texto: str):
+        nonlocal motivo
+        motivo = motivo.mask(mask & motivo.isna(), texto)
+
+    reject(dados["nome"] == "", "nome vazio")
+
+    if "porcao_g" in mapping:
+        porcao, porcao_invalida = to_number(df[mapping["porcao_g"]])
+        reject(porcao_invalida | ~(porcao > 0), "porção (g) inválida")
+        fator = 100.0 / porcao
+    else:
+        fator = pd.Series(100.0 / base_g, index=df.index)
+
+    for campo in NUTRIENT_FIELDS:
+        if campo not in mapping:
+            dados[campo] = np.nan
+            continue
+        valores, invalidos = to_number(df[mapping[campo]])
+        reject(invalidos, f"valor não numérico em '{mapping[campo]}'")
+        reject(valores < 0, f"valor negativo em '{mapping[campo]}'")
+        dados[campo] = valores * fator
+
+    reject(dados["kcal"].isna(), "energia (kcal) ausente")
+    reject(dados["kcal"] > MAX_KCAL_100G, f"energia acima de {MAX_KCAL_100G:.0f} kcal por 100 g")
+    macros = dados[["cho", "ptn", "lip"]].fillna(0).sum(axis=1)
+    reject(macros > MAX_MACROS_100G, "carboidratos + proteínas + lipídios acima de 100 g por 100 g")
+    return dados, motivo
+
+def _to_alimentos(dados: pd.DataFrame, fonte: str) -> List[Alimento]:
+    """Converte as linhas válidas (por 100 g) em Alimentos com valores por grama."""
+    por_grama = dados[list(NUTRIENT_FIELDS)] / 100.0
+    por_grama = por_grama.astype(object).where(por_grama.notna(), None)
+    alimentos = []
+    for nome, grupo, valores in zip(dados["nome"], dados["grupo"], por_grama.itertuples(index=False, name=None)):
+        kwargs = {MODEL_FIELDS[campo]: valor for campo, valor in zip(NUTRIENT_FIELDS, valores)}
+        alimentos.append(Alimento(nome=nome, grupo=grupo or None, unidade_padrao="g", fonte_dados=fonte, **kwargs))
+    return alimentos
+
+def import_dataframe(df: pd.DataFrame, fonte: str, repo: Optional[AlimentoRepository] = None,
+                     chunk_size: int = IMPORT_CHUNK_SIZE, base_g: float = 100.0,
+                     progress: Optional[ProgressCallback] = None) -> ImportResult:
+    """Valida e grava um DataFrame já lido (ver read_table)."""
+    inicio = time.perf_counter()
+    repo = repo or AlimentoRepository()
+    dados, motivo = prepare_dataframe(df, base_g)
+    result = ImportResult(lidos=len(dados))
+    for linha, texto in motivo.dropna().items():
+        result.rejeitar(linha, dados.at[linha, "nome"], texto)
+
+    validos = dados[motivo.isna()]
+    # Nome repetido no arquivo: vale a última ocorrência (mesmo efeito do upsert)
+    validos = validos[~validos["nome"].duplicated(keep="last")]
+    total = len(validos)
+    if progress:
+        progress(0, total)
+    for start in range(0, total, chunk_size):
+        chunk = validos.iloc[start:start + chunk_size]
+        result.gravados += repo.upsert_batch(_to_alimentos(chunk, fonte))
+        if progress:
+            progress(min(start + chunk_size, total), total)
+
+    result.segundos = time.perf_counter() - inicio
+    logging.info(f"Importação '{fonte}': {result.gravados} alimentos gravados, {result.n_rejeitados} rejeitados, "
+                 f"{result.lidos} linhas lidas em {result.segundos:.2f}s.")
+    return result
+
+def import_food_table(path: str, fonte: Optional[str] = None, repo: Optional[AlimentoRepository] = None,
+                      chunk_size: int = IMPORT_CHUNK_SIZE, base_g: float = 100.0, sheet_name=0,
+                      progress: Optional[ProgressCallback] = None) -> ImportResult:
+    """Importa uma tabela TACO/IBGE (CSV ou XLSX) para `alimentos`.
+
+    `fonte` vai para fonte_dados (padrão: "TACO"/"IBGE" conforme o nome do arquivo,
+    senão o próprio nome do arquivo). `progress(gravados, total)` é chamado após cada bloco.
+    """
+    if fonte is None:
+        nome_arquivo = os.path.basename(path)
+        fonte = next((f for f in ("TACO", "IBGE") if f in nome_arquivo.upper()), nome_arquivo)
+    df = read_table(path, sheet_name=sheet_name)
+    return import_dataframe(df, fonte, repo=repo, chunk_size=chunk_size, base_g=base_g, progress=progress)
@@ -0,0 +1,368 @@
+# src/core/instrumentation.py
+
+import bisect
+import functools
+import inspect
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+# Tenta importar de forma relativa primeiro
+try:
+    from ..config import SLOW_QUERY_THRESHOLD_MS, SLOW_QUERY_LOG_PATH, METRICS_PATH
+except ImportError:
+    from config import SLOW_QUERY_THRESHOLD_MS, SLOW_QUERY_LOG_PATH, METRICS_PATH
+
+# Instrumentação das consultas: cada comando executado por um InstrumentedCursor é
+# cronometrado (execute + fetch* até esgotar o resultado) e registrado em
+# histogramas por comando SQL e por método de repositório. Comandos acima de
+# SLOW_QUERY_THRESHOLD_MS vão para o log de consultas lentas. Os números podem ser
+# exportados em formato OpenMetrics (texto) com write_openmetrics().
+
+# Limites dos buckets (segundos) dos histogramas exportados
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Amostras recentes guardadas por série para calcular p50/p95/p99
+RESERVOIR_SIZE = 1024
+
+slow_query_logger = logging.getLogger("nutriapp.slow_queries")
+
+class LatencyHistogram:
+    """Histograma de latências com buckets fixos e amostras recentes para percentis."""
+    def __init__(self):
+        self.bucket_counts = [0] * (len(BUCKETS) + 1) # Último = +Inf
+        self.count = 0
+        self.total = 0.0
+        self.rows = 0
+        self._recent = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, seconds: float, rows: int = 0):
+        self.bucket_counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.rows += rows
+        self._recent.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Percentil `p` (0-100) das amostras recentes, em segundos."""
+        if not self._recent:
+            return None
+        ordered = sorted(self._recent)
+        index = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+class QueryMetrics:
+    """Registro thread-safe das latências por comando SQL e por método de repositório."""
+    def __init__(self, slow_threshold_ms: float = SLOW_QUERY_THRESHOLD_MS):
+        self.slow_threshold_ms = slow_threshold_ms
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._statements: Dict[str, LatencyHistogram] = {}
+        self._methods: Dict[str, LatencyHistogram] = {}
+        self._errors: Dict[str, int] = {}
+        self._context = threading.local()
+
+    # --- Contexto (método de repositório em execução na thread) ---
+    def current_method(self) -> Optional[str]:
+        stack = getattr(self._context, "stack", None)
+        return stack[-1] if stack else None
+
+    def push_method(self, name: str):
+        if not hasattr(self._context, "stack"):
+            self._context.stack = []
+        self._context.stack.append(name)
+
+    def pop_method(self):
+        self._context.stack.pop()
+
+    # --- Registro ---
+    def record_statement(self, sql: str, seconds: float, rows: int):
+        if not self.enabled:
+            return
+        key = " ".join(sql.split())
+        with self._lock:
+            self._statements.setdefault(key, LatencyHistogram()).observe(seconds, rows)
+        elapsed_ms = seconds * 1000
+        if elapsed_ms >= self.slow_threshold_ms:
+            origem = self.current_method() or "<fora de repositório>"
+            slow_query_logger.warning(f"Consulta lenta ({elapsed_ms:.1f} ms, {rows} linha(s)) em {origem}: {key}")
+
+    def record_error(self, sql: str):
+        """Conta um comando que falhou (não entra nos histogramas de duração)."""
+        if not self.enabled:
+            return
+        key = " ".join(sql.split())
+        with self._lock:
+            self._errors[key] = self._errors.get(key, 0) + 1
+
+    def record_method(self, name: str, seconds: float):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._methods.setdefault(name, LatencyHistogram()).observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._methods.clear()
+            self._errors.clear()
+
+    # --- Consulta ---
+    def statement_stats(self) -> Dict[str, LatencyHistogram]:
+        with self._lock:
+            return dict(self._statements)
+
+    def method_stats(self) -> Dict[str, LatencyHistogram]:
+        with self._lock:
+            return dict(self._methods)
+
+    def error_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._errors)
+
+    def summary(self) -> List[Dict[str, object]]:
+        """Resumo por método (contagem, p50/p95/p99 em ms), do mais lento (p95) para o mais rápido."""
+        linhas = []
+        for name, hist in self.method_stats().items():
+            linhas.append({
+                "metodo": name, "chamadas": hist.count,
+                "p50_ms": (hist.percentile(50) or 0) * 1000,
+                "p95_ms": (hist.percentile(95) or 0) * 1000,
+                "p99_ms": (hist.percentile(99) or 0) * 1000,
+            })
+        return sorted(linhas, key=lambda l: l["p95_ms"], reverse=True)
+
+    # --- Exportação ---
+    def to_openmetrics(self) -> str:
+        """Serializa os histogramas no formato de texto OpenMetrics."""
+        out: List[str] = []
+        self._write_histograms(out, "nutriapp_query_duration_seconds",
+                               "Duração dos comandos SQL (execute + fetch).", "statement", self.statement_stats())
+        out.append("# TYPE nutriapp_query_rows counter")
+        out.append("# HELP nutriapp_query_rows Linhas retornadas ou afetadas pelos comandos SQL.")
+        for sql, hist in sorted(self.statement_stats().items()):
+            out.append(f'nutriapp_query_rows_total{{statement="{_escape(sql)}"}} {hist.rows}')
+        out.append("# TYPE nutriapp_query_errors counter")
+        out.append("# HELP nutriapp_query_errors Comandos SQL que terminaram com erro.")
+        for sql, count in sorted(self.error_stats().items()):
+            out.append(f'nutriapp_query_errors_total{{statement="{_escape(sql)}"}} {count}')
+        methods = self.method_stats()
+        self._write_histograms(out, "nutriapp_repository_method_duration_seconds",
+                               "Duração das chamadas aos métodos dos repositórios.", "method", methods)
+        out.append("# TYPE nutriapp_repository_method_quantile_seconds gauge")
+        out.append("# HELP nutriapp_repository_method_quantile_seconds Percentis recentes da duração por método.")
+        for name, hist in sorted(methods.items()):
+            for q in (50, 95, 99):
+                value = hist.percentile(q)
+                if value is not None:
+                    out.append(f'nutriapp_repository_method_quantile_seconds{{method="{_escape(name)}",quantile="{q / 100}"}} {value:.6f}')
+        out.append("# EOF")
+        return "\n".join(out) + "\n"
+
+    @staticmethod
+    def _write_histograms(out: List[str], family: str, help_text: str, label: str, series: Dict[str, LatencyHistogram]):
+        out.append(f"# TYPE {family} histogram")
+        out.append(f"# HELP {family} {help_text}")
+        for key, hist in sorted(series.items()):
+            lbl = f'{label}="{_escape(key)}"'
+            cumulative = 0
+            for bound, count in zip(BUCKETS, hist.bucket_counts):
+                cumulative += count
+                out.append(f'{family}_bucket{{{lbl},le="{bound}"}} {cumulative}')
+            out.append(f'{family}_bucket{{{lbl},le="+Inf"}} {hist.count}')
+            out.append(f"{family}_count{{{lbl}}} {hist.count}")
+            out.append(f"{family}_sum{{{lbl}}} {hist.total:.6f}")
+
+    def write_openmetrics(self, path: str = METRICS_PATH):
+        """Grava as métricas num arquivo de texto (substituição atômica)."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_openmetrics())
+        os.replace(tmp_path, path)
+        logging.info(f"Métricas de consultas exportadas para {path}")
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+# Instância única usada pelos cursores e repositórios
+metrics = QueryMetrics()
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor que cronometra cada comando, incluindo o tempo gasto nos fetch*.
+
+    O SQLite só avança a consulta à medida que as linhas são lidas, então o tempo
+    de um SELECT é a soma do execute com os fetch* até o resultado se esgotar.
+    """
+    _sql: Optional[str] = None
+    _elapsed = 0.0
+    _rows = 0
+
+    def _finish(self):
+        if self._sql is not None:
+            metrics.record_statement(self._sql, self._elapsed, self._rows)
+            self._sql = None
+
+    def _start(self, sql: str, run: Callable):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            result = run()
+        except Exception:
+            metrics.record_error(sql) # Não conta como comando concluído
+            raise
+        self._sql, self._elapsed, self._rows = sql, time.perf_counter() - start, 0
+        if self.description is None: # Sem linhas de resultado (INSERT/UPDATE/DELETE/DDL)
+            self._rows = max(self.rowcount, 0)
+            self._finish()
+        return result
+
+    # Com metrics.enabled desligado, os comandos vão direto ao sqlite3.Cursor
+    # (sem cronômetro nem closures) e os fetch* seguintes também não são medidos
+    def execute(self, sql, parameters=()):
+        if not metrics.enabled:
+            self._finish()
+            return super().execute(sql, parameters)
+        return self._start(sql, lambda: super(InstrumentedCursor, self).execute(sql, parameters))
+
+    def executemany(self, sql, seq_of_parameters):
+        if not metrics.enabled:
+            self._finish()
+            return super().executemany(sql, seq_of_parameters)
+        return self._start(sql, lambda: super(InstrumentedCursor, self).executemany(sql, seq_of_parameters))
+
+    def executescript(self, sql_script):
+        if not metrics.enabled:
+            self._finish()
+            return super().executescript(sql_script)
+        return self._start(sql_script, lambda: super(InstrumentedCursor, self).executescript(sql_script))
+
+    def _timed_fetch(self, fetch: Callable, exhausted: Callable):
+        if self._sql is None: # Comando não medido (métricas desligadas) ou já registrado
+            return fetch()
+        start = time.perf_counter()
+        result = fetch()
+        self._elapsed += time.perf_counter() - start
+        if isinstance(result, list):
+            self._rows += len(result)
+        elif result is not None:
+            self._rows += 1
+        if exhausted(result):
+            self._finish()
+        return result
+
+    def fetchone(self):
+        return self._timed_fetch(super().fetchone, lambda r: r is None)
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        return self._timed_fetch(lambda: super(InstrumentedCursor, self).fetchmany(size), lambda r: len(r) < size)
+
+    def fetchall(self):
+        return self._timed_fetch(super().fetchall, lambda r: True)
+
+    def __next__(self):
+        try:
+            return self._timed_fetch(super().__next__, lambda r: False)
+        except StopIteration:
+            self._finish()
+            raise
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # Cursor descartado sem esgotar o resultado (ex: fetchone() que achou a linha)
+        try:
+            self._finish()
+        except Exception:
+            pass # Fim do interpretador: o registro pode não existir mais
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Conexão cujos cursores (inclusive os de conn.execute) são InstrumentedCursor."""
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+class _AttributedGenerator:
+    """Repassa next/send/throw/close a um gerador com `name` na pilha da thread só durante cada passo.
+
+    Usado com `yield from` por timed_method: o gerador do repositório recebe os
+    send() e throw() de quem consome e é fechado junto com o wrapper, mas entre um
+    yield e o próximo o nome fica fora da pilha (as consultas de quem consome,
+    geradores intercalados e um fechamento em outra thread não herdam a atribuição).
+    """
+    __slots__ = ("_name", "_gen")
+
+    def __init__(self, name: str, gen):
+        self._name = name
+        self._gen = gen
+
+    def _step(self, func: Callable, *args):
+        metrics.push_method(self._name)
+        try:
+            return func(*args)
+        finally:
+            metrics.pop_method()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self._step(self._gen.__next__)
+
+    def send(self, value):
+        return self._step(self._gen.send, value)
+
+    def throw(self, typ, val=None, tb=None):
+        # `yield from` repassa (tipo, valor, traceback); generator.throw só precisa da exceção
+        exc = val if val is not None else (typ() if isinstance(typ, type) else typ)
+        if tb is not None:
+            exc = exc.with_traceback(tb)
+        return self._step(self._gen.throw, exc)
+
+    def close(self):
+        return self._step(self._gen.close)
+
+def timed_method(name: str, func: Callable) -> Callable:
+    """Envolve um método de repositório para registrar sua duração (geradores: até o fim da iteração)."""
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def gen_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return (yield from _AttributedGenerator(name, func(*args, **kwargs)))
+            finally:
+                metrics.record_method(name, time.perf_counter() - start)
+        return gen_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        metrics.push_method(name)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            metrics.pop_method()
+            metrics.record_method(name, time.perf_counter() - start)
+    return wrapper
+
+def setup_slow_query_log(path: Optional[str] = SLOW_QUERY_LOG_PATH):
+    """Direciona o log de consultas lentas também para um arquivo próprio."""
+    if not path or any(getattr(h, "baseFilename", None) == os.path.abspath(path) for h in slow_query_logger.handlers):
+        return
+    handler = logging.FileHandler(path, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(message)s"))
+    slow_query_logger.addHandler(handler)
@@ -0,0 +1,306 @@
+# src/core/json_importer.py
+
+import codecs
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, Iterator, List, Optional
+
+# Tenta importar de forma relativa primeiro
+try:
+    from ..config import IMPORT_CHUNK_SIZE
+except ImportError:
+    from config import IMPORT_CHUNK_SIZE
+
+try:
+    from .models import Alimento
+    from .repositories import AlimentoRepository
+    from .text_utils import chave_ordenacao
+    from .importers import (ImportResult, ProgressCallback, map_columns, MODEL_FIELDS, NUTRIENT_FIELDS,
+                            TRACE_MARKERS, MISSING_MARKERS, MAX_KCAL_100G, MAX_MACROS_100G)
+except ImportError:
+    from src.core.models import Alimento
+    from src.core.repositories import AlimentoRepository
+    from src.core.text_utils import chave_ordenacao
+    from src.core.importers import (ImportResult, ProgressCallback, map_columns, MODEL_FIELDS, NUTRIENT_FIELDS,
+                                    TRACE_MARKERS, MISSING_MARKERS, MAX_KCAL_100G, MAX_MACROS_100G)
+
+# Importação de arquivos JSON muito grandes (ex: dumps no formato FoodData Central)
+# com memória limitada: o arquivo é lido em blocos de READ_CHUNK_BYTES e cada
+# registro do array principal é decodificado e convertido em Alimento assim que
+# termina de chegar. Só ficam em memória o registro atual, o bloco lido e um lote
+# de IMPORT_CHUNK_SIZE alimentos, qualquer que seja o tamanho do arquivo.
+# Formatos aceitos: um array de registros, um objeto cujo primeiro valor-array
+# contém os registros (ex: {"FoundationFoods": [...]}) ou NDJSON (.ndjson/.jsonl).
+
+READ_CHUNK_BYTES = 64 * 1024
+# Limite para um único registro; acima disso o arquivo é tratado como inválido
+MAX_RECORD_CHARS = 16 * 1024 * 1024
+
+# Números de nutriente do FoodData Central -> campo do importador (valores por 100 g).
+# Para energia, 208 (kcal) tem prioridade sobre os fatores de Atwater (958/957).
+FDC_NUTRIENT_NUMBERS = {
+    "208": "kcal", "958": "kcal_atwater", "957": "kcal_atwater",
+    "205": "cho", "203": "ptn", "204": "lip", "291": "fibras", "307": "sodio",
+}
+# Fallback pelo nome do nutriente (normalizado), quando o número não vem no arquivo
+FDC_NUTRIENT_NAMES = [
+    (r"^energy", "kcal"), (r"^protein", "ptn"), (r"^total lipid", "lip"),
+    (r"^carbohydrate", "cho"), (r"^fiber", "fibras"), (r"^sodium", "sodio"),
+]
+
+class JsonRecordStream:
+    """Itera sobre os registros de um arquivo JSON sem carregá-lo inteiro.
+
+    `bytes_read` indica quanto do arquivo já foi lido (para barras de progresso).
+    """
+    def __init__(self, path: str, array_key: Optional[str] = None, chunk_size: int = READ_CHUNK_BYTES):
+        self.path = path
+        self.array_key = array_key
+        self.chunk_size = chunk_size
+        self.bytes_read = 0
+        self.total_bytes = os.path.getsize(path)
+        self._json = json.JSONDecoder()
+
+    def __iter__(self) -> Iterator[Any]:
+        if os.path.splitext(self.path)[1].lower() in (".ndjson", ".jsonl"):
+            yield from self._iter_lines()
+            return
+        with open(self.path, "rb") as self._file:
+            self._decoder = codecs.getincrementaldecoder("utf-8-sig")()
+            self._buf, self._pos, self._eof = "", 0, False
+            self._enter_records_array()
+            if self._peek() == "]":
+                return
+            while True:
+                yield self._decode_value()
+                c = self._peek()
+                if c == ",":
+                    self._pos += 1
+                elif c == "]":
+                    return
+                else:
+                    self._fail("',' ou ']' esperado entre registros")
+
+    def _iter_lines(self) -> Iterator[Any]:
+        with open(self.path, "rb") as f:
+            for line in f:
+                self.bytes_read += len(line)
+                if line.strip():
+                    yield json.loads(line)
+
+    # --- Leitura incremental ---
+    def _fill(self) -> bool:
+        """Lê mais um bloco, descartando o que já foi consumido. False no fim do arquivo."""
+        if self._eof:
+            return False
+        data = self._file.read(self.chunk_size)
+        self.bytes_read += len(data)
+        self._buf = self._buf[self._pos:] + self._decoder.decode(data, final=not data)
+        self._pos = 0
+        self._eof = not data
+        return True
+
+    def _peek(self) -> str:
+        """Próximo caractere não branco (sem consumi-lo); "" no fim do arquivo."""
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def _decode_value(self) -> Any:
+        """Decodifica o valor JSON na posição atual, lendo mais blocos se ele estiver incompleto."""
+        self._peek() # raw_decode não aceita espaços antes do valor
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # Valor incompleto: lê mais um bloco, mas sem acumular o arquivo inteiro se o JSON for inválido
+                if len(self._buf) - self._pos > MAX_RECORD_CHARS or not self._fill():
+                    raise
+                continue
+            # Um número no fim do buffer pode ter sido cortado pelo bloco ("12" de "123")
+            if end == len(self._buf) and not self._eof and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            self._fail(f"'{char}' esperado")
+        self._pos += 1
+
+    def _fail(self, message: str):
+        raise ValueError(f"JSON inválido perto do byte {self.bytes_read}: {message}.")
+
+    def _enter_records_array(self):
+        """Posiciona a leitura logo após o '[' do array de registros."""
+        c = self._peek()
+        if c == "[":
+            self._pos += 1
+            return
+        if c != "{":
+            self._fail("array ou objeto esperado no início do arquivo")
+        self._pos += 1
+        while self._peek() != "}":
+            key = self._decode_value()
+            self._expect(":")
+            if self._peek() == "[" and self.array_key in (None, key):
+                self._pos += 1
+                return
+            self._decode_value() # Ignora valores que não são o array de registros
+            if self._peek() == ",":
+                self._pos += 1
+        raise ValueError("Nenhum array de registros encontrado no arquivo JSON.")
+
+# --- Conversão de registros ---
+def _to_float(value) -> Optional[float]:
+    """Número do registro (aceita texto com vírgula decimal, "Tr" e "NA"); ValueError se inválido."""
+    if value is None or isinstance(value, (int, float)):
+        return None if value is None else float(value)
+    text = str(value).strip()
+    if text.upper() in TRACE_MARKERS:
+        return 0.0
+    if text.upper() in MISSING_MARKERS:
+        return None
+    return float(text.replace(",", "."))
+
+def _fdc_nutrients(food_nutrients: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Extrai os nutrientes de uma lista foodNutrients (formatos completo e resumido do FDC)."""
+    valores: Dict[str, float] = {}
+    for fn in food_nutrients:
+        nutrient = fn.get("nutrient") or fn
+        amount = fn.get("amount", fn.get("value"))
+        if amount is None:
+            continue
+        unit = str(nutrient.get("unitName") or "").lower()
+        campo = FDC_NUTRIENT_NUMBERS.get(str(nutrient.get("number") or nutrient.get("nutrientNumber") or ""))
+        if campo is None:
+            nome = chave_ordenacao(str(nutrient.get("name") or nutrient.get("nutrientName") or ""))
+            campo = next((c for pattern, c in FDC_NUTRIENT_NAMES if re.search(pattern, nome)), None)
+            if campo == "kcal" and unit != "kcal":
+                campo = "kj" if unit == "kj" else None
+        if campo is None or campo in valores:
+            continue
+        amount = float(amount)
+        if campo == "sodio" and unit == "g":
+            amount *= 1000
+        valores[campo] = amount
+    if "kcal" not in valores:
+        if "kcal_atwater" in valores:
+            valores["kcal"] = valores["kcal_atwater"]
+        elif "kj" in valores:
+            valores["kcal"] = valores["kj"] / 4.184
+    return valores
+
+_mapping_cache: Dict[tuple, Dict[str, str]] = {}
+
+def record_to_values(record: Dict[str, Any]):
+    """Retorna (nome, grupo, {campo: valor por 100 g}) de um registro FDC ou plano.
+
+    Registros planos usam os mesmos cabeçalhos aceitos pelo importador de
+    tabelas (ex: {"Descrição": ..., "Energia (kcal)": ...}).
+    """
+    if "foodNutrients" in record:
+        categoria = record.get("foodCategory")
+        grupo = categoria.get("description") if isinstance(categoria, dict) else categoria
+        if not grupo and isinstance(record.get("wweiaFoodCategory"), dict):
+            grupo = record["wweiaFoodCategory"].get("wweiaFoodCategoryDescription")
+        return str(record.get("description") or "").strip(), grupo, _fdc_nutrients(record["foodNutrients"] or [])
+
+    keys = tuple(record.keys())
+    mapping = _mapping_cache.get(keys)
+    if mapping is None:
+        if len(_mapping_cache) > 256: # Registros com chaves muito variadas: não deixa o cache crescer
+            _mapping_cache.clear()
+        mapping = _mapping_cache.setdefault(keys, map_columns(keys))
+    nome = str(record.get(mapping.get("nome"), "") or "").strip()
+    grupo = record.get(mapping["grupo"]) if "grupo" in mapping else None
+    valores = {campo: _to_float(record.get(mapping[campo])) for campo in NUTRIENT_FIELDS if campo in mapping}
+    valores = {k: v for k, v in valores.items() if v is not None}
+    porcao = _to_float(record.get(mapping["porcao_g"])) if "porcao_g" in mapping else None
+    if porcao: # Valores informados por porção -> por 100 g
+        valores = {k: v * 100.0 / porcao for k, v in valores.items()}
+    return nome, grupo, valores
+
+def validate_values(nome: str, valores: Dict[str, float]) -> Optional[str]:
+    """Mesmas regras do importador de tabelas, para um registro (valores por 100 g)."""
+    if not nome:
+        return "nome vazio"
+    negativos = [campo for campo in NUTRIENT_FIELDS if valores.get(campo, 0) < 0]
+    if negativos:
+        return f"valor negativo em '{negativos[0]}'"
+    if valores.get("kcal") is None:
+        return "energia (kcal) ausente"
+    if valores["kcal"] > MAX_KCAL_100G:
+        return f"energia acima de {MAX_KCAL_100G:.0f} kcal por 100 g"
+    if sum(valores.get(c, 0) for c in ("cho", "ptn", "lip")) > MAX_MACROS_100G:
+        return "carboidratos + proteínas + lipídios acima de 100 g por 100 g"
+    return None
+
+def import_json(path: str, fonte: Optional[str] = None, repo: Optional[AlimentoRepository] = None,
+                chunk_size: int = IMPORT_CHUNK_SIZE, array_key: Optional[str] = None,
+                write_queue=None, progress: Optional[ProgressCallback] = None) -> ImportResult:
+    """Importa um JSON de composição de alimentos em lotes, com memória limitada.
+
+    Cada lote de `chunk_size` alimentos é gravado por AlimentoRepository.upsert_batch
+    numa transação própria. Com `write_queue` (WriteQueue), os lotes vão para a
+    thread escritora e a leitura do próximo lote continua enquanto o anterior é
+    gravado (no máximo um lote pendente). `progress(bytes_lidos, tamanho)` é
+    chamado após cada lote.
+    """
+    inicio = time.perf_counter()
+    repo = repo or AlimentoRepository()
+    fonte = fonte or os.path.basename(path)
+    stream = JsonRecordStream(path, array_key=array_key)
+    result = ImportResult()
+    lote: List[Alimento] = []
+    pendente: Optional[Future] = None
+
+    def gravar(alimentos: List[Alimento]):
+        nonlocal pendente
+        if write_queue is None:
+            result.gravados += repo.upsert_batch(alimentos)
+        else:
+            if pendente is not None:
+                result.gravados += pendente.result()
+            pendente = write_queue.submit(repo.upsert_batch, alimentos)
+        if progress:
+            progress(stream.bytes_read, stream.total_bytes)
+
+    for registro in stream:
+        result.lidos += 1
+        if not isinstance(registro, dict):
+            result.rejeitar(result.lidos, "", "registro não é um objeto")
+            continue
+        try:
+            nome, grupo, valores = record_to_values(registro)
+        except (ValueError, TypeError) as e:
+            result.rejeitar(result.lidos, str(registro.get("description", "")), f"valor inválido: {e}")
+            continue
+        motivo = validate_values(nome, valores)
+        if motivo:
+            result.rejeitar(result.lidos, nome, motivo)
+            continue
+        # Por 100 g -> por grama, como nos demais alimentos (ver importers.py)
+        kwargs = {MODEL_FIELDS[campo]: valores[campo] / 100.0 for campo in NUTRIENT_FIELDS if campo in valores}
+        lote.append(Alimento(nome=nome, grupo=grupo or None, unidade_padrao="g", fonte_dados=fonte, **kwargs))
+        if len(lote) >= chunk_size:
+            gravar(lote)
+            lote = []
+
+    if lote:
+        gravar(lote)
+    if pendente is not None:
+        result.gravados += pendente.result()
+
+    result.segundos = time.perf_counter() - inicio
+    logging.info(f"Importação JSON '{fonte}': {result.gravados} alimentos gravados, {result.n_rejeitados} rejeitados, "
+                 f"{result.lidos} registros lidos em {result.segundos:.2f}s.")
+    return result
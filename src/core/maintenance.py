@@ -0,0 +1,283 @@
+# src/core/maintenance.py
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Iterator, List, Optional, Tuple
+
+# Tenta importar de forma relativa primeiro
+try:
+    from ..config import (MAINTENANCE_INTERVAL_HOURS, MAINTENANCE_STEP_BUDGET_MS,
+                          MAINTENANCE_VACUUM_MIN_FREE_PAGES, MAINTENANCE_MAX_CONVERSION_MB, MAINTENANCE_LOG_DAYS,
+                          FOOD_CATALOG_LOG_KEEP)
+except ImportError:
+    from config import (MAINTENANCE_INTERVAL_HOURS, MAINTENANCE_STEP_BUDGET_MS,
+                        MAINTENANCE_VACUUM_MIN_FREE_PAGES, MAINTENANCE_MAX_CONVERSION_MB, MAINTENANCE_LOG_DAYS,
+                        FOOD_CATALOG_LOG_KEEP)
+
+try:
+    from .database import create_connection, close_connection, get_database_path
+except ImportError:
+    from src.core.database import create_connection, close_connection, get_database_path
+
+# Manutenção automática do banco, feita aos poucos enquanto a interface está ociosa:
+#   incremental_vacuum: devolve ao sistema as páginas livres deixadas por exclusões.
+#                       O primeiro passo, uma vez na vida do banco, é a conversão para
+#                       auto_vacuum=INCREMENTAL (VACUUM completo, ver convert_to_incremental)
+#   analyze:            estatísticas (sqlite_stat1) para o planejador, uma tabela por passo
+#   optimize:           PRAGMA optimize
+# Cada tarefa é um gerador que executa um passo curto por iteração; entre os passos
+# o agendador confere se a interface continua ociosa. Os passos rodam numa conexão
+# própria (fora do pool) e cada um é registrado na tabela manutencao_log com sua
+# duração; o passo 'fim' marca a tarefa como concluída, o que define quando ela
+# volta a ser devida (MAINTENANCE_INTERVAL_HOURS).
+
+TASKS = ("incremental_vacuum", "analyze", "optimize")
+
+# Linhas lidas por índice no ANALYZE (análise aproximada, com duração limitada)
+ANALYSIS_LIMIT = 1000
+
+@dataclass
+class MaintenanceStep:
+    """Um passo executado por uma tarefa de manutenção."""
+    tarefa: str
+    passo: str
+    segundos: float
+    detalhes: str = ""
+
+class MaintenanceScheduler:
+    """Executa as tarefas de manutenção devidas enquanto a aplicação está ociosa.
+
+    A interface informa o estado com set_idle(); start() cria a thread que roda os
+    passos enquanto houver ociosidade e tarefas devidas. run_pending() executa o
+    mesmo ciclo na thread atual (usado pela thread e pelos testes). `listener(step)`
+    é chamado após cada passo; `progress(mensagem)`, durante a conversão para o
+    vacuum incremental (passo longo), com o tempo decorrido. Os dois rodam na
+    thread da manutenção.
+    """
+    def __init__(self, database_path: Optional[str] = None, interval_hours: float = MAINTENANCE_INTERVAL_HOURS,
+                 step_budget_ms: float = MAINTENANCE_STEP_BUDGET_MS,
+                 listener: Optional[Callable[[MaintenanceStep], None]] = None,
+                 progress: Optional[Callable[[str], None]] = None):
+        self.database_path = database_path or get_database_path()
+        self.interval = timedelta(hours=interval_hours)
+        self.step_budget_s = step_budget_ms / 1000.0
+        self.listener = listener
+        self.progress = progress
+        self._conn = None
+        self._idle = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._vacuum_pages = 128 # Ajustado a cada passo para caber em step_budget_ms
+
+    # --- Controle ---
+    def set_idle(self, idle: bool):
+        """Chamado pela interface: com idle=False, a manutenção para no fim do passo atual."""
+        if idle:
+            self._idle.set()
+        else:
+            self._idle.clear()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="nutriapp-maintenance", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        self._idle.set() # Acorda a thread para ela encerrar
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                # Passo ainda em andamento na conexão: a própria thread a fecha ao sair
+                logging.warning("Manutenção ainda em andamento ao encerrar; a conexão será fechada ao fim do passo.")
+                return
+            self._thread = None
+        self._close()
+
+    def _loop(self):
+        try:
+            while not self._stop.is_set():
+                self._idle.wait()
+                if self._stop.is_set():
+                    break
+                try:
+                    self.run_pending(lambda: self._idle.is_set() and not self._stop.is_set())
+                except Exception:
+                    logging.exception("Erro na manutenção automática do banco de dados:")
+                self._stop.wait(60) # Ociosidade longa: reavalia as tarefas devidas a cada minuto
+        finally:
+            if self._stop.is_set():
+                self._close()
+
+    # --- Execução ---
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = create_connection(self.database_path)
+            if self._conn is None:
+                raise RuntimeError(f"Não foi possível abrir o banco {self.database_path} para manutenção.")
+        return self._conn
+
+    def _close(self):
+        if self._conn is not None:
+            close_connection(self._conn)
+            self._conn = None
+
+    def convert_to_incremental(self, max_mb: Optional[float] = MAINTENANCE_MAX_CONVERSION_MB) -> bool:
+        """Converte o banco para auto_vacuum=INCREMENTAL (uma vez na vida do banco).
+
+        Normalmente roda sozinha, como primeiro passo ocioso da tarefa incremental_vacuum
+        (na thread da manutenção); aqui, para uma conversão pedida explicitamente, na
+        thread atual. Bancos acima de `max_mb` MiB só são convertidos com max_mb=None.
+        Retorna True se o banco já estava ou ficou no modo incremental.
+        """
+        if self._pragma("auto_vacuum") == 2: # 2 = INCREMENTAL
+            return True
+        iniciado_em = datetime.now()
+        inicio = time.perf_counter()
+        convertido, detalhes = self._convert(max_mb)
+        self._record("incremental_vacuum", "conversao", iniciado_em, time.perf_counter() - inicio, detalhes)
+        return convertido
+
+    def _convert(self, max_mb: Optional[float]) -> Tuple[bool, str]:
+        """VACUUM completo com auto_vacuum=INCREMENTAL. Retorna (convertido, detalhes do passo).
+
+        O VACUUM não pode ser feito em partes e bloqueia as escritas até terminar:
+        `progress` recebe o tempo decorrido a cada segundo, e o encerramento da
+        aplicação (stop) o interrompe (o SQLite desfaz tudo; a conversão volta a
+        ser tentada na próxima vez).
+        """
+        tamanho_mb = os.path.getsize(self.database_path) / (1024 * 1024)
+        if max_mb is not None and tamanho_mb > max_mb:
+            logging.info(f"Conversão para auto_vacuum=INCREMENTAL adiada: banco com {tamanho_mb:.0f} MiB (limite {max_mb} MiB).")
+            return False, f"adiada: banco com {tamanho_mb:.0f} MiB (limite {max_mb} MiB)"
+        inicio = time.perf_counter()
+        ultimo_aviso = [inicio]
+        def andamento() -> int:
+            agora = time.perf_counter()
+            if agora - ultimo_aviso[0] >= 1.0:
+                ultimo_aviso[0] = agora
+                self._report(f"Manutenção: convertendo o banco para vacuum incremental ({agora - inicio:.0f}s)...")
+            return 1 if self._stop.is_set() else 0 # Diferente de 0 interrompe o VACUUM
+        self._report(f"Manutenção: convertendo o banco ({tamanho_mb:.1f} MiB) para vacuum incremental...")
+        self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self.conn.set_progress_handler(andamento, 10000)
+        try:
+            self.conn.execute("VACUUM")
+        except sqlite3.OperationalError:
+            if not self._stop.is_set():
+                raise
+            logging.info("Conversão para auto_vacuum=INCREMENTAL interrompida pelo encerramento da aplicação.")
+            return False, "interrompida pelo encerramento da aplicação"
+        finally:
+            self.conn.set_progress_handler(None, 0)
+        self._report("Manutenção: conversão para vacuum incremental concluída.")
+        return True, f"auto_vacuum=INCREMENTAL aplicado com VACUUM ({tamanho_mb:.1f} MiB)"
+
+    def _report(self, mensagem: str):
+        if self.progress:
+            self.progress(mensagem)
+
+    def due_tasks(self, now: Optional[datetime] = None) -> List[str]:
+        """Tarefas sem conclusão registrada dentro do intervalo."""
+        limite = ((now or datetime.now()) - self.interval).strftime("%Y-%m-%d %H:%M:%S")
+        devidas = []
+        for tarefa in TASKS:
+            row = self.conn.execute("SELECT MAX(iniciado_em) AS ultima FROM manutencao_log WHERE tarefa = ? AND passo = 'fim'",
+                                    (tarefa,)).fetchone()
+            if row["ultima"] is None or row["ultima"] < limite:
+                devidas.append(tarefa)
+        return devidas
+
+    def run_pending(self, should_continue: Callable[[], bool] = lambda: True) -> List[MaintenanceStep]:
+        """Executa passos das tarefas devidas enquanto `should_continue()` for verdadeiro."""
+        executados: List[MaintenanceStep] = []
+        for tarefa in self.due_tasks():
+            if not should_continue():
+                break
+            inicio_tarefa = time.perf_counter()
+            passos = getattr(self, f"_task_{tarefa}")()
+            concluida = True
+            while True:
+                if not should_continue():
+                    passos.close()
+                    concluida = False
+                    break
+                iniciado_em = datetime.now()
+                inicio = time.perf_counter()
+                try:
+                    passo, detalhes = next(passos)
+                except StopIteration:
+                    break
+                executados.append(self._record(tarefa, passo, iniciado_em, time.perf_counter() - inicio, detalhes))
+            if concluida:
+                executados.append(self._record(tarefa, "fim", datetime.now(), time.perf_counter() - inicio_tarefa,
+                                               f"{sum(1 for e in executados if e.tarefa == tarefa)} passo(s)"))
+            else:
+                logging.info(f"Manutenção '{tarefa}' interrompida (aplicação em uso); continua na próxima ociosidade.")
+        return executados
+
+    def _record(self, tarefa: str, passo: str, iniciado_em: datetime, segundos: float, detalhes: str) -> MaintenanceStep:
+        step = MaintenanceStep(tarefa, passo, segundos, detalhes)
+        self.conn.execute("INSERT INTO manutencao_log (tarefa, passo, iniciado_em, duracao_ms, detalhes) VALUES (?, ?, ?, ?, ?)",
+                          (tarefa, passo, iniciado_em.strftime("%Y-%m-%d %H:%M:%S"), segundos * 1000.0, detalhes))
+        self.conn.commit()
+        logging.info(f"Manutenção {tarefa}/{passo}: {detalhes} ({segundos * 1000:.0f} ms)")
+        if self.listener:
+            self.listener(step)
+        return step
+
+    def _pragma(self, name: str):
+        row = self.conn.execute(f"PRAGMA {name}").fetchone()
+        return next(iter(row.values()))
+
+    # --- Tarefas (cada iteração executa um passo e retorna (passo, detalhes)) ---
+    def _task_incremental_vacuum(self) -> Iterator[Tuple[str, str]]:
+        if self._pragma("auto_vacuum") != 2: # 2 = INCREMENTAL
+            # Sem a conversão, o incremental_vacuum não libera nada: ela é o primeiro passo
+            convertido, detalhes = self._convert(MAINTENANCE_MAX_CONVERSION_MB)
+            yield "conversao", detalhes
+            if not convertido:
+                return
+        while True:
+            livres = self._pragma("freelist_count")
+            if livres < MAINTENANCE_VACUUM_MIN_FREE_PAGES:
+                return
+            inicio = time.perf_counter()
+            paginas = min(self._vacuum_pages, livres)
+            self.conn.execute(f"PRAGMA incremental_vacuum({int(paginas)})").fetchall()
+            duracao = time.perf_counter() - inicio
+            # Ajusta o tamanho do próximo passo para ficar perto do orçamento
+            if duracao < self.step_budget_s / 2:
+                self._vacuum_pages = min(self._vacuum_pages * 2, 65536)
+            elif duracao > self.step_budget_s:
+                self._vacuum_pages = max(self._vacuum_pages // 2, 16)
+            yield "vacuum", f"{paginas} página(s) liberada(s), {livres - paginas} livre(s) restante(s)"
+
+    def _task_analyze(self) -> Iterator[Tuple[str, str]]:
+        self.conn.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+        tabelas = [row["name"] for row in self.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+            "AND sql NOT LIKE 'CREATE VIRTUAL TABLE%' ORDER BY name").fetchall()]
+        for tabela in tabelas:
+            if tabela.startswith("alimentos_fts_"): # Tabelas internas do FTS5
+                continue
+            self.conn.execute(f'ANALYZE "{tabela}"')
+            self.conn.commit()
+            yield tabela, "estatísticas atualizadas"
+
+    def _task_optimize(self) -> Iterator[Tuple[str, str]]:
+        self.conn.execute("PRAGMA optimize")
+        # Aproveita a tarefa diária para podar o histórico de manutenção
+        limite = (datetime.now() - timedelta(days=MAINTENANCE_LOG_DAYS)).strftime("%Y-%m-%d %H:%M:%S")
+        removidas = self.conn.execute("DELETE FROM manutencao_log WHERE iniciado_em < ?", (limite,)).rowcount
+        # e o registro de alterações de alimentos (catálogos atrasados recarregam tudo)
+        removidas += self.conn.execute("DELETE FROM alimentos_alteracoes WHERE seq <= (SELECT MAX(seq) FROM alimentos_alteracoes) - ?",
+                                       (FOOD_CATALOG_LOG_KEEP,)).rowcount
+        self.conn.commit()
+        yield "optimize", f"PRAGMA optimize executado; {removidas} registro(s) antigo(s) do histórico removido(s)"
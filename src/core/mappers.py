@@ -0,0 +1,95 @@
+# src/core/mappers.py
+
+import dataclasses
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, TypeVar
+
+# Conversão de linhas do SQLite em dataclasses sem passar por dicts.
+# `Model(**row)` exige a row factory de dicts (um dict por linha) e uma chamada com
+# argumentos nomeados por objeto. Aqui o resultado é lido como tuplas e, para cada
+# formato de resultado (as colunas de cursor.description) e modelo, é gerada uma
+# única vez uma função que chama o construtor com argumentos posicionais:
+#     lambda row: Alimento(row[0], row[1], ..., None, ...)
+# Colunas que não são campos do modelo são ignoradas; campos sem coluna recebem o
+# valor padrão do modelo. As funções ficam em cache pelo resto da execução.
+# Nos geradores iter_*, use row_mapper() e aplique a função a cada linha de iter_rows().
+# Para montar dois modelos a partir de um JOIN, dê às colunas de um deles um prefixo
+# (ex: "a.kcal_por_unidade AS alimento_kcal_por_unidade") e use row_mapper(..., prefix="alimento_").
+
+T = TypeVar("T")
+
+_cache: Dict[Tuple[type, Tuple[str, ...], Tuple[Tuple[str, Any], ...]], Callable[[tuple], Any]] = {}
+_cache_lock = threading.Lock()
+
+def compile_mapper(model: Type[T], columns: Tuple[str, ...], fixed: Optional[Dict[str, Any]] = None) -> Callable[[tuple], T]:
+    """Gera a função linha -> `model` para resultados com as colunas `columns`.
+
+    `fixed` define valores constantes para campos (ex: {"arquivada": True}).
+    """
+    fixed = fixed or {}
+    posicoes = {}
+    for indice, nome in enumerate(columns):
+        posicoes[nome] = indice # Coluna repetida: vale a última, como na row factory de dicts
+    namespace: Dict[str, Any] = {"_model": model}
+    argumentos = []
+    for campo in dataclasses.fields(model):
+        if not campo.init:
+            continue
+        if campo.name in fixed:
+            namespace[f"_c_{campo.name}"] = fixed[campo.name]
+            argumentos.append(f"_c_{campo.name}")
+        elif campo.name in posicoes:
+            argumentos.append(f"row[{posicoes[campo.name]}]")
+        elif campo.default is not dataclasses.MISSING:
+            namespace[f"_d_{campo.name}"] = campo.default
+            argumentos.append(f"_d_{campo.name}")
+        elif campo.default_factory is not dataclasses.MISSING:
+            namespace[f"_f_{campo.name}"] = campo.default_factory
+            argumentos.append(f"_f_{campo.name}()")
+        else:
+            argumentos.append("None") # Campo obrigatório fora do resultado
+    codigo = f"def _map_row(row):\n    return _model({', '.join(argumentos)})\n"
+    exec(compile(codigo, f"<mapper {model.__name__}>", "exec"), namespace)
+    return namespace["_map_row"]
+
+def row_mapper(cursor: sqlite3.Cursor, model: Type[T], prefix: str = "", **fixed) -> Callable[[tuple], T]:
+    """Retorna (do cache ou recém-gerada) a função de conversão para o resultado do cursor.
+
+    Também troca a row factory do cursor para tuplas; deve ser chamada logo após
+    o execute(), antes de qualquer fetch. Com `prefix`, só as colunas com esse
+    prefixo são usadas (sem ele, como nomes dos campos).
+    """
+    cursor.row_factory = None
+    columns = tuple(d[0] for d in cursor.description)
+    if prefix:
+        columns = tuple(c[len(prefix):] if c.startswith(prefix) else "" for c in columns)
+    key = (model, columns, tuple(sorted(fixed.items())))
+    mapper = _cache.get(key)
+    if mapper is None:
+        with _cache_lock:
+            mapper = _cache.get(key)
+            if mapper is None:
+                mapper = _cache[key] = compile_mapper(model, columns, fixed)
+    return mapper
+
+def fetch_one_as(cursor: sqlite3.Cursor, model: Type[T], **fixed) -> Optional[T]:
+    """fetchone() convertido em `model` (None se não houver linha).
+
+    O cursor é fechado depois da leitura: a consulta termina aqui (e é registrada
+    pela instrumentação) mesmo quando a linha é encontrada.
+    """
+    mapper = row_mapper(cursor, model, **fixed)
+    row = cursor.fetchone()
+    cursor.close()
+    return mapper(row) if row is not None else None
+
+def fetch_all_as(cursor: sqlite3.Cursor, model: Type[T], **fixed) -> List[T]:
+    """fetchall() convertido em uma lista de `model`."""
+    mapper = row_mapper(cursor, model, **fixed)
+    return list(map(mapper, cursor.fetchall()))
+
+def clear_cache():
+    """Descarta as funções geradas (a chave já inclui as colunas; usado nos testes)."""
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,244 @@
+# src/core/migrations.py
+
+import sqlite3
+import logging
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+# Tenta importar de forma relativa primeiro
+try:
+    from .database import get_db_connection
+except ImportError:
+    from src.core.database import get_db_connection
+
+# Versionamento do esquema: a versão aplicada fica em PRAGMA user_version.
+# Cada migração é uma lista ordenada de comandos SQL; as pendentes rodam todas
+# numa única transação, junto com a atualização do user_version. Nunca altere
+# uma migração já publicada: adicione uma nova ao final de MIGRATIONS.
+
+@dataclass
+class Migration:
+    """Uma etapa de evolução do esquema do banco de dados."""
+    version: int
+    descricao: str
+    statements: List[str] = field(default_factory=list)
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Esquema inicial", [
+        """
+        CREATE TABLE IF NOT EXISTS pacientes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome_completo TEXT NOT NULL,
+            data_nascimento TEXT NOT NULL, -- Formato YYYY-MM-DD
+            sexo TEXT,
+            telefone TEXT,
+            email TEXT UNIQUE,
+            endereco TEXT,
+            objetivo_consulta TEXT,
+            historico_clinico TEXT,
+            observacoes TEXT,
+            data_cadastro TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS avaliacoes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            paciente_id INTEGER NOT NULL,
+            data_avaliacao TEXT DEFAULT CURRENT_TIMESTAMP,
+            peso REAL,
+            altura REAL,
+            circunferencia_cintura REAL,
+            circunferencia_quadril REAL,
+            anamnese_resumo TEXT,
+            exames_resumo TEXT,
+            observacoes TEXT,
+            FOREIGN KEY (paciente_id) REFERENCES pacientes (id) ON DELETE CASCADE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS alimentos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL UNIQUE,
+            grupo TEXT,
+            unidade_padrao TEXT DEFAULT 'g',
+            kcal_por_unidade REAL,
+            cho_por_unidade REAL,
+            ptn_por_unidade REAL,
+            lip_por_unidade REAL,
+            fonte_dados TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS planos_alimentares (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            paciente_id INTEGER NOT NULL,
+            nome_plano TEXT NOT NULL,
+            data_criacao TEXT DEFAULT CURRENT_TIMESTAMP,
+            objetivo TEXT,
+            meta_kcal REAL,
+            meta_cho_perc REAL,
+            meta_ptn_perc REAL,
+            meta_lip_perc REAL,
+            observacoes_gerais TEXT,
+            FOREIGN KEY (paciente_id) REFERENCES pacientes (id) ON DELETE CASCADE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS itens_plano_alimentar (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            plano_alimentar_id INTEGER NOT NULL,
+            refeicao TEXT NOT NULL,
+            alimento_id INTEGER NOT NULL,
+            quantidade REAL NOT NULL,
+            unidade_medida TEXT NOT NULL,
+            FOREIGN KEY (plano_alimentar_id) REFERENCES planos_alimentares (id) ON DELETE CASCADE,
+            FOREIGN KEY (alimento_id) REFERENCES alimentos (id) ON DELETE RESTRICT -- Evita deletar alimento usado em plano
+        )
+        """,
+    ]),
+    Migration(2, "Colunas já usadas pelos repositórios (medidas, fibras/sódio, observações, nutrientes calculados)", [
+        "ALTER TABLE avaliacoes ADD COLUMN circunferencia_braco REAL",
+        "ALTER TABLE avaliacoes ADD COLUMN dobra_tricipital REAL",
+        "ALTER TABLE avaliacoes ADD COLUMN dobra_subescapular REAL",
+        "ALTER TABLE avaliacoes ADD COLUMN dobra_suprailiaca REAL",
+        "ALTER TABLE avaliacoes ADD COLUMN dobra_abdominal REAL",
+        "ALTER TABLE alimentos ADD COLUMN fibras_por_unidade REAL",
+        "ALTER TABLE alimentos ADD COLUMN sodio_mg_por_unidade REAL",
+        "ALTER TABLE alimentos ADD COLUMN observacoes TEXT",
+        "ALTER TABLE itens_plano_alimentar ADD COLUMN observacoes TEXT",
+        "ALTER TABLE itens_plano_alimentar ADD COLUMN kcal_calculado REAL",
+        "ALTER TABLE itens_plano_alimentar ADD COLUMN cho_calculado REAL",
+        "ALTER TABLE itens_plano_alimentar ADD COLUMN ptn_calculado REAL",
+        "ALTER TABLE itens_plano_alimentar ADD COLUMN lip_calculado REAL",
+    ]),
+    Migration(3, "Índices de desempenho para buscas por paciente, plano e alimento", [
+        # get_by_paciente_id: filtro por paciente + ORDER BY data servidos pelo mesmo índice
+        "CREATE INDEX IF NOT EXISTS idx_avaliacoes_paciente_data ON avaliacoes (paciente_id, data_avaliacao)",
+        "CREATE INDEX IF NOT EXISTS idx_planos_paciente_data ON planos_alimentares (paciente_id, data_criacao)",
+        # get_by_plano_id / delete_by_plano_id
+        "CREATE INDEX IF NOT EXISTS idx_itens_plano ON itens_plano_alimentar (plano_alimentar_id)",
+        # Verificação de uso em AlimentoRepository.delete e checagem da FK ON DELETE RESTRICT
+        "CREATE INDEX IF NOT EXISTS idx_itens_alimento ON itens_plano_alimentar (alimento_id)",
+    ]),
+    Migration(4, "Índice de texto completo (FTS5) para busca de alimentos", [
+        # Tabela externa: o texto fica só em `alimentos`; o índice é mantido pelos triggers.
+        # remove_diacritics 2 faz "feijao" casar com "Feijão"; os índices de prefixo
+        # atendem a busca enquanto o usuário digita.
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS alimentos_fts USING fts5(
+            nome, grupo,
+            content='alimentos', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3 4'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS alimentos_fts_ai AFTER INSERT ON alimentos BEGIN
+            INSERT INTO alimentos_fts (rowid, nome, grupo) VALUES (new.id, new.nome, new.grupo);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS alimentos_fts_ad AFTER DELETE ON alimentos BEGIN
+            INSERT INTO alimentos_fts (alimentos_fts, rowid, nome, grupo) VALUES ('delete', old.id, old.nome, old.grupo);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS alimentos_fts_au AFTER UPDATE OF nome, grupo ON alimentos BEGIN
+            INSERT INTO alimentos_fts (alimentos_fts, rowid, nome, grupo) VALUES ('delete', old.id, old.nome, old.grupo);
+            INSERT INTO alimentos_fts (rowid, nome, grupo) VALUES (new.id, new.nome, new.grupo);
+        END
+        """,
+        # Indexa os alimentos já cadastrados
+        "INSERT INTO alimentos_fts (alimentos_fts) VALUES ('rebuild')",
+    ]),
+    Migration(5, "Chaves de ordenação normalizadas (sem acento/caixa) para nomes de pacientes e alimentos", [
+        # chave_ordenacao() é registrada em cada conexão por database.create_connection;
+        # depois da migração a coluna é mantida pelos repositórios em add/update.
+        "ALTER TABLE pacientes ADD COLUMN nome_ordenacao TEXT",
+        "UPDATE pacientes SET nome_ordenacao = chave_ordenacao(nome_completo)",
+        "CREATE INDEX IF NOT EXISTS idx_pacientes_nome_ordenacao ON pacientes (nome_ordenacao)",
+        "ALTER TABLE alimentos ADD COLUMN nome_ordenacao TEXT",
+        "UPDATE alimentos SET nome_ordenacao = chave_ordenacao(nome)",
+        "CREATE INDEX IF NOT EXISTS idx_alimentos_nome_ordenacao ON alimentos (nome_ordenacao)",
+    ]),
+    Migration(6, "Registro das tarefas de manutenção automática (ANALYZE, optimize, vacuum incremental)", [
+        # Uma linha por passo executado; passo 'fim' marca a tarefa como concluída (ver core/maintenance.py)
+        """
+        CREATE TABLE IF NOT EXISTS manutencao_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tarefa TEXT NOT NULL,
+            passo TEXT NOT NULL,
+            iniciado_em TEXT NOT NULL,
+            duracao_ms REAL NOT NULL,
+            detalhes TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_manutencao_tarefa ON manutencao_log (tarefa, passo, iniciado_em)",
+    ]),
+    Migration(7, "Registro de alterações em alimentos (recarga incremental do catálogo em memória)", [
+        # Uma linha por alimento inserido, alterado ou excluído; o catálogo (core/food_catalog.py)
+        # relê só os alimentos com seq maior que o último que ele viu. Podado pela manutenção.
+        """
+        CREATE TABLE IF NOT EXISTS alimentos_alteracoes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            alimento_id INTEGER NOT NULL
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS alimentos_alteracoes_ai AFTER INSERT ON alimentos BEGIN
+            INSERT INTO alimentos_alteracoes (alimento_id) VALUES (new.id);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS alimentos_alteracoes_au AFTER UPDATE ON alimentos BEGIN
+            INSERT INTO alimentos_alteracoes (alimento_id) VALUES (new.id);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS alimentos_alteracoes_ad AFTER DELETE ON alimentos BEGIN
+            INSERT INTO alimentos_alteracoes (alimento_id) VALUES (old.id);
+        END
+        """,
+    ]),
+]
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Retorna a versão do esquema gravada no banco (PRAGMA user_version)."""
+    row = conn.execute("PRAGMA user_version").fetchone()
+    return row["user_version"] if isinstance(row, dict) else row[0]
+
+def latest_version() -> int:
+    """Versão mais recente conhecida pelo código."""
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+def migrate(conn: Optional[sqlite3.Connection] = None, target: Optional[int] = None) -> int:
+    """Aplica as migrações pendentes até `target` (padrão: a mais recente).
+
+    Todas as migrações pendentes rodam numa única transação: ou o banco chega à
+    versão alvo, ou permanece exatamente como estava. Retorna a versão final.
+    """
+    conn = conn or get_db_connection()
+    target = latest_version() if target is None else target
+    current = get_schema_version(conn)
+    if current > latest_version():
+        raise RuntimeError(f"Banco de dados na versão {current}, mais nova que a suportada por esta aplicação ({latest_version()}).")
+    pending = [m for m in MIGRATIONS if current < m.version <= target]
+    if not pending:
+        logging.info(f"Esquema do banco de dados atualizado (versão {current}).")
+        return current
+
+    logging.info(f"Migrando esquema do banco de dados da versão {current} para {pending[-1].version}...")
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        for migration in pending:
+            for statement in migration.statements:
+                conn.execute(statement)
+            logging.info(f"Migração {migration.version} aplicada: {migration.descricao}")
+        # user_version é transacional: só é gravado se o COMMIT acontecer
+        conn.execute(f"PRAGMA user_version = {int(pending[-1].version)}")
+        conn.commit()
+    except Exception:
+        logging.exception(f"Falha ao migrar o esquema; banco mantido na versão {current}.")
+        conn.rollback()
+        raise
+    return pending[-1].version
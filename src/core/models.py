@@ -1,10 +1,40 @@
 # src/core/models.py
 
-from dataclasses import dataclass, field
-from typing import Optional, List
+from dataclasses import dataclass, field, fields, make_dataclass, MISSING
+from typing import Optional, List, Dict, Type
 
-# Usar dataclasses para criar modelos de dados simples e claros
+# Usar dataclasses para criar modelos de dados simples e claros.
+# __slots__ (via _slotted): sem __dict__ por instância (coleções grandes, como o catálogo de
+# alimentos numa tabela, ocupam bem menos memória); atributos fora dos campos
+# declarados não podem ser criados. Ver também as variantes imutáveis no fim do arquivo.
 
+def _frozen_getstate(self):
+    return [getattr(self, f.name) for f in fields(self)]
+
+def _frozen_setstate(self, state):
+    # Variante imutável: o __setattr__ gerado recusa atribuições, inclusive no unpickle
+    for f, valor in zip(fields(self), state):
+        object.__setattr__(self, f.name, valor)
+
+def _slotted(cls: type) -> type:
+    """Recria uma dataclass com __slots__ para os seus campos.
+
+    Equivale a @dataclass(slots=True), que só existe a partir do Python 3.10
+    (o projeto ainda suporta o 3.9, ver setup.py).
+    """
+    nomes = tuple(f.name for f in fields(cls))
+    atributos = dict(cls.__dict__)
+    for nome in nomes + ("__dict__", "__weakref__"):
+        atributos.pop(nome, None) # Os padrões dos campos já estão no __init__ gerado
+    atributos["__slots__"] = nomes
+    if cls.__dataclass_params__.frozen:
+        atributos["__getstate__"] = _frozen_getstate
+        atributos["__setstate__"] = _frozen_setstate
+    slotted = type(cls)(cls.__name__, cls.__bases__, atributos)
+    slotted.__qualname__ = cls.__qualname__
+    return slotted
+
+@_slotted
 @dataclass
 class Paciente:
     """Representa um paciente no sistema."""
@@ -19,7 +49,9 @@ class Paciente:
     historico_clinico: Optional[str] = None
     observacoes: Optional[str] = None
     data_cadastro: Optional[str] = None # Será preenchido pelo DB
+    nome_ordenacao: Optional[str] = None # Chave normalizada do nome (mantida pelo repositório)
 
+@_slotted
 @dataclass
 class Avaliacao:
     """Representa uma avaliação nutricional de um paciente."""
@@ -30,11 +62,21 @@ class Avaliacao:
     altura: Optional[float] = None # Em metros
     circunferencia_cintura: Optional[float] = None # Em cm
     circunferencia_quadril: Optional[float] = None # Em cm
-    # Adicionar outras medidas antropométricas conforme necessário (dobras, etc.)
+    circunferencia_braco: Optional[float] = None # Em cm
+    dobra_tricipital: Optional[float] = None # Em mm
+    dobra_subescapular: Optional[float] = None # Em mm
+    dobra_suprailiaca: Optional[float] = None # Em mm
+    dobra_abdominal: Optional[float] = None # Em mm
     anamnese_resumo: Optional[str] = None # Campo para resumo da anamnese ou link para dados mais detalhados
     exames_resumo: Optional[str] = None # Campo para resumo de exames ou link
     observacoes: Optional[str] = None
+    arquivada: bool = False # Lida do arquivo de dados frios (somente leitura, ver core/archive.py)
+
+# Nutrientes calculados por item de plano, na ordem das colunas das matrizes
+# (FoodCatalog.valores, services.NutrientesPlano)
+NUTRIENTES = ("kcal", "cho", "ptn", "lip")
 
+@_slotted
 @dataclass
 class Alimento:
     """Representa um alimento no banco de dados local."""
@@ -46,9 +88,13 @@ class Alimento:
     cho_por_unidade: Optional[float] = None # Carboidratos por unidade_padrao
     ptn_por_unidade: Optional[float] = None # Proteínas por unidade_padrao
     lip_por_unidade: Optional[float] = None # Gorduras por unidade_padrao
-    # Adicionar outros nutrientes se necessário (fibras, vitaminas, minerais)
+    fibras_por_unidade: Optional[float] = None # Fibras por unidade_padrao
+    sodio_mg_por_unidade: Optional[float] = None # Sódio (mg) por unidade_padrao
     fonte_dados: Optional[str] = None # Ex: "TACO", "Usuário"
+    observacoes: Optional[str] = None
+    nome_ordenacao: Optional[str] = None # Chave normalizada do nome (mantida pelo repositório)
 
+@_slotted
 @dataclass
 class ItemPlanoAlimentar:
     """Representa um item (alimento) dentro de uma refeição de um plano alimentar."""
@@ -58,6 +104,7 @@ class ItemPlanoAlimentar:
     quantidade: float = 1.0 # Quantidade numérica
     unidade_medida: str = "" # Unidade da quantidade (ex: "g", "unidade", "xícara")
     id: Optional[int] = None
+    observacoes: Optional[str] = None
     # Campos calculados (podem ser preenchidos ao carregar/calcular o plano)
     nome_alimento: Optional[str] = None # Para exibição fácil
     kcal_calculado: Optional[float] = None
@@ -65,6 +112,7 @@ class ItemPlanoAlimentar:
     ptn_calculado: Optional[float] = None
     lip_calculado: Optional[float] = None
 
+@_slotted
 @dataclass
 class PlanoAlimentar:
     """Representa um plano alimentar completo para um paciente."""
@@ -78,7 +126,57 @@ class PlanoAlimentar:
     meta_ptn_perc: Optional[float] = None # Percentual
     meta_lip_perc: Optional[float] = None # Percentual
     observacoes_gerais: Optional[str] = None
+    arquivado: bool = False # Lido do arquivo de dados frios (somente leitura, ver core/archive.py)
     # A lista de itens será gerenciada separadamente ou carregada sob demanda
     # itens: List[ItemPlanoAlimentar] = field(default_factory=list) # Evitar carregar tudo sempre
 
+# --- Variantes imutáveis (frozen) ---
+# Mesmos campos, na mesma ordem, com __slots__ e sem atribuição depois de criadas
+# (FrozenInstanceError); por isso também são hasheáveis. Servem para dados
+# somente leitura mantidos em memória (catálogos, históricos). Os mapeadores de
+# core/mappers.py constroem qualquer uma delas: fetch_all_as(cursor, FrozenAlimento).
+# Uma variante nunca é igual (==) ao modelo mutável com os mesmos valores.
+
+def frozen_variant(model: type) -> type:
+    """Cria a variante imutável e compacta de um modelo, com os mesmos campos e padrões."""
+    campos = []
+    for f in fields(model):
+        if f.default is not MISSING:
+            campos.append((f.name, f.type, field(default=f.default)))
+        elif f.default_factory is not MISSING:
+            campos.append((f.name, f.type, field(default_factory=f.default_factory)))
+        else:
+            campos.append((f.name, f.type))
+    variant = _slotted(make_dataclass(f"Frozen{model.__name__}", campos, frozen=True))
+    variant.__module__ = __name__ # Nome importável daqui (pickle, repr em logs)
+    variant.__doc__ = f"Variante imutável de {model.__name__} (mesmos campos)."
+    return variant
+
+FrozenPaciente = frozen_variant(Paciente)
+FrozenAvaliacao = frozen_variant(Avaliacao)
+FrozenAlimento = frozen_variant(Alimento)
+FrozenItemPlanoAlimentar = frozen_variant(ItemPlanoAlimentar)
+FrozenPlanoAlimentar = frozen_variant(PlanoAlimentar)
+
+FROZEN_VARIANTS: Dict[type, type] = {
+    Paciente: FrozenPaciente,
+    Avaliacao: FrozenAvaliacao,
+    Alimento: FrozenAlimento,
+    ItemPlanoAlimentar: FrozenItemPlanoAlimentar,
+    PlanoAlimentar: FrozenPlanoAlimentar,
+}
+_MUTABLE_MODELS: Dict[type, type] = {frozen: mutable for mutable, frozen in FROZEN_VARIANTS.items()}
+
+def freeze(obj):
+    """Cópia imutável de um modelo (retorna o próprio objeto se ele já for imutável)."""
+    if type(obj) in _MUTABLE_MODELS:
+        return obj
+    variant = FROZEN_VARIANTS[type(obj)]
+    return variant(*(getattr(obj, f.name) for f in fields(obj)))
 
+def thaw(obj):
+    """Cópia mutável (o modelo original) de uma variante imutável, ex: para editar e gravar."""
+    if type(obj) in FROZEN_VARIANTS:
+        return obj
+    model = _MUTABLE_MODELS[type(obj)]
+    return model(*(getattr(obj, f.name) for f in fields(obj)))
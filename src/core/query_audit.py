@@ -0,0 +1,156 @@
+# src/core/query_audit.py
+
+import ast
+import os
+import re
+import sqlite3
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+# Tenta importar de forma relativa primeiro
+try:
+    from .database import create_connection
+    from .migrations import migrate
+    from .archive import SCHEMA as ARCHIVE_SCHEMA, ensure_archive_schema
+except ImportError:
+    from src.core.database import create_connection
+    from src.core.migrations import migrate
+    from src.core.archive import SCHEMA as ARCHIVE_SCHEMA, ensure_archive_schema
+
+# Auditoria de planos de execução: coleta os comandos SQL literais de repositories.py,
+# roda EXPLAIN QUERY PLAN em cada um contra um banco migrado e populado, e aponta
+# varreduras completas (SCAN), ordenações em memória (TEMP B-TREE) e buscas por
+# índice que ainda precisam ler a tabela (índice não cobridor).
+# Uso: python -m src.core.query_audit  (ou via tests/core/test_query_plans.py)
+
+REPOSITORIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "repositories.py")
+
+_SQL_START = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+_SQL_COMMENT = re.compile(r"--[^\n]*")
+
+@dataclass
+class QueryPlan:
+    """Resultado da auditoria de um comando SQL de um repositório."""
+    origem: str # Ex: "AlimentoRepository.search_by_name"
+    lineno: int
+    sql: str
+    plano: List[str] = field(default_factory=list)
+
+    @property
+    def has_where(self) -> bool:
+        return re.search(r"\bWHERE\b", self.sql, re.IGNORECASE) is not None
+
+    @property
+    def full_scans(self) -> List[str]:
+        """Passos que percorrem uma tabela/índice inteiro (tabelas FTS virtuais não contam)."""
+        return [p for p in self.plano if p.startswith("SCAN ") and "VIRTUAL TABLE" not in p]
+
+    @property
+    def searches(self) -> List[str]:
+        return [p for p in self.plano if p.startswith("SEARCH ")]
+
+    @property
+    def temp_btrees(self) -> List[str]:
+        return [p for p in self.plano if "TEMP B-TREE" in p]
+
+    @property
+    def non_covering(self) -> List[str]:
+        """Buscas por índice que ainda consultam a tabela (candidatas a índice cobridor)."""
+        return [p for p in self.searches if "USING INDEX" in p and "COVERING" not in p]
+
+    @property
+    def is_full_scan_regression(self) -> bool:
+        """Consulta com filtro (WHERE) que mesmo assim percorre a tabela inteira."""
+        return self.has_where and bool(self.full_scans)
+
+def _fstring_sql(node: ast.JoinedStr) -> str:
+    """Texto de uma f-string com cada valor interpolado trocado por um marcador "?"."""
+    return "".join(part.value if isinstance(part, ast.Constant) else "?" for part in node.values)
+
+def collect_statements(path: str = REPOSITORIES_PATH) -> List[QueryPlan]:
+    """Extrai os literais SQL do módulo, identificando a classe/método de origem."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    statements: List[QueryPlan] = []
+
+    def visit(node, scope: List[str]):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+                visit(child, scope + [child.name])
+            elif isinstance(child, ast.Constant) and isinstance(child.value, str) and _SQL_START.match(child.value):
+                sql = " ".join(_SQL_COMMENT.sub("", child.value).split())
+                statements.append(QueryPlan(origem=".".join(scope) or "<módulo>", lineno=child.lineno, sql=sql))
+            elif isinstance(child, ast.JoinedStr) and _SQL_START.match(_fstring_sql(child)):
+                # f-string: cada trecho interpolado é uma lista de marcadores (ex: IN ({marcadores}))
+                sql = " ".join(_SQL_COMMENT.sub("", _fstring_sql(child)).split())
+                statements.append(QueryPlan(origem=".".join(scope) or "<módulo>", lineno=child.lineno, sql=sql))
+            else:
+                visit(child, scope)
+
+    visit(tree, [])
+    return statements
+
+def seed_database(conn: sqlite3.Connection, rows: int = 50):
+    """Migra o esquema e insere alguns registros em cada tabela.
+
+    Também anexa um arquivo de dados frios vazio, em memória, para que as consultas
+    dos repositórios ao esquema `arquivo` sejam auditadas com os índices dele.
+    """
+    migrate(conn)
+    conn.execute(f"ATTACH DATABASE ':memory:' AS {ARCHIVE_SCHEMA}")
+    ensure_archive_schema(conn)
+    cursor = conn.cursor()
+    for i in range(rows):
+        cursor.execute("INSERT INTO pacientes (nome_completo, data_nascimento, nome_ordenacao) VALUES (?, '1990-01-01', ?)",
+                       (f"Paciente {i}", f"paciente {i}"))
+        paciente_id = cursor.lastrowid
+        cursor.execute("INSERT INTO alimentos (nome, grupo, kcal_por_unidade, nome_ordenacao) VALUES (?, 'Grupo', 1.0, ?)",
+                       (f"Alimento {i}", f"alimento {i}"))
+        alimento_id = cursor.lastrowid
+        cursor.execute("INSERT INTO avaliacoes (paciente_id, peso) VALUES (?, 70)", (paciente_id,))
+        cursor.execute("INSERT INTO planos_alimentares (paciente_id, nome_plano) VALUES (?, 'Plano')", (paciente_id,))
+        plano_id = cursor.lastrowid
+        cursor.execute("INSERT INTO itens_plano_alimentar (plano_alimentar_id, refeicao, alimento_id, quantidade, unidade_medida) VALUES (?, 'Almoço', ?, 100, 'g')",
+                       (plano_id, alimento_id))
+    conn.commit()
+
+def explain(conn: sqlite3.Connection, query: QueryPlan) -> QueryPlan:
+    """Preenche `query.plano` com os passos de EXPLAIN QUERY PLAN (parâmetros ligados a NULL)."""
+    n_params = query.sql.count("?")
+    rows = conn.execute(f"EXPLAIN QUERY PLAN {query.sql}", (None,) * n_params).fetchall()
+    query.plano = [row["detail"] if isinstance(row, dict) else row[3] for row in rows]
+    return query
+
+def audit(path: str = REPOSITORIES_PATH, conn: Optional[sqlite3.Connection] = None) -> List[QueryPlan]:
+    """Roda a auditoria completa. Sem `conn`, usa um banco em memória populado por seed_database()."""
+    own_conn = conn is None
+    if own_conn:
+        conn = create_connection(":memory:")
+        seed_database(conn)
+    try:
+        return [explain(conn, q) for q in collect_statements(path)]
+    finally:
+        if own_conn:
+            conn.close()
+
+def format_report(plans: List[QueryPlan]) -> str:
+    """Monta um relatório legível com o plano de cada comando e os alertas encontrados."""
+    lines = []
+    for q in plans:
+        alertas = []
+        if q.is_full_scan_regression:
+            alertas.append("SCAN COMPLETO")
+        if q.temp_btrees:
+            alertas.append("TEMP B-TREE")
+        if q.non_covering:
+            alertas.append("índice não cobridor")
+        status = ", ".join(alertas) if alertas else "ok"
+        lines.append(f"{q.origem} (linha {q.lineno}): {status}")
+        lines.append(f"    {q.sql}")
+        for passo in q.plano or ["(sem plano: comando sem leitura de tabela)"]:
+            lines.append(f"      - {passo}")
+    return "\n".join(lines)
+
+if __name__ == '__main__':
+    print(format_report(audit()))
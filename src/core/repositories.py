@@ -1,29 +1,88 @@
 # src/core/repositories.py
 
+import inspect
+import re
 import sqlite3
 import logging
-from typing import List, Optional, Any, Dict
+from typing import List, Optional, Any, Dict, Iterable, Iterator, Tuple
 from datetime import datetime
 
 # Tenta importar de forma relativa primeiro
 try:
-    from .database import create_connection
+    from ..config import FETCH_CHUNK_SIZE, SQL_IN_CHUNK_SIZE
+except ImportError:
+    from config import FETCH_CHUNK_SIZE, SQL_IN_CHUNK_SIZE
+
+try:
+    from .database import ConnectionPool, get_pool, savepoint, iter_rows
+    from .mappers import row_mapper, fetch_one_as, fetch_all_as
+    from .archive import archive_path_for, attached_archive, merge_archived, purge_paciente
+    from .text_utils import chave_ordenacao, limite_prefixo
+    from .instrumentation import timed_method
     from .models import Paciente, Avaliacao, Alimento, PlanoAlimentar, ItemPlanoAlimentar
 except ImportError:
     # Fallback
-    from src.core.database import get_db_connection
+    from src.core.database import ConnectionPool, get_pool, savepoint, iter_rows
+    from src.core.mappers import row_mapper, fetch_one_as, fetch_all_as
+    from src.core.archive import archive_path_for, attached_archive, merge_archived, purge_paciente
+    from src.core.text_utils import chave_ordenacao, limite_prefixo
+    from src.core.instrumentation import timed_method
     from src.core.models import Paciente, Avaliacao, Alimento, PlanoAlimentar, ItemPlanoAlimentar
 
+# --- Base Repository --- 
+class BaseRepository:
+    """Base comum dos repositórios: resolve a conexão da thread atual no pool compartilhado.
+
+    A conexão não é guardada na instância; cada acesso a `self.conn` retorna a
+    conexão da thread que está executando, o que permite usar o mesmo repositório
+    a partir da GUI e de workers em segundo plano.
+
+    Os métodos públicos das subclasses são cronometrados automaticamente e aparecem
+    nos histogramas por método (ex: "AlimentoRepository.search_by_name").
+
+    Os métodos iter_* são geradores: leem o resultado em lotes de `chunk_size`
+    linhas (fetchmany) e entregam um objeto por vez, sem montar a lista inteira.
+    O cursor fica aberto até o fim da iteração; evite alterar a mesma tabela pela
+    mesma conexão enquanto itera.
+
+    Os métodos get_many recebem uma lista de ids e fazem uma consulta
+    "WHERE id IN (...)" por lote de SQL_IN_CHUNK_SIZE ids (abaixo do limite de
+    variáveis do SQLite), retornando {id: objeto}; ids inexistentes ficam de fora.
+
+    Consultas com `incluir_arquivad*=True` também leem o arquivo de dados frios
+    (ver core/archive.py), anexado à conexão só durante a consulta; os registros
+    vindos de lá são marcados (ex: Avaliacao.arquivada) e são somente leitura.
+    """
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name, attr in list(vars(cls).items()):
+            if not name.startswith("_") and inspect.isfunction(attr):
+                setattr(cls, name, timed_method(f"{cls.__name__}.{name}", attr))
+
+    def __init__(self, pool: Optional[ConnectionPool] = None):
+        self._pool = pool
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        return (self._pool or get_pool()).acquire()
+
+    def _archive_path(self) -> Optional[str]:
+        return archive_path_for((self._pool or get_pool()).database_path)
+
+def _lotes_de_ids(ids: Iterable[int]) -> Iterator[Tuple[List[int], str]]:
+    """Ids distintos (sem None) em lotes de SQL_IN_CHUNK_SIZE, com os marcadores "?, ?, ..." de cada lote."""
+    unicos = list(dict.fromkeys(int(i) for i in ids if i is not None))
+    for inicio in range(0, len(unicos), SQL_IN_CHUNK_SIZE):
+        lote = unicos[inicio:inicio + SQL_IN_CHUNK_SIZE]
+        yield lote, ", ".join("?" * len(lote))
+
 # --- Paciente Repository --- 
-class PacienteRepository:
+class PacienteRepository(BaseRepository):
     """Gerencia operações CRUD para Pacientes no banco de dados."""
-    def __init__(self):
-        self.conn = get_db_connection()
-
     def add(self, paciente: Paciente) -> Optional[int]:
         """Adiciona um novo paciente ao banco de dados."""
-        sql = """INSERT INTO pacientes(nome_completo, data_nascimento, sexo, telefone, email, endereco, objetivo_consulta, historico_clinico, observacoes, data_cadastro)
-                 VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+        sql = """INSERT INTO pacientes(nome_completo, data_nascimento, sexo, telefone, email, endereco, objetivo_consulta, historico_clinico, observacoes, data_cadastro, nome_ordenacao)
+                 VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
         try:
             cursor = self.conn.cursor()
             now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -31,7 +90,7 @@ class PacienteRepository:
                 paciente.nome_completo, paciente.data_nascimento, paciente.sexo,
                 paciente.telefone, paciente.email, paciente.endereco,
                 paciente.objetivo_consulta, paciente.historico_clinico, paciente.observacoes,
-                now
+                now, chave_ordenacao(paciente.nome_completo)
             ))
             self.conn.commit()
             logging.info(f"Paciente \"{paciente.nome_completo}\" adicionado com ID: {cursor.lastrowid}")
@@ -52,7 +111,8 @@ class PacienteRepository:
             return False
         sql = """UPDATE pacientes SET 
                  nome_completo = ?, data_nascimento = ?, sexo = ?, telefone = ?, email = ?, 
-                 endereco = ?, objetivo_consulta = ?, historico_clinico = ?, observacoes = ?
+                 endereco = ?, objetivo_consulta = ?, historico_clinico = ?, observacoes = ?,
+                 nome_ordenacao = ?
                  WHERE id = ?"""
         try:
             cursor = self.conn.cursor()
@@ -60,7 +120,7 @@ class PacienteRepository:
                 paciente.nome_completo, paciente.data_nascimento, paciente.sexo,
                 paciente.telefone, paciente.email, paciente.endereco,
                 paciente.objetivo_consulta, paciente.historico_clinico, paciente.observacoes,
-                paciente.id
+                chave_ordenacao(paciente.nome_completo), paciente.id
             ))
             self.conn.commit()
             if cursor.rowcount == 0:
@@ -99,6 +159,14 @@ class PacienteRepository:
                 logging.warning(f"Nenhum paciente encontrado com ID {paciente_id} para excluir.")
                 return False
             logging.info(f"Paciente ID {paciente_id} e dados relacionados excluídos.")
+            # Registros antigos do paciente no arquivo de dados frios; dentro de uma
+            # UnitOfWork a exclusão ainda pode ser desfeita, então o arquivo fica intacto
+            if self.conn.in_transaction:
+                logging.warning(f"Exclusão do paciente ID {paciente_id} dentro de uma transação: registros arquivados mantidos.")
+            else:
+                apagados = purge_paciente(self._archive_path(), paciente_id)
+                if apagados:
+                    logging.info(f"{apagados} registro(s) arquivado(s) do paciente ID {paciente_id} excluído(s).")
             return True
         except Exception as e:
             logging.exception(f"Erro inesperado ao excluir paciente ID {paciente_id} e dados relacionados:")
@@ -111,30 +179,73 @@ class PacienteRepository:
         try:
             cursor = self.conn.cursor()
             cursor.execute(sql, (paciente_id,))
-            row = cursor.fetchone()
-            return Paciente(**row) if row else None
+            return fetch_one_as(cursor, Paciente)
         except Exception as e:
             logging.exception(f"Erro ao buscar paciente por ID {paciente_id}:")
             raise
 
+    def get_many(self, paciente_ids: Iterable[int]) -> Dict[int, Paciente]:
+        """Busca vários pacientes por id (uma consulta por lote de ids)."""
+        try:
+            pacientes = {}
+            for lote, marcadores in _lotes_de_ids(paciente_ids):
+                cursor = self.conn.cursor()
+                cursor.execute(f"SELECT * FROM pacientes WHERE id IN ({marcadores})", lote)
+                pacientes.update((p.id, p) for p in fetch_all_as(cursor, Paciente))
+            return pacientes
+        except Exception as e:
+            logging.exception("Erro ao buscar pacientes por lista de IDs:")
+            raise
+
     def get_all(self) -> List[Paciente]:
         """Retorna todos os pacientes."""
-        sql = "SELECT * FROM pacientes ORDER BY nome_completo"
+        # nome_ordenacao: ordem sem acento/caixa, servida pelo índice (sem ordenação em memória)
+        sql = "SELECT * FROM pacientes ORDER BY nome_ordenacao"
         try:
             cursor = self.conn.cursor()
             cursor.execute(sql)
-            rows = cursor.fetchall()
-            return [Paciente(**row) for row in rows]
+            return fetch_all_as(cursor, Paciente)
         except Exception as e:
             logging.exception("Erro ao buscar todos os pacientes:")
             raise
 
+    def iter_all(self, chunk_size: int = FETCH_CHUNK_SIZE) -> Iterator[Paciente]:
+        """Percorre todos os pacientes (ordem de cadastro) em lotes de `chunk_size`."""
+        sql = "SELECT * FROM pacientes ORDER BY id"
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(sql)
+            mapper = row_mapper(cursor, Paciente)
+            for row in iter_rows(cursor, chunk_size):
+                yield mapper(row)
+        except Exception as e:
+            logging.exception("Erro ao percorrer os pacientes:")
+            raise
+
+    def search_by_name_prefix(self, prefix: str, limit: Optional[int] = None) -> List[Paciente]:
+        """Busca pacientes cujo nome começa com `prefix`, ignorando acentos e maiúsculas."""
+        chave = chave_ordenacao(prefix)
+        if chave:
+            # Intervalo [chave, limite) sobre a coluna indexada: busca por faixa no índice
+            sql = "SELECT * FROM pacientes WHERE nome_ordenacao >= ? AND nome_ordenacao < ? ORDER BY nome_ordenacao"
+            params = (chave, limite_prefixo(chave))
+        else:
+            # Prefixo vazio: todos os pacientes, na mesma ordem (e com o mesmo limite)
+            sql = "SELECT * FROM pacientes ORDER BY nome_ordenacao"
+            params = ()
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(sql, params)
+            return fetch_all_as(cursor, Paciente)
+        except Exception as e:
+            logging.exception(f"Erro ao buscar pacientes pelo prefixo \"{prefix}\":")
+            raise
+
 # --- Avaliacao Repository --- 
-class AvaliacaoRepository:
+class AvaliacaoRepository(BaseRepository):
     """Gerencia operações CRUD para Avaliações."""
-    def __init__(self):
-        self.conn = get_db_connection()
-
     def add(self, avaliacao: Avaliacao) -> Optional[int]:
         sql = """INSERT INTO avaliacoes (paciente_id, data_avaliacao, peso, altura, 
                  circunferencia_cintura, circunferencia_quadril, circunferencia_braco, 
@@ -159,37 +270,127 @@ class AvaliacaoRepository:
             self.conn.rollback()
             raise
 
-    def get_by_paciente_id(self, paciente_id: int) -> List[Avaliacao]:
+    def get_by_paciente_id(self, paciente_id: int, incluir_arquivadas: bool = False) -> List[Avaliacao]:
         sql = "SELECT * FROM avaliacoes WHERE paciente_id = ? ORDER BY data_avaliacao DESC"
         try:
             cursor = self.conn.cursor()
             cursor.execute(sql, (paciente_id,))
-            rows = cursor.fetchall()
-            return [Avaliacao(**row) for row in rows]
+            avaliacoes = fetch_all_as(cursor, Avaliacao)
+            if incluir_arquivadas:
+                avaliacoes = merge_archived(avaliacoes, self._get_archived_by_paciente_id(paciente_id),
+                                            "data_avaliacao", reverse=True)
+            return avaliacoes
         except Exception as e:
             logging.exception(f"Erro ao buscar avaliações para paciente ID {paciente_id}:")
             raise
-            
-    # TODO: Implementar update e delete para avaliações se necessário
+
+    def _get_archived_by_paciente_id(self, paciente_id: int) -> List[Avaliacao]:
+        sql = "SELECT * FROM arquivo.avaliacoes WHERE paciente_id = ? ORDER BY data_avaliacao DESC"
+        with attached_archive(self.conn, self._archive_path()) as anexado:
+            if not anexado:
+                return []
+            return fetch_all_as(self.conn.execute(sql, (paciente_id,)), Avaliacao, arquivada=True)
+
+    def iter_all(self, chunk_size: int = FETCH_CHUNK_SIZE) -> Iterator[Avaliacao]:
+        """Percorre todas as avaliações (ordem de inclusão) em lotes de `chunk_size`."""
+        sql = "SELECT * FROM avaliacoes ORDER BY id"
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(sql)
+            mapper = row_mapper(cursor, Avaliacao)
+            for row in iter_rows(cursor, chunk_size):
+                yield mapper(row)
+        except Exception as e:
+            logging.exception("Erro ao percorrer as avaliações:")
+            raise
+
+    def iter_by_paciente_id(self, paciente_id: int, chunk_size: int = FETCH_CHUNK_SIZE) -> Iterator[Avaliacao]:
+        """Como get_by_paciente_id, mas entregando as avaliações em lotes de `chunk_size`."""
+        sql = "SELECT * FROM avaliacoes WHERE paciente_id = ? ORDER BY data_avaliacao DESC"
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(sql, (paciente_id,))
+            mapper = row_mapper(cursor, Avaliacao)
+            for row in iter_rows(cursor, chunk_size):
+                yield mapper(row)
+        except Exception as e:
+            logging.exception(f"Erro ao percorrer avaliações do paciente ID {paciente_id}:")
+            raise
+
+    def get_by_id(self, avaliacao_id: int) -> Optional[Avaliacao]:
+        sql = "SELECT * FROM avaliacoes WHERE id = ?"
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(sql, (avaliacao_id,))
+            return fetch_one_as(cursor, Avaliacao)
+        except Exception as e:
+            logging.exception(f"Erro ao buscar avaliação por ID {avaliacao_id}:")
+            raise
+
+    def update(self, avaliacao: Avaliacao) -> bool:
+        """Atualiza os dados de uma avaliação existente."""
+        if not avaliacao.id:
+            logging.error("Tentativa de atualizar avaliação sem ID.")
+            return False
+        sql = """UPDATE avaliacoes SET 
+                 data_avaliacao = ?, peso = ?, altura = ?, 
+                 circunferencia_cintura = ?, circunferencia_quadril = ?, circunferencia_braco = ?, 
+                 dobra_tricipital = ?, dobra_subescapular = ?, dobra_suprailiaca = ?, dobra_abdominal = ?, 
+                 anamnese_resumo = ?, exames_resumo = ?, observacoes = ?
+                 WHERE id = ? AND paciente_id = ?"""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(sql, (
+                avaliacao.data_avaliacao or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                avaliacao.peso, avaliacao.altura,
+                avaliacao.circunferencia_cintura, avaliacao.circunferencia_quadril, avaliacao.circunferencia_braco,
+                avaliacao.dobra_tricipital, avaliacao.dobra_subescapular, avaliacao.dobra_suprailiaca,
+                avaliacao.dobra_abdominal, avaliacao.anamnese_resumo, avaliacao.exames_resumo,
+                avaliacao.observacoes, avaliacao.id, avaliacao.paciente_id
+            ))
+            self.conn.commit()
+            if cursor.rowcount == 0:
+                logging.warning(f"Nenhuma avaliação encontrada com ID {avaliacao.id} para paciente ID {avaliacao.paciente_id} para atualizar.")
+                return False
+            logging.info(f"Avaliação ID {avaliacao.id} atualizada.")
+            return True
+        except Exception as e:
+            logging.exception(f"Erro inesperado ao atualizar avaliação ID {avaliacao.id}:")
+            self.conn.rollback()
+            raise
+
+    def delete(self, avaliacao_id: int) -> bool:
+        """Exclui uma avaliação."""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("DELETE FROM avaliacoes WHERE id = ?", (avaliacao_id,))
+            deleted_count = cursor.rowcount
+            self.conn.commit()
+            if deleted_count == 0:
+                logging.warning(f"Nenhuma avaliação encontrada com ID {avaliacao_id} para excluir.")
+                return False
+            logging.info(f"Avaliação ID {avaliacao_id} excluída.")
+            return True
+        except Exception as e:
+            logging.exception(f"Erro inesperado ao excluir avaliação ID {avaliacao_id}:")
+            self.conn.rollback()
+            raise
 
 # --- Alimento Repository --- 
-class AlimentoRepository:
+class AlimentoRepository(BaseRepository):
     """Gerencia operações CRUD para Alimentos."""
-    def __init__(self):
-        self.conn = get_db_connection()
-
     def add(self, alimento: Alimento) -> Optional[int]:
         sql = """INSERT INTO alimentos (nome, grupo, unidade_padrao, kcal_por_unidade, 
                  cho_por_unidade, ptn_por_unidade, lip_por_unidade, fibras_por_unidade, 
-                 sodio_mg_por_unidade, fonte_dados, observacoes)
-                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+                 sodio_mg_por_unidade, fonte_dados, observacoes, nome_ordenacao)
+                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
         try:
             cursor = self.conn.cursor()
             cursor.execute(sql, (
                 alimento.nome, alimento.grupo, alimento.unidade_padrao, alimento.kcal_por_unidade,
                 alimento.cho_por_unidade, alimento.ptn_por_unidade, alimento.lip_por_unidade,
                 alimento.fibras_por_unidade, alimento.sodio_mg_por_unidade, alimento.fonte_dados,
-                alimento.observacoes
+                alimento.observacoes, chave_ordenacao(alimento.nome)
             ))
             self.conn.commit()
             logging.info(f"Alimento \"{alimento.nome}\" adicionado com ID: {cursor.lastrowid}")
@@ -210,7 +411,8 @@ class AlimentoRepository:
         sql = """UPDATE alimentos SET 
                  nome = ?, grupo = ?, unidade_padrao = ?, kcal_por_unidade = ?, 
                  cho_por_unidade = ?, ptn_por_unidade = ?, lip_por_unidade = ?, 
-                 fibras_por_unidade = ?, sodio_mg_por_unidade = ?, fonte_dados = ?, observacoes = ?
+                 fibras_por_unidade = ?, sodio_mg_por_unidade = ?, fonte_dados = ?, observacoes = ?,
+                 nome_ordenacao = ?
                  WHERE id = ?"""
         try:
             cursor = self.conn.cursor()
@@ -218,7 +420,7 @@ class AlimentoRepository:
                 alimento.nome, alimento.grupo, alimento.unidade_padrao, alimento.kcal_por_unidade,
                 alimento.cho_por_unidade, alimento.ptn_por_unidade, alimento.lip_por_unidade,
                 alimento.fibras_por_unidade, alimento.sodio_mg_por_unidade, alimento.fonte_dados,
-                alimento.observacoes, alimento.id
+                alimento.observacoes, chave_ordenacao(alimento.nome), alimento.id
             ))
             self.conn.commit()
             if cursor.rowcount == 0:
@@ -236,9 +438,8 @@ class AlimentoRepository:
             raise
 
     def delete(self, alimento_id: int) -> bool:
-        # Verificar se o alimento está em uso em algum item de plano?
-        # Por simplicidade, vamos permitir a exclusão, mas isso pode quebrar planos existentes.
-        # Idealmente, marcar como inativo ou impedir exclusão se em uso.
+        # Alimentos em uso em itens de plano não são excluídos (a chave estrangeira
+        # dos itens é RESTRICT): retorna False em vez de deixar o DELETE falhar.
         sql_check = "SELECT 1 FROM itens_plano_alimentar WHERE alimento_id = ? LIMIT 1"
         sql_delete = "DELETE FROM alimentos WHERE id = ?"
         try:
@@ -246,10 +447,8 @@ class AlimentoRepository:
             cursor.execute(sql_check, (alimento_id,))
             if cursor.fetchone():
                 logging.warning(f"Tentativa de excluir alimento ID {alimento_id} que está em uso em planos alimentares.")
-                # Impedir exclusão ou apenas avisar?
-                # return False # Impedir
-                pass # Permitir, mas avisar
-                
+                return False
+
             cursor.execute(sql_delete, (alimento_id,))
             deleted_count = cursor.rowcount
             self.conn.commit()
@@ -263,59 +462,135 @@ class AlimentoRepository:
             self.conn.rollback()
             raise
 
+    def upsert_batch(self, alimentos: List[Alimento]) -> int:
+        """Insere ou atualiza (pelo nome) uma lista de alimentos numa única transação.
+
+        Usado pelos importadores de tabelas de composição. Alimentos já cadastrados
+        têm os valores nutricionais substituídos; as observações do usuário são mantidas.
+        Retorna o número de alimentos gravados.
+        """
+        if not alimentos:
+            return 0
+        sql = """INSERT INTO alimentos (nome, grupo, unidade_padrao, kcal_por_unidade,
+                 cho_por_unidade, ptn_por_unidade, lip_por_unidade, fibras_por_unidade,
+                 sodio_mg_por_unidade, fonte_dados, observacoes, nome_ordenacao)
+                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                 ON CONFLICT(nome) DO UPDATE SET
+                 grupo = excluded.grupo, unidade_padrao = excluded.unidade_padrao,
+                 kcal_por_unidade = excluded.kcal_por_unidade, cho_por_unidade = excluded.cho_por_unidade,
+                 ptn_por_unidade = excluded.ptn_por_unidade, lip_por_unidade = excluded.lip_por_unidade,
+                 fibras_por_unidade = excluded.fibras_por_unidade, sodio_mg_por_unidade = excluded.sodio_mg_por_unidade,
+                 fonte_dados = excluded.fonte_dados"""
+        try:
+            cursor = self.conn.cursor()
+            cursor.executemany(sql, [(
+                a.nome, a.grupo, a.unidade_padrao, a.kcal_por_unidade,
+                a.cho_por_unidade, a.ptn_por_unidade, a.lip_por_unidade,
+                a.fibras_por_unidade, a.sodio_mg_por_unidade, a.fonte_dados,
+                a.observacoes, chave_ordenacao(a.nome)
+            ) for a in alimentos])
+            self.conn.commit()
+            logging.debug(f"{len(alimentos)} alimentos gravados em lote (upsert por nome).")
+            return len(alimentos)
+        except Exception as e:
+            logging.exception(f"Erro ao gravar lote de {len(alimentos)} alimentos:")
+            self.conn.rollback()
+            raise
+
     def get_by_id(self, alimento_id: int) -> Optional[Alimento]:
         sql = "SELECT * FROM alimentos WHERE id = ?"
         try:
             cursor = self.conn.cursor()
             cursor.execute(sql, (alimento_id,))
-            row = cursor.fetchone()
-            return Alimento(**row) if row else None
+            return fetch_one_as(cursor, Alimento)
         except Exception as e:
             logging.exception(f"Erro ao buscar alimento por ID {alimento_id}:")
             raise
 
+    def get_many(self, alimento_ids: Iterable[int]) -> Dict[int, Alimento]:
+        """Busca vários alimentos por id (uma consulta por lote de ids)."""
+        try:
+            alimentos = {}
+            for lote, marcadores in _lotes_de_ids(alimento_ids):
+                cursor = self.conn.cursor()
+                cursor.execute(f"SELECT * FROM alimentos WHERE id IN ({marcadores})", lote)
+                alimentos.update((a.id, a) for a in fetch_all_as(cursor, Alimento))
+            return alimentos
+        except Exception as e:
+            logging.exception("Erro ao buscar alimentos por lista de IDs:")
+            raise
+
     def get_all(self, limit: Optional[int] = None) -> List[Alimento]:
-        sql = "SELECT * FROM alimentos ORDER BY nome"
+        sql = "SELECT * FROM alimentos ORDER BY nome_ordenacao"
         if limit:
-            sql += f" LIMIT {limit}"
+            sql += f" LIMIT {int(limit)}"
         try:
             cursor = self.conn.cursor()
             cursor.execute(sql)
-            rows = cursor.fetchall()
-            return [Alimento(**row) for row in rows]
+            return fetch_all_as(cursor, Alimento)
         except Exception as e:
             logging.exception("Erro ao buscar todos os alimentos:")
             raise
 
+    def iter_all(self, chunk_size: int = FETCH_CHUNK_SIZE) -> Iterator[Alimento]:
+        """Percorre todos os alimentos (ordem de cadastro) em lotes de `chunk_size`."""
+        sql = "SELECT * FROM alimentos ORDER BY id"
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(sql)
+            mapper = row_mapper(cursor, Alimento)
+            for row in iter_rows(cursor, chunk_size):
+                yield mapper(row)
+        except Exception as e:
+            logging.exception("Erro ao percorrer os alimentos:")
+            raise
+
+    @staticmethod
+    def _fts_query(term: str) -> str:
+        """Converte o texto digitado numa expressão FTS5: cada palavra vira um prefixo entre aspas.
+
+        "feijao car" -> '"feijao"* "car"*' (todas as palavras, em qualquer posição do nome/grupo).
+        As aspas neutralizam a sintaxe do FTS5 (AND, OR, NEAR, parênteses...) digitada pelo usuário.
+        """
+        tokens = re.findall(r"\w+", term)
+        return " ".join(f'"{token}"*' for token in tokens)
+
     def search_by_name(self, term: str, limit: Optional[int] = None) -> List[Alimento]:
-        sql = "SELECT * FROM alimentos WHERE nome LIKE ? ORDER BY nome"
+        """Busca alimentos pelo nome (e grupo) usando o índice FTS5, ordenados por relevância (bm25).
+
+        A busca ignora acentos e maiúsculas e casa prefixos de palavras ("feij" -> "Feijão").
+        """
+        fts_query = self._fts_query(term)
+        if not fts_query:
+            return []
+        # Peso maior para o nome do que para o grupo; empate desfeito pela ordem alfabética
+        sql = """SELECT a.* FROM alimentos_fts f
+                 JOIN alimentos a ON a.id = f.rowid
+                 WHERE alimentos_fts MATCH ?
+                 ORDER BY bm25(alimentos_fts, 10.0, 1.0), a.nome_ordenacao"""
         if limit:
-            sql += f" LIMIT {limit}"
+            sql += f" LIMIT {int(limit)}"
         try:
             cursor = self.conn.cursor()
-            cursor.execute(sql, (f"%{term}%",))
-            rows = cursor.fetchall()
-            return [Alimento(**row) for row in rows]
+            cursor.execute(sql, (fts_query,))
+            return fetch_all_as(cursor, Alimento)
         except Exception as e:
             logging.exception(f"Erro ao buscar alimentos por termo \"{term}\":")
             raise
 
 # --- PlanoAlimentar Repository --- 
-class PlanoAlimentarRepository:
+class PlanoAlimentarRepository(BaseRepository):
     """Gerencia operações CRUD para Planos Alimentares."""
-    def __init__(self):
-        self.conn = get_db_connection()
-
     def add(self, plano: PlanoAlimentar) -> Optional[int]:
         """Adiciona um novo plano alimentar."""
-        sql = """INSERT INTO planos_alimentares (paciente_id, nome_plano, objetivo, meta_kcal, observacoes, data_criacao)
+        sql = """INSERT INTO planos_alimentares (paciente_id, nome_plano, objetivo, meta_kcal, observacoes_gerais, data_criacao)
                  VALUES (?, ?, ?, ?, ?, ?)"""
         try:
             cursor = self.conn.cursor()
             now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             cursor.execute(sql, (
                 plano.paciente_id, plano.nome_plano, plano.objetivo,
-                plano.meta_kcal, plano.observacoes, now
+                plano.meta_kcal, plano.observacoes_gerais, now
             ))
             self.conn.commit()
             plano_id = cursor.lastrowid
@@ -332,13 +607,13 @@ class PlanoAlimentarRepository:
             logging.error("Tentativa de atualizar plano alimentar sem ID.")
             return False
         sql = """UPDATE planos_alimentares SET 
-                 nome_plano = ?, objetivo = ?, meta_kcal = ?, observacoes = ?
+                 nome_plano = ?, objetivo = ?, meta_kcal = ?, observacoes_gerais = ?
                  WHERE id = ? AND paciente_id = ?"""
         try:
             cursor = self.conn.cursor()
             cursor.execute(sql, (
                 plano.nome_plano, plano.objetivo, plano.meta_kcal, 
-                plano.observacoes, plano.id, plano.paciente_id
+                plano.observacoes_gerais, plano.id, plano.paciente_id
             ))
             self.conn.commit()
             if cursor.rowcount == 0:
@@ -377,29 +652,74 @@ class PlanoAlimentarRepository:
         try:
             cursor = self.conn.cursor()
             cursor.execute(sql, (plano_id,))
-            row = cursor.fetchone()
-            return PlanoAlimentar(**row) if row else None
+            return fetch_one_as(cursor, PlanoAlimentar)
         except Exception as e:
             logging.exception(f"Erro ao buscar plano alimentar por ID {plano_id}:")
             raise
 
-    def get_by_paciente_id(self, paciente_id: int) -> List[PlanoAlimentar]:
+    def get_many(self, plano_ids: Iterable[int]) -> Dict[int, PlanoAlimentar]:
+        """Busca vários planos alimentares por id (uma consulta por lote de ids)."""
+        try:
+            planos = {}
+            for lote, marcadores in _lotes_de_ids(plano_ids):
+                cursor = self.conn.cursor()
+                cursor.execute(f"SELECT * FROM planos_alimentares WHERE id IN ({marcadores})", lote)
+                planos.update((p.id, p) for p in fetch_all_as(cursor, PlanoAlimentar))
+            return planos
+        except Exception as e:
+            logging.exception("Erro ao buscar planos alimentares por lista de IDs:")
+            raise
+
+    def get_by_paciente_id(self, paciente_id: int, incluir_arquivados: bool = False) -> List[PlanoAlimentar]:
         sql = "SELECT * FROM planos_alimentares WHERE paciente_id = ? ORDER BY data_criacao DESC"
         try:
             cursor = self.conn.cursor()
             cursor.execute(sql, (paciente_id,))
-            rows = cursor.fetchall()
-            return [PlanoAlimentar(**row) for row in rows]
+            planos = fetch_all_as(cursor, PlanoAlimentar)
+            if incluir_arquivados:
+                planos = merge_archived(planos, self._get_archived_by_paciente_id(paciente_id),
+                                        "data_criacao", reverse=True)
+            return planos
         except Exception as e:
             logging.exception(f"Erro ao buscar planos alimentares para paciente ID {paciente_id}:")
             raise
 
+    def _get_archived_by_paciente_id(self, paciente_id: int) -> List[PlanoAlimentar]:
+        sql = "SELECT * FROM arquivo.planos_alimentares WHERE paciente_id = ? ORDER BY data_criacao DESC"
+        with attached_archive(self.conn, self._archive_path()) as anexado:
+            if not anexado:
+                return []
+            return fetch_all_as(self.conn.execute(sql, (paciente_id,)), PlanoAlimentar, arquivado=True)
+
+    def iter_all(self, chunk_size: int = FETCH_CHUNK_SIZE) -> Iterator[PlanoAlimentar]:
+        """Percorre todos os planos alimentares (ordem de criação) em lotes de `chunk_size`."""
+        sql = "SELECT * FROM planos_alimentares ORDER BY id"
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(sql)
+            mapper = row_mapper(cursor, PlanoAlimentar)
+            for row in iter_rows(cursor, chunk_size):
+                yield mapper(row)
+        except Exception as e:
+            logging.exception("Erro ao percorrer os planos alimentares:")
+            raise
+
+    def iter_by_paciente_id(self, paciente_id: int, chunk_size: int = FETCH_CHUNK_SIZE) -> Iterator[PlanoAlimentar]:
+        """Como get_by_paciente_id, mas entregando os planos em lotes de `chunk_size`."""
+        sql = "SELECT * FROM planos_alimentares WHERE paciente_id = ? ORDER BY data_criacao DESC"
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(sql, (paciente_id,))
+            mapper = row_mapper(cursor, PlanoAlimentar)
+            for row in iter_rows(cursor, chunk_size):
+                yield mapper(row)
+        except Exception as e:
+            logging.exception(f"Erro ao percorrer planos alimentares do paciente ID {paciente_id}:")
+            raise
+
 # --- ItemPlanoAlimentar Repository --- 
-class ItemPlanoAlimentarRepository:
+class ItemPlanoAlimentarRepository(BaseRepository):
     """Gerencia operações CRUD para Itens de Planos Alimentares."""
-    def __init__(self):
-        self.conn = get_db_connection()
-
     def add_batch(self, itens: List[ItemPlanoAlimentar]) -> bool:
         """Adiciona uma lista de itens de plano alimentar em lote."""
         if not itens:
@@ -433,6 +753,84 @@ class ItemPlanoAlimentarRepository:
             self.conn.rollback()
             raise
 
+    def add(self, item: ItemPlanoAlimentar) -> Optional[int]:
+        """Adiciona um item a um plano alimentar e retorna o seu ID."""
+        if item.plano_alimentar_id is None:
+            logging.error(f"Tentativa de adicionar item sem plano_alimentar_id: {item}")
+            return None
+        sql = """INSERT INTO itens_plano_alimentar (plano_alimentar_id, refeicao, alimento_id, 
+                 quantidade, unidade_medida, observacoes, 
+                 kcal_calculado, cho_calculado, ptn_calculado, lip_calculado)
+                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(sql, (
+                item.plano_alimentar_id, item.refeicao, item.alimento_id,
+                item.quantidade, item.unidade_medida, item.observacoes,
+                item.kcal_calculado, item.cho_calculado, item.ptn_calculado, item.lip_calculado
+            ))
+            self.conn.commit()
+            logging.info(f"Item adicionado com ID: {cursor.lastrowid} ao plano ID {item.plano_alimentar_id}")
+            return cursor.lastrowid
+        except Exception as e:
+            logging.exception(f"Erro ao adicionar item ao plano ID {item.plano_alimentar_id}:")
+            self.conn.rollback()
+            raise
+
+    def get_by_id(self, item_id: int) -> Optional[ItemPlanoAlimentar]:
+        sql = """SELECT i.*, a.nome as nome_alimento 
+                 FROM itens_plano_alimentar i
+                 LEFT JOIN alimentos a ON i.alimento_id = a.id
+                 WHERE i.id = ?"""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(sql, (item_id,))
+            return fetch_one_as(cursor, ItemPlanoAlimentar)
+        except Exception as e:
+            logging.exception(f"Erro ao buscar item de plano por ID {item_id}:")
+            raise
+
+    def update(self, item: ItemPlanoAlimentar) -> bool:
+        """Atualiza os dados de um item de plano alimentar existente."""
+        if not item.id:
+            logging.error("Tentativa de atualizar item de plano sem ID.")
+            return False
+        sql = """UPDATE itens_plano_alimentar SET
+                 refeicao = ?, alimento_id = ?, quantidade = ?, unidade_medida = ?, observacoes = ?,
+                 kcal_calculado = ?, cho_calculado = ?, ptn_calculado = ?, lip_calculado = ?
+                 WHERE id = ? AND plano_alimentar_id = ?"""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(sql, tuple(getattr(item, campo) for campo in self._CAMPOS_ITEM)
+                           + (item.id, item.plano_alimentar_id))
+            self.conn.commit()
+            if cursor.rowcount == 0:
+                logging.warning(f"Nenhum item encontrado com ID {item.id} no plano ID {item.plano_alimentar_id} para atualizar.")
+                return False
+            logging.info(f"Item de plano ID {item.id} atualizado.")
+            return True
+        except Exception as e:
+            logging.exception(f"Erro inesperado ao atualizar item de plano ID {item.id}:")
+            self.conn.rollback()
+            raise
+
+    def delete(self, item_id: int) -> bool:
+        """Exclui um item de plano alimentar."""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute("DELETE FROM itens_plano_alimentar WHERE id = ?", (item_id,))
+            deleted_count = cursor.rowcount
+            self.conn.commit()
+            if deleted_count == 0:
+                logging.warning(f"Nenhum item de plano encontrado com ID {item_id} para excluir.")
+                return False
+            logging.info(f"Item de plano ID {item_id} excluído.")
+            return True
+        except Exception as e:
+            logging.exception(f"Erro inesperado ao excluir item de plano ID {item_id}:")
+            self.conn.rollback()
+            raise
+
     def delete_by_plano_id(self, plano_id: int) -> int:
         """Exclui todos os itens associados a um plano alimentar."""
         sql = "DELETE FROM itens_plano_alimentar WHERE plano_alimentar_id = ?"
@@ -448,8 +846,8 @@ class ItemPlanoAlimentarRepository:
             self.conn.rollback()
             raise
 
-    def get_by_plano_id(self, plano_id: int) -> List[ItemPlanoAlimentar]:
-        """Busca todos os itens associados a um plano alimentar."""
+    def get_by_plano_id(self, plano_id: int, incluir_arquivados: bool = False) -> List[ItemPlanoAlimentar]:
+        """Busca todos os itens associados a um plano alimentar (de um plano arquivado, com incluir_arquivados)."""
         # Adicionar nome do alimento via JOIN para facilitar exibição
         sql = """SELECT i.*, a.nome as nome_alimento 
                  FROM itens_plano_alimentar i
@@ -460,18 +858,261 @@ class ItemPlanoAlimentarRepository:
         try:
             cursor = self.conn.cursor()
             cursor.execute(sql, (plano_id,))
-            rows = cursor.fetchall()
-            # Criar objetos ItemPlanoAlimentar, incluindo nome_alimento
-            itens = []
-            for row_dict in rows:
-                # nome_alimento não faz parte do __init__ padrão, mas podemos adicionar
-                item = ItemPlanoAlimentar(**{k: v for k, v in row_dict.items() if k != 'nome_alimento'})
-                item.nome_alimento = row_dict.get('nome_alimento', f"<Alimento ID {item.alimento_id} não encontrado>")
-                itens.append(item)
+            # nome_alimento vem do JOIN (None se o alimento não existir mais)
+            itens = fetch_all_as(cursor, ItemPlanoAlimentar)
+            if incluir_arquivados:
+                itens = merge_archived(itens, self._get_archived_by_plano_id(plano_id), "id")
             return itens
         except Exception as e:
             logging.exception(f"Erro ao buscar itens para o plano ID {plano_id}:")
             raise
 
-    # TODO: Implementar update e delete individuais para itens se necessário
+    def _get_archived_by_plano_id(self, plano_id: int) -> List[ItemPlanoAlimentar]:
+        sql = """SELECT i.*, a.nome AS nome_alimento
+                 FROM arquivo.itens_plano_alimentar i
+                 LEFT JOIN main.alimentos a ON i.alimento_id = a.id
+                 WHERE i.plano_alimentar_id = ?
+                 ORDER BY i.id"""
+        with attached_archive(self.conn, self._archive_path()) as anexado:
+            if not anexado:
+                return []
+            return fetch_all_as(self.conn.execute(sql, (plano_id,)), ItemPlanoAlimentar)
+
+    def get_by_plano_id_with_alimentos(self, plano_id: int) -> List[Tuple[ItemPlanoAlimentar, Optional[Alimento]]]:
+        """Itens do plano, cada um com o seu alimento (None se não existir mais), numa única consulta.
+
+        Traz todas as colunas nutricionais do alimento, para recalcular os itens
+        sem uma busca por alimento (ex: ao abrir o plano no diálogo de edição).
+        """
+        sql = """SELECT i.*, a.nome AS nome_alimento,
+                 a.nome AS alimento_nome, a.grupo AS alimento_grupo,
+                 a.unidade_padrao AS alimento_unidade_padrao, a.kcal_por_unidade AS alimento_kcal_por_unidade,
+                 a.cho_por_unidade AS alimento_cho_por_unidade, a.ptn_por_unidade AS alimento_ptn_por_unidade,
+                 a.lip_por_unidade AS alimento_lip_por_unidade, a.fibras_por_unidade AS alimento_fibras_por_unidade,
+                 a.sodio_mg_por_unidade AS alimento_sodio_mg_por_unidade, a.fonte_dados AS alimento_fonte_dados,
+                 a.observacoes AS alimento_observacoes
+                 FROM itens_plano_alimentar i
+                 LEFT JOIN alimentos a ON i.alimento_id = a.id
+                 WHERE i.plano_alimentar_id = ?
+                 ORDER BY i.id"""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(sql, (plano_id,))
+            item_mapper = row_mapper(cursor, ItemPlanoAlimentar)
+            alimento_mapper = row_mapper(cursor, Alimento, prefix="alimento_")
+            # Alimento.id vem de i.alimento_id (prefixo "alimento_"); nome é NOT NULL, então
+            # nome None indica item cujo alimento não existe mais (LEFT JOIN sem par)
+            resultado = []
+            for row in cursor.fetchall():
+                alimento = alimento_mapper(row)
+                resultado.append((item_mapper(row), alimento if alimento.nome is not None else None))
+            return resultado
+        except Exception as e:
+            logging.exception(f"Erro ao buscar itens com alimentos para o plano ID {plano_id}:")
+            raise
+
+    def iter_all(self, chunk_size: int = FETCH_CHUNK_SIZE) -> Iterator[ItemPlanoAlimentar]:
+        """Percorre todos os itens de todos os planos, com o nome do alimento, em lotes de `chunk_size`."""
+        sql = """SELECT i.*, a.nome AS nome_alimento
+                 FROM itens_plano_alimentar i
+                 LEFT JOIN alimentos a ON i.alimento_id = a.id
+                 ORDER BY i.id"""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(sql)
+            mapper = row_mapper(cursor, ItemPlanoAlimentar)
+            for row in iter_rows(cursor, chunk_size):
+                yield mapper(row)
+        except Exception as e:
+            logging.exception("Erro ao percorrer os itens de planos alimentares:")
+            raise
+
+    def iter_by_plano_id(self, plano_id: int, chunk_size: int = FETCH_CHUNK_SIZE) -> Iterator[ItemPlanoAlimentar]:
+        """Como get_by_plano_id, mas entregando os itens em lotes de `chunk_size`."""
+        sql = """SELECT i.*, a.nome AS nome_alimento
+                 FROM itens_plano_alimentar i
+                 LEFT JOIN alimentos a ON i.alimento_id = a.id
+                 WHERE i.plano_alimentar_id = ?
+                 ORDER BY i.id"""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(sql, (plano_id,))
+            mapper = row_mapper(cursor, ItemPlanoAlimentar)
+            for row in iter_rows(cursor, chunk_size):
+                yield mapper(row)
+        except Exception as e:
+            logging.exception(f"Erro ao percorrer itens do plano ID {plano_id}:")
+            raise
+
+    def iter_by_paciente_id(self, paciente_id: int, chunk_size: int = FETCH_CHUNK_SIZE) -> Iterator[ItemPlanoAlimentar]:
+        """Percorre os itens de todos os planos do paciente (planos mais recentes primeiro)."""
+        sql = """SELECT i.*, a.nome AS nome_alimento
+                 FROM planos_alimentares p
+                 JOIN itens_plano_alimentar i ON i.plano_alimentar_id = p.id
+                 LEFT JOIN alimentos a ON i.alimento_id = a.id
+                 WHERE p.paciente_id = ?
+                 ORDER BY p.data_criacao DESC, p.id DESC, i.id"""
+        try:
+            cursor = self.conn.cursor()
+            cursor.execute(sql, (paciente_id,))
+            mapper = row_mapper(cursor, ItemPlanoAlimentar)
+            for row in iter_rows(cursor, chunk_size):
+                yield mapper(row)
+        except Exception as e:
+            logging.exception(f"Erro ao percorrer itens dos planos do paciente ID {paciente_id}:")
+            raise
+
+    def update_calculados(self, valores: List[tuple]) -> int:
+        """Grava os nutrientes calculados de vários itens: tuplas (kcal, cho, ptn, lip, item_id).
+
+        Uma única transação (ou savepoint, se já houver uma aberta). Retorna o número de itens gravados.
+        """
+        if not valores:
+            return 0
+        sql = """UPDATE itens_plano_alimentar SET
+                 kcal_calculado = ?, cho_calculado = ?, ptn_calculado = ?, lip_calculado = ?
+                 WHERE id = ?"""
+        try:
+            with savepoint(self.conn) as conn:
+                conn.executemany(sql, valores)
+            logging.debug(f"Nutrientes calculados gravados para {len(valores)} itens de planos.")
+            return len(valores)
+        except Exception as e:
+            logging.exception(f"Erro ao gravar nutrientes calculados de {len(valores)} itens:")
+            raise
+
+    def iter_calculo_batches(self, alimento_id: Optional[int] = None,
+                             chunk_size: int = FETCH_CHUNK_SIZE) -> Iterator[List[tuple]]:
+        """Percorre os itens de todos os planos em lotes de `chunk_size`, para o recálculo de nutrientes.
+
+        Cada lote é uma lista de tuplas (id, plano_alimentar_id, alimento_id, quantidade,
+        unidade_medida, kcal_calculado, cho_calculado, ptn_calculado, lip_calculado).
+        Os lotes são lidos por faixa de id, sem cursor aberto entre um e outro: quem
+        consome pode gravar (update_calculados) antes de pedir o próximo.
+        Com `alimento_id`, só os itens desse alimento.
+        """
+        if alimento_id is None:
+            sql = """SELECT id, plano_alimentar_id, alimento_id, quantidade, unidade_medida,
+                     kcal_calculado, cho_calculado, ptn_calculado, lip_calculado
+                     FROM itens_plano_alimentar WHERE id > ? ORDER BY id LIMIT ?"""
+            filtro = ()
+        else:
+            sql = """SELECT id, plano_alimentar_id, alimento_id, quantidade, unidade_medida,
+                     kcal_calculado, cho_calculado, ptn_calculado, lip_calculado
+                     FROM itens_plano_alimentar WHERE alimento_id = ? AND id > ? ORDER BY id LIMIT ?"""
+            filtro = (alimento_id,)
+        ultimo_id = 0
+        try:
+            while True:
+                cursor = self.conn.cursor()
+                cursor.row_factory = None
+                lote = cursor.execute(sql, filtro + (ultimo_id, chunk_size)).fetchall()
+                if not lote:
+                    return
+                ultimo_id = lote[-1][0]
+                yield lote
+        except Exception as e:
+            logging.exception("Erro ao percorrer os itens de planos para recálculo:")
+            raise
+
+    # Campos gravados de cada item; uma diferença em qualquer um deles gera um UPDATE
+    _CAMPOS_ITEM = ("refeicao", "alimento_id", "quantidade", "unidade_medida", "observacoes",
+                    "kcal_calculado", "cho_calculado", "ptn_calculado", "lip_calculado")
+
+    @classmethod
+    def compute_changes(cls, originais: List[ItemPlanoAlimentar], editados: List[ItemPlanoAlimentar]):
+        """Compara as listas de itens pelo id e retorna (inserir, atualizar, ids_excluir).
+
+        Itens editados sem id são novos; itens originais ausentes da lista editada
+        foram removidos; os demais só entram em `atualizar` se algum campo mudou.
+        """
+        por_id = {item.id: item for item in originais if item.id is not None}
+        inserir, atualizar, mantidos = [], [], set()
+        for item in editados:
+            if item.id is None:
+                inserir.append(item)
+                continue
+            original = por_id.get(item.id)
+            if original is None:
+                raise ValueError(f"Item ID {item.id} não pertence à lista original do plano.")
+            mantidos.add(item.id)
+            if any(getattr(item, campo) != getattr(original, campo) for campo in cls._CAMPOS_ITEM):
+                atualizar.append(item)
+        ids_excluir = [item_id for item_id in por_id if item_id not in mantidos]
+        return inserir, atualizar, ids_excluir
+
+    def save_changes(self, plano_id: int, originais: List[ItemPlanoAlimentar], editados: List[ItemPlanoAlimentar]) -> Dict[str, int]:
+        """Grava apenas a diferença entre os itens originais e os editados de um plano.
+
+        INSERTs, UPDATEs e DELETEs são aplicados com executemany numa única transação
+        (ou num savepoint, se já houver uma aberta, ex: UnitOfWork). Retorna a
+        contagem de itens {"inseridos", "atualizados", "excluidos"}.
+        """
+        inserir, atualizar, ids_excluir = self.compute_changes(originais, editados)
+        for item in inserir:
+            item.plano_alimentar_id = plano_id
+        try:
+            with savepoint(self.conn) as conn:
+                cursor = conn.cursor()
+                if ids_excluir:
+                    cursor.executemany("DELETE FROM itens_plano_alimentar WHERE id = ? AND plano_alimentar_id = ?",
+                                       [(item_id, plano_id) for item_id in ids_excluir])
+                if atualizar:
+                    cursor.executemany("""UPDATE itens_plano_alimentar SET
+                                          refeicao = ?, alimento_id = ?, quantidade = ?, unidade_medida = ?, observacoes = ?,
+                                          kcal_calculado = ?, cho_calculado = ?, ptn_calculado = ?, lip_calculado = ?
+                                          WHERE id = ? AND plano_alimentar_id = ?""",
+                                       [tuple(getattr(item, campo) for campo in self._CAMPOS_ITEM) + (item.id, plano_id)
+                                        for item in atualizar])
+                if inserir:
+                    cursor.executemany("""INSERT INTO itens_plano_alimentar (plano_alimentar_id, refeicao, alimento_id,
+                                          quantidade, unidade_medida, observacoes,
+                                          kcal_calculado, cho_calculado, ptn_calculado, lip_calculado)
+                                          VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                                       [(plano_id,) + tuple(getattr(item, campo) for campo in self._CAMPOS_ITEM)
+                                        for item in inserir])
+            alteracoes = {"inseridos": len(inserir), "atualizados": len(atualizar), "excluidos": len(ids_excluir)}
+            logging.info(f"Itens do plano ID {plano_id} gravados por diferença: {alteracoes} ({len(editados)} itens no plano).")
+            return alteracoes
+        except Exception as e:
+            logging.exception(f"Erro ao gravar alterações dos itens do plano ID {plano_id}:")
+            raise
+
+# --- Unit of Work ---
+class UnitOfWork:
+    """Sessão que agrupa escritas de vários repositórios numa única transação.
+
+    Uso:
+        with UnitOfWork() as uow:
+            plano_id = uow.planos.add(plano)
+            uow.itens_plano.add_batch(itens)
+
+    Os commit() internos dos repositórios são adiados (ver database.savepoint) e a
+    transação é gravada uma só vez ao sair do bloco; uma exceção desfaz tudo.
+    Qualquer repositório do mesmo pool usado na mesma thread participa da sessão.
+    Métodos que sinalizam falha retornando False/None (ex: IntegrityError) já
+    desfizeram o que foi feito na sessão: o chamador deve lançar uma exceção para
+    não gravar o restante pela metade. Dentro de uma transação já aberta (ex: um
+    lote da WriteQueue), a sessão vira um savepoint aninhado.
+    """
+    def __init__(self, pool: Optional[ConnectionPool] = None):
+        self._pool = pool
+        self._scope = None
+        self.pacientes = PacienteRepository(pool)
+        self.avaliacoes = AvaliacaoRepository(pool)
+        self.alimentos = AlimentoRepository(pool)
+        self.planos = PlanoAlimentarRepository(pool)
+        self.itens_plano = ItemPlanoAlimentarRepository(pool)
+
+    def __enter__(self) -> "UnitOfWork":
+        if self._scope is not None:
+            raise RuntimeError("UnitOfWork já está em uso.")
+        self._scope = savepoint((self._pool or get_pool()).acquire())
+        self._scope.__enter__()
+        return self
 
+    def __exit__(self, exc_type, exc, tb):
+        scope, self._scope = self._scope, None
+        if exc_type is not None:
+            logging.warning(f"Unidade de trabalho desfeita: {exc_type.__name__}: {exc}")
+        return scope.__exit__(exc_type, exc, tb)
@@ -2,13 +2,29 @@
 
 import math
 import logging
-from typing import Optional, Tuple
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
 
 # Tenta importar de forma relativa primeiro
 try:
-    from .models import Paciente # Pode ser necessário para obter dados do paciente
+    from ..config import RECALCULO_CHUNK_SIZE
+except ImportError:
+    from config import RECALCULO_CHUNK_SIZE
+
+try:
+    from .models import Paciente, Alimento, ItemPlanoAlimentar, NUTRIENTES # Pode ser necessário para obter dados do paciente
 except ImportError:
-    from models import Paciente
+    from src.core.models import Paciente, Alimento, ItemPlanoAlimentar, NUTRIENTES
+
+# O catálogo e o repositório só são usados pelo cálculo de planos e pelo recálculo
+# em lote: são importados dentro dessas funções, para que os cálculos simples
+# (IMC, GEB, GET) não carreguem a camada de dados.
+if TYPE_CHECKING:
+    from .database import ConnectionPool
+    from .food_catalog import FoodCatalog
 
 # Configuração básica de logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -58,10 +74,10 @@ def calcular_geb_harris_benedict(sexo: str, peso_kg: float, altura_cm: float, id
     sexo_lower = sexo.lower()
     
     try:
-        if sexo_lower == \'masculino\' or sexo_lower == \'m\':
+        if sexo_lower == 'masculino' or sexo_lower == 'm':
             # Fórmula revisada por Roza e Shizgal (1984)
             geb = 88.362 + (13.397 * peso_kg) + (4.799 * altura_cm) - (5.677 * idade_anos)
-        elif sexo_lower == \'feminino\' or sexo_lower == \'f\':
+        elif sexo_lower == 'feminino' or sexo_lower == 'f':
             # Fórmula revisada por Roza e Shizgal (1984)
             geb = 447.593 + (9.247 * peso_kg) + (3.098 * altura_cm) - (4.330 * idade_anos)
         else:
@@ -85,9 +101,9 @@ def calcular_geb_mifflin_st_jeor(sexo: str, peso_kg: float, altura_cm: float, id
     sexo_lower = sexo.lower()
     
     try:
-        if sexo_lower == \'masculino\' or sexo_lower == \'m\':
+        if sexo_lower == 'masculino' or sexo_lower == 'm':
             geb = (10 * peso_kg) + (6.25 * altura_cm) - (5 * idade_anos) + 5
-        elif sexo_lower == \'feminino\' or sexo_lower == \'f\':
+        elif sexo_lower == 'feminino' or sexo_lower == 'f':
             geb = (10 * peso_kg) + (6.25 * altura_cm) - (5 * idade_anos) - 161
         else:
             logging.warning(f"Sexo inválido para cálculo de GEB: {sexo}")
@@ -115,6 +131,180 @@ def calcular_get(geb: Optional[float], fator_atividade: Optional[float]) -> Opti
         logging.error(f"Erro ao calcular GET: {e}")
         return None
 
+# --- Nutrientes de Planos Alimentares ---
+# Um único motor de cálculo, vetorizado com NumPy, usado pelo diálogo do plano, pelos
+# relatórios (via valores gravados em itens_plano_alimentar) e pelo recálculo em lote.
+# Cada item vale (valor do alimento por unidade) x quantidade x fator de conversão da
+# unidade do item para a unidade padrão do alimento; os valores por unidade vêm do
+# catálogo de alimentos em memória (core/food_catalog.py) ou, se o chamador já os
+# tiver (ex: consulta com JOIN), de uma matriz (n, 4) passada diretamente.
+
+# (unidade padrão do alimento, unidade do item) -> multiplicador da quantidade.
+# Unidades diferentes sem conversão conhecida usam a quantidade como está (com aviso).
+CONVERSOES_UNIDADE: Dict[Tuple[str, str], float] = {
+    ("g", "kg"): 1000.0,
+    ("ml", "l"): 1000.0,
+}
+
+@dataclass
+class NutrientesPlano:
+    """Resultado do cálculo de um plano: matrizes com colunas kcal, cho, ptn, lip (ver NUTRIENTES)."""
+    itens: np.ndarray # (n_itens, 4)
+    encontrados: np.ndarray # (n_itens,) False para itens cujo alimento não existe
+    refeicoes: List[str] = field(default_factory=list) # Na ordem em que aparecem nos itens
+    por_refeicao: np.ndarray = field(default_factory=lambda: np.zeros((0, len(NUTRIENTES))))
+    total: np.ndarray = field(default_factory=lambda: np.zeros(len(NUTRIENTES)))
+
+    def totais(self) -> Dict[str, float]:
+        return {nome: float(valor) for nome, valor in zip(NUTRIENTES, self.total)}
+
+    def totais_por_refeicao(self) -> Dict[str, Dict[str, float]]:
+        return {refeicao: {nome: float(valor) for nome, valor in zip(NUTRIENTES, linha)}
+                for refeicao, linha in zip(self.refeicoes, self.por_refeicao)}
+
+def _normalizar_unidades(unidades: Iterable[Any], n: int) -> np.ndarray:
+    """Unidades em minúsculas e sem espaços (None -> ""), normalizando cada texto distinto uma vez."""
+    codigos: Dict[Any, int] = {}
+    indices = np.fromiter((codigos.setdefault(u, len(codigos)) for u in unidades), dtype=np.int32, count=n)
+    return np.array([(u or "").strip().lower() for u in codigos], dtype=object)[indices]
+
+def fatores_unidade(unidades_alimento: Iterable[Any], unidades_item: Iterable[Any], n: int) -> np.ndarray:
+    """Multiplicador da quantidade de cada item para a unidade padrão do seu alimento."""
+    base = _normalizar_unidades(unidades_alimento, n)
+    item = _normalizar_unidades(unidades_item, n)
+    fatores = np.ones(n, dtype=np.float64)
+    convertidos = np.zeros(n, dtype=bool)
+    for (unidade_base, unidade_item), fator in CONVERSOES_UNIDADE.items():
+        mascara = (base == unidade_base) & (item == unidade_item)
+        fatores[mascara] = fator
+        convertidos |= mascara
+    diferentes = (base != item) & (base != "") & (item != "") & ~convertidos
+    if diferentes.any():
+        logging.warning(f"{int(diferentes.sum())} item(ns) com unidade diferente da padrão do alimento e sem conversão "
+                        f"conhecida (ex: {item[diferentes][0]} x {base[diferentes][0]}). Cálculo baseado na unidade padrão.")
+    return fatores
+
+def _agrupar(chaves: Iterable[Any], n: int) -> Tuple[List[Any], np.ndarray]:
+    """Chaves distintas (na ordem de aparição) e o índice do grupo de cada linha."""
+    grupos: Dict[Any, int] = {}
+    indices = np.fromiter((grupos.setdefault(c, len(grupos)) for c in chaves), dtype=np.int32, count=n)
+    return list(grupos), indices
+
+def _somar_grupos(indices: np.ndarray, n_grupos: int, valores: np.ndarray) -> np.ndarray:
+    """Soma as linhas de `valores` (n, 4) por grupo -> (n_grupos, 4)."""
+    return np.stack([np.bincount(indices, weights=valores[:, k], minlength=n_grupos)
+                     for k in range(valores.shape[1])], axis=1) if n_grupos else np.zeros((0, valores.shape[1]))
+
+def calcular_nutrientes(valores_por_unidade: np.ndarray, unidades_alimento: Sequence[Any],
+                        quantidades: Sequence[Optional[float]], unidades: Sequence[Any],
+                        refeicoes: Optional[Sequence[str]] = None,
+                        encontrados: Optional[np.ndarray] = None) -> NutrientesPlano:
+    """Calcula os nutrientes de n itens a partir dos valores por unidade dos seus alimentos.
+
+    `valores_por_unidade` é uma matriz (n, 4) (NaN vale 0); `unidades_alimento`, as
+    unidades padrão dos alimentos de cada item. Com `refeicoes`, também soma por refeição.
+    """
+    n = len(quantidades)
+    valores = np.nan_to_num(np.asarray(valores_por_unidade, dtype=np.float64).reshape(n, len(NUTRIENTES)))
+    # None vira NaN com dtype=float; quantidade ausente vale 0
+    fatores = np.nan_to_num(np.asarray(quantidades, dtype=np.float64)) * fatores_unidade(unidades_alimento, unidades, n)
+    resultado = NutrientesPlano(itens=valores * fatores[:, np.newaxis],
+                                encontrados=np.ones(n, dtype=bool) if encontrados is None else encontrados)
+    resultado.total = resultado.itens.sum(axis=0)
+    if refeicoes is not None:
+        resultado.refeicoes, indices = _agrupar(refeicoes, n)
+        resultado.por_refeicao = _somar_grupos(indices, len(resultado.refeicoes), resultado.itens)
+    return resultado
+
+def calcular_nutrientes_plano(alimento_ids: Sequence[int], quantidades: Sequence[Optional[float]],
+                              unidades: Sequence[Any], refeicoes: Optional[Sequence[str]] = None,
+                              catalog: Optional["FoodCatalog"] = None) -> NutrientesPlano:
+    """Calcula kcal/CHO/PTN/LIP por item, por refeição e totais de um plano.
+
+    Recebe as colunas dos itens (alimento, quantidade, unidade e, opcionalmente, refeição)
+    e busca os valores dos alimentos no catálogo em memória (get_catalog() por padrão).
+    Itens de alimentos inexistentes valem 0 e ficam marcados em `encontrados`.
+    """
+    if catalog is None:
+        try:
+            from .food_catalog import get_catalog
+        except ImportError:
+            from src.core.food_catalog import get_catalog
+        catalog = get_catalog()
+    ids = np.asarray(alimento_ids, dtype=np.int64)
+    encontrados = catalog.rows_for(ids) >= 0
+    return calcular_nutrientes(catalog.nutrients_for(ids), catalog.units_for(ids), quantidades, unidades,
+                               refeicoes, encontrados)
+
+def calcular_nutrientes_itens(itens: Sequence[ItemPlanoAlimentar],
+                              alimentos: Sequence[Optional[Alimento]]) -> NutrientesPlano:
+    """Calcula os itens de um plano com os alimentos já carregados (um por item, None se inexistente).
+
+    Para resultados de ItemPlanoAlimentarRepository.get_by_plano_id_with_alimentos:
+    não consulta o catálogo nem o banco. Também soma por refeição.
+    """
+    n = len(itens)
+    valores = np.array([(a.kcal_por_unidade, a.cho_por_unidade, a.ptn_por_unidade, a.lip_por_unidade)
+                        if a is not None else (None,) * len(NUTRIENTES) for a in alimentos], dtype=np.float64)
+    return calcular_nutrientes(valores.reshape(n, len(NUTRIENTES)),
+                               [a.unidade_padrao if a is not None else None for a in alimentos],
+                               [i.quantidade for i in itens], [i.unidade_medida for i in itens],
+                               refeicoes=[i.refeicao for i in itens],
+                               encontrados=np.array([a is not None for a in alimentos], dtype=bool))
+
+@dataclass
+class RecalculoResult:
+    """Resumo de um recálculo em lote dos nutrientes dos itens de planos."""
+    planos: int = 0
+    itens: int = 0
+    atualizados: int = 0 # Itens cujos valores gravados mudaram
+    segundos: float = 0.0
+    totais_por_plano: Dict[int, Dict[str, float]] = field(default_factory=dict)
+
+def recalcular_planos(pool: Optional["ConnectionPool"] = None, catalog: Optional["FoodCatalog"] = None,
+                      tolerancia: float = 1e-6, alimento_id: Optional[int] = None,
+                      chunk_size: int = RECALCULO_CHUNK_SIZE) -> RecalculoResult:
+    """Recalcula os nutrientes dos itens de planos e grava os que mudaram.
+
+    Usado depois de importar/corrigir tabelas de alimentos: os valores gravados em
+    itens_plano_alimentar (exibidos no diálogo e usados nos relatórios) passam a
+    refletir os valores atuais dos alimentos. Os itens são lidos, calculados e gravados
+    em lotes de `chunk_size`; só os totais por plano ficam em memória.
+    Com `alimento_id` (correção de um alimento), só os itens desse alimento são
+    recalculados, e os totais por plano somam apenas esses itens.
+    """
+    try:
+        from .food_catalog import FoodCatalog, get_catalog
+        from .repositories import ItemPlanoAlimentarRepository
+    except ImportError:
+        from src.core.food_catalog import FoodCatalog, get_catalog
+        from src.core.repositories import ItemPlanoAlimentarRepository
+
+    inicio = time.perf_counter()
+    repo = ItemPlanoAlimentarRepository(pool)
+    catalog = catalog or (FoodCatalog(pool) if pool is not None else get_catalog())
+    catalog.refresh()
+    result = RecalculoResult()
+    totais: Dict[int, np.ndarray] = {}
+    for lote in repo.iter_calculo_batches(alimento_id, chunk_size):
+        n = len(lote)
+        item_ids, plano_ids, alimento_ids, quantidades, unidades = list(zip(*lote))[:5]
+        calculo = calcular_nutrientes_plano(alimento_ids, quantidades, unidades, catalog=catalog)
+        gravados = np.array([linha[5:] for linha in lote], dtype=np.float64).reshape(n, len(NUTRIENTES))
+        mudaram = np.isnan(gravados).any(axis=1) | (np.abs(gravados - calculo.itens) > tolerancia).any(axis=1)
+        result.atualizados += repo.update_calculados([tuple(calculo.itens[k].tolist()) + (item_ids[k],)
+                                                      for k in np.flatnonzero(mudaram)])
+        planos, indices = _agrupar(plano_ids, n)
+        for plano_id, soma in zip(planos, _somar_grupos(indices, len(planos), calculo.itens)):
+            totais[plano_id] = totais[plano_id] + soma if plano_id in totais else soma
+        result.itens += n
+    result.planos = len(totais)
+    result.totais_por_plano = {plano_id: dict(zip(NUTRIENTES, soma.tolist())) for plano_id, soma in totais.items()}
+    result.segundos = time.perf_counter() - inicio
+    logging.info(f"Recálculo de planos: {result.planos} plano(s), {result.itens} item(ns), "
+                 f"{result.atualizados} atualizado(s) em {result.segundos:.2f}s")
+    return result
+
 # --- Outros Serviços (Exemplos Futuros) ---
 
 # def validar_plano_alimentar(plano: PlanoAlimentar, itens: List[ItemPlanoAlimentar]) -> List[str]:
@@ -126,14 +316,7 @@ def calcular_get(geb: Optional[float], fator_atividade: Optional[float]) -> Opti
 #     # Ex: Verificar se há itens com quantidade zero
 #     return erros
 
-# def calcular_nutrientes_plano(itens: List[ItemPlanoAlimentar]) -> dict:
-#     """Calcula os totais de kcal e macronutrientes para uma lista de itens de plano."""
-#     totais = {"kcal": 0.0, "cho": 0.0, "ptn": 0.0, "lip": 0.0}
-#     # Lógica para buscar dados nutricionais de cada alimento (via AlimentoRepository?)
-#     # e calcular totais com base nas quantidades e unidades
-#     return totais
-
-if __name__ == \'__main__\":
+if __name__ == '__main__':
     # Testes rápidos das funções de serviço
     logging.info("Testando módulo services.py...")
     
@@ -144,15 +327,15 @@ if __name__ == \'__main__\":
     print(f"Teste IMC inválido: {imc_info_invalido}")
     
     # Teste GEB Harris-Benedict
-    geb_hb_m = calcular_geb_harris_benedict(sexo=\'Masculino\", peso_kg=80, altura_cm=180, idade_anos=30)
+    geb_hb_m = calcular_geb_harris_benedict(sexo='Masculino', peso_kg=80, altura_cm=180, idade_anos=30)
     print(f"Teste GEB H-B (M, 80kg, 180cm, 30a): {geb_hb_m} kcal/dia")
-    geb_hb_f = calcular_geb_harris_benedict(sexo=\'Feminino\", peso_kg=60, altura_cm=165, idade_anos=25)
+    geb_hb_f = calcular_geb_harris_benedict(sexo='Feminino', peso_kg=60, altura_cm=165, idade_anos=25)
     print(f"Teste GEB H-B (F, 60kg, 165cm, 25a): {geb_hb_f} kcal/dia")
     
     # Teste GEB Mifflin-St Jeor
-    geb_msj_m = calcular_geb_mifflin_st_jeor(sexo=\'m\", peso_kg=80, altura_cm=180, idade_anos=30)
+    geb_msj_m = calcular_geb_mifflin_st_jeor(sexo='m', peso_kg=80, altura_cm=180, idade_anos=30)
     print(f"Teste GEB M-SJ (M, 80kg, 180cm, 30a): {geb_msj_m} kcal/dia")
-    geb_msj_f = calcular_geb_mifflin_st_jeor(sexo=\'f\", peso_kg=60, altura_cm=165, idade_anos=25)
+    geb_msj_f = calcular_geb_mifflin_st_jeor(sexo='f', peso_kg=60, altura_cm=165, idade_anos=25)
     print(f"Teste GEB M-SJ (F, 60kg, 165cm, 25a): {geb_msj_f} kcal/dia")
     
     # Teste GET
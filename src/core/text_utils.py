@@ -0,0 +1,24 @@
+# src/core/text_utils.py
+
+import re
+import unicodedata
+from typing import Optional
+
+_ESPACOS = re.compile(r"\s+")
+
+def chave_ordenacao(texto: Optional[str]) -> str:
+    """Gera a chave de ordenação/busca de um nome: sem acentos, minúscula e com espaços normalizados.
+
+    Segue a ordem esperada em português: "Ágata" fica junto de "Agata" (antes de "Bruno"),
+    "Çaí" junto de "Caí". A chave é gravada em colunas indexadas (ex.: pacientes.nome_ordenacao)
+    para que listagens ordenadas e buscas por prefixo usem o índice.
+    """
+    if not texto:
+        return ""
+    decomposto = unicodedata.normalize("NFKD", texto)
+    sem_acentos = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return _ESPACOS.sub(" ", sem_acentos.casefold()).strip()
+
+def limite_prefixo(prefixo: str) -> str:
+    """Retorna o menor texto maior que todos os que começam com `prefixo` (fim do intervalo de busca)."""
+    return prefixo[:-1] + chr(ord(prefixo[-1]) + 1)
@@ -0,0 +1,147 @@
+# src/core/write_queue.py
+
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Tenta importar de forma relativa primeiro
+try:
+    from ..config import WRITE_QUEUE_MAX_BATCH, WRITE_QUEUE_GROUP_WINDOW_MS
+except ImportError:
+    from config import WRITE_QUEUE_MAX_BATCH, WRITE_QUEUE_GROUP_WINDOW_MS
+
+try:
+    from .database import ConnectionPool, get_pool, savepoint
+except ImportError:
+    from src.core.database import ConnectionPool, get_pool, savepoint
+
+# Fila de escrita com uma única thread escritora (write-behind).
+# Cada escrita é uma chamada qualquer a um repositório (ex: repo.update, alimento)
+# enviada com submit(); a thread escritora junta as escritas que chegam em rajada
+# e executa o lote numa única transação, cada escrita no seu próprio SAVEPOINT:
+# os commit() dos repositórios são adiados para o COMMIT do lote (um fsync por lote)
+# e uma escrita que falha é desfeita sem derrubar as demais.
+# As escritas são executadas e concluídas na ordem de submit(). Os Futures só são
+# resolvidos depois do COMMIT, então um resultado entregue já está gravado em disco.
+# Os repositórios usados nas escritas precisam usar o mesmo pool da fila.
+
+@dataclass
+class _WriteJob:
+    fn: Callable[..., Any]
+    args: Tuple[Any, ...]
+    kwargs: Dict[str, Any]
+    future: Future = field(default_factory=Future)
+
+_STOP = object()
+
+class WriteQueue:
+    """Thread escritora única com commit em grupo."""
+    def __init__(self, pool: Optional[ConnectionPool] = None,
+                 max_batch: int = WRITE_QUEUE_MAX_BATCH,
+                 group_window_ms: float = WRITE_QUEUE_GROUP_WINDOW_MS,
+                 listener: Optional[Callable[[Future], None]] = None):
+        """`listener`, se informado, é chamado (na thread escritora) com cada Future concluído."""
+        self._pool = pool
+        self.max_batch = max_batch
+        self.group_window = group_window_ms / 1000
+        self.listener = listener
+        self._queue: "queue.Queue" = queue.Queue()
+        self._sequence = itertools.count(1)
+        self._submit_lock = threading.Lock()
+        self._closed = False
+        self.batches_committed = 0
+        self._thread = threading.Thread(target=self._run, name="nutriapp-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Enfileira `fn(*args, **kwargs)` para a thread escritora.
+
+        Retorna um Future com o retorno de `fn` (ou sua exceção). O atributo
+        `future.sequence` indica a ordem de submissão, que é a ordem de execução.
+        """
+        job = _WriteJob(fn, args, kwargs)
+        with self._submit_lock: # Numeração e enfileiramento na mesma ordem
+            if self._closed:
+                raise RuntimeError("Fila de escrita encerrada.")
+            job.future.sequence = next(self._sequence)
+            self._queue.put(job)
+        return job.future
+
+    def flush(self, timeout: Optional[float] = None):
+        """Bloqueia até todas as escritas enviadas antes desta chamada estarem gravadas."""
+        self.submit(lambda: None).result(timeout)
+
+    def close(self, timeout: Optional[float] = None):
+        """Grava as escritas pendentes e encerra a thread escritora."""
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    # --- Thread escritora ---
+    def _run(self):
+        stop = False
+        while not stop:
+            job = self._queue.get()
+            if job is _STOP:
+                break
+            batch = [job]
+            deadline = time.monotonic() + self.group_window
+            while len(batch) < self.max_batch:
+                try:
+                    nxt = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if nxt is _STOP:
+                    stop = True
+                    break
+                batch.append(nxt)
+            self._commit_batch(batch)
+
+    def _commit_batch(self, batch: List[_WriteJob]):
+        pool = self._pool or get_pool()
+        outcomes: List[Tuple[_WriteJob, bool, Any]] = []
+        try:
+            with pool.connection() as conn:
+                try:
+                    conn.execute("BEGIN IMMEDIATE")
+                    for job in batch:
+                        if not job.future.set_running_or_notify_cancel():
+                            continue # Cancelado antes de ser executado
+                        try:
+                            with savepoint(conn):
+                                outcomes.append((job, True, job.fn(*job.args, **job.kwargs)))
+                        except Exception as e:
+                            logging.exception(f"Erro na escrita #{job.future.sequence} da fila; escrita desfeita.")
+                            outcomes.append((job, False, e))
+                    conn.commit()
+                except Exception:
+                    if conn.in_transaction:
+                        conn.rollback()
+                    raise
+        except Exception as e:
+            # BEGIN/COMMIT falhou: nenhuma escrita do lote foi gravada
+            logging.exception(f"Falha ao gravar lote de {len(batch)} escrita(s); lote descartado.")
+            outcomes = [(job, False, e) for job in batch
+                        if job.future.running() or job.future.set_running_or_notify_cancel()]
+        else:
+            self.batches_committed += 1
+            logging.debug(f"Lote de {len(batch)} escrita(s) gravado numa única transação.")
+
+        for job, ok, value in outcomes:
+            if ok:
+                job.future.set_result(value)
+            else:
+                job.future.set_exception(value)
+            if self.listener:
+                try:
+                    self.listener(job.future)
+                except Exception:
+                    logging.exception("Erro no listener da fila de escrita.")
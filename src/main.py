@@ -12,6 +12,7 @@ logging.basicConfig(level=logging.INFO, format=log_format, datefmt=date_format)
 # Importar componentes principais
 try:
     from core import database
+    from core.instrumentation import setup_slow_query_log
     from ui.controllers.main_controller import MainController
     from config import DATABASE_PATH # Importar o caminho do DB
 except ImportError as e:
@@ -26,6 +27,7 @@ except ImportError as e:
 def run_application():
     """Inicializa e executa a aplicação principal."""
     logging.info("Iniciando Sistema de Gestão Nutricional...")
+    setup_slow_query_log()
 
     # 1. Inicializar Banco de Dados
     logging.info(f"Verificando/Inicializando banco de dados em: {DATABASE_PATH}")
@@ -0,0 +1,30 @@
+# src/ui/controllers/activity_monitor.py
+
+import time
+from typing import Callable, Optional
+from PySide6.QtCore import QObject, QEvent
+
+class ActivityMonitor(QObject):
+    """Filtro de eventos da aplicação que registra a última interação do usuário.
+
+    Instalado com QApplication.installEventFilter(); usado pelo MainController para
+    saber quando a interface está ociosa (ver core/maintenance.py). `on_activity` é
+    chamado a cada interação, na thread da GUI.
+    """
+    USER_EVENTS = {QEvent.KeyPress, QEvent.MouseButtonPress, QEvent.MouseButtonDblClick,
+                   QEvent.Wheel, QEvent.MouseMove, QEvent.TouchBegin}
+
+    def __init__(self, parent=None, on_activity: Optional[Callable[[], None]] = None):
+        super().__init__(parent)
+        self.on_activity = on_activity
+        self.last_activity = time.monotonic()
+
+    def idle_seconds(self) -> float:
+        return time.monotonic() - self.last_activity
+
+    def eventFilter(self, watched, event) -> bool:
+        if event.type() in self.USER_EVENTS:
+            self.last_activity = time.monotonic()
+            if self.on_activity:
+                self.on_activity()
+        return False # Nunca consome o evento
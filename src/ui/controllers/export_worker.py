@@ -0,0 +1,74 @@
+# src/ui/controllers/export_worker.py
+
+import logging
+import threading
+from typing import Optional
+from PySide6.QtCore import QObject, Signal, Slot
+
+# Tenta importar de forma relativa primeiro
+try:
+    from ...core.exporters import export_dataset
+except ImportError:
+    # Fallback
+    from src.core.exporters import export_dataset
+
+class ExportWorker(QObject):
+    """Executa core.exporters.export_dataset numa thread própria, sem travar a GUI.
+
+    Como o WriteBehindController, este objeto vive na thread da GUI: a thread de
+    exportação só emite os sinais internos, entregues aos slots daqui pelo loop de
+    eventos, e os sinais públicos (progress/finished/failed) são emitidos já na
+    thread da GUI. cancel() interrompe a exportação no fim do lote atual (o arquivo
+    parcial é descartado).
+    """
+    # (linhas exportadas, total)
+    progress = Signal(int, int)
+    # ExportResult / exceção
+    finished = Signal(object)
+    failed = Signal(object)
+
+    _progress_relay = Signal(int, int)
+    _finished_relay = Signal(object)
+    _failed_relay = Signal(object)
+
+    def __init__(self, dataset: str, path: str, fmt: Optional[str] = None, parent=None):
+        super().__init__(parent)
+        self.dataset = dataset
+        self.path = path
+        self.fmt = fmt
+        self._cancelado = False
+        self._thread = threading.Thread(target=self._run, name="nutriapp-export", daemon=True)
+        self._progress_relay.connect(self._dispatch_progress)
+        self._finished_relay.connect(self._dispatch_finished)
+        self._failed_relay.connect(self._dispatch_failed)
+
+    def start(self):
+        self._thread.start()
+
+    def cancel(self):
+        self._cancelado = True
+
+    def _run(self):
+        # Thread de exportação: export_dataset empresta uma conexão do pool a esta thread
+        def on_progress(feitas: int, total: int) -> bool:
+            self._progress_relay.emit(feitas, total)
+            return self._cancelado
+        try:
+            result = export_dataset(self.dataset, self.path, self.fmt, progress=on_progress)
+        except Exception as e:
+            logging.exception(f"Falha na exportação de '{self.dataset}':")
+            self._failed_relay.emit(e)
+        else:
+            self._finished_relay.emit(result)
+
+    @Slot(int, int)
+    def _dispatch_progress(self, feitas: int, total: int):
+        self.progress.emit(feitas, total)
+
+    @Slot(object)
+    def _dispatch_finished(self, result):
+        self.finished.emit(result)
+
+    @Slot(object)
+    def _dispatch_failed(self, error):
+        self.failed.emit(error)
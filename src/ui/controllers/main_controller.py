@@ -3,8 +3,9 @@
 import sys
 import logging
 import sqlite3 # Import for specific error handling
-from PySide6.QtWidgets import QApplication, QMessageBox, QDialog
-from PySide6.QtCore import Slot, QItemSelectionModel, QModelIndex, QDateTime, Qt
+from typing import Optional
+from PySide6.QtWidgets import QApplication, QMessageBox, QDialog, QFileDialog, QInputDialog, QProgressDialog
+from PySide6.QtCore import QObject, Signal, Slot, QItemSelectionModel, QModelIndex, QDateTime, Qt, QTimer
 
 # Tenta importar de forma relativa primeiro
 try:
@@ -16,8 +17,20 @@ try:
     from ..views.view_avaliacoes_dialog import ViewAvaliacoesDialog # Importar diálogo de visualização
     from ..views.view_planos_dialog import ViewPlanosDialog # Importar diálogo de visualização
     from ..models.paciente_table_model import PacienteTableModel
-    from ...core.repositories import PacienteRepository, AvaliacaoRepository, AlimentoRepository, PlanoAlimentarRepository, ItemPlanoAlimentarRepository
+    from ...core.repositories import PacienteRepository, AvaliacaoRepository, AlimentoRepository, PlanoAlimentarRepository, ItemPlanoAlimentarRepository, UnitOfWork
     from ...core.models import Paciente, Avaliacao, Alimento, PlanoAlimentar, ItemPlanoAlimentar
+    from ...core.database import close_pool
+    from ...core.instrumentation import metrics
+    from ...core.backup import BackupScheduler
+    from ...core.backup_store import BackupStore
+    from ...core.maintenance import MaintenanceScheduler
+    from ...core.archive import archive_old_records, cutoff_date
+    from ...config import WRITE_BEHIND_ENABLED, BACKUP_INTERVAL_MINUTES, BACKUP_ON_EXIT, BACKUP_DIR, BACKUP_STORE_ENABLED
+    from ...config import MAINTENANCE_ENABLED, MAINTENANCE_IDLE_SECONDS, ARCHIVE_AFTER_YEARS
+    from .activity_monitor import ActivityMonitor
+    from .write_behind import WriteBehindController
+    from .export_worker import ExportWorker
+    from ...core.exporters import DATASETS
 except ImportError:
     # Fallback
     from src.ui.views.main_window import MainWindow
@@ -28,12 +41,31 @@ except ImportError:
     from src.ui.views.view_avaliacoes_dialog import ViewAvaliacoesDialog
     from src.ui.views.view_planos_dialog import ViewPlanosDialog
     from src.ui.models.paciente_table_model import PacienteTableModel
-    from src.core.repositories import PacienteRepository, AvaliacaoRepository, AlimentoRepository, PlanoAlimentarRepository, ItemPlanoAlimentarRepository
+    from src.core.repositories import PacienteRepository, AvaliacaoRepository, AlimentoRepository, PlanoAlimentarRepository, ItemPlanoAlimentarRepository, UnitOfWork
     from src.core.models import Paciente, Avaliacao, Alimento, PlanoAlimentar, ItemPlanoAlimentar
+    from src.core.database import close_pool
+    from src.core.instrumentation import metrics
+    from src.core.backup import BackupScheduler
+    from src.core.backup_store import BackupStore
+    from src.core.maintenance import MaintenanceScheduler
+    from src.core.archive import archive_old_records, cutoff_date
+    from src.config import WRITE_BEHIND_ENABLED, BACKUP_INTERVAL_MINUTES, BACKUP_ON_EXIT, BACKUP_DIR, BACKUP_STORE_ENABLED
+    from src.config import MAINTENANCE_ENABLED, MAINTENANCE_IDLE_SECONDS, ARCHIVE_AFTER_YEARS
+    from src.ui.controllers.activity_monitor import ActivityMonitor
+    from src.ui.controllers.write_behind import WriteBehindController
+    from src.ui.controllers.export_worker import ExportWorker
+    from src.core.exporters import DATASETS
 
 # Configuração básica de logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s')
 
+class _StatusRelay(QObject):
+    """Leva à barra de status mensagens emitidas por threads de segundo plano.
+
+    Vive na thread da GUI: o sinal emitido em outra thread é entregue pelo loop de eventos.
+    """
+    message = Signal(str)
+
 class MainController:
     """Controlador principal que gerencia a MainWindow e a interação com o backend."""
     def __init__(self):
@@ -49,6 +81,18 @@ class MainController:
             self.alimento_repo = AlimentoRepository()
             self.plano_repo = PlanoAlimentarRepository()
             self.item_plano_repo = ItemPlanoAlimentarRepository()
+            # Escritas em segundo plano com commit em grupo (opcional, ver config.WRITE_BEHIND_ENABLED)
+            self.write_behind = WriteBehindController() if WRITE_BEHIND_ENABLED else None
+            self._export_worker: Optional[ExportWorker] = None
+            # Backups online periódicos e ao sair (ver core/backup.py), também gravados
+            # no repositório deduplicado de pontos de restauração (core/backup_store.py)
+            self.backup_scheduler = BackupScheduler(store=BackupStore() if BACKUP_STORE_ENABLED else None)
+            if BACKUP_INTERVAL_MINUTES > 0:
+                self.backup_scheduler.start()
+            # Manutenção do banco (ANALYZE, optimize, vacuum incremental) quando a interface fica ociosa;
+            # o andamento da conversão única para o vacuum incremental aparece na barra de status
+            self._status_relay = _StatusRelay()
+            self.maintenance = MaintenanceScheduler(progress=self._status_relay.message.emit) if MAINTENANCE_ENABLED else None
         except Exception as e:
             logging.critical(f"Erro ao inicializar repositórios: {e}", exc_info=True)
             QMessageBox.critical(None, "Erro Crítico", f"Falha ao conectar ao banco de dados ou inicializar repositórios:\n{e}\n\nA aplicação será encerrada.")
@@ -56,6 +100,7 @@ class MainController:
             
         self.paciente_table_model = PacienteTableModel()
         self.view = MainWindow()
+        self._status_relay.message.connect(lambda mensagem: self.view.set_status_message(mensagem, 5000))
 
         # Configura a view
         self.view.pacientes_table_view.setModel(self.paciente_table_model)
@@ -66,10 +111,39 @@ class MainController:
         # Conecta sinais da View aos slots do Controller
         self._connect_signals()
 
+        if self.maintenance:
+            self._setup_idle_maintenance()
+
     def show_view(self):
         """Exibe a janela principal."""
         self.view.show()
-        sys.exit(self.app.exec())
+        exit_code = self.app.exec()
+        try:
+            metrics.write_openmetrics() # Histogramas de latência da sessão (config.METRICS_PATH)
+        except OSError as e:
+            logging.warning(f"Não foi possível exportar as métricas de consultas: {e}")
+        if self.write_behind:
+            self.write_behind.close() # Grava as escritas ainda na fila antes de fechar o pool
+        if self.maintenance:
+            self.maintenance.stop(timeout=5.0) # Termina o passo em andamento
+        self.backup_scheduler.stop(final_backup=BACKUP_ON_EXIT)
+        close_pool() # Fecha as conexões do pool compartilhado ao sair
+        sys.exit(exit_code)
+
+    def _setup_idle_maintenance(self):
+        """Observa a interação do usuário e libera a manutenção após MAINTENANCE_IDLE_SECONDS sem uso."""
+        # Qualquer interação interrompe a manutenção no fim do passo atual
+        self.activity_monitor = ActivityMonitor(self.app, on_activity=lambda: self.maintenance.set_idle(False))
+        self.app.installEventFilter(self.activity_monitor)
+        self.maintenance_timer = QTimer(self.view)
+        self.maintenance_timer.setInterval(5000)
+        self.maintenance_timer.timeout.connect(self._check_idle)
+        self.maintenance_timer.start()
+        self.maintenance.start()
+
+    @Slot()
+    def _check_idle(self):
+        self.maintenance.set_idle(self.activity_monitor.idle_seconds() >= MAINTENANCE_IDLE_SECONDS)
 
     def _get_selected_paciente(self) -> Optional[Paciente]:
         """Retorna o objeto Paciente selecionado na tabela."""
@@ -82,6 +156,7 @@ class MainController:
     def _connect_signals(self):
         """Conecta os sinais dos widgets da MainWindow aos métodos (slots) deste controller."""
         self.view.quit_action.triggered.connect(self._handle_quit)
+        self.view.export_action.triggered.connect(self._handle_export)
         self.view.new_paciente_action.triggered.connect(self._handle_new_paciente)
         self.view.edit_paciente_action.triggered.connect(self._handle_edit_paciente)
         self.view.delete_paciente_action.triggered.connect(self._handle_delete_paciente)
@@ -90,6 +165,8 @@ class MainController:
         self.view.new_plano_action.triggered.connect(self._handle_new_plano)
         self.view.view_planos_action.triggered.connect(self._handle_view_planos)
         self.view.manage_alimentos_action.triggered.connect(self._handle_manage_alimentos)
+        self.view.backup_action.triggered.connect(self._handle_backup)
+        self.view.archive_action.triggered.connect(self._handle_archive)
         self.view.about_action.triggered.connect(self._handle_about)
         selection_model = self.view.pacientes_table_view.selectionModel()
         if selection_model:
@@ -262,7 +339,7 @@ class MainController:
             
         logging.info(f"Ação: Ver Avaliações para Paciente ID: {paciente_selecionado.id}")
         try:
-            dialog = ViewAvaliacoesDialog(paciente=paciente_selecionado, parent=self.view)
+            dialog = ViewAvaliacoesDialog(paciente=paciente_selecionado, parent=self.view, avaliacao_repo=self.avaliacao_repo)
             dialog.exec()
             # Ações futuras (editar/excluir) podem ser tratadas aqui com base no resultado do diálogo
         except Exception as e:
@@ -279,7 +356,8 @@ class MainController:
             return
             
         logging.info(f"Ação: Novo Plano para Paciente ID: {paciente_selecionado.id}")
-        dialog = PlanoAlimentarDialog(paciente=paciente_selecionado, parent=self.view)
+        dialog = PlanoAlimentarDialog(paciente=paciente_selecionado, parent=self.view,
+                                      item_repo=self.item_plano_repo, alimento_repo=self.alimento_repo)
         
         if dialog.exec() == QDialog.Accepted:
             plano_data = dialog.get_plano_data()
@@ -288,24 +366,17 @@ class MainController:
             novo_plano = PlanoAlimentar(**plano_data)
             plano_id = None
             try:
-                # Usar transação conceitual (idealmente seria uma transação real no DB)
-                plano_id = self.plano_repo.add(novo_plano)
-                if not plano_id:
-                    raise Exception("Falha ao obter ID do novo plano alimentar.")
-                
-                logging.info(f"Plano ID {plano_id} criado. Adicionando {len(itens_data)} itens.")
-                for item in itens_data:
-                    item.plano_alimentar_id = plano_id
-                
-                if itens_data:
-                    if not self.item_plano_repo.add_batch(itens_data):
-                        # Tentar reverter a criação do plano se itens falharem
-                        logging.error(f"Falha ao salvar itens para o novo plano ID {plano_id}. Tentando reverter.")
-                        try:
-                            self.plano_repo.delete(plano_id)
-                            logging.info(f"Plano ID {plano_id} revertido com sucesso.")
-                        except Exception as del_e:
-                            logging.error(f"Falha CRÍTICA ao reverter plano ID {plano_id} após erro nos itens: {del_e}")
+                # Plano e itens numa única transação: uma falha nos itens desfaz o plano
+                with UnitOfWork():
+                    plano_id = self.plano_repo.add(novo_plano)
+                    if not plano_id:
+                        raise Exception("Falha ao obter ID do novo plano alimentar.")
+
+                    logging.info(f"Plano ID {plano_id} criado. Adicionando {len(itens_data)} itens.")
+                    for item in itens_data:
+                        item.plano_alimentar_id = plano_id
+
+                    if itens_data and not self.item_plano_repo.add_batch(itens_data):
                         raise Exception("Falha ao salvar itens do plano alimentar em lote.")
                 
                 logging.info(f"Plano alimentar ID {plano_id} e seus itens salvos com sucesso.")
@@ -318,19 +389,24 @@ class MainController:
             logging.info("Criação de novo plano cancelada.")
             self.view.set_status_message("Criação de plano cancelada.", 2000)
 
-    def _handle_edit_plano(self, plano_para_editar: PlanoAlimentar):
-        """Abre o diálogo para editar um plano alimentar existente."""
+    def _handle_edit_plano(self, plano_para_editar: PlanoAlimentar, paciente: Optional[Paciente] = None):
+        """Abre o diálogo para editar um plano alimentar existente.
+
+        `paciente` é o dono do plano, quando o chamador já o tem (evita buscá-lo de novo).
+        """
         if not plano_para_editar or not plano_para_editar.id:
             logging.error("Tentativa de editar plano inválido.")
             return
             
-        paciente = self.paciente_repo.get_by_id(plano_para_editar.paciente_id)
+        if paciente is None or paciente.id != plano_para_editar.paciente_id:
+            paciente = self.paciente_repo.get_by_id(plano_para_editar.paciente_id)
         if not paciente:
              QMessageBox.critical(self.view, "Erro", f"Paciente ID {plano_para_editar.paciente_id} não encontrado para o plano.")
              return
 
         logging.info(f"Ação: Editar Plano ID: {plano_para_editar.id} para Paciente ID: {paciente.id}")
-        dialog = PlanoAlimentarDialog(paciente=paciente, plano=plano_para_editar, parent=self.view)
+        dialog = PlanoAlimentarDialog(paciente=paciente, plano=plano_para_editar, parent=self.view,
+                                      item_repo=self.item_plano_repo, alimento_repo=self.alimento_repo)
         
         if dialog.exec() == QDialog.Accepted:
             plano_data = dialog.get_plano_data()
@@ -339,22 +415,14 @@ class MainController:
             plano_atualizado = PlanoAlimentar(id=plano_para_editar.id, **plano_data)
             
             try:
-                # Transação conceitual
-                if not self.plano_repo.update(plano_atualizado):
-                    raise Exception("Falha ao atualizar dados do plano alimentar (plano não encontrado?).")
-                
-                logging.info(f"Plano ID {plano_atualizado.id} atualizado. Atualizando itens...")
-                self.item_plano_repo.delete_by_plano_id(plano_atualizado.id)
-                
-                for item in itens_data:
-                    item.plano_alimentar_id = plano_atualizado.id
-                
-                if itens_data:
-                    if not self.item_plano_repo.add_batch(itens_data):
-                        # ERRO: Reverter a atualização do plano seria complexo aqui.
-                        # Idealmente, a transação deveria cobrir tudo.
-                        logging.error(f"Falha ao salvar itens atualizados para o plano ID {plano_atualizado.id}. O plano foi atualizado, mas os itens podem estar inconsistentes.")
-                        raise Exception("Falha ao salvar itens atualizados do plano alimentar em lote.")
+                # Cabeçalho e itens numa única transação: uma falha mantém o plano como estava
+                with UnitOfWork():
+                    if not self.plano_repo.update(plano_atualizado):
+                        raise Exception("Falha ao atualizar dados do plano alimentar (plano não encontrado?).")
+
+                    logging.info(f"Plano ID {plano_atualizado.id} atualizado. Atualizando itens...")
+                    # Grava só os itens incluídos, alterados ou removidos no diálogo
+                    self.item_plano_repo.save_changes(plano_atualizado.id, dialog.get_itens_originais(), itens_data)
                 
                 logging.info(f"Plano alimentar ID {plano_atualizado.id} e seus itens atualizados com sucesso.")
                 self.view.set_status_message("Plano alimentar atualizado com sucesso!", 3000)
@@ -376,14 +444,14 @@ class MainController:
             
         logging.info(f"Ação: Ver Planos para Paciente ID: {paciente_selecionado.id}")
         try:
-            dialog = ViewPlanosDialog(paciente=paciente_selecionado, parent=self.view)
+            dialog = ViewPlanosDialog(paciente=paciente_selecionado, parent=self.view, plano_repo=self.plano_repo)
             result = dialog.exec()
             
             if result == QDialog.Accepted:
                 plano_para_editar = dialog.get_selected_plano_for_edit()
                 if plano_para_editar:
                     # Chamar a função de edição
-                    self._handle_edit_plano(plano_para_editar)
+                    self._handle_edit_plano(plano_para_editar, paciente_selecionado)
                 else:
                     # Isso não deveria acontecer se o diálogo foi aceito para edição
                     logging.warning("Diálogo ViewPlanos aceito, mas nenhum plano selecionado para edição.")
@@ -399,7 +467,7 @@ class MainController:
         """Abre o diálogo de gerenciamento de alimentos."""
         logging.info("Ação: Gerenciar Alimentos")
         try:
-            dialog = AlimentoDialog(parent=self.view)
+            dialog = AlimentoDialog(parent=self.view, alimento_repo=self.alimento_repo, write_behind=self.write_behind)
             dialog.exec()
             # Atualizações feitas no diálogo de alimentos não refletem imediatamente
             # em diálogos de plano abertos. Considerar recarregar dados se necessário.
@@ -407,6 +475,86 @@ class MainController:
             logging.exception("Erro ao abrir gerenciador de alimentos:")
             QMessageBox.critical(self.view, "Erro Crítico", f"Não foi possível abrir o gerenciador de alimentos:\n{e}")
 
+    @Slot()
+    def _handle_export(self):
+        """Exporta um conjunto de dados em segundo plano (ver core/exporters.py)."""
+        logging.info("Ação: Exportar Dados")
+        if self._export_worker is not None:
+            QMessageBox.information(self.view, "Exportação", "Já existe uma exportação em andamento.")
+            return
+        titulos = {titulo: nome for nome, (titulo, _, _) in DATASETS.items()}
+        titulo, ok = QInputDialog.getItem(self.view, "Exportar Dados", "Dados a exportar:", list(titulos), 0, False)
+        if not ok:
+            return
+        path, _ = QFileDialog.getSaveFileName(self.view, "Exportar Dados", f"{titulos[titulo]}.csv",
+                                              "CSV (*.csv);;NDJSON (*.ndjson);;Excel (*.xlsx)")
+        if not path:
+            return
+
+        progress_dialog = QProgressDialog(f"Exportando {titulo.lower()}...", "Cancelar", 0, 1000, self.view)
+        progress_dialog.setWindowTitle("Exportar Dados")
+        progress_dialog.setMinimumDuration(500)
+        worker = ExportWorker(titulos[titulo], path)
+        # Conexões com a thread da GUI: os slots abaixo rodam no loop de eventos
+        worker.progress.connect(lambda feitas, total: progress_dialog.setValue(int(feitas * 1000 / total) if total else 1000))
+        progress_dialog.canceled.connect(worker.cancel)
+
+        def concluir(result):
+            progress_dialog.close()
+            self._export_worker = None
+            if result.cancelada:
+                self.view.set_status_message("Exportação cancelada.", 5000)
+            else:
+                self.view.set_status_message(f"{result.linhas} linha(s) exportada(s) para {result.caminho} em {result.segundos:.1f}s.", 8000)
+
+        def falhar(error):
+            progress_dialog.close()
+            self._export_worker = None
+            QMessageBox.critical(self.view, "Erro na Exportação", f"Não foi possível exportar os dados:\n{error}")
+
+        worker.finished.connect(concluir)
+        worker.failed.connect(falhar)
+        self._export_worker = worker
+        self.view.set_status_message(f"Exportando {titulo.lower()} para {path}...")
+        worker.start()
+
+    @Slot()
+    def _handle_backup(self):
+        """Pede um backup imediato; a cópia roda em segundo plano e o resultado vai para o log."""
+        logging.info("Ação: Fazer Backup Agora")
+        self.backup_scheduler.run_now()
+        self.view.set_status_message(f"Backup iniciado em segundo plano ({BACKUP_DIR}).", 5000)
+
+    @Slot()
+    def _handle_archive(self):
+        """Move avaliações e planos antigos para o arquivo de dados frios (ver core/archive.py)."""
+        logging.info("Ação: Arquivar Dados Antigos")
+        anos, ok = QInputDialog.getInt(self.view, "Arquivar Dados Antigos",
+                                       "Arquivar avaliações e planos com mais de quantos anos?\n"
+                                       "(a avaliação e o plano mais recentes de cada paciente são mantidos)",
+                                       ARCHIVE_AFTER_YEARS, 1, 100)
+        if not ok:
+            return
+        corte = cutoff_date(anos)
+        confirm = QMessageBox.question(self.view, "Confirmar Arquivamento",
+                                       f"Mover para o arquivo os registros anteriores a {corte}?\n"
+                                       "Eles continuam disponíveis nos históricos, marcando \"Incluir arquivadas\".",
+                                       QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if confirm != QMessageBox.Yes:
+            return
+        if self.write_behind:
+            self.write_behind.flush() # Nada pendente na fila durante a mudança
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            result = archive_old_records(cutoff=corte)
+        except Exception as e:
+            QMessageBox.critical(self.view, "Erro ao Arquivar", f"Não foi possível arquivar os dados antigos:\n{e}")
+            return
+        finally:
+            QApplication.restoreOverrideCursor()
+        self.view.set_status_message(f"{result.avaliacoes} avaliação(ões) e {result.planos} plano(s) arquivados "
+                                     f"em {result.segundos:.1f}s.", 8000)
+
     # --- Slots para Ajuda --- 
     @Slot()
     def _handle_about(self):
@@ -0,0 +1,75 @@
+# src/ui/controllers/write_behind.py
+
+import logging
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+from PySide6.QtCore import QObject, Signal, Slot
+
+# Tenta importar de forma relativa primeiro
+try:
+    from ...core.write_queue import WriteQueue
+except ImportError:
+    # Fallback
+    from src.core.write_queue import WriteQueue
+
+class WriteBehindController(QObject):
+    """Envia escritas dos repositórios para a WriteQueue e devolve os resultados via sinais Qt.
+
+    A fila conclui os Futures na thread escritora; este objeto vive na thread da GUI,
+    então os sinais emitidos de lá são entregues aqui pelo loop de eventos, e os
+    callbacks `on_done`/`on_error` rodam na thread da GUI, na ordem de envio.
+    """
+    # (sequência, resultado) / (sequência, exceção)
+    write_done = Signal(int, object)
+    write_failed = Signal(int, object)
+    # Escritas enviadas e ainda não concluídas
+    pending_changed = Signal(int)
+
+    def __init__(self, parent=None, write_queue: Optional[WriteQueue] = None):
+        super().__init__(parent)
+        self._callbacks: Dict[int, Tuple[Optional[Callable], Optional[Callable]]] = {}
+        self.queue = write_queue or WriteQueue(listener=self._relay)
+        if write_queue is not None:
+            write_queue.listener = self._relay
+        self.write_done.connect(self._dispatch_done)
+        self.write_failed.connect(self._dispatch_failed)
+
+    def submit(self, fn: Callable[..., Any], *args,
+               on_done: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[BaseException], None]] = None, **kwargs) -> Future:
+        """Enfileira `fn(*args, **kwargs)`; `on_done(resultado)` ou `on_error(exceção)` rodam na GUI."""
+        future = self.queue.submit(fn, *args, **kwargs)
+        self._callbacks[future.sequence] = (on_done, on_error)
+        self.pending_changed.emit(len(self._callbacks))
+        return future
+
+    def flush(self, timeout: Optional[float] = None):
+        self.queue.flush(timeout)
+
+    def close(self, timeout: Optional[float] = None):
+        """Grava as escritas pendentes (chamado ao encerrar a aplicação)."""
+        self.queue.close(timeout)
+
+    def _relay(self, future: Future):
+        # Thread escritora: apenas emite; a conexão com os slots é enfileirada pelo Qt
+        if future.cancelled():
+            return
+        if future.exception() is None:
+            self.write_done.emit(future.sequence, future.result())
+        else:
+            self.write_failed.emit(future.sequence, future.exception())
+
+    @Slot(int, object)
+    def _dispatch_done(self, sequence: int, result: Any):
+        on_done, _ = self._callbacks.pop(sequence, (None, None))
+        self.pending_changed.emit(len(self._callbacks))
+        if on_done:
+            on_done(result)
+
+    @Slot(int, object)
+    def _dispatch_failed(self, sequence: int, error: BaseException):
+        _, on_error = self._callbacks.pop(sequence, (None, None))
+        self.pending_changed.emit(len(self._callbacks))
+        logging.error(f"Escrita #{sequence} em segundo plano falhou: {error}")
+        if on_error:
+            on_error(error)
@@ -1,9 +1,11 @@
 # src/ui/views/alimento_dialog.py
 
+import logging
 from PySide6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QTableView, QPushButton, 
     QAbstractItemView, QHeaderView, QMessageBox, QDialogButtonBox,
-    QLineEdit, QLabel, QSpacerItem, QSizePolicy
+    QLineEdit, QLabel, QSpacerItem, QSizePolicy, QFileDialog, QProgressDialog,
+    QApplication
 )
 from PySide6.QtCore import Slot, Qt
 from typing import Optional
@@ -13,6 +15,9 @@ try:
     from ..models.alimento_table_model import AlimentoTableModel # Criaremos este modelo
     from ...core.repositories import AlimentoRepository
     from ...core.models import Alimento
+    from ...core.importers import import_food_table
+    from ...core.json_importer import import_json
+    from ...core.services import recalcular_planos
     # Importar diálogo de cadastro/edição de alimento (a ser criado)
     from .cadastro_alimento_dialog import CadastroAlimentoDialog 
 except ImportError:
@@ -20,17 +25,26 @@ except ImportError:
     from src.ui.models.alimento_table_model import AlimentoTableModel
     from src.core.repositories import AlimentoRepository
     from src.core.models import Alimento
+    from src.core.importers import import_food_table
+    from src.core.json_importer import import_json
+    from src.core.services import recalcular_planos
     from src.ui.views.cadastro_alimento_dialog import CadastroAlimentoDialog
 
 class AlimentoDialog(QDialog):
     """Diálogo para gerenciar o banco de dados de alimentos."""
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, alimento_repo: Optional[AlimentoRepository] = None, write_behind=None):
         super().__init__(parent)
         self.setWindowTitle("Gerenciar Alimentos")
         self.setMinimumSize(700, 500)
 
         # --- Camada de Dados --- 
-        self.alimento_repo = AlimentoRepository()
+        # Reutiliza o repositório do controller quando fornecido
+        self.alimento_repo = alimento_repo or AlimentoRepository()
+        # Modo write-behind (WriteBehindController): inclusões/edições são gravadas em
+        # segundo plano e a tabela é recarregada quando o lote é gravado
+        self.write_behind = write_behind
+        # Marcado em done(): escritas concluídas depois do fechamento não tocam nos widgets
+        self._closed = False
         self.table_model = AlimentoTableModel()
 
         # --- Widgets --- 
@@ -44,6 +58,7 @@ class AlimentoDialog(QDialog):
         self.add_button = QPushButton("&Adicionar Novo")
         self.edit_button = QPushButton("&Editar Selecionado")
         self.delete_button = QPushButton("E&xcluir Selecionado")
+        self.import_button = QPushButton("&Importar Tabela...")
         self.close_button = QPushButton("&Fechar")
 
         # --- Layout --- 
@@ -63,6 +78,7 @@ class AlimentoDialog(QDialog):
         button_layout.addWidget(self.add_button)
         button_layout.addWidget(self.edit_button)
         button_layout.addWidget(self.delete_button)
+        button_layout.addWidget(self.import_button)
         button_layout.addSpacerItem(QSpacerItem(40, 20, QSizePolicy.Expanding, QSizePolicy.Minimum))
         button_layout.addWidget(self.close_button)
         layout.addLayout(button_layout)
@@ -72,6 +88,7 @@ class AlimentoDialog(QDialog):
         self.add_button.clicked.connect(self._handle_add)
         self.edit_button.clicked.connect(self._handle_edit)
         self.delete_button.clicked.connect(self._handle_delete)
+        self.import_button.clicked.connect(self._handle_import)
         self.close_button.clicked.connect(self.accept) # Fecha o diálogo
         self.alimentos_table_view.doubleClicked.connect(self._handle_edit) # Duplo clique para editar
         self.alimentos_table_view.selectionModel().selectionChanged.connect(self._update_button_states)
@@ -142,6 +159,11 @@ class AlimentoDialog(QDialog):
         if dialog.exec() == QDialog.Accepted:
             novo_alimento_data = dialog.get_data()
             alimento = Alimento(**novo_alimento_data)
+            if self.write_behind:
+                self.write_behind.submit(self.alimento_repo.add, alimento,
+                                         on_done=lambda alimento_id: self._on_background_write(alimento_id, "adicionar"),
+                                         on_error=self._on_background_error)
+                return
             try:
                 alimento_id = self.alimento_repo.add(alimento)
                 if alimento_id:
@@ -164,9 +186,15 @@ class AlimentoDialog(QDialog):
         if dialog.exec() == QDialog.Accepted:
             dados_atualizados = dialog.get_data()
             alimento_atualizado = Alimento(id=alimento_selecionado.id, **dados_atualizados)
+            if self.write_behind:
+                self.write_behind.submit(self.alimento_repo.update, alimento_atualizado,
+                                         on_done=lambda ok: self._on_background_write(ok, "atualizar", alimento_atualizado.id),
+                                         on_error=self._on_background_error)
+                return
             try:
                 if self.alimento_repo.update(alimento_atualizado):
                     self._load_alimentos(self.search_edit.text().strip()) # Recarrega com filtro atual
+                    self._recalcular_planos(alimento_atualizado.id)
                     QMessageBox.information(self, "Sucesso", "Alimento atualizado com sucesso!")
                 else:
                     QMessageBox.warning(self, "Erro", "Não foi possível atualizar o alimento (verifique se o nome já existe).")
@@ -195,6 +223,80 @@ class AlimentoDialog(QDialog):
             except Exception as e:
                  QMessageBox.critical(self, "Erro Crítico", f"Erro ao excluir alimento:\n{e}")
 
+    @Slot()
+    def _handle_import(self):
+        """Importa uma tabela de composição (TACO/IBGE em CSV/XLSX ou JSON/NDJSON) com barra de progresso."""
+        path, _ = QFileDialog.getOpenFileName(self, "Importar Tabela de Alimentos", "",
+                                              "Tabelas (*.csv *.xlsx *.xls *.json *.ndjson *.jsonl);;Todos os arquivos (*)")
+        if not path:
+            return
+
+        progress_dialog = QProgressDialog("Importando alimentos...", None, 0, 0, self)
+        progress_dialog.setWindowTitle("Importar Tabela")
+        progress_dialog.setWindowModality(Qt.WindowModal)
+        progress_dialog.setMinimumDuration(0)
+
+        def on_progress(feito: int, total: int):
+            # Em milésimos: no JSON o progresso é em bytes e pode passar do limite de um int do Qt
+            progress_dialog.setMaximum(1000)
+            progress_dialog.setValue(int(feito * 1000 / total) if total else 0)
+            QApplication.processEvents()
+
+        importar = import_json if path.lower().endswith((".json", ".ndjson", ".jsonl")) else import_food_table
+        try:
+            result = importar(path, repo=self.alimento_repo, progress=on_progress)
+        except Exception as e:
+            QMessageBox.critical(self, "Erro na Importação", f"Não foi possível importar a tabela:\n{e}")
+            return
+        finally:
+            progress_dialog.close()
+
+        self._load_alimentos(self.search_edit.text().strip())
+        mensagem = f"{result.gravados} alimento(s) importado(s) em {result.segundos:.1f}s."
+        recalculo = self._recalcular_planos() if result.gravados else None
+        if recalculo and recalculo.atualizados:
+            mensagem += f"\n{recalculo.atualizados} item(ns) de planos alimentares recalculado(s)."
+        if result.rejeitados:
+            exemplos = "\n".join(f"Linha {linha} ({nome or '-'}): {motivo}" for linha, nome, motivo in result.rejeitados[:10])
+            mensagem += f"\n\n{result.n_rejeitados} registro(s) rejeitado(s):\n{exemplos}"
+        QMessageBox.information(self, "Importação Concluída", mensagem)
+
+    def _recalcular_planos(self, alimento_id: Optional[int] = None):
+        """Atualiza os nutrientes gravados nos planos após importar (todos) ou corrigir um alimento."""
+        try:
+            return recalcular_planos(alimento_id=alimento_id)
+        except Exception as e:
+            QMessageBox.warning(self, "Atenção", f"Os alimentos foram gravados, mas os nutrientes dos planos não foram recalculados:\n{e}")
+            return None
+
+    def done(self, result: int):
+        self._closed = True
+        super().done(result)
+
+    def _on_background_write(self, result, acao: str, alimento_id: Optional[int] = None):
+        """Conclusão de uma escrita em segundo plano (thread da GUI)."""
+        if self._closed:
+            # Diálogo já fechado (talvez destruído): só o recálculo dos planos, sem widgets
+            if result and alimento_id is not None:
+                try:
+                    recalcular_planos(alimento_id=alimento_id)
+                except Exception:
+                    logging.exception(f"Erro ao recalcular os planos após atualizar o alimento ID {alimento_id}:")
+            elif not result:
+                logging.warning(f"Não foi possível {acao} o alimento (gravação concluída após fechar o diálogo).")
+            return
+        if result:
+            self._load_alimentos(self.search_edit.text().strip())
+            if alimento_id is not None:
+                self._recalcular_planos(alimento_id)
+        else:
+            QMessageBox.warning(self, "Erro", f"Não foi possível {acao} o alimento (verifique se o nome já existe).")
+
+    def _on_background_error(self, error: BaseException):
+        if self._closed:
+            return # O WriteBehindController já registrou a falha no log
+        QMessageBox.critical(self, "Erro Crítico", f"Erro ao gravar alimento:\n{error}")
+
 # Bloco para testar o diálogo isoladamente
 if __name__ == "__main__":
     import sys
@@ -22,7 +22,7 @@ except ImportError:
 
 class AlimentoSearchDialog(QDialog):
     """Diálogo para buscar e selecionar um alimento, e definir quantidade/unidade."""
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, alimento_repo: Optional[AlimentoRepository] = None):
         super().__init__(parent)
         self.setWindowTitle("Buscar e Adicionar Alimento")
         self.setMinimumSize(650, 450)
@@ -32,7 +32,8 @@ class AlimentoSearchDialog(QDialog):
         self.unidade: str = ""
 
         # --- Camada de Dados --- 
-        self.alimento_repo = AlimentoRepository()
+        # Reutiliza o repositório de quem abriu o diálogo quando fornecido
+        self.alimento_repo = alimento_repo or AlimentoRepository()
         self.table_model = AlimentoTableModel() # Reutiliza o modelo de exibição
 
         # --- Widgets --- 
@@ -201,7 +202,7 @@ if __name__ == "__main__":
     # Inicializar DB se possível para ter dados reais
     try:
         # Adiciona src ao path para importar database
-        src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), \"..\", \"..\"))
+        src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
         sys.path.insert(0, src_path)
         from src.core import database
         database.initialize_database()
@@ -50,6 +50,9 @@ class MainWindow(QMainWindow):
         self.quit_action.setShortcut(QKeySequence.Quit) # Ctrl+Q
         self.quit_action.setStatusTip("Fechar a aplicação")
 
+        self.export_action = QAction("E&xportar Dados...", self)
+        self.export_action.setStatusTip("Exportar pacientes, avaliações ou planos para CSV, NDJSON ou XLSX")
+
         # Ações de Paciente
         self.new_paciente_action = QAction(QIcon(f"{icon_path}add_user.png"), "&Novo Paciente...", self)
         self.new_paciente_action.setShortcut("Ctrl+N")
@@ -87,6 +90,12 @@ class MainWindow(QMainWindow):
         self.manage_alimentos_action = QAction(QIcon(f"{icon_path}manage_food.png"), "Gerenciar &Alimentos...", self)
         self.manage_alimentos_action.setStatusTip("Abrir o banco de dados de alimentos")
 
+        self.backup_action = QAction("Fazer &Backup Agora", self)
+        self.backup_action.setStatusTip("Gravar uma cópia verificada do banco de dados na pasta de backups")
+
+        self.archive_action = QAction("A&rquivar Dados Antigos...", self)
+        self.archive_action.setStatusTip("Mover avaliações e planos antigos para o arquivo de dados frios")
+
         # Ações de Ajuda
         self.about_action = QAction("&Sobre...", self)
         self.about_action.setStatusTip("Mostrar informações sobre a aplicação")
@@ -97,6 +106,8 @@ class MainWindow(QMainWindow):
 
         # Menu Arquivo
         file_menu = menu_bar.addMenu("&Arquivo")
+        file_menu.addAction(self.export_action)
+        file_menu.addSeparator()
         file_menu.addAction(self.quit_action)
 
         # Menu Pacientes
@@ -114,6 +125,8 @@ class MainWindow(QMainWindow):
         # Menu Ferramentas (Adicionado)
         tools_menu = menu_bar.addMenu("&Ferramentas")
         tools_menu.addAction(self.manage_alimentos_action)
+        tools_menu.addAction(self.backup_action)
+        tools_menu.addAction(self.archive_action)
         # Adicionar outras ferramentas (Configurações, Backup, etc.) aqui
 
         # Menu Ajuda
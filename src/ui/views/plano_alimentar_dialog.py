@@ -10,33 +10,40 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import QDateTime, Slot, Qt, QModelIndex
 from typing import Optional, Dict, Any, List
 import logging # Adicionar logging
+import dataclasses
 
 # Tenta importar de forma relativa primeiro
 try:
     from ...core.models import PlanoAlimentar, Paciente, ItemPlanoAlimentar, Alimento
     from ...core.repositories import ItemPlanoAlimentarRepository, AlimentoRepository # Repos necessários
+    from ...core.services import NutrientesPlano, calcular_nutrientes_plano, calcular_nutrientes_itens
     from ..models.item_plano_table_model import ItemPlanoTableModel
     from .alimento_search_dialog import AlimentoSearchDialog
 except ImportError:
     # Fallback
     from src.core.models import PlanoAlimentar, Paciente, ItemPlanoAlimentar, Alimento
     from src.core.repositories import ItemPlanoAlimentarRepository, AlimentoRepository
+    from src.core.services import NutrientesPlano, calcular_nutrientes_plano, calcular_nutrientes_itens
     from src.ui.models.item_plano_table_model import ItemPlanoTableModel
     from src.ui.views.alimento_search_dialog import AlimentoSearchDialog
 
 class PlanoAlimentarDialog(QDialog):
     """Diálogo para criar ou editar um plano alimentar."""
-    def __init__(self, paciente: Paciente, plano: Optional[PlanoAlimentar] = None, parent=None):
+    def __init__(self, paciente: Paciente, plano: Optional[PlanoAlimentar] = None, parent=None,
+                 item_repo: Optional[ItemPlanoAlimentarRepository] = None,
+                 alimento_repo: Optional[AlimentoRepository] = None):
         super().__init__(parent)
         self.paciente = paciente
         self.plano = plano
         self.is_editing = plano is not None
         self.items_do_plano: list[ItemPlanoAlimentar] = []
+        # Cópia dos itens como estão no banco, para gravar só a diferença ao salvar
+        self.itens_originais: list[ItemPlanoAlimentar] = []
 
-        # Repositórios necessários
+        # Repositórios necessários (reutiliza os do controller quando fornecidos)
         try:
-            self.item_repo = ItemPlanoAlimentarRepository()
-            self.alimento_repo = AlimentoRepository()
+            self.item_repo = item_repo or ItemPlanoAlimentarRepository()
+            self.alimento_repo = alimento_repo or AlimentoRepository()
         except Exception as e:
             logging.exception("Erro ao instanciar repositórios no PlanoAlimentarDialog")
             QMessageBox.critical(self, "Erro Crítico", f"Não foi possível inicializar os repositórios necessários:\n{e}")
@@ -193,7 +200,7 @@ class PlanoAlimentarDialog(QDialog):
         self.nome_plano_edit.setText(self.plano.nome_plano or "")
         self.objetivo_edit.setText(self.plano.objetivo or "")
         self.meta_kcal_spinbox.setValue(self.plano.meta_kcal or 0.0)
-        self.observacoes_plano_edit.setText(self.plano.observacoes or "")
+        self.observacoes_plano_edit.setText(self.plano.observacoes_gerais or "")
         try:
             # Tentar converter de ISO 8601 (formato do SQLite)
             dt_obj = QDateTime.fromString(self.plano.data_criacao or "", Qt.ISODate)
@@ -208,23 +215,19 @@ class PlanoAlimentarDialog(QDialog):
         if self.is_editing and self.plano and self.plano.id is not None:
             logging.info(f"Carregando itens para o plano ID: {self.plano.id}")
             try:
-                self.items_do_plano = self.item_repo.get_by_plano_id(self.plano.id)
+                # Uma única consulta: itens com os dados nutricionais dos seus alimentos
+                itens_com_alimentos = self.item_repo.get_by_plano_id_with_alimentos(self.plano.id)
+                self.items_do_plano = [item for item, _ in itens_com_alimentos]
+                # Os itens da tabela são alterados no lugar (edição de quantidade), então guarda cópias
+                self.itens_originais = [dataclasses.replace(item) for item in self.items_do_plano]
                 logging.info(f"{len(self.items_do_plano)} itens encontrados no banco.")
-                # Precisamos dos dados do alimento para calcular/exibir
-                for item in self.items_do_plano:
-                    alimento = self.alimento_repo.get_by_id(item.alimento_id)
-                    if alimento:
-                        item.nome_alimento = alimento.nome # Garante que nome está atualizado
-                        # Calcular nutrientes ao carregar
-                        self._calculate_item_nutrients(item, alimento)
-                    else:
+                # Nome do alimento já vem do JOIN; nutrientes recalculados de uma vez (alimento inexistente vale 0)
+                calculo = calcular_nutrientes_itens(self.items_do_plano, [alimento for _, alimento in itens_com_alimentos])
+                encontrados = self._apply_nutrients(self.items_do_plano, calculo)
+                for item, encontrado in zip(self.items_do_plano, encontrados):
+                    if not encontrado:
                         logging.warning(f"Alimento ID {item.alimento_id} não encontrado para o item {item.id}. O item será exibido com aviso.")
                         item.nome_alimento = f"<Alimento ID {item.alimento_id} não encontrado>"
-                        # Zerar nutrientes calculados se alimento não existe?
-                        item.kcal_calculado = 0
-                        item.cho_calculado = 0
-                        item.ptn_calculado = 0
-                        item.lip_calculado = 0
                 
                 self.item_table_model.setData(self.items_do_plano)
                 logging.info("Modelo da tabela de itens atualizado.")
@@ -234,6 +237,7 @@ class PlanoAlimentarDialog(QDialog):
         else:
             logging.info("Nenhum item para carregar (novo plano ou ID inválido).")
             self.items_do_plano = []
+            self.itens_originais = []
             self.item_table_model.setData(self.items_do_plano)
 
     @Slot()
@@ -253,7 +257,7 @@ class PlanoAlimentarDialog(QDialog):
             return
 
         logging.info("Abrindo diálogo de busca de alimentos.")
-        search_dialog = AlimentoSearchDialog(parent=self)
+        search_dialog = AlimentoSearchDialog(parent=self, alimento_repo=self.alimento_repo)
         if search_dialog.exec() == QDialog.Accepted:
             selection = search_dialog.get_selection()
             if selection:
@@ -272,7 +276,7 @@ class PlanoAlimentarDialog(QDialog):
                 )
                 
                 # Calcular nutrientes para o novo item
-                self._calculate_item_nutrients(novo_item, alimento_selecionado)
+                self._calculate_items_nutrients([novo_item])
                 
                 # Adicionar à lista e atualizar tabela
                 # Usar insertRow do modelo para notificação correta
@@ -284,49 +288,23 @@ class PlanoAlimentarDialog(QDialog):
         else:
             logging.info("Busca de alimento cancelada.")
 
-    def _calculate_item_nutrients(self, item: ItemPlanoAlimentar, alimento: Alimento):
-        """Calcula os nutrientes de um item do plano baseado no alimento e quantidade.
-           ATENÇÃO: A conversão de unidades NÃO está implementada.
+    def _calculate_items_nutrients(self, itens: List[ItemPlanoAlimentar]) -> List[bool]:
+        """Calcula os nutrientes dos itens (todos de uma vez) com o motor de core/services.py.
+
+        Retorna, para cada item, se o alimento foi encontrado.
         """
-        # Validação básica
-        if not alimento or item.quantidade is None:
-            item.kcal_calculado = 0
-            item.cho_calculado = 0
-            item.ptn_calculado = 0
-            item.lip_calculado = 0
-            return
-            
-        # Simplificação: Assume que a unidade do item é a unidade padrão do alimento
-        alimento_unidade_padrao = (alimento.unidade_padrao or "").strip().lower()
-        item_unidade = (item.unidade_medida or "").strip().lower()
-        
-        fator = item.quantidade
-        
-        # Lógica de conversão (MUITO BÁSICA - EXEMPLO)
-        # Idealmente, usar uma biblioteca ou tabela de conversão robusta
-        if alimento_unidade_padrao == "g" and item_unidade == "kg":
-            fator *= 1000
-            logging.debug(f"Convertendo kg para g para {alimento.nome}")
-        elif alimento_unidade_padrao == "ml" and item_unidade == "l":
-            fator *= 1000
-            logging.debug(f"Convertendo l para ml para {alimento.nome}")
-        elif alimento_unidade_padrao != item_unidade and alimento_unidade_padrao and item_unidade:
-            # Se unidades diferentes e não for conversão simples conhecida, ZERAR e AVISAR?
-            # Ou tentar calcular mesmo assim e avisar?
-            logging.warning(f"Unidade do item ({item.unidade_medida}) diferente da padrão ({alimento.unidade_padrao}) para {alimento.nome}. Cálculo baseado na unidade padrão.")
-            # Poderia tentar buscar um fator de conversão em `alimento.observacoes`? Ex: "1 fatia = 30g"
-            # Por ora, calcula usando a unidade padrão do alimento
-            pass 
-            
-        # Calcular nutrientes
-        item.kcal_calculado = (alimento.kcal_por_unidade or 0) * fator
-        item.cho_calculado = (alimento.cho_por_unidade or 0) * fator
-        item.ptn_calculado = (alimento.ptn_por_unidade or 0) * fator
-        item.lip_calculado = (alimento.lip_por_unidade or 0) * fator
-        # Adicionar outros nutrientes (fibras, sódio) se existirem no modelo Alimento
-        # item.fibras_calculado = (alimento.fibras_por_unidade or 0) * fator
-        # item.sodio_calculado = (alimento.sodio_mg_por_unidade or 0) * fator
-        logging.debug(f"Nutrientes calculados para {item.nome_alimento}: Kcal={item.kcal_calculado:.1f}")
+        if not itens:
+            return []
+        calculo = calcular_nutrientes_plano([item.alimento_id for item in itens], [item.quantidade for item in itens],
+                                            [item.unidade_medida for item in itens])
+        return self._apply_nutrients(itens, calculo)
+
+    def _apply_nutrients(self, itens: List[ItemPlanoAlimentar], calculo: NutrientesPlano) -> List[bool]:
+        """Copia os valores calculados para os itens; retorna se o alimento de cada um foi encontrado."""
+        for item, (kcal, cho, ptn, lip) in zip(itens, calculo.itens.tolist()):
+            item.kcal_calculado, item.cho_calculado, item.ptn_calculado, item.lip_calculado = kcal, cho, ptn, lip
+        logging.debug(f"Nutrientes calculados para {len(itens)} item(ns): Kcal={calculo.total[0]:.1f}")
+        return calculo.encontrados.tolist()
 
     def _get_selected_item_index(self) -> Optional[QModelIndex]:
         """Retorna o QModelIndex do item selecionado na tabela."""
@@ -378,9 +356,7 @@ class PlanoAlimentarDialog(QDialog):
                 item_selecionado.unidade_medida = nova_unidade.strip()
                 
                 # Recalcular nutrientes
-                alimento = self.alimento_repo.get_by_id(item_selecionado.alimento_id)
-                if alimento:
-                    self._calculate_item_nutrients(item_selecionado, alimento)
+                if self._calculate_items_nutrients([item_selecionado])[0]:
                     # Notificar a view que os dados mudaram para esta linha
                     # Usar updateRow do modelo para simplificar
                     self.item_table_model.updateRow(selected_index.row(), item_selecionado)
@@ -454,7 +430,7 @@ class PlanoAlimentarDialog(QDialog):
             "nome_plano": self.nome_plano_edit.text().strip(),
             "objetivo": self.objetivo_edit.text().strip() or None,
             "meta_kcal": meta_kcal if meta_kcal > 1e-6 else None,
-            "observacoes": self.observacoes_plano_edit.toPlainText().strip() or None,
+            "observacoes_gerais": self.observacoes_plano_edit.toPlainText().strip() or None,
         }
 
     def get_itens_data(self) -> List[ItemPlanoAlimentar]:
@@ -462,6 +438,10 @@ class PlanoAlimentarDialog(QDialog):
         # Retorna a lista de dados que está no modelo
         return self.item_table_model._data
 
+    def get_itens_originais(self) -> List[ItemPlanoAlimentar]:
+        """Retorna os itens como foram carregados do banco (antes das edições)."""
+        return self.itens_originais
+
     @Slot()
     def accept(self):
         """Valida os dados antes de aceitar o diálogo."""
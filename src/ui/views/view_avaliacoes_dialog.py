@@ -2,9 +2,10 @@
 
 from PySide6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QTableView, QPushButton, 
-    QDialogButtonBox, QMessageBox, QLabel, QAbstractItemView, QHeaderView
+    QDialogButtonBox, QMessageBox, QLabel, QAbstractItemView, QHeaderView, QCheckBox
 )
 from PySide6.QtCore import Slot, Qt, QDateTime, QAbstractTableModel, QModelIndex
+from PySide6.QtGui import QBrush, QColor
 from typing import List, Optional, Any
 import logging
 
@@ -68,6 +69,12 @@ class AvaliacaoTableModel(QAbstractTableModel):
                 return Qt.AlignRight | Qt.AlignVCenter
             return Qt.AlignLeft | Qt.AlignVCenter
 
+        elif role == Qt.ForegroundRole and aval.arquivada:
+            return QBrush(QColor("gray")) # Avaliações do arquivo de dados frios
+
+        elif role == Qt.ToolTipRole and aval.arquivada:
+            return "Avaliação arquivada (somente leitura)"
+
         return None
 
     def headerData(self, section: int, orientation: Qt.Orientation, role=Qt.DisplayRole) -> Any:
@@ -89,10 +96,10 @@ class AvaliacaoTableModel(QAbstractTableModel):
 # --- Diálogo de Visualização --- 
 class ViewAvaliacoesDialog(QDialog):
     """Diálogo para visualizar o histórico de avaliações de um paciente."""
-    def __init__(self, paciente: Paciente, parent=None):
+    def __init__(self, paciente: Paciente, parent=None, avaliacao_repo: Optional[AvaliacaoRepository] = None):
         super().__init__(parent)
         self.paciente = paciente
-        self.avaliacao_repo = AvaliacaoRepository()
+        self.avaliacao_repo = avaliacao_repo or AvaliacaoRepository()
         self.avaliacoes: List[Avaliacao] = []
 
         self.setWindowTitle(f"Histórico de Avaliações - {self.paciente.nome_completo}")
@@ -119,15 +126,20 @@ class ViewAvaliacoesDialog(QDialog):
         button_box = QDialogButtonBox(QDialogButtonBox.Close)
         button_box.button(QDialogButtonBox.Close).setText("Fechar")
 
+        # Avaliações antigas movidas para o arquivo de dados frios (ver core/archive.py)
+        self.incluir_arquivadas_checkbox = QCheckBox("Incluir avaliações arquivadas")
+
         # --- Layout --- 
         main_layout = QVBoxLayout(self)
         main_layout.addWidget(QLabel(f"<b>Histórico de Avaliações para:</b> {self.paciente.nome_completo}"))
         main_layout.addWidget(self.table_view)
+        main_layout.addWidget(self.incluir_arquivadas_checkbox)
         main_layout.addWidget(button_box)
         # main_layout.addLayout(button_layout)
 
         # --- Conexões --- 
         button_box.rejected.connect(self.reject)
+        self.incluir_arquivadas_checkbox.toggled.connect(self._load_data)
         # self.close_button.clicked.connect(self.reject)
         # self.edit_button.clicked.connect(self._handle_edit)
         # self.delete_button.clicked.connect(self._handle_delete)
@@ -149,10 +161,12 @@ class ViewAvaliacoesDialog(QDialog):
         self.table_view.setSortingEnabled(True)
         self.table_view.sortByColumn(0, Qt.DescendingOrder) # Ordenar por data mais recente
 
+    @Slot()
     def _load_data(self):
         logging.info(f"Carregando avaliações para paciente ID {self.paciente.id}")
         try:
-            self.avaliacoes = self.avaliacao_repo.get_by_paciente_id(self.paciente.id)
+            self.avaliacoes = self.avaliacao_repo.get_by_paciente_id(
+                self.paciente.id, incluir_arquivadas=self.incluir_arquivadas_checkbox.isChecked())
             self.table_model.setData(self.avaliacoes)
             logging.info(f"{len(self.avaliacoes)} avaliações carregadas.")
             if not self.avaliacoes:
@@ -75,10 +75,10 @@ class PlanoAlimentarTableModel(QAbstractTableModel):
 # --- Diálogo de Visualização --- 
 class ViewPlanosDialog(QDialog):
     """Diálogo para visualizar e gerenciar os planos alimentares de um paciente."""
-    def __init__(self, paciente: Paciente, parent=None):
+    def __init__(self, paciente: Paciente, parent=None, plano_repo: Optional[PlanoAlimentarRepository] = None):
         super().__init__(parent)
         self.paciente = paciente
-        self.plano_repo = PlanoAlimentarRepository()
+        self.plano_repo = plano_repo or PlanoAlimentarRepository()
         self.planos: List[PlanoAlimentar] = []
         self.selected_plano: Optional[PlanoAlimentar] = None # Para retornar qual editar/excluir
 
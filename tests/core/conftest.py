@@ -0,0 +1,108 @@
+# tests/core/conftest.py
+
+import pytest
+import datetime
+import itertools
+import os
+import sqlite3
+import sys
+
+# Adiciona o diretório src ao sys.path
+src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, src_path)
+
+from src.core import database
+from src.core.migrations import migrate
+from src.core.models import Paciente, Alimento, PlanoAlimentar
+from src.core.repositories import PacienteRepository, AlimentoRepository, PlanoAlimentarRepository
+
+# Banco de testes em memória: as migrações rodam uma única vez por sessão num
+# banco-modelo, e cada teste recebe uma cópia nova dele, feita pela API de backup
+# do SQLite num banco em memória com nome próprio. Nada é lido ou gravado em data/.
+# Bancos em memória pertencem ao processo, e o nome inclui o worker do pytest-xdist:
+# execuções paralelas (pytest -n N) nunca compartilham um banco.
+# seeded_db faz o mesmo a partir de um segundo modelo, que também já traz as linhas
+# de base usadas pelos testes dos repositórios (um paciente, um alimento e um plano),
+# gravadas uma única vez por sessão.
+
+WORKER = os.environ.get("PYTEST_XDIST_WORKER", "main")
+_sequencia = itertools.count(1)
+
+@pytest.fixture(scope="session")
+def template_db():
+    """Banco-modelo em memória com o esquema migrado (criado uma vez por sessão/worker)."""
+    conn = database.create_connection(":memory:")
+    migrate(conn)
+    yield conn
+    database.close_connection(conn)
+
+def _clone_uri(modelo: sqlite3.Connection):
+    """Copia o modelo para um banco em memória com nome próprio; retorna (uri, conexão que o mantém)."""
+    uri = f"file:nutriapp-{WORKER}-{next(_sequencia)}?mode=memory&cache=shared"
+    keeper = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    modelo.backup(keeper)
+    return uri, keeper
+
+@pytest.fixture(scope="session")
+def seeded_template(template_db):
+    """Banco-modelo com o esquema e as linhas de base, e os ids dessas linhas: (conexão, ids)."""
+    uri, keeper = _clone_uri(template_db)
+    with database.use_database(uri):
+        paciente_id = PacienteRepository().add(Paciente(
+            nome_completo="Paciente Teste Base", data_nascimento="1988-03-10", email="paciente.base@teste.com"))
+        alimento_id = AlimentoRepository().add(Alimento(
+            nome="Maçã Fuji", grupo="Frutas", unidade_padrao="g", kcal_por_unidade=52, cho_por_unidade=14,
+            ptn_por_unidade=0.3, lip_por_unidade=0.2, fonte_dados="TACO"))
+        plano_id = PlanoAlimentarRepository().add(PlanoAlimentar(
+            paciente_id=paciente_id, nome_plano="Plano Teste Inicial", objetivo="Manutenção",
+            data_criacao=datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+    conn = database.create_connection(":memory:")
+    keeper.backup(conn)
+    keeper.close()
+    yield conn, {"paciente": paciente_id, "alimento": alimento_id, "plano": plano_id}
+    database.close_connection(conn)
+
+@pytest.fixture
+def memory_db(template_db):
+    """Troca o banco padrão (get_pool, get_database_path) por uma cópia do modelo durante o teste.
+
+    Retorna a URI do banco; ele existe enquanto a conexão mantida aqui estiver aberta.
+    """
+    uri, keeper = _clone_uri(template_db)
+    with database.use_database(uri):
+        yield uri
+    keeper.close()
+
+@pytest.fixture
+def seeded_db(seeded_template):
+    """Como memory_db, mas a partir do modelo com as linhas de base; retorna os ids delas."""
+    modelo, ids = seeded_template
+    uri, keeper = _clone_uri(modelo)
+    with database.use_database(uri):
+        yield ids
+    keeper.close()
+
+# Os testes que precisam de um arquivo de verdade (backup, banco de arquivo morto,
+# várias threads no mesmo banco) usam file_pool: um ConnectionPool sobre um banco
+# novo em tmp_path, já migrado. As opções padrão servem à maioria; um módulo pode
+# trocá-las sobrescrevendo file_pool_options, e um teste, por parametrização
+# indireta: @pytest.mark.parametrize("file_pool", [{"max_size": 2}], indirect=True).
+
+FILE_POOL_DEFAULTS = {"name": "nutri.db", "max_size": 3, "timeout": 1.0, "migrate": True}
+
+@pytest.fixture
+def file_pool_options():
+    """Opções do file_pool para o módulo (sobrescreva para mudar os padrões)."""
+    return {}
+
+@pytest.fixture
+def file_pool(request, tmp_path, file_pool_options):
+    """ConnectionPool sobre um banco em arquivo novo em tmp_path, migrado salvo migrate=False."""
+    opcoes = {**FILE_POOL_DEFAULTS, **file_pool_options, **getattr(request, "param", {})}
+    pool = database.ConnectionPool(
+        database_path=str(tmp_path / opcoes["name"]), max_size=opcoes["max_size"], timeout=opcoes["timeout"])
+    if opcoes["migrate"]:
+        with pool.connection() as conn:
+            migrate(conn)
+    yield pool
+    pool.close_all()
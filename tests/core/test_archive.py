@@ -0,0 +1,116 @@
+# tests/core/test_archive.py
+
+import pytest
+import os
+import sqlite3
+import sys
+
+# Adiciona o diretório src ao sys.path
+src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, src_path)
+
+from src.core import archive
+from src.core.repositories import (PacienteRepository, AvaliacaoRepository, AlimentoRepository,
+                                   PlanoAlimentarRepository, ItemPlanoAlimentarRepository)
+from src.core.models import Paciente, Avaliacao, Alimento, PlanoAlimentar, ItemPlanoAlimentar
+
+CORTE = "2022-01-01"
+
+@pytest.fixture
+def paciente_id(file_pool):
+    """Paciente com avaliações e planos de 2019, 2020 e 2024 (dois itens por plano)."""
+    paciente_id = PacienteRepository(file_pool).add(Paciente(nome_completo="Ana", data_nascimento="1990-01-01"))
+    alimento_id = AlimentoRepository(file_pool).add(Alimento(nome="Arroz", kcal_por_unidade=1.3))
+    avaliacoes, planos, itens = AvaliacaoRepository(file_pool), PlanoAlimentarRepository(file_pool), ItemPlanoAlimentarRepository(file_pool)
+    for ano in (2019, 2020, 2024):
+        avaliacoes.add(Avaliacao(paciente_id=paciente_id, data_avaliacao=f"{ano}-03-01 10:00:00", peso=70.0 + ano % 10))
+        plano_id = planos.add(PlanoAlimentar(paciente_id=paciente_id, nome_plano=f"Plano {ano}"))
+        file_pool.acquire().execute("UPDATE planos_alimentares SET data_criacao = ? WHERE id = ?", (f"{ano}-03-01 10:00:00", plano_id))
+        file_pool.acquire().commit()
+        itens.add_batch([ItemPlanoAlimentar(plano_alimentar_id=plano_id, alimento_id=alimento_id, refeicao=r, quantidade=100, unidade_medida="g")
+                         for r in ("Almoço", "Jantar")])
+    return paciente_id
+
+def contar(conn, tabela):
+    return conn.execute(f"SELECT COUNT(*) AS n FROM {tabela}").fetchone()["n"]
+
+def test_archive_path_next_to_database():
+    assert archive.archive_path_for(os.path.join("data", "nutricional.db")) == os.path.join("data", "nutricional_arquivo.db")
+    assert archive.archive_path_for(":memory:") is None
+
+def test_cutoff_date_handles_leap_day():
+    from datetime import date
+    assert archive.cutoff_date(3, today=date(2024, 2, 29)) == "2021-02-28"
+    assert archive.cutoff_date(2, today=date(2026, 10, 17)) == "2024-10-17"
+
+def test_moves_old_records_and_keeps_latest(file_pool, paciente_id):
+    result = archive.archive_old_records(file_pool, cutoff=CORTE, batch_size=1)
+    assert (result.avaliacoes, result.planos, result.itens) == (2, 2, 4)
+    conn = file_pool.acquire()
+    assert contar(conn, "avaliacoes") == 1
+    assert contar(conn, "planos_alimentares") == 1
+    assert contar(conn, "itens_plano_alimentar") == 2
+    assert not archive.is_attached(conn) # Anexado só durante a operação
+    with sqlite3.connect(result.caminho) as arquivo:
+        assert arquivo.execute("SELECT COUNT(*) FROM avaliacoes").fetchone()[0] == 2
+        assert arquivo.execute("SELECT COUNT(*) FROM itens_plano_alimentar").fetchone()[0] == 4
+    # Rodar de novo não move mais nada: o registro mais recente de cada paciente fica
+    assert archive.archive_old_records(file_pool, cutoff="2030-01-01").avaliacoes == 0
+
+def test_repositories_include_archived_on_demand(file_pool, paciente_id):
+    archive.archive_old_records(file_pool, cutoff=CORTE)
+    avaliacoes = AvaliacaoRepository(file_pool)
+    assert [a.data_avaliacao[:4] for a in avaliacoes.get_by_paciente_id(paciente_id)] == ["2024"]
+    todas = avaliacoes.get_by_paciente_id(paciente_id, incluir_arquivadas=True)
+    assert [a.data_avaliacao[:4] for a in todas] == ["2024", "2020", "2019"]
+    assert [a.arquivada for a in todas] == [False, True, True]
+
+    planos = PlanoAlimentarRepository(file_pool).get_by_paciente_id(paciente_id, incluir_arquivados=True)
+    assert [p.nome_plano for p in planos] == ["Plano 2024", "Plano 2020", "Plano 2019"]
+    antigo = planos[-1]
+    itens = ItemPlanoAlimentarRepository(file_pool)
+    assert itens.get_by_plano_id(antigo.id) == []
+    assert [i.nome_alimento for i in itens.get_by_plano_id(antigo.id, incluir_arquivados=True)] == ["Arroz", "Arroz"]
+    assert not archive.is_attached(file_pool.acquire())
+
+def test_include_archived_without_archive_file(file_pool, paciente_id):
+    assert len(AvaliacaoRepository(file_pool).get_by_paciente_id(paciente_id, incluir_arquivadas=True)) == 3
+    assert not os.path.exists(archive.archive_path_for(file_pool.database_path))
+
+def test_interrupted_batch_prefers_main_copy(file_pool, paciente_id):
+    archive.archive_old_records(file_pool, cutoff=CORTE)
+    conn = file_pool.acquire()
+    with archive.attached_archive(conn, archive.archive_path_for(file_pool.database_path)):
+        # Simula um lote copiado para o arquivo mas ainda não apagado do banco principal
+        conn.execute("INSERT INTO arquivo.avaliacoes SELECT * FROM main.avaliacoes")
+        conn.commit()
+    todas = AvaliacaoRepository(file_pool).get_by_paciente_id(paciente_id, incluir_arquivadas=True)
+    assert len(todas) == 3
+    assert not todas[0].arquivada
+
+def test_schema_follows_new_columns(file_pool, paciente_id):
+    archive.archive_old_records(file_pool, cutoff=CORTE)
+    conn = file_pool.acquire()
+    # Simula uma migração posterior: nova coluna e user_version incrementado
+    versao = conn.execute("PRAGMA user_version").fetchone()["user_version"]
+    conn.execute("ALTER TABLE avaliacoes ADD COLUMN gordura_corporal REAL")
+    conn.execute(f"PRAGMA user_version = {versao + 1}")
+    conn.commit()
+    with archive.attached_archive(conn, archive.archive_path_for(file_pool.database_path)):
+        colunas = [row["name"] for row in conn.execute("PRAGMA arquivo.table_info(avaliacoes)").fetchall()]
+        assert conn.execute("PRAGMA arquivo.user_version").fetchone()["user_version"] == versao + 1
+    assert colunas[-1] == "gordura_corporal"
+
+def test_read_only_attaches_when_archive_is_current(file_pool, paciente_id, monkeypatch):
+    archive.archive_old_records(file_pool, cutoff=CORTE)
+    chamadas = []
+    monkeypatch.setattr(archive, "ensure_archive_schema", lambda conn: chamadas.append(conn))
+    assert len(AvaliacaoRepository(file_pool).get_by_paciente_id(paciente_id, incluir_arquivadas=True)) == 3
+    assert chamadas == []
+
+def test_deleting_patient_purges_archive(file_pool, paciente_id):
+    result = archive.archive_old_records(file_pool, cutoff=CORTE)
+    assert PacienteRepository(file_pool).delete(paciente_id)
+    with sqlite3.connect(result.caminho) as arquivo:
+        for tabela in archive.ARCHIVED_TABLES:
+            assert arquivo.execute(f"SELECT COUNT(*) FROM {tabela}").fetchone()[0] == 0
@@ -0,0 +1,103 @@
+# tests/core/test_backup.py
+
+import pytest
+import os
+import sqlite3
+import sys
+import threading
+
+# Adiciona o diretório src ao sys.path
+src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, src_path)
+
+from src.core import backup
+from src.core.repositories import AlimentoRepository
+from src.core.models import Alimento
+
+@pytest.fixture
+def pool(file_pool):
+    AlimentoRepository(file_pool).upsert_batch([Alimento(nome=f"Alimento {i}", observacoes="x" * 500) for i in range(2000)])
+    return file_pool
+
+def count(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM alimentos").fetchone()[0]
+    finally:
+        conn.close()
+
+def test_backup_in_steps_is_verified_and_self_contained(tmp_path, pool):
+    dest = str(tmp_path / "copia.db")
+    progresso = []
+    result = backup.backup_database(dest, pool.database_path, pages_per_step=50, pause_ms=0,
+                                    progress=lambda feitas, total: progresso.append((feitas, total)))
+    assert result.passos > 1
+    assert progresso[-1] == (result.paginas, result.paginas)
+    assert result.verificacao == "ok"
+    assert count(dest) == 2000
+    assert not os.path.exists(dest + "-wal") and not os.path.exists(dest + ".tmp")
+    conn = sqlite3.connect(dest)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    conn.close()
+
+def test_writes_during_backup_do_not_tear_the_copy(tmp_path, pool):
+    repo = AlimentoRepository(pool)
+    def escrever(feitas, total):
+        # Outra thread (outra conexão do pool) grava entre os passos da cópia
+        t = threading.Thread(target=lambda: (repo.add(Alimento(nome=f"Novo {feitas}")), pool.release()))
+        t.start()
+        t.join()
+    result = backup.backup_database(str(tmp_path / "copia.db"), pool.database_path, pages_per_step=20,
+                                    pause_ms=0, progress=escrever)
+    # Retrato do início da cópia: nenhuma escrita posterior e sem recomeçar a cópia
+    assert count(result.caminho) == 2000
+    assert result.passos == -(-result.paginas // 20)
+    assert count(pool.database_path) == 2000 + result.passos
+
+def test_rollback_journal_source_is_copied_in_one_step_without_blocking_writes(tmp_path):
+    origem = str(tmp_path / "compartilhado.db")
+    conn = sqlite3.connect(origem, timeout=0)
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.execute("CREATE TABLE t (x TEXT)")
+    conn.executemany("INSERT INTO t VALUES (?)", [("x" * 500,) for _ in range(500)])
+    conn.commit()
+    def escrever(feitas, total):
+        # Sem transação de leitura presa na origem, a aplicação grava normalmente
+        conn.execute("INSERT INTO t VALUES ('novo')")
+        conn.commit()
+    result = backup.backup_database(str(tmp_path / "copia.db"), origem, pages_per_step=5,
+                                    pause_ms=0, progress=escrever)
+    conn.close()
+    assert result.passos == 1
+    with sqlite3.connect(result.caminho) as copia:
+        assert copia.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 500
+
+def test_rotation_keeps_most_recent(tmp_path, pool):
+    scheduler = backup.BackupScheduler(source_path=pool.database_path, backup_dir=str(tmp_path / "bk"),
+                                       interval_minutes=0, keep=3)
+    resultados = [scheduler.backup() for _ in range(5)]
+    restantes = backup.list_snapshots(str(tmp_path / "bk"))
+    assert restantes == [r.caminho for r in resultados[-3:]]
+
+def test_corrupt_snapshot_fails_verification(tmp_path, pool):
+    dest = str(tmp_path / "copia.db")
+    backup.backup_database(dest, pool.database_path, pause_ms=0)
+    with open(dest, "r+b") as f:
+        f.seek(4096 * 3)
+        f.write(b"\xff" * 4096 * 4)
+    ok, mensagem = backup.verify_snapshot(dest)
+    assert not ok and mensagem
+
+def test_scheduler_runs_on_request_and_on_stop(tmp_path, pool):
+    feitos = threading.Event()
+    eventos = []
+    def listener(result, erro):
+        eventos.append((result, erro))
+        feitos.set()
+    scheduler = backup.BackupScheduler(source_path=pool.database_path, backup_dir=str(tmp_path / "bk"),
+                                       interval_minutes=0, listener=listener)
+    scheduler.run_now()
+    assert feitos.wait(10)
+    scheduler.stop(final_backup=True)
+    assert len(eventos) == 2 and all(r is not None and e is None for r, e in eventos)
+    assert len(backup.list_snapshots(str(tmp_path / "bk"))) == 2
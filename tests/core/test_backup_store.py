@@ -0,0 +1,143 @@
+# tests/core/test_backup_store.py
+
+import pytest
+import os
+import sqlite3
+import sys
+
+# Adiciona o diretório src ao sys.path
+src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, src_path)
+
+from src.core import archive, backup, backup_store, database
+from src.core.repositories import AlimentoRepository, AvaliacaoRepository, PacienteRepository
+from src.core.models import Alimento, Avaliacao, Paciente
+
+@pytest.fixture
+def pool(file_pool):
+    AlimentoRepository(file_pool).upsert_batch([Alimento(nome=f"Alimento {i}", observacoes=os.urandom(200).hex()) for i in range(3000)])
+    return file_pool
+
+@pytest.fixture
+def store(tmp_path):
+    return backup_store.BackupStore(str(tmp_path / "store"), chunk_size=16 * 1024, backup_dir=str(tmp_path / "bk"))
+
+def nomes(path):
+    conn = sqlite3.connect(path)
+    try:
+        return [r[0] for r in conn.execute("SELECT nome FROM alimentos ORDER BY id")]
+    finally:
+        conn.close()
+
+def test_second_snapshot_stores_only_changed_chunks(pool, store):
+    primeiro = store.snapshot(pool.database_path)
+    assert primeiro.blocos_novos == len(set(primeiro.manifest.chunks))
+    AlimentoRepository(pool).add(Alimento(nome="Uma alteração pequena"))
+    segundo = store.snapshot(pool.database_path)
+    assert 0 < segundo.blocos_novos < len(segundo.manifest.chunks) // 4
+    assert segundo.bytes_gravados < primeiro.bytes_gravados / 4
+    assert [m.id for m in store.list_snapshots()] == [primeiro.manifest.id, segundo.manifest.id]
+    # Os blocos vêm dos snapshots comuns, sem cópias de trabalho no repositório
+    assert len(backup.list_snapshots(store.backup_dir)) == 2
+    assert sorted(os.listdir(store.root)) == ["chunks", "manifests"]
+
+def test_restore_each_snapshot(tmp_path, pool, store):
+    antes = store.snapshot(pool.database_path).manifest
+    AlimentoRepository(pool).add(Alimento(nome="Depois"))
+    depois = store.snapshot(pool.database_path).manifest
+    store.restore(antes.id, str(tmp_path / "antes.db"))
+    store.restore(depois.id, str(tmp_path / "depois.db"))
+    assert "Depois" not in nomes(str(tmp_path / "antes.db"))
+    assert nomes(str(tmp_path / "depois.db"))[-1] == "Depois"
+    with pytest.raises(FileExistsError):
+        store.restore(antes.id, str(tmp_path / "antes.db"))
+
+def test_verify_detects_damaged_chunk(tmp_path, pool, store):
+    manifest = store.snapshot(pool.database_path).manifest
+    assert store.verify() == {}
+    with open(store._chunk_path(manifest.chunks[1]), "r+b") as f:
+        f.write(b"\x00" * 8)
+    problemas = store.verify(manifest.id)
+    assert list(problemas) == [manifest.id]
+    with pytest.raises(Exception):
+        store.restore(manifest.id, str(tmp_path / "restaurado.db"))
+    assert not os.path.exists(tmp_path / "restaurado.db")
+
+def test_prune_removes_unreferenced_chunks(pool, store):
+    repo = AlimentoRepository(pool)
+    for i in range(3):
+        repo.add(Alimento(nome=f"Rodada {i}", observacoes=os.urandom(4000).hex()))
+        store.snapshot(pool.database_path)
+    todos = {d for m in store.list_snapshots() for d in m.chunks}
+    apagados = store.prune(keep=1)
+    restante = store.list_snapshots()
+    assert len(restante) == 1
+    assert apagados == len(todos - set(restante[0].chunks)) > 0
+    assert store.verify() == {}
+
+def test_prune_requires_keeping_at_least_one(pool, store):
+    store.snapshot(pool.database_path)
+    with pytest.raises(ValueError):
+        store.prune(keep=0)
+    assert len(store.list_snapshots()) == 1
+
+def test_store_lock_serializes_writers(tmp_path, pool, store, monkeypatch):
+    copia = backup.backup_database(str(tmp_path / "copia.db"), pool.database_path)
+    with store._locked():
+        # Um prune() concorrente esperaria o snapshot em gravação terminar
+        with pytest.raises(TimeoutError):
+            with store._locked(timeout=0.1):
+                pass
+    trava = os.path.join(store.root, "store.lock")
+    assert not os.path.exists(trava)
+    # Trava deixada por um processo encerrado no meio da gravação
+    open(trava, "w").close()
+    monkeypatch.setattr(backup_store, "LOCK_STALE_S", -1.0)
+    assert store.add_file(copia.caminho).blocos_novos > 0
+    assert not os.path.exists(trava)
+
+def test_scheduler_feeds_store(tmp_path, pool, store):
+    scheduler = backup.BackupScheduler(source_path=pool.database_path, backup_dir=str(tmp_path / "bk"),
+                                       interval_minutes=0, keep=1, store=store, store_keep=2)
+    for _ in range(3):
+        scheduler.backup()
+    assert len(backup.list_snapshots(str(tmp_path / "bk"))) == 1
+    assert len(store.list_snapshots()) == 2
+
+def test_command_line(tmp_path, pool, capsys):
+    raiz = str(tmp_path / "cli")
+    assert backup_store.main(["--store", raiz, "--backup-dir", str(tmp_path / "bk"),
+                              "snapshot", "--db", pool.database_path]) == 0
+    snapshot_id = backup_store.BackupStore(raiz).list_snapshots()[0].id
+    assert backup_store.main(["--store", raiz, "verify"]) == 0
+    assert backup_store.main(["--store", raiz, "restore", snapshot_id, str(tmp_path / "r.db")]) == 0
+    assert len(nomes(str(tmp_path / "r.db"))) == 3000
+    assert snapshot_id in capsys.readouterr().out
+
+def test_archived_records_survive_backup_and_restore(tmp_path, pool, store):
+    paciente_id = PacienteRepository(pool).add(Paciente(nome_completo="Ana", data_nascimento="1990-01-01"))
+    avaliacoes = AvaliacaoRepository(pool)
+    for ano in (2019, 2024):
+        avaliacoes.add(Avaliacao(paciente_id=paciente_id, data_avaliacao=f"{ano}-03-01 10:00:00", peso=70.0))
+    assert archive.archive_old_records(pool, cutoff="2022-01-01").avaliacoes == 1
+
+    pasta = str(tmp_path / "bk")
+    scheduler = backup.BackupScheduler(source_path=pool.database_path, backup_dir=pasta,
+                                       interval_minutes=0, keep=1, store=store)
+    primeiro = scheduler.backup()
+    assert primeiro.arquivo == archive.archive_path_for(primeiro.caminho) and os.path.exists(primeiro.arquivo)
+    scheduler.backup()
+    assert backup.list_snapshots(pasta) == [scheduler.last_result.caminho] # A cópia do arquivo não conta
+    assert not os.path.exists(primeiro.arquivo) # Removida junto com o snapshot na rotação
+    assert store.verify() == {}
+
+    for snapshot_id, destino in ((store.list_snapshots()[-1].id, "restaurado.db"),
+                                 (store.snapshot(pool.database_path).manifest.id, "restaurado2.db")):
+        destino = str(tmp_path / destino)
+        store.restore(snapshot_id, destino)
+        restaurado = database.ConnectionPool(database_path=destino, max_size=1, timeout=1.0)
+        try:
+            todas = AvaliacaoRepository(restaurado).get_by_paciente_id(paciente_id, incluir_arquivadas=True)
+            assert [(a.data_avaliacao[:4], a.arquivada) for a in todas] == [("2024", False), ("2019", True)]
+        finally:
+            restaurado.close_all()
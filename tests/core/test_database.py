@@ -0,0 +1,121 @@
+# tests/core/test_database.py
+
+import pytest
+import os
+import sys
+import sqlite3
+import threading
+
+# Adiciona o diretório src ao sys.path
+src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, src_path)
+
+from src.core import database
+
+@pytest.fixture
+def file_pool_options():
+    # Banco vazio (sem migrações) e pool pequeno com timeout curto para os testes de limite.
+    return {"name": "pool.db", "max_size": 2, "timeout": 0.2, "migrate": False}
+
+# --- Testes para ConnectionPool ---
+
+def test_connection_is_preconfigured(file_pool):
+    conn = file_pool.acquire()
+    assert conn.execute("PRAGMA foreign_keys").fetchone() == {"foreign_keys": 1}
+    expected_cache = database.get_storage_profile()["cache_size"]
+    assert conn.execute("PRAGMA cache_size").fetchone()["cache_size"] == expected_cache
+
+def test_same_thread_reuses_connection(file_pool):
+    assert file_pool.acquire() is file_pool.acquire()
+
+def test_threads_get_distinct_connections(file_pool):
+    main_conn = file_pool.acquire()
+    worker_conns = []
+
+    def worker():
+        with file_pool.connection() as conn:
+            worker_conns.append(conn)
+
+    t = threading.Thread(target=worker)
+    t.start()
+    t.join()
+    assert worker_conns and worker_conns[0] is not main_conn
+
+def test_released_connection_is_reused_by_other_thread(file_pool):
+    conns = []
+
+    def worker():
+        with file_pool.connection() as conn:
+            conns.append(conn)
+
+    for _ in range(3):
+        t = threading.Thread(target=worker)
+        t.start()
+        t.join()
+    assert len({id(c) for c in conns}) == 1
+
+def test_pool_is_bounded(file_pool):
+    file_pool.acquire()
+    errors = []
+    holder_ready = threading.Event()
+    done = threading.Event()
+
+    def holder():
+        with file_pool.connection():
+            holder_ready.set()
+            done.wait(2)
+
+    def starved():
+        try:
+            file_pool.acquire()
+        except sqlite3.OperationalError as e:
+            errors.append(e)
+
+    t1 = threading.Thread(target=holder)
+    t1.start()
+    holder_ready.wait(2)
+    t2 = threading.Thread(target=starved)
+    t2.start()
+    t2.join()
+    done.set()
+    t1.join()
+    assert len(errors) == 1
+
+# --- Testes para perfis de armazenamento ---
+
+@pytest.mark.parametrize("profile_name", ["desktop-safe", "fast-local", "shared-drive"])
+def test_storage_profile_is_applied(tmp_path, profile_name):
+    conn = database.create_connection(str(tmp_path / "perfil.db"), profile=profile_name)
+    try:
+        effective = database.verify_storage_profile(conn, profile_name)
+        expected = database.get_storage_profile(profile_name)
+        assert effective["journal_mode"] == expected["journal_mode"]
+        assert effective["synchronous"] == expected["synchronous"]
+        assert effective["cache_size"] == expected["cache_size"]
+        assert effective["temp_store"] == expected["temp_store"]
+        assert effective["busy_timeout"] == expected["busy_timeout"]
+    finally:
+        conn.close()
+
+def test_unknown_storage_profile_raises():
+    with pytest.raises(ValueError):
+        database.get_storage_profile("inexistente")
+
+# --- Testes para use_database / banco em memória dos testes ---
+
+def test_use_database_switches_shared_pool(tmp_path):
+    padrao = database.get_database_path()
+    caminho = str(tmp_path / "outro.db")
+    with database.use_database(caminho):
+        assert database.get_pool().database_path == caminho
+        database.get_db_connection().execute("CREATE TABLE t (x)")
+    assert database.get_database_path() == padrao
+    assert os.path.exists(caminho)
+
+def test_memory_db_is_a_fresh_copy_of_template(memory_db, template_db):
+    conn = database.get_db_connection()
+    tabelas = {r["name"] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()}
+    assert {"pacientes", "alimentos", "planos_alimentares"} <= tabelas
+    conn.execute("INSERT INTO pacientes (nome_completo, data_nascimento) VALUES ('X', '2000-01-01')")
+    conn.commit()
+    assert template_db.execute("SELECT COUNT(*) AS n FROM pacientes").fetchone()["n"] == 0
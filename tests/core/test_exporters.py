@@ -0,0 +1,98 @@
+# tests/core/test_exporters.py
+
+import pytest
+import csv
+import json
+import os
+import sys
+import tracemalloc
+
+# Adiciona o diretório src ao sys.path
+src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, src_path)
+
+from src.core import database, exporters, query_audit
+
+def seed(file_pool, pacientes=3, itens_por_plano=2):
+    conn = file_pool.acquire()
+    conn.execute("INSERT INTO alimentos (nome, kcal_por_unidade, cho_por_unidade, fibras_por_unidade) VALUES ('Arroz', 1.3, 0.28, 0.02)")
+    for i in range(pacientes):
+        paciente_id = conn.execute("INSERT INTO pacientes (nome_completo, data_nascimento, nome_ordenacao) VALUES (?, '1990-01-01', ?)",
+                                   (f"Paciente {i}", f"paciente {i:06d}")).lastrowid
+        conn.execute("INSERT INTO avaliacoes (paciente_id, peso) VALUES (?, 70)", (paciente_id,))
+        plano_id = conn.execute("INSERT INTO planos_alimentares (paciente_id, nome_plano) VALUES (?, 'Plano')", (paciente_id,)).lastrowid
+        conn.executemany("INSERT INTO itens_plano_alimentar (plano_alimentar_id, refeicao, alimento_id, quantidade, unidade_medida, kcal_calculado) "
+                         "VALUES (?, 'Almoço', 1, 100, 'g', ?)", [(plano_id, None if j == 0 else 999) for j in range(itens_por_plano)])
+    conn.commit()
+
+def test_export_csv(tmp_path, file_pool):
+    seed(file_pool)
+    path = str(tmp_path / "pacientes.csv")
+    result = exporters.export_dataset("pacientes", path, pool=file_pool)
+    assert result.linhas == 3 and not result.cancelada
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        linhas = list(csv.reader(f, delimiter=";"))
+    assert linhas[0][:2] == ["id", "nome_completo"]
+    assert [l[1] for l in linhas[1:]] == ["Paciente 0", "Paciente 1", "Paciente 2"]
+    assert not os.path.exists(path + ".parcial")
+
+def test_export_expanded_plans_ndjson(tmp_path, file_pool):
+    seed(file_pool, pacientes=2)
+    path = str(tmp_path / "planos.ndjson")
+    exporters.export_dataset("planos", path, pool=file_pool)
+    with open(path, encoding="utf-8") as f:
+        itens = [json.loads(l) for l in f]
+    assert len(itens) == 4
+    assert itens[0]["paciente"] == "Paciente 0" and itens[0]["alimento"] == "Arroz"
+    # Sem valor gravado: quantidade x valor por unidade; com valor gravado: o valor gravado
+    assert itens[0]["kcal"] == pytest.approx(130)
+    assert itens[0]["fibras_g"] == pytest.approx(2)
+    assert itens[1]["kcal"] == 999
+
+def test_export_xlsx(tmp_path, file_pool):
+    openpyxl = pytest.importorskip("openpyxl")
+    seed(file_pool)
+    path = str(tmp_path / "avaliacoes.xlsx")
+    assert exporters.export_dataset("avaliacoes", path, pool=file_pool).linhas == 3
+    sheet = openpyxl.load_workbook(path, read_only=True).active
+    linhas = list(sheet.iter_rows(values_only=True))
+    assert linhas[0][:3] == ("id", "paciente_id", "paciente")
+    assert len(linhas) == 4
+
+def test_progress_and_cancel(tmp_path, file_pool):
+    seed(file_pool, pacientes=10)
+    path = str(tmp_path / "planos.csv")
+    chamadas = []
+    result = exporters.export_dataset("planos", path, pool=file_pool, fetch_size=4,
+                                      progress=lambda feitas, total: chamadas.append((feitas, total)) or feitas >= 8)
+    assert result.cancelada
+    assert chamadas == [(4, 20), (8, 20)]
+    assert not os.path.exists(path) and not os.path.exists(path + ".parcial")
+
+def test_unknown_format_or_dataset(tmp_path, file_pool):
+    with pytest.raises(ValueError):
+        exporters.export_dataset("pacientes", str(tmp_path / "x.pdf"), pool=file_pool)
+    with pytest.raises(ValueError):
+        exporters.export_dataset("inexistente", str(tmp_path / "x.csv"), pool=file_pool)
+
+def test_export_queries_follow_indexes():
+    conn = database.create_connection(":memory:")
+    query_audit.seed_database(conn)
+    try:
+        for query in query_audit.collect_statements(exporters.__file__):
+            plan = query_audit.explain(conn, query)
+            assert not plan.temp_btrees, query_audit.format_report([plan])
+    finally:
+        conn.close()
+
+def test_memory_does_not_grow_with_rows(tmp_path, file_pool):
+    seed(file_pool, pacientes=200, itens_por_plano=10)
+    def peak(fmt):
+        tracemalloc.start()
+        exporters.export_dataset("planos", str(tmp_path / f"planos.{fmt}"), pool=file_pool, fetch_size=100)
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return pico
+    # 2.000 linhas expandidas: o pico fica na ordem de um lote, não do resultado inteiro
+    assert peak("csv") < 1024 * 1024
+    assert peak("ndjson") < 1024 * 1024
@@ -0,0 +1,93 @@
+# tests/core/test_food_catalog.py
+
+import pytest
+import os
+import sys
+
+import numpy as np
+
+# Adiciona o diretório src ao sys.path
+src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, src_path)
+
+from src.core import food_catalog
+from src.core.food_catalog import FoodCatalog
+from src.core.repositories import AlimentoRepository
+from src.core.models import Alimento
+
+@pytest.fixture
+def repo(file_pool):
+    repo = AlimentoRepository(file_pool)
+    repo.add(Alimento(nome="Arroz", grupo="Cereais", kcal_por_unidade=1.28, cho_por_unidade=0.28, ptn_por_unidade=0.025, lip_por_unidade=0.002))
+    repo.add(Alimento(nome="Frango", grupo="Carnes", kcal_por_unidade=1.63, ptn_por_unidade=0.31, lip_por_unidade=0.032))
+    repo.add(Alimento(nome="Leite", grupo="Laticínios", unidade_padrao="ml", kcal_por_unidade=0.6, ptn_por_unidade=0.032))
+    return repo
+
+def test_loads_columns_and_looks_up_by_id(file_pool, repo):
+    catalog = FoodCatalog(file_pool)
+    assert catalog.refresh()
+    assert len(catalog) == 3
+    assert catalog.nome(2) == "Frango" and catalog.unidade(3) == "ml" and catalog.grupo(1) == "Cereais"
+    assert catalog.rows_for([3, 99, 1, -1]).tolist() == [2, -1, 0, -1]
+    assert 99 not in catalog and None not in catalog
+    nutrientes = catalog.nutrients_for([2, 99])
+    assert nutrientes.shape == (2, 4)
+    assert nutrientes[0].tolist() == pytest.approx([1.63, 0.0, 0.31, 0.032]) # CHO não informado vale 0
+    assert nutrientes[1].tolist() == [0, 0, 0, 0]
+    assert np.isnan(catalog.valores[catalog.row_of(2), 1]) # No catálogo fica NaN
+    assert not catalog.refresh() # Nada mudou
+
+def test_refresh_applies_only_changes(file_pool, repo):
+    catalog = FoodCatalog(file_pool)
+    catalog.refresh()
+    valores_antes = catalog.valores
+    frango = repo.get_by_id(2)
+    frango.kcal_por_unidade = 1.9
+    repo.update(frango)
+    assert catalog.refresh()
+    assert catalog.valores is valores_antes # Atualizado no lugar, sem recarga completa
+    assert catalog.nutrients_for([2])[0, 0] == pytest.approx(1.9)
+
+    repo.delete(1)
+    feijao_id = repo.add(Alimento(nome="Feijão", grupo="Leguminosas", kcal_por_unidade=0.76))
+    assert catalog.refresh()
+    assert sorted(catalog.ids.tolist()) == [2, 3, feijao_id]
+    assert 1 not in catalog and catalog.nome(feijao_id) == "Feijão"
+    assert catalog.rows_for(catalog.ids).tolist() == list(range(len(catalog)))
+
+def test_upsert_batch_and_pruned_log_trigger_reload(file_pool, repo):
+    catalog = FoodCatalog(file_pool)
+    catalog.refresh()
+    repo.upsert_batch([Alimento(nome="Leite", unidade_padrao="ml", kcal_por_unidade=0.42)])
+    catalog.refresh()
+    assert catalog.nutrients_for([3])[0, 0] == pytest.approx(0.42)
+
+    repo.add(Alimento(nome="Ovo", unidade_padrao="unidade", kcal_por_unidade=70))
+    repo.add(Alimento(nome="Maçã", kcal_por_unidade=0.52))
+    # A manutenção podou o registro além do ponto em que o catálogo parou
+    conn = file_pool.acquire()
+    conn.execute("DELETE FROM alimentos_alteracoes WHERE seq < (SELECT MAX(seq) FROM alimentos_alteracoes)")
+    conn.commit()
+    assert catalog.refresh()
+    assert len(catalog) == 5 and catalog.unidade(repo.search_by_name("ovo")[0].id) == "unidade"
+
+def test_get_catalog_follows_default_database(memory_db):
+    AlimentoRepository().add(Alimento(nome="Arroz", kcal_por_unidade=1.28))
+    catalog = food_catalog.get_catalog()
+    assert len(catalog) == 1
+    AlimentoRepository().add(Alimento(nome="Feijão", kcal_por_unidade=0.76))
+    assert food_catalog.get_catalog() is catalog and len(catalog) == 2
+
+def test_catalog_stays_compact(file_pool):
+    # 5 mil alimentos; o tamanho cresce de forma linear (50 mil ficam abaixo de 8 MB)
+    n = 5_000
+    conn = file_pool.acquire()
+    conn.executemany("INSERT INTO alimentos (nome, grupo, kcal_por_unidade, cho_por_unidade, ptn_por_unidade, lip_por_unidade) "
+                     "VALUES (?, ?, ?, ?, ?, ?)",
+                     ((f"Alimento {i:05d}", f"Grupo {i % 20}", i % 900 / 100, 0.1, 0.2, 0.05) for i in range(n)))
+    conn.commit()
+    catalog = FoodCatalog(file_pool)
+    catalog.refresh()
+    ids = np.random.default_rng(0).integers(1, n + 1, size=10_000)
+    assert (catalog.ids[catalog.rows_for(ids)] == ids).all()
+    assert catalog.nbytes < n * 160
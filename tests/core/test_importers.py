@@ -0,0 +1,106 @@
+# tests/core/test_importers.py
+
+import pytest
+import os
+import sys
+
+# Adiciona o diretório src ao sys.path
+src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, src_path)
+
+pd = pytest.importorskip("pandas")
+
+from src.core import database, importers
+from src.core.migrations import migrate
+from src.core.repositories import AlimentoRepository
+from src.core.models import Alimento
+
+TACO_CSV = """Tabela Brasileira de Composição de Alimentos - TACO
+
+Número;Descrição dos alimentos;Categoria;Energia (kcal);Energia (kJ);Proteína (g);Lipídeos (g);Carboidrato (g);Fibra Alimentar (g);Sódio (mg)
+1;Arroz, integral, cozido;Cereais e derivados;124;517;2,6;1,0;25,8;2,7;1
+2;Feijão, carioca, cozido;Leguminosas;76;318;4,8;0,5;13,6;8,5;2
+3;Açúcar, refinado;Açúcares;387;1619;0,3;Tr;99,5;NA;12
+4;;Cereais;100;1;1;1;1;1;1
+5;Erro de digitação;Cereais;12x;1;1;1;1;1;1
+6;Impossível;Cereais;950;1;1;1;1;1;1
+7;Negativo;Cereais;10;1;-1;1;1;1;1
+
+"""
+
+@pytest.fixture
+def repo(tmp_path):
+    pool = database.ConnectionPool(database_path=str(tmp_path / "import.db"), max_size=2, timeout=1.0)
+    migrate(pool.acquire())
+    yield AlimentoRepository(pool=pool)
+    pool.close_all()
+
+@pytest.fixture
+def taco_csv(tmp_path):
+    path = tmp_path / "taco_4ed.csv"
+    path.write_text(TACO_CSV, encoding="latin-1")
+    return str(path)
+
+def test_import_taco_csv(repo, taco_csv):
+    progresso = []
+    result = importers.import_food_table(taco_csv, repo=repo, progress=lambda feito, total: progresso.append((feito, total)))
+    assert result.lidos == 7
+    assert result.gravados == 3
+    assert progresso[-1] == (3, 3)
+
+    arroz = repo.search_by_name("arroz integral")[0]
+    # Por 100 g na tabela -> por grama no banco (unidade_padrao "g")
+    assert arroz.unidade_padrao == "g"
+    assert arroz.kcal_por_unidade == pytest.approx(1.24)
+    assert arroz.cho_por_unidade == pytest.approx(0.258)
+    assert arroz.sodio_mg_por_unidade == pytest.approx(0.01)
+    assert arroz.fonte_dados == "TACO"
+    acucar = repo.search_by_name("acucar")[0]
+    assert acucar.lip_por_unidade == 0 # "Tr" = traços
+    assert acucar.fibras_por_unidade is None # "NA" = não analisado
+
+def test_invalid_rows_are_reported_with_line_numbers(repo, taco_csv):
+    result = importers.import_food_table(taco_csv, repo=repo)
+    motivos = {linha: motivo for linha, _, motivo in result.rejeitados}
+    assert set(motivos) == {7, 8, 9, 10}
+    assert motivos[7] == "nome vazio"
+    assert "não numérico" in motivos[8]
+    assert "900 kcal" in motivos[9]
+    assert "negativo" in motivos[10]
+
+def test_reimport_updates_by_name_and_keeps_notes(repo, taco_csv):
+    repo.add(Alimento(nome="Arroz, integral, cozido", kcal_por_unidade=9.9, observacoes="Nota da nutricionista"))
+    importers.import_food_table(taco_csv, repo=repo)
+    importers.import_food_table(taco_csv, repo=repo)
+    alimentos = repo.get_all()
+    assert len(alimentos) == 3
+    arroz = next(a for a in alimentos if a.nome.startswith("Arroz"))
+    assert arroz.kcal_por_unidade == pytest.approx(1.24)
+    assert arroz.observacoes == "Nota da nutricionista"
+
+def test_portion_column_is_normalized_to_100g(repo):
+    df = pd.DataFrame({
+        "Descrição do alimento": ["Leite integral"],
+        "Porção (g)": ["200"],
+        "Energia (kcal)": ["120"],
+        "Lipídios totais (g)": ["6,4"],
+    })
+    dados, motivo = importers.prepare_dataframe(df)
+    assert motivo.isna().all()
+    assert dados.loc[0, "kcal"] == pytest.approx(60.0)
+    assert dados.loc[0, "lip"] == pytest.approx(3.2)
+
+def test_chunks_are_committed_separately(repo):
+    df = pd.DataFrame({"Nome": [f"Alimento {i}" for i in range(25)], "Energia (kcal)": ["100"] * 25})
+    chamadas = []
+    original = repo.upsert_batch
+    repo.upsert_batch = lambda alimentos: chamadas.append(len(alimentos)) or original(alimentos)
+    result = importers.import_dataframe(df, "Teste", repo=repo, chunk_size=10)
+    assert result.gravados == 25
+    assert chamadas == [10, 10, 5]
+
+def test_missing_required_columns(tmp_path, repo):
+    path = tmp_path / "sem_energia.csv"
+    path.write_text("Nome;Proteína (g)\nArroz;2,6\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        importers.import_food_table(str(path), repo=repo)
@@ -0,0 +1,138 @@
+# tests/core/test_instrumentation.py
+
+import pytest
+import os
+import sys
+import logging
+import sqlite3
+
+# Adiciona o diretório src ao sys.path
+src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, src_path)
+
+from src.core import instrumentation
+from src.core.instrumentation import LatencyHistogram, metrics
+from src.core.repositories import AlimentoRepository, PacienteRepository
+from src.core.models import Alimento, Paciente
+
+@pytest.fixture
+def pool(file_pool):
+    metrics.reset()
+    yield file_pool
+    metrics.reset()
+
+def test_histogram_percentiles():
+    hist = LatencyHistogram()
+    for ms in range(1, 101):
+        hist.observe(ms / 1000)
+    assert hist.count == 100
+    assert hist.percentile(50) == pytest.approx(0.050, abs=0.001)
+    assert hist.percentile(95) == pytest.approx(0.095, abs=0.001)
+    assert hist.percentile(99) == pytest.approx(0.099, abs=0.001)
+    assert LatencyHistogram().percentile(95) is None
+
+def test_select_is_timed_until_exhausted_with_row_count(pool):
+    conn = pool.acquire()
+    conn.executemany("INSERT INTO alimentos (nome, nome_ordenacao) VALUES (?, ?)", [(f"A{i}", f"a{i}") for i in range(5)])
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM alimentos")
+    assert "SELECT id FROM alimentos" not in metrics.statement_stats() # Ainda não foi lido
+    cursor.fetchall()
+    stats = metrics.statement_stats()
+    assert stats["SELECT id FROM alimentos"].count == 1
+    assert stats["SELECT id FROM alimentos"].rows == 5
+    insert = stats["INSERT INTO alimentos (nome, nome_ordenacao) VALUES (?, ?)"]
+    assert insert.rows == 5
+
+def test_repository_methods_are_recorded(pool):
+    repo = AlimentoRepository(pool=pool)
+    repo.add(Alimento(nome="Arroz", grupo="Cereais"))
+    repo.search_by_name("arr")
+    methods = metrics.method_stats()
+    assert methods["AlimentoRepository.add"].count == 1
+    assert methods["AlimentoRepository.search_by_name"].count == 1
+    assert metrics.current_method() is None
+
+def test_point_lookup_that_finds_its_row_is_recorded(pool):
+    repo = PacienteRepository(pool=pool)
+    paciente_id = repo.add(Paciente(nome_completo="Ana", data_nascimento="1990-01-01"))
+    for _ in range(10):
+        assert repo.get_by_id(paciente_id) is not None
+    assert metrics.statement_stats()["SELECT * FROM pacientes WHERE id = ?"].count == 10
+    cursor = pool.acquire().execute("SELECT id FROM pacientes")
+    cursor.fetchone()
+    del cursor # Descartado sem esgotar o resultado
+    assert metrics.statement_stats()["SELECT id FROM pacientes"].count == 1
+
+def test_interleaved_generators_keep_their_own_attribution(pool, caplog, monkeypatch):
+    repo = AlimentoRepository(pool=pool)
+    repo.upsert_batch([Alimento(nome=f"Alimento {i}") for i in range(4)])
+    monkeypatch.setattr(metrics, "slow_threshold_ms", 0.0)
+    primeiro, segundo = repo.iter_all(chunk_size=1), repo.iter_all(chunk_size=1)
+    next(primeiro)
+    next(segundo)
+    assert metrics.current_method() is None # Nada na pilha entre um yield e o próximo
+    with caplog.at_level(logging.WARNING, logger="nutriapp.slow_queries"):
+        repo.get_all()
+    assert "em AlimentoRepository.get_all:" in caplog.text
+    primeiro.close()
+    list(segundo)
+    assert metrics.current_method() is None
+    assert metrics.method_stats()["AlimentoRepository.iter_all"].count == 2
+
+def test_generator_wrapper_forwards_send_and_throw():
+    def eco(self):
+        recebido = yield metrics.current_method()
+        while True:
+            try:
+                recebido = yield (recebido, metrics.current_method())
+            except KeyError:
+                recebido = yield "tratado"
+
+    gen = instrumentation.timed_method("Teste.eco", eco)(None)
+    assert next(gen) == "Teste.eco"
+    assert gen.send(42) == (42, "Teste.eco")
+    assert metrics.current_method() is None
+    assert gen.throw(KeyError("x")) == "tratado"
+    gen.close()
+    assert metrics.current_method() is None
+
+def test_failed_statement_is_counted_as_error(pool):
+    conn = pool.acquire()
+    with pytest.raises(sqlite3.OperationalError):
+        conn.execute("SELECT * FROM tabela_inexistente")
+    conn.execute("SELECT 1").fetchall()
+    assert "SELECT * FROM tabela_inexistente" not in metrics.statement_stats()
+    assert metrics.error_stats() == {"SELECT * FROM tabela_inexistente": 1}
+    assert 'nutriapp_query_errors_total{statement="SELECT * FROM tabela_inexistente"} 1' in metrics.to_openmetrics()
+
+def test_disabled_metrics_record_nothing(pool, monkeypatch):
+    monkeypatch.setattr(metrics, "enabled", False)
+    conn = pool.acquire()
+    assert len(conn.execute("SELECT 1").fetchall()) == 1
+    AlimentoRepository(pool=pool).get_all()
+    assert metrics.statement_stats() == {} and metrics.method_stats() == {}
+
+def test_slow_query_is_logged_with_origin(pool, caplog, monkeypatch):
+    monkeypatch.setattr(metrics, "slow_threshold_ms", 0.0)
+    repo = AlimentoRepository(pool=pool)
+    with caplog.at_level(logging.WARNING, logger="nutriapp.slow_queries"):
+        repo.get_all()
+    assert any("Consulta lenta" in r.message and "AlimentoRepository.get_all" in r.message for r in caplog.records)
+
+def test_fast_query_is_not_logged(pool, caplog):
+    with caplog.at_level(logging.WARNING, logger="nutriapp.slow_queries"):
+        AlimentoRepository(pool=pool).get_all()
+    assert not caplog.records
+
+def test_openmetrics_export(pool, tmp_path):
+    AlimentoRepository(pool=pool).get_all()
+    path = str(tmp_path / "metrics.prom")
+    metrics.write_openmetrics(path)
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    assert "# TYPE nutriapp_query_duration_seconds histogram" in text
+    assert 'nutriapp_repository_method_duration_seconds_count{method="AlimentoRepository.get_all"} 1' in text
+    assert 'method="AlimentoRepository.get_all",quantile="0.95"' in text
+    assert text.endswith("# EOF\n")
+    assert instrumentation._escape('a"b\\') == 'a\\"b\\\\'
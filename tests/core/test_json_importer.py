@@ -0,0 +1,122 @@
+# tests/core/test_json_importer.py
+
+import pytest
+import json
+import os
+import sys
+import tracemalloc
+
+# Adiciona o diretório src ao sys.path
+src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, src_path)
+
+from src.core import importers, json_importer
+from src.core.repositories import AlimentoRepository
+from src.core.write_queue import WriteQueue
+
+def fdc_food(nome, kcal=52, ptn=0.26, sodio_mg=1.0, categoria="Fruits"):
+    return {
+        "fdcId": 1, "description": nome, "foodCategory": {"description": categoria},
+        "foodNutrients": [
+            {"nutrient": {"number": "208", "name": "Energy", "unitName": "kcal"}, "amount": kcal},
+            {"nutrient": {"number": "203", "name": "Protein", "unitName": "g"}, "amount": ptn},
+            {"nutrient": {"number": "307", "name": "Sodium, Na", "unitName": "mg"}, "amount": sodio_mg},
+            {"nutrient": {"number": "1003", "name": "Outro", "unitName": "g"}, "amount": 1},
+        ],
+    }
+
+@pytest.fixture
+def repo(file_pool):
+    return AlimentoRepository(pool=file_pool)
+
+def write_json(tmp_path, data, name="foods.json"):
+    path = tmp_path / name
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    return str(path)
+
+def test_import_fdc_document(tmp_path, repo):
+    path = write_json(tmp_path, {"FoundationFoods": [fdc_food("Apples, raw"), fdc_food("Bananas, raw", kcal=89)]})
+    result = json_importer.import_json(path, fonte="FDC", repo=repo)
+    assert (result.lidos, result.gravados, result.rejeitados) == (2, 2, [])
+    maca = repo.search_by_name("apples")[0]
+    # Por 100 g no FDC -> por grama no banco
+    assert maca.kcal_por_unidade == pytest.approx(0.52)
+    assert maca.ptn_por_unidade == pytest.approx(0.0026)
+    assert maca.sodio_mg_por_unidade == pytest.approx(0.01)
+    assert maca.grupo == "Fruits"
+    assert maca.fonte_dados == "FDC"
+
+def test_flat_records_and_ndjson(tmp_path, repo):
+    linhas = [
+        {"Descrição": "Arroz, integral, cozido", "Categoria": "Cereais", "Energia (kcal)": "124", "Carboidrato (g)": "25,8"},
+        {"Descrição": "Leite integral", "Porção (g)": 200, "Energia (kcal)": 120, "Lipídios totais (g)": "Tr"},
+    ]
+    path = tmp_path / "taco.ndjson"
+    path.write_text("\n".join(json.dumps(l, ensure_ascii=False) for l in linhas) + "\n\n", encoding="utf-8")
+    result = json_importer.import_json(str(path), repo=repo)
+    assert result.gravados == 2
+    arroz = repo.search_by_name("arroz")[0]
+    assert arroz.cho_por_unidade == pytest.approx(0.258)
+    leite = repo.search_by_name("leite")[0]
+    assert leite.kcal_por_unidade == pytest.approx(0.6) # 120 kcal em 200 g
+    assert leite.lip_por_unidade == 0
+
+def test_invalid_records_are_reported(tmp_path, repo):
+    registros = [fdc_food("Ok"), fdc_food(""), fdc_food("Impossível", kcal=950), fdc_food("Negativo", ptn=-1), 42,
+                 {"description": "Sem energia", "foodNutrients": []}]
+    result = json_importer.import_json(write_json(tmp_path, registros), repo=repo)
+    motivos = {n: motivo for n, _, motivo in result.rejeitados}
+    assert result.gravados == 1
+    assert motivos[2] == "nome vazio"
+    assert "900 kcal" in motivos[3]
+    assert "negativo" in motivos[4]
+    assert "objeto" in motivos[5]
+    assert "ausente" in motivos[6]
+
+def test_rejected_records_are_counted_with_capped_examples(tmp_path, repo, monkeypatch):
+    monkeypatch.setattr(importers, "MAX_REJECTED_EXAMPLES", 3)
+    registros = [{"description": f"Sem energia {i}", "foodNutrients": []} for i in range(50)] + [fdc_food("Ok")]
+    result = json_importer.import_json(write_json(tmp_path, registros), repo=repo)
+    assert (result.gravados, result.n_rejeitados) == (1, 50)
+    assert [linha for linha, _, _ in result.rejeitados] == [1, 2, 3]
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64 * 1024])
+def test_stream_across_read_boundaries(tmp_path, chunk_size):
+    registros = [fdc_food(f"Alimento ção {i}", kcal=i) for i in range(30)] + [123456789, "texto", None]
+    path = write_json(tmp_path, {"meta": {"versão": [1, 2]}, "SurveyFoods": registros})
+    lidos = list(json_importer.JsonRecordStream(path, chunk_size=chunk_size))
+    assert lidos == registros
+
+def test_array_key_selects_records(tmp_path):
+    path = write_json(tmp_path, {"A": [1], "B": [2, 3]})
+    assert list(json_importer.JsonRecordStream(path)) == [1]
+    assert list(json_importer.JsonRecordStream(path, array_key="B")) == [2, 3]
+
+def test_invalid_json_raises(tmp_path, repo):
+    path = tmp_path / "ruim.json"
+    path.write_text('[{"description": "a"} {"description": "b"}]', encoding="utf-8")
+    with pytest.raises(ValueError):
+        json_importer.import_json(str(path), repo=repo)
+
+def test_batches_through_write_queue(tmp_path, file_pool, repo):
+    path = write_json(tmp_path, [fdc_food(f"Alimento {i}") for i in range(25)])
+    queue = WriteQueue(pool=file_pool)
+    progresso = []
+    result = json_importer.import_json(path, repo=repo, chunk_size=10, write_queue=queue,
+                                       progress=lambda feito, total: progresso.append((feito, total)))
+    queue.close()
+    assert result.gravados == 25
+    assert len(progresso) == 3
+    assert progresso[-1][0] == progresso[-1][1] == os.path.getsize(path)
+    assert len(repo.get_all()) == 25
+
+def test_memory_does_not_grow_with_file_size(tmp_path, repo):
+    def peak(n):
+        path = write_json(tmp_path, [fdc_food(f"Alimento {i}") for i in range(n)], name=f"f{n}.json")
+        tracemalloc.start()
+        json_importer.import_json(path, repo=repo, chunk_size=100)
+        pico = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return pico
+    pequeno, grande = peak(500), peak(5000)
+    assert grande < pequeno * 2
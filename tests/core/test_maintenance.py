@@ -0,0 +1,126 @@
+# tests/core/test_maintenance.py
+
+import pytest
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+
+# Adiciona o diretório src ao sys.path
+src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, src_path)
+
+from src.core import database, maintenance
+from src.core.migrations import migrate
+from src.core.repositories import AlimentoRepository
+from src.core.models import Alimento
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "manut.db")
+    pool = database.ConnectionPool(database_path=path, max_size=2, timeout=1.0)
+    migrate(pool.acquire())
+    repo = AlimentoRepository(pool)
+    repo.upsert_batch([Alimento(nome=f"Alimento {i}", observacoes="x" * 1000) for i in range(3000)])
+    pool.acquire().execute("DELETE FROM alimentos WHERE id % 2 = 0")
+    pool.acquire().commit()
+    pool.close_all()
+    return path
+
+@pytest.fixture
+def scheduler(db_path):
+    scheduler = maintenance.MaintenanceScheduler(db_path, step_budget_ms=50)
+    yield scheduler
+    scheduler.stop()
+
+def test_conversion_is_the_first_idle_step(scheduler):
+    mensagens = []
+    scheduler.progress = mensagens.append
+    passos = scheduler.run_pending()
+    assert (passos[0].tarefa, passos[0].passo) == ("incremental_vacuum", "conversao")
+    assert passos[0].detalhes.startswith("auto_vacuum=INCREMENTAL aplicado")
+    assert scheduler._pragma("auto_vacuum") == 2
+    assert scheduler._pragma("freelist_count") == 0 # VACUUM da conversão compacta tudo
+    assert mensagens[0].startswith("Manutenção: convertendo") and mensagens[-1].endswith("concluída.")
+    assert scheduler.convert_to_incremental(max_mb=0) # Já convertido
+
+def test_large_database_conversion_is_deferred(scheduler, monkeypatch):
+    monkeypatch.setattr(maintenance, "MAINTENANCE_MAX_CONVERSION_MB", 0)
+    passos = scheduler.run_pending()
+    assert [p.detalhes for p in passos if p.passo == "conversao"][0].startswith("adiada:")
+    assert scheduler._pragma("auto_vacuum") != 2
+    assert not scheduler.convert_to_incremental(max_mb=0)
+    assert scheduler.convert_to_incremental(max_mb=None) # Pedida explicitamente
+    assert scheduler._pragma("auto_vacuum") == 2
+
+def test_stop_interrupts_the_conversion(scheduler):
+    scheduler._stop.set()
+    assert scheduler._convert(None) == (False, "interrompida pelo encerramento da aplicação")
+    assert scheduler._pragma("auto_vacuum") != 2
+
+def test_converted_database_runs_every_task(scheduler):
+    scheduler.convert_to_incremental()
+    passos = scheduler.run_pending()
+    assert [p.tarefa for p in passos if p.passo == "fim"] == list(maintenance.TASKS)
+    assert not any(p.passo == "conversao" for p in passos)
+    assert scheduler.conn.execute("SELECT COUNT(*) AS n FROM sqlite_stat1").fetchone()["n"] > 0
+    assert scheduler.due_tasks() == []
+    # Todos os passos ficam registrados com a duração
+    registros = scheduler.conn.execute("SELECT tarefa, passo, duracao_ms FROM manutencao_log").fetchall()
+    assert len(registros) == len(passos) + 1 # Mais o registro da conversão
+    assert all(r["duracao_ms"] >= 0 for r in registros)
+
+def test_incremental_vacuum_runs_in_steps(scheduler):
+    scheduler.convert_to_incremental()
+    scheduler.run_pending()
+    conn = scheduler.conn
+    conn.execute("DELETE FROM alimentos")
+    conn.commit()
+    livres = scheduler._pragma("freelist_count")
+    assert livres > maintenance.MAINTENANCE_VACUUM_MIN_FREE_PAGES
+    scheduler._vacuum_pages = 16
+    passos = list(scheduler._task_incremental_vacuum())
+    assert len(passos) > 1
+    assert scheduler._pragma("freelist_count") < maintenance.MAINTENANCE_VACUUM_MIN_FREE_PAGES
+
+def test_tasks_become_due_after_interval(scheduler):
+    scheduler.run_pending()
+    assert scheduler.due_tasks(datetime.now() + timedelta(hours=25)) == list(maintenance.TASKS)
+
+def test_interrupted_task_is_not_marked_done(scheduler):
+    chamadas = []
+    def continuar():
+        chamadas.append(1)
+        return len(chamadas) < 6 # Usuário volta depois do primeiro passo do ANALYZE
+    passos = scheduler.run_pending(continuar)
+    assert [p.tarefa for p in passos if p.tarefa == "analyze"] == ["analyze"]
+    assert "analyze" in scheduler.due_tasks()
+    passos = scheduler.run_pending()
+    assert "analyze" in [p.tarefa for p in passos if p.passo == "fim"]
+
+def test_background_thread_runs_only_while_idle(scheduler):
+    feito = threading.Event()
+    def listener(step):
+        if step.tarefa == "optimize" and step.passo == "fim":
+            feito.set()
+    scheduler.listener = listener
+    scheduler.start()
+    assert not feito.wait(0.3) # Sem ociosidade, nada acontece
+    scheduler.set_idle(True)
+    assert feito.wait(10)
+
+def test_stop_keeps_connection_while_a_step_is_running(scheduler):
+    no_passo, liberar = threading.Event(), threading.Event()
+    def listener(step):
+        no_passo.set()
+        liberar.wait(10)
+    scheduler.listener = listener
+    scheduler.set_idle(True)
+    scheduler.start()
+    assert no_passo.wait(10)
+    thread = scheduler._thread
+    scheduler.stop(timeout=0.1)
+    assert scheduler._conn is not None # Não foi fechada debaixo da thread
+    liberar.set()
+    thread.join(10)
+    assert not thread.is_alive() and scheduler._conn is None
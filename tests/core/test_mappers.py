@@ -0,0 +1,44 @@
+# tests/core/test_mappers.py
+
+import pytest
+import os
+import sys
+
+# Adiciona o diretório src ao sys.path
+src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, src_path)
+
+from src.core import database, mappers
+from src.core.models import Alimento, Avaliacao, ItemPlanoAlimentar
+
+@pytest.fixture
+def conn():
+    conn = database.create_connection(":memory:")
+    yield conn
+    conn.close()
+
+def test_maps_by_column_name_with_extra_and_missing_columns(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT 'kg' AS sobra, 7 AS id, 'Arroz' AS nome, 1.3 AS kcal_por_unidade")
+    alimento = mappers.fetch_one_as(cursor, Alimento)
+    assert alimento == Alimento(id=7, nome="Arroz", kcal_por_unidade=1.3) # Demais campos com o padrão
+    assert alimento.unidade_padrao == "g"
+
+def test_required_field_missing_becomes_none_and_fixed_values_apply(conn):
+    cursor = conn.execute("SELECT 3 AS id, 80.5 AS peso")
+    (avaliacao,) = mappers.fetch_all_as(cursor, Avaliacao, arquivada=True)
+    assert (avaliacao.paciente_id, avaliacao.id, avaliacao.peso, avaliacao.arquivada) == (None, 3, 80.5, True)
+
+def test_mapper_is_compiled_once_per_result_shape(conn):
+    mappers.clear_cache()
+    sql = "SELECT 1 AS plano_alimentar_id, 2 AS alimento_id, 'Arroz' AS nome_alimento"
+    primeiro = mappers.row_mapper(conn.execute(sql), ItemPlanoAlimentar)
+    assert mappers.row_mapper(conn.execute(sql), ItemPlanoAlimentar) is primeiro
+    assert mappers.row_mapper(conn.execute(sql + ", 5 AS id"), ItemPlanoAlimentar) is not primeiro
+    item = mappers.fetch_one_as(conn.execute(sql), ItemPlanoAlimentar)
+    assert (item.plano_alimentar_id, item.alimento_id, item.nome_alimento) == (1, 2, "Arroz")
+
+def test_empty_result(conn):
+    cursor = conn.execute("SELECT 1 AS id WHERE 0")
+    assert mappers.fetch_one_as(cursor, Alimento) is None
+    assert mappers.fetch_all_as(conn.execute("SELECT 1 AS id WHERE 0"), Alimento) == []
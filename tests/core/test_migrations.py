@@ -0,0 +1,84 @@
+# tests/core/test_migrations.py
+
+import pytest
+import os
+import sys
+
+# Adiciona o diretório src ao sys.path
+src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, src_path)
+
+from src.core import database, migrations
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = database.create_connection(str(tmp_path / "migr.db"))
+    yield conn
+    conn.close()
+
+def _columns(conn, table):
+    return {row["name"] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+
+def _indexes(conn):
+    return {row["name"] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall()}
+
+# --- Testes para migrate ---
+
+def test_migrate_fresh_database_to_latest(conn):
+    assert migrations.get_schema_version(conn) == 0
+    version = migrations.migrate(conn)
+    assert version == migrations.latest_version()
+    assert migrations.get_schema_version(conn) == version
+    assert "dobra_tricipital" in _columns(conn, "avaliacoes")
+    assert "fibras_por_unidade" in _columns(conn, "alimentos")
+    assert "observacoes" in _columns(conn, "itens_plano_alimentar")
+    assert {"idx_avaliacoes_paciente_data", "idx_planos_paciente_data",
+            "idx_itens_plano", "idx_itens_alimento"} <= _indexes(conn)
+
+def test_migrate_is_idempotent(conn):
+    migrations.migrate(conn)
+    assert migrations.migrate(conn) == migrations.latest_version()
+
+def test_migrate_legacy_database_keeps_data(conn):
+    # Banco criado pela versão antiga (CREATE TABLE IF NOT EXISTS, user_version = 0)
+    migrations.migrate(conn, target=1)
+    conn.execute("PRAGMA user_version = 0")
+    conn.execute("INSERT INTO alimentos (nome) VALUES ('Arroz')")
+    conn.commit()
+
+    migrations.migrate(conn)
+    row = conn.execute("SELECT nome, fibras_por_unidade FROM alimentos").fetchone()
+    assert row == {"nome": "Arroz", "fibras_por_unidade": None}
+
+def test_failed_migration_rolls_back_everything(conn, monkeypatch):
+    broken = migrations.MIGRATIONS + [
+        migrations.Migration(99, "quebrada", ["CREATE TABLE nova (id INTEGER)", "SELECT * FROM tabela_inexistente"])
+    ]
+    monkeypatch.setattr(migrations, "MIGRATIONS", broken)
+    with pytest.raises(Exception):
+        migrations.migrate(conn)
+    assert migrations.get_schema_version(conn) == 0
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'pacientes'").fetchone() is None
+
+def test_hot_queries_use_indexes(conn):
+    migrations.migrate(conn)
+    plan = conn.execute("EXPLAIN QUERY PLAN SELECT * FROM avaliacoes WHERE paciente_id = ? ORDER BY data_avaliacao DESC", (1,)).fetchall()
+    details = " ".join(row["detail"] for row in plan)
+    assert "idx_avaliacoes_paciente_data" in details
+    assert "TEMP B-TREE" not in details
+
+def test_name_listings_use_sort_key_index(conn):
+    migrations.migrate(conn)
+    for sql in ["SELECT * FROM pacientes ORDER BY nome_ordenacao",
+                "SELECT * FROM alimentos ORDER BY nome_ordenacao",
+                "SELECT * FROM pacientes WHERE nome_ordenacao >= 'ag' AND nome_ordenacao < 'ah' ORDER BY nome_ordenacao"]:
+        details = " ".join(row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall())
+        assert "nome_ordenacao" in details
+        assert "TEMP B-TREE" not in details
+
+def test_sort_key_migration_backfills_existing_rows(conn):
+    migrations.migrate(conn, target=4)
+    conn.execute("INSERT INTO pacientes (nome_completo, data_nascimento) VALUES ('Ágata Lima', '1990-01-01')")
+    conn.commit()
+    migrations.migrate(conn)
+    assert conn.execute("SELECT nome_ordenacao FROM pacientes").fetchone() == {"nome_ordenacao": "agata lima"}
@@ -0,0 +1,80 @@
+# tests/core/test_models.py
+
+import pytest
+import dataclasses
+import os
+import pickle
+import sys
+import tracemalloc
+
+# Adiciona o diretório src ao sys.path
+src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, src_path)
+
+from src.core import database, mappers
+from src.core.models import (Paciente, Avaliacao, Alimento, PlanoAlimentar, ItemPlanoAlimentar,
+                             FrozenAlimento, FrozenAvaliacao, FROZEN_VARIANTS, freeze, thaw)
+
+N_LINHAS = 10_000
+
+def _com_dict(model):
+    """O mesmo modelo como dataclass comum (com __dict__), para comparação."""
+    campos = [(f.name, f.type, dataclasses.field(default=f.default)) if f.default is not dataclasses.MISSING else (f.name, f.type)
+              for f in dataclasses.fields(model)]
+    return dataclasses.make_dataclass(f"Dict{model.__name__}", campos)
+
+def _memoria(cls, linhas) -> int:
+    tracemalloc.start()
+    try:
+        objetos = [cls(*linha) for linha in linhas]
+        atual, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert len(objetos) == len(linhas)
+    return atual
+
+@pytest.mark.parametrize("model, frozen", [(Alimento, FrozenAlimento), (Avaliacao, FrozenAvaliacao)])
+def test_slotted_models_use_less_memory(model, frozen):
+    n_campos = len(dataclasses.fields(model))
+    linhas = [(i,) + (1.5,) * (n_campos - 1) for i in range(N_LINHAS)]
+    com_dict = _memoria(_com_dict(model), linhas)
+    compacto = _memoria(model, linhas)
+    imutavel = _memoria(frozen, linhas)
+    assert compacto < com_dict * 0.85
+    assert imutavel < com_dict * 0.85
+
+def test_models_have_no_instance_dict():
+    for model in FROZEN_VARIANTS:
+        assert not hasattr(model.__new__(model), "__dict__")
+    alimento = Alimento(nome="Arroz")
+    with pytest.raises(AttributeError):
+        alimento.campo_inexistente = 1
+
+def test_models_keep_dataclass_api():
+    alimento = Alimento(id=1, nome="Arroz", kcal_por_unidade=1.3)
+    alimento.nome = "Arroz integral"
+    assert dataclasses.replace(alimento, id=2).nome == "Arroz integral"
+    assert dataclasses.asdict(alimento)["kcal_por_unidade"] == 1.3
+    assert pickle.loads(pickle.dumps(alimento)) == alimento
+    assert Avaliacao(paciente_id=1, peso=70, arquivada=True).arquivada
+
+def test_frozen_variants_round_trip():
+    item = ItemPlanoAlimentar(plano_alimentar_id=1, alimento_id=2, refeicao="Almoço", quantidade=50, nome_alimento="Arroz")
+    congelado = freeze(item)
+    assert [f.name for f in dataclasses.fields(congelado)] == [f.name for f in dataclasses.fields(item)]
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        congelado.quantidade = 60
+    assert freeze(congelado) is congelado
+    assert thaw(congelado) == item
+    assert len({congelado, freeze(item)}) == 1 # Hasheável
+    assert pickle.loads(pickle.dumps(congelado)) == congelado
+    for model in (Paciente, PlanoAlimentar):
+        assert type(thaw(freeze(model(**({"paciente_id": 1} if model is PlanoAlimentar else {}))))) is model
+
+def test_mapper_builds_frozen_variant():
+    conn = database.create_connection(":memory:")
+    try:
+        alimento = mappers.fetch_one_as(conn.execute("SELECT 1 AS id, 'Arroz' AS nome"), FrozenAlimento)
+    finally:
+        conn.close()
+    assert alimento == FrozenAlimento(id=1, nome="Arroz")
@@ -0,0 +1,97 @@
+# tests/core/test_plan_nutrients.py
+
+import pytest
+import os
+import sys
+
+import numpy as np
+
+# Adiciona o diretório src ao sys.path
+src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, src_path)
+
+from src.core import services
+from src.core.food_catalog import FoodCatalog
+from src.core.repositories import AlimentoRepository, PacienteRepository, PlanoAlimentarRepository, ItemPlanoAlimentarRepository
+from src.core.models import Alimento, Paciente, PlanoAlimentar, ItemPlanoAlimentar
+
+@pytest.fixture
+def catalog(file_pool):
+    repo = AlimentoRepository(file_pool)
+    repo.add(Alimento(nome="Arroz", kcal_por_unidade=1.28, cho_por_unidade=0.28, ptn_por_unidade=0.025, lip_por_unidade=0.002))
+    repo.add(Alimento(nome="Leite", unidade_padrao="ml", kcal_por_unidade=0.6, ptn_por_unidade=0.032))
+    repo.add(Alimento(nome="Ovo", unidade_padrao="unidade", kcal_por_unidade=70, ptn_por_unidade=6.3, lip_por_unidade=4.8))
+    catalog = FoodCatalog(file_pool)
+    catalog.refresh()
+    return catalog
+
+def test_per_item_per_meal_and_totals(catalog):
+    calculo = services.calcular_nutrientes_plano(
+        alimento_ids=[1, 2, 3, 1],
+        quantidades=[150, 0.2, 2, 0.1],
+        unidades=["g", "L", "unidade", "kg"], # Litro e quilo convertidos para a unidade padrão
+        refeicoes=["Almoço", "Café da Manhã", "Café da Manhã", "Jantar"],
+        catalog=catalog)
+    assert calculo.itens[:, 0].tolist() == pytest.approx([192.0, 120.0, 140.0, 128.0])
+    assert calculo.itens[1].tolist() == pytest.approx([120.0, 0.0, 6.4, 0.0]) # Valores não informados valem 0
+    assert calculo.refeicoes == ["Almoço", "Café da Manhã", "Jantar"]
+    assert calculo.por_refeicao[:, 0].tolist() == pytest.approx([192.0, 260.0, 128.0])
+    assert calculo.totais()["kcal"] == pytest.approx(580.0)
+    assert calculo.totais_por_refeicao()["Café da Manhã"]["ptn"] == pytest.approx(6.4 + 12.6)
+
+def test_missing_food_unknown_unit_and_empty_plan(catalog, caplog):
+    calculo = services.calcular_nutrientes_plano([1, 99], [100, 50], ["xícara", "g"], catalog=catalog)
+    assert calculo.encontrados.tolist() == [True, False]
+    assert calculo.itens[:, 0].tolist() == pytest.approx([128.0, 0.0]) # Sem conversão: usa a unidade padrão
+    assert "sem conversão" in caplog.text
+    vazio = services.calcular_nutrientes_plano([], [], [], refeicoes=[], catalog=catalog)
+    assert vazio.itens.shape == (0, 4) and vazio.totais() == {"kcal": 0.0, "cho": 0.0, "ptn": 0.0, "lip": 0.0}
+
+def test_values_given_directly_match_catalog(catalog):
+    ids, quantidades, unidades = [3, 1], [1, 2], ["unidade", None]
+    direto = services.calcular_nutrientes(catalog.valores[catalog.rows_for(ids)], ["unidade", "g"], quantidades, unidades)
+    assert np.allclose(direto.itens, services.calcular_nutrientes_plano(ids, quantidades, unidades, catalog=catalog).itens)
+
+def test_batch_recalculates_stored_plans(file_pool, catalog):
+    paciente_id = PacienteRepository(file_pool).add(Paciente(nome_completo="Ana", data_nascimento="1990-01-01"))
+    planos, itens = PlanoAlimentarRepository(file_pool), ItemPlanoAlimentarRepository(file_pool)
+    n_planos = 200
+    ids_planos = [planos.add(PlanoAlimentar(paciente_id=paciente_id, nome_plano=f"Plano {n}")) for n in range(n_planos)]
+    itens.add_batch([ItemPlanoAlimentar(plano_alimentar_id=plano_id, alimento_id=alimento_id, refeicao="Almoço",
+                                        quantidade=100, unidade_medida="g", kcal_calculado=1.0)
+                     for plano_id in ids_planos for alimento_id in (1, 2, 3)])
+    # Lotes de 7 itens: os itens de um plano ficam divididos entre lotes
+    result = services.recalcular_planos(file_pool, catalog=catalog, chunk_size=7)
+    assert (result.planos, result.itens, result.atualizados) == (n_planos, 3 * n_planos, 3 * n_planos)
+    assert all(totais["kcal"] == pytest.approx(128.0 + 60.0 + 7000.0) for totais in result.totais_por_plano.values())
+    assert itens.get_by_plano_id(ids_planos[-1])[0].kcal_calculado == pytest.approx(128.0)
+    # Nada mudou: nenhuma escrita
+    assert services.recalcular_planos(file_pool, catalog=catalog).atualizados == 0
+
+def test_batch_recalculates_only_the_corrected_food(file_pool, catalog):
+    paciente_id = PacienteRepository(file_pool).add(Paciente(nome_completo="Ana", data_nascimento="1990-01-01"))
+    plano_id = PlanoAlimentarRepository(file_pool).add(PlanoAlimentar(paciente_id=paciente_id, nome_plano="Plano"))
+    itens = ItemPlanoAlimentarRepository(file_pool)
+    itens.add_batch([ItemPlanoAlimentar(plano_alimentar_id=plano_id, alimento_id=alimento_id, quantidade=100, unidade_medida="g")
+                     for alimento_id in (1, 2, 1)])
+    result = services.recalcular_planos(file_pool, catalog=catalog, alimento_id=1, chunk_size=1)
+    assert (result.itens, result.atualizados) == (2, 2)
+    assert result.totais_por_plano[plano_id]["kcal"] == pytest.approx(256.0)
+    assert [item.kcal_calculado for item in itens.get_by_plano_id(plano_id)] == [pytest.approx(128.0), None, pytest.approx(128.0)]
+
+def test_items_with_joined_foods_match_catalog(file_pool, catalog):
+    paciente_id = PacienteRepository(file_pool).add(Paciente(nome_completo="Ana", data_nascimento="1990-01-01"))
+    plano_id = PlanoAlimentarRepository(file_pool).add(PlanoAlimentar(paciente_id=paciente_id, nome_plano="Plano"))
+    repo = ItemPlanoAlimentarRepository(file_pool)
+    repo.add_batch([ItemPlanoAlimentar(plano_alimentar_id=plano_id, alimento_id=alimento_id, refeicao=refeicao, quantidade=qtd, unidade_medida=und)
+                    for alimento_id, refeicao, qtd, und in ((1, "Almoço", 0.2, "kg"), (2, "Ceia", 200, "ml"), (3, "Almoço", 2, "unidade"))])
+    pares = repo.get_by_plano_id_with_alimentos(plano_id)
+    itens = [item for item, _ in pares]
+    calculo = services.calcular_nutrientes_itens(itens, [alimento for _, alimento in pares])
+    pelo_catalogo = services.calcular_nutrientes_plano([i.alimento_id for i in itens], [i.quantidade for i in itens],
+                                                       [i.unidade_medida for i in itens], [i.refeicao for i in itens], catalog=catalog)
+    assert np.allclose(calculo.itens, pelo_catalogo.itens)
+    assert calculo.refeicoes == pelo_catalogo.refeicoes == ["Almoço", "Ceia"]
+    assert np.allclose(calculo.por_refeicao, pelo_catalogo.por_refeicao)
+    sem_alimento = services.calcular_nutrientes_itens(itens[:1], [None])
+    assert sem_alimento.encontrados.tolist() == [False] and sem_alimento.totais()["kcal"] == 0
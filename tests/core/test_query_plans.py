@@ -0,0 +1,63 @@
+# tests/core/test_query_plans.py
+
+import pytest
+import os
+import sys
+
+# Adiciona o diretório src ao sys.path
+src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, src_path)
+
+from src.core import database, query_audit
+
+# Consultas que podem ordenar em memória, com o motivo
+TEMP_BTREE_PERMITIDO = {
+    "AlimentoRepository.search_by_name": "ordenação por relevância (bm25) só existe após o MATCH",
+}
+
+STATEMENTS = query_audit.collect_statements()
+
+@pytest.fixture(scope="module")
+def seeded_conn():
+    conn = database.create_connection(":memory:")
+    query_audit.seed_database(conn)
+    yield conn
+    conn.close()
+
+def _audited(conn, origem):
+    plans = [query_audit.explain(conn, q) for q in query_audit.collect_statements() if q.origem == origem]
+    assert plans, f"Nenhum SQL encontrado em {origem}"
+    return plans
+
+def test_collects_repository_statements():
+    origens = {q.origem for q in STATEMENTS}
+    assert "ItemPlanoAlimentarRepository.get_by_plano_id" in origens
+    assert "PacienteRepository.delete" in origens
+
+@pytest.mark.parametrize("query", STATEMENTS, ids=lambda q: f"{q.origem}:{q.lineno}")
+def test_filtered_query_does_not_scan(seeded_conn, query):
+    plan = query_audit.explain(seeded_conn, query)
+    assert not plan.is_full_scan_regression, (
+        f"{plan.origem} (linha {plan.lineno}) passou a varrer a tabela inteira:\n"
+        + query_audit.format_report([plan]))
+
+@pytest.mark.parametrize("query", STATEMENTS, ids=lambda q: f"{q.origem}:{q.lineno}")
+def test_query_does_not_sort_in_memory(seeded_conn, query):
+    plan = query_audit.explain(seeded_conn, query)
+    if plan.origem in TEMP_BTREE_PERMITIDO:
+        pytest.skip(TEMP_BTREE_PERMITIDO[plan.origem])
+    assert not plan.temp_btrees, (
+        f"{plan.origem} (linha {plan.lineno}) passou a ordenar em memória:\n"
+        + query_audit.format_report([plan]))
+
+def test_get_by_plano_id_uses_plan_index(seeded_conn):
+    (plan,) = _audited(seeded_conn, "ItemPlanoAlimentarRepository.get_by_plano_id")
+    assert any("idx_itens_plano" in passo for passo in plan.plano)
+    assert any("alimentos" in passo or "SEARCH a " in passo for passo in plan.searches)
+
+def test_paciente_delete_subquery_uses_indexes(seeded_conn):
+    subquery = [p for p in _audited(seeded_conn, "PacienteRepository.delete") if "IN (SELECT" in p.sql]
+    assert len(subquery) == 1
+    detalhes = " ".join(subquery[0].plano)
+    assert "idx_itens_plano" in detalhes
+    assert "idx_planos_paciente_data" in detalhes
@@ -4,9 +4,10 @@ import pytest
 import os
 import sys
 import datetime
+import dataclasses
 
 # Adiciona o diretório src ao sys.path para permitir importações relativas
-src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), \"..\", \"..\"))
+src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 sys.path.insert(0, src_path)
 
 from src.core.models import Paciente, Avaliacao, Alimento, PlanoAlimentar, ItemPlanoAlimentar
@@ -15,18 +16,12 @@ from src.core.repositories import (
     PlanoAlimentarRepository, ItemPlanoAlimentarRepository
 )
 from src.core import database
-from src.config import DATABASE_PATH
 
-# Fixture para garantir que o banco de dados esteja limpo antes de cada teste
+# Cada teste roda numa cópia em memória do banco-modelo já migrado e com as linhas
+# de base (ver conftest.py): o banco real em data/ nunca é tocado
 @pytest.fixture(autouse=True)
-def setup_teardown_database():
-    if os.path.exists(DATABASE_PATH):
-        os.remove(DATABASE_PATH)
-    # É crucial inicializar o DB *antes* de cada teste
-    assert database.initialize_database() is True, "Falha ao inicializar banco de dados para teste"
+def setup_teardown_database(seeded_db):
     yield
-    # if os.path.exists(DATABASE_PATH):
-    #     os.remove(DATABASE_PATH)
 
 # --- Fixtures para Repositórios ---
 @pytest.fixture
@@ -50,52 +45,47 @@ def item_plano_repo():
     return ItemPlanoAlimentarRepository()
 
 # --- Fixtures para Dados de Exemplo ---
+# Linhas gravadas uma vez no banco-modelo (conftest.seeded_template)
 @pytest.fixture
-def sample_paciente(paciente_repo) -> Paciente:
-    """Cria e retorna um paciente de exemplo já salvo no banco."""
-    paciente_data = {
-        "nome_completo": "Paciente Teste Base",
-        "data_nascimento": "1988-03-10",
-        "email": "paciente.base@teste.com"
-    }
-    paciente = Paciente(**paciente_data)
-    paciente_id = paciente_repo.add(paciente)
-    assert paciente_id is not None
-    paciente.id = paciente_id
-    return paciente
+def sample_paciente(paciente_repo, seeded_db) -> Paciente:
+    """Paciente de exemplo já salvo no banco."""
+    return paciente_repo.get_by_id(seeded_db["paciente"])
 
 @pytest.fixture
-def sample_alimento(alimento_repo) -> Alimento:
-    """Cria e retorna um alimento de exemplo já salvo."""
-    alimento_data = {
-        "nome": "Maçã Fuji", "grupo": "Frutas", "unidade_padrao": "g",
-        "kcal_por_unidade": 52, "cho_por_unidade": 14, "ptn_por_unidade": 0.3, 
-        "lip_por_unidade": 0.2, "fonte_dados": "TACO"
-    }
-    alimento = Alimento(**alimento_data)
-    alimento_id = alimento_repo.add(alimento)
-    assert alimento_id is not None
-    alimento.id = alimento_id
-    return alimento
+def sample_alimento(alimento_repo, seeded_db) -> Alimento:
+    """Alimento de exemplo já salvo."""
+    return alimento_repo.get_by_id(seeded_db["alimento"])
 
 @pytest.fixture
-def sample_plano(plano_repo, sample_paciente) -> PlanoAlimentar:
-    """Cria e retorna um plano alimentar de exemplo já salvo."""
-    plano_data = {
-        "paciente_id": sample_paciente.id,
-        "nome_plano": "Plano Teste Inicial",
-        "data_criacao": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "objetivo": "Manutenção"
-    }
-    plano = PlanoAlimentar(**plano_data)
-    plano_id = plano_repo.add(plano)
-    assert plano_id is not None
-    plano.id = plano_id
-    return plano
+def sample_plano(plano_repo, seeded_db) -> PlanoAlimentar:
+    """Plano alimentar de exemplo (do paciente de exemplo) já salvo."""
+    return plano_repo.get_by_id(seeded_db["plano"])
 
 # --- Testes para PacienteRepository (já existentes, omitidos para brevidade) ---
 # ... (testes anteriores de PacienteRepository aqui) ...
 
+def test_get_all_pacientes_ignores_accents_and_case(paciente_repo):
+    for nome in ["Zilda Souza", "Ágata Lima", "bruno Costa", "Álvaro Dias"]:
+        assert paciente_repo.add(Paciente(nome_completo=nome, data_nascimento="1990-01-01")) is not None
+    nomes = [p.nome_completo for p in paciente_repo.get_all()]
+    assert nomes == ["Ágata Lima", "Álvaro Dias", "bruno Costa", "Paciente Teste Base", "Zilda Souza"]
+
+def test_search_pacientes_by_name_prefix(paciente_repo, sample_paciente):
+    paciente_repo.add(Paciente(nome_completo="Ágata Lima", data_nascimento="1990-01-01"))
+    paciente_repo.add(Paciente(nome_completo="Agenor Prado", data_nascimento="1970-05-02"))
+    paciente_repo.add(Paciente(nome_completo="Bruno Costa", data_nascimento="1985-07-03"))
+
+    nomes = [p.nome_completo for p in paciente_repo.search_by_name_prefix("ag")]
+    assert nomes == ["Ágata Lima", "Agenor Prado"]
+    assert [p.nome_completo for p in paciente_repo.search_by_name_prefix("ÁGATA")] == ["Ágata Lima"]
+    assert [p.nome_completo for p in paciente_repo.search_by_name_prefix("ag", limit=1)] == ["Ágata Lima"]
+    assert [p.nome_completo for p in paciente_repo.search_by_name_prefix("  ", limit=2)] == ["Ágata Lima", "Agenor Prado"]
+
+def test_update_paciente_refreshes_sort_key(paciente_repo, sample_paciente):
+    sample_paciente.nome_completo = "Úrsula Teste"
+    assert paciente_repo.update(sample_paciente) is True
+    assert paciente_repo.get_by_id(sample_paciente.id).nome_ordenacao == "ursula teste"
+
 # --- Testes para AvaliacaoRepository ---
 
 def test_add_avaliacao(avaliacao_repo, sample_paciente):
@@ -190,10 +180,8 @@ def test_search_alimento_by_name(alimento_repo, sample_alimento):
     alimento_repo.add(Alimento(nome="Pera Williams"))
 
     results = alimento_repo.search_by_name("Maçã")
-    assert len(results) == 3
-    assert results[0].nome == "Maçã Fuji"
-    assert results[1].nome == "Maçã Verde"
-    assert results[2].nome == "Suco de Maçã"
+    assert len(results) == 3 # Ordenados por relevância (bm25), não alfabeticamente
+    assert {a.nome for a in results} == {"Maçã Fuji", "Maçã Verde", "Suco de Maçã"}
 
     results_exact = alimento_repo.search_by_name("Maçã Fuji")
     assert len(results_exact) == 1
@@ -201,6 +189,22 @@ def test_search_alimento_by_name(alimento_repo, sample_alimento):
     results_none = alimento_repo.search_by_name("Inexistente")
     assert len(results_none) == 0
 
+def test_search_alimento_ignores_accents_and_ranks(alimento_repo):
+    alimento_repo.add(Alimento(nome="Tutu de Feijão com Bacon e Couve"))
+    alimento_repo.add(Alimento(nome="Feijão Carioca Cozido"))
+    alimento_repo.add(Alimento(nome="Arroz Branco"))
+
+    results = alimento_repo.search_by_name("feijao")
+    assert [a.nome for a in results] == ["Feijão Carioca Cozido", "Tutu de Feijão com Bacon e Couve"]
+    # Prefixo enquanto o usuário digita
+    assert [a.nome for a in alimento_repo.search_by_name("feij car")] == ["Feijão Carioca Cozido"]
+
+def test_search_alimento_follows_updates(alimento_repo, sample_alimento):
+    sample_alimento.nome = "Pêra Williams"
+    assert alimento_repo.update(sample_alimento) is True
+    assert alimento_repo.search_by_name("maca") == []
+    assert [a.id for a in alimento_repo.search_by_name("pera")] == [sample_alimento.id]
+
 def test_update_alimento(alimento_repo, sample_alimento):
     sample_alimento.kcal_por_unidade = 55
     sample_alimento.grupo = "Frutas Vermelhas" # Errado, mas para testar update
@@ -242,7 +246,7 @@ def test_get_planos_by_paciente_id(plano_repo, sample_paciente):
     plano_repo.add(PlanoAlimentar(paciente_id=sample_paciente.id, nome_plano="Plano A"))
     plano_repo.add(PlanoAlimentar(paciente_id=sample_paciente.id, nome_plano="Plano B"))
     planos = plano_repo.get_by_paciente_id(sample_paciente.id)
-    assert len(planos) == 2 # Mais o sample_plano criado na fixture
+    assert len(planos) == 3 # Mais o plano de base do banco-modelo
     # A ordem depende da data de criação, difícil prever exatamente sem controlar o tempo
 
 def test_update_plano(plano_repo, sample_plano):
@@ -295,8 +299,8 @@ def test_get_itens_by_plano_id(item_plano_repo, sample_plano, sample_alimento):
     
     itens = item_plano_repo.get_by_plano_id(sample_plano.id)
     assert len(itens) == 2
-    assert itens[0].refeicao == "Almoço" # Ordem alfabética da refeição? Ou ID? Verificar query ORDER BY
-    assert itens[1].refeicao == "Café"
+    assert itens[0].refeicao == "Café" # Ordem de inclusão (ORDER BY i.id)
+    assert itens[1].refeicao == "Almoço"
     assert itens[0].nome_alimento == sample_alimento.nome
 
 def test_update_item_plano(item_plano_repo, sample_plano, sample_alimento):
@@ -329,12 +333,84 @@ def test_delete_itens_by_plano_id(item_plano_repo, sample_plano, sample_alimento
     item_plano_repo.add(ItemPlanoAlimentar(plano_alimentar_id=sample_plano.id, refeicao="B", alimento_id=sample_alimento.id, quantidade=100, unidade_medida="g"))
     assert len(item_plano_repo.get_by_plano_id(sample_plano.id)) == 2
 
-    success = item_plano_repo.delete_by_plano_id(sample_plano.id)
-    assert success is True
+    deleted_count = item_plano_repo.delete_by_plano_id(sample_plano.id)
+    assert deleted_count == 2
     assert len(item_plano_repo.get_by_plano_id(sample_plano.id)) == 0
 
+def test_save_changes_applies_only_the_diff(item_plano_repo, sample_plano, sample_alimento):
+    itens = [ItemPlanoAlimentar(plano_alimentar_id=sample_plano.id, refeicao=f"R{i}", alimento_id=sample_alimento.id, quantidade=100, unidade_medida="g")
+             for i in range(5)]
+    assert item_plano_repo.add_batch(itens)
+    originais = item_plano_repo.get_by_plano_id(sample_plano.id)
+    ids_originais = [item.id for item in originais]
+
+    editados = [dataclasses.replace(item) for item in originais]
+    editados[1].quantidade = 150 # Alterado
+    del editados[3] # Removido
+    editados.append(ItemPlanoAlimentar(plano_alimentar_id=None, refeicao="Ceia", alimento_id=sample_alimento.id, quantidade=30, unidade_medida="g"))
+
+    alteracoes = item_plano_repo.save_changes(sample_plano.id, originais, editados)
+    assert alteracoes == {"inseridos": 1, "atualizados": 1, "excluidos": 1}
+
+    gravados = {item.id: item for item in item_plano_repo.get_by_plano_id(sample_plano.id)}
+    assert len(gravados) == 5
+    assert ids_originais[3] not in gravados
+    # Itens mantidos preservam o id (sem apagar e reinserir)
+    assert all(item_id in gravados for i, item_id in enumerate(ids_originais) if i != 3)
+    assert gravados[ids_originais[1]].quantidade == 150
+    assert any(item.refeicao == "Ceia" for item in gravados.values())
+
+def test_save_changes_without_edits_writes_nothing(item_plano_repo, sample_plano, sample_alimento):
+    assert item_plano_repo.add_batch([ItemPlanoAlimentar(plano_alimentar_id=sample_plano.id, refeicao="A", alimento_id=sample_alimento.id, quantidade=1, unidade_medida="un")])
+    originais = item_plano_repo.get_by_plano_id(sample_plano.id)
+    editados = [dataclasses.replace(item) for item in originais]
+    assert item_plano_repo.save_changes(sample_plano.id, originais, editados) == {"inseridos": 0, "atualizados": 0, "excluidos": 0}
+
+def test_save_changes_is_atomic(item_plano_repo, sample_plano, sample_alimento):
+    assert item_plano_repo.add_batch([ItemPlanoAlimentar(plano_alimentar_id=sample_plano.id, refeicao="A", alimento_id=sample_alimento.id, quantidade=1, unidade_medida="un")])
+    originais = item_plano_repo.get_by_plano_id(sample_plano.id)
+    # Remove o item existente e tenta incluir um com alimento inexistente (FK): nada deve mudar
+    editados = [ItemPlanoAlimentar(plano_alimentar_id=None, refeicao="B", alimento_id=99999, quantidade=1, unidade_medida="un")]
+    with pytest.raises(Exception):
+        item_plano_repo.save_changes(sample_plano.id, originais, editados)
+    assert [item.id for item in item_plano_repo.get_by_plano_id(sample_plano.id)] == [originais[0].id]
+
 # Teste para ON DELETE CASCADE (Plano -> Itens) e ON DELETE RESTRICT (Alimento -> Itens)
 
+def test_get_by_plano_id_with_alimentos_in_one_query(item_plano_repo, alimento_repo, sample_plano, sample_alimento):
+    leite_id = alimento_repo.add(Alimento(nome="Leite", unidade_padrao="ml", kcal_por_unidade=0.6, sodio_mg_por_unidade=0.4))
+    assert item_plano_repo.add_batch([
+        ItemPlanoAlimentar(plano_alimentar_id=sample_plano.id, refeicao="Lanche", alimento_id=alimento_id, quantidade=100, unidade_medida="g", observacoes="obs item")
+        for alimento_id in (sample_alimento.id, leite_id)])
+    comandos = []
+    item_plano_repo.conn.set_trace_callback(comandos.append)
+    try:
+        pares = item_plano_repo.get_by_plano_id_with_alimentos(sample_plano.id)
+    finally:
+        item_plano_repo.conn.set_trace_callback(None)
+    assert len(comandos) == 1
+    (item, maca), (_, leite) = pares
+    assert item.nome_alimento == "Maçã Fuji" and item.observacoes == "obs item"
+    # Observações do item não se misturam às do alimento (a chave de ordenação não é lida)
+    assert maca == dataclasses.replace(sample_alimento, nome_ordenacao=None)
+    assert (leite.id, leite.unidade_padrao, leite.sodio_mg_por_unidade) == (leite_id, "ml", 0.4)
+
+def test_get_many_returns_mapping_in_chunks(monkeypatch, alimento_repo, paciente_repo, plano_repo, sample_plano):
+    from src.core import repositories
+    ids = [alimento_repo.add(Alimento(nome=f"Alimento {i}")) for i in range(7)]
+    monkeypatch.setattr(repositories, "SQL_IN_CHUNK_SIZE", 3)
+    comandos = []
+    alimento_repo.conn.set_trace_callback(comandos.append)
+    try:
+        alimentos = alimento_repo.get_many(ids + [ids[0], None, 99999])
+    finally:
+        alimento_repo.conn.set_trace_callback(None)
+    assert len(comandos) == 3 # 7 ids distintos em lotes de 3 (repetidos e None ignorados)
+    assert sorted(alimentos) == ids and alimentos[ids[4]].nome == "Alimento 4"
+    assert alimento_repo.get_many([]) == {}
+    assert paciente_repo.get_many([sample_plano.paciente_id])[sample_plano.paciente_id].nome_completo == "Paciente Teste Base"
+    assert plano_repo.get_many((sample_plano.id, 99999)) == {sample_plano.id: plano_repo.get_by_id(sample_plano.id)}
+
 def test_delete_plano_cascades_to_itens(plano_repo, item_plano_repo, sample_plano, sample_alimento):
     item_id = item_plano_repo.add(ItemPlanoAlimentar(plano_alimentar_id=sample_plano.id, refeicao="C", alimento_id=sample_alimento.id, quantidade=1, unidade_medida="un"))
     assert item_id is not None
@@ -0,0 +1,72 @@
+# tests/core/test_repository_iterators.py
+
+import pytest
+import os
+import sys
+import types
+
+# Adiciona o diretório src ao sys.path
+src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, src_path)
+
+from src.core import repositories
+from src.core.models import Paciente, Avaliacao, Alimento, PlanoAlimentar, ItemPlanoAlimentar
+
+@pytest.fixture
+def uow(file_pool):
+    uow = repositories.UnitOfWork(file_pool)
+    alimento_id = uow.alimentos.add(Alimento(nome="Arroz", kcal_por_unidade=1.3))
+    for i in range(3):
+        paciente_id = uow.pacientes.add(Paciente(nome_completo=f"Paciente {i}", data_nascimento="1990-01-01"))
+        for d in range(4):
+            uow.avaliacoes.add(Avaliacao(paciente_id=paciente_id, data_avaliacao=f"2024-01-0{d + 1}", peso=70 + d))
+        for p in range(2):
+            plano_id = uow.planos.add(PlanoAlimentar(paciente_id=paciente_id, nome_plano=f"Plano {p}", data_criacao=f"2024-02-0{p + 1}"))
+            uow.itens_plano.add_batch([ItemPlanoAlimentar(plano_alimentar_id=plano_id, alimento_id=alimento_id, refeicao="Almoço",
+                                                          quantidade=10 * (n + 1), unidade_medida="g") for n in range(3)])
+    return uow
+
+@pytest.fixture
+def fetch_sizes(monkeypatch):
+    """Registra o tamanho de lote pedido a cada chamada de iter_rows."""
+    sizes = []
+    original = repositories.iter_rows
+    def spy(cursor, size):
+        sizes.append(size)
+        return original(cursor, size)
+    monkeypatch.setattr(repositories, "iter_rows", spy)
+    return sizes
+
+def test_iter_all_matches_get_all(uow):
+    assert sorted(p.id for p in uow.pacientes.iter_all()) == sorted(p.id for p in uow.pacientes.get_all())
+    assert [a.nome for a in uow.alimentos.iter_all()] == ["Arroz"]
+    assert len(list(uow.avaliacoes.iter_all())) == 12
+    assert len(list(uow.planos.iter_all())) == 6
+    itens = list(uow.itens_plano.iter_all())
+    assert len(itens) == 18
+    assert all(i.nome_alimento == "Arroz" for i in itens)
+
+def test_iter_by_paciente_keeps_order_of_get(uow):
+    paciente_id = uow.pacientes.get_all()[1].id
+    assert list(uow.avaliacoes.iter_by_paciente_id(paciente_id, chunk_size=3)) == uow.avaliacoes.get_by_paciente_id(paciente_id)
+    assert list(uow.planos.iter_by_paciente_id(paciente_id, chunk_size=1)) == uow.planos.get_by_paciente_id(paciente_id)
+
+def test_items_by_plano_and_by_paciente(uow):
+    paciente_id = uow.pacientes.get_all()[0].id
+    planos = uow.planos.get_by_paciente_id(paciente_id)
+    esperado = [item for plano in planos for item in uow.itens_plano.get_by_plano_id(plano.id)]
+    assert list(uow.itens_plano.iter_by_paciente_id(paciente_id, chunk_size=2)) == esperado
+    assert list(uow.itens_plano.iter_by_plano_id(planos[0].id)) == uow.itens_plano.get_by_plano_id(planos[0].id)
+
+def test_generators_are_lazy_and_use_chunk_size(uow, fetch_sizes):
+    gen = uow.avaliacoes.iter_all(chunk_size=5)
+    assert isinstance(gen, types.GeneratorType)
+    assert fetch_sizes == [] # Nada é consultado antes da primeira iteração
+    primeira = next(gen)
+    assert isinstance(primeira, Avaliacao)
+    assert fetch_sizes == [5]
+    assert len(list(gen)) == 11
+
+def test_default_chunk_size_comes_from_config(uow, fetch_sizes):
+    list(uow.pacientes.iter_all())
+    assert fetch_sizes == [repositories.FETCH_CHUNK_SIZE]
@@ -6,7 +6,7 @@ import sys
 import math
 
 # Adiciona o diretório src ao sys.path
-src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), \'..\', \'..\'))
+src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
 sys.path.insert(0, src_path)
 
 from src.core import services
@@ -14,12 +14,12 @@ from src.core import services
 # --- Testes para calcular_imc --- 
 
 @pytest.mark.parametrize("peso, altura, expected_imc, expected_class", [
-    (70, 1.75, (22.86, "Peso normal")),
-    (50, 1.70, (17.3, "Abaixo do peso")),
-    (85, 1.75, (27.76, "Sobrepeso")),
-    (100, 1.80, (30.86, "Obesidade Grau I")),
-    (120, 1.70, (41.52, "Obesidade Grau II")),
-    (150, 1.85, (43.84, "Obesidade Grau III")),
+    (70, 1.75, 22.86, "Peso normal"),
+    (50, 1.70, 17.3, "Abaixo do peso"),
+    (85, 1.75, 27.76, "Sobrepeso"),
+    (100, 1.80, 30.86, "Obesidade Grau I"),
+    (120, 1.70, 41.52, "Obesidade Grau III"),
+    (150, 1.85, 43.83, "Obesidade Grau III"),
 ])
 def test_calcular_imc_valid(peso, altura, expected_imc, expected_class):
     imc, classificacao = services.calcular_imc(peso_kg=peso, altura_m=altura)
@@ -42,7 +42,7 @@ def test_calcular_imc_invalid_input(peso, altura):
 
 @pytest.mark.parametrize("sexo, peso, altura_cm, idade, expected_geb", [
     ("Masculino", 80, 180, 30, 1860.14),
-    ("Feminino", 60, 165, 25, 1390.97),
+    ("Feminino", 60, 165, 25, 1405.33),
     ("m", 95, 190, 45, 2018.94),
     ("f", 55, 160, 50, 1241.12),
 ])
@@ -65,8 +65,8 @@ def test_calcular_geb_harris_benedict_invalid_input(sexo, peso, altura_cm, idade
 
 @pytest.mark.parametrize("sexo, peso, altura_cm, idade, expected_geb", [
     ("Masculino", 80, 180, 30, 1780.00),
-    ("Feminino", 60, 165, 25, 1307.50),
-    ("m", 95, 190, 45, 1862.50),
+    ("Feminino", 60, 165, 25, 1345.25),
+    ("m", 95, 190, 45, 1917.50),
     ("f", 55, 160, 50, 1139.00),
 ])
 def test_calcular_geb_mifflin_st_jeor_valid(sexo, peso, altura_cm, idade, expected_geb):
@@ -0,0 +1,72 @@
+# tests/core/test_unit_of_work.py
+
+import pytest
+import os
+import sys
+
+# Adiciona o diretório src ao sys.path
+src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, src_path)
+
+from src.core import database
+from src.core.repositories import UnitOfWork, PlanoAlimentarRepository
+from src.core.models import Paciente, Alimento, PlanoAlimentar, ItemPlanoAlimentar
+
+@pytest.fixture
+def ids(file_pool):
+    uow = UnitOfWork(file_pool)
+    paciente_id = uow.pacientes.add(Paciente(nome_completo="Ana", data_nascimento="1990-01-01"))
+    alimento_id = uow.alimentos.add(Alimento(nome="Arroz", kcal_por_unidade=1.3))
+    return paciente_id, alimento_id
+
+def count(file_pool, table):
+    other = database.create_connection(file_pool.database_path)
+    try:
+        return other.execute(f"SELECT COUNT(*) AS n FROM {table}").fetchone()["n"]
+    finally:
+        other.close()
+
+def novo_item(alimento_id, plano_id=None):
+    return ItemPlanoAlimentar(plano_alimentar_id=plano_id, refeicao="Almoço", alimento_id=alimento_id,
+                              quantidade=100, unidade_medida="g")
+
+def test_commits_once_on_exit(file_pool, ids):
+    paciente_id, alimento_id = ids
+    with UnitOfWork(file_pool) as uow:
+        plano_id = uow.planos.add(PlanoAlimentar(paciente_id=paciente_id, nome_plano="Plano"))
+        uow.itens_plano.add_batch([novo_item(alimento_id, plano_id), novo_item(alimento_id, plano_id)])
+        # Ainda não gravado: outra conexão não enxerga o plano
+        assert count(file_pool, "planos_alimentares") == 0
+    assert count(file_pool, "planos_alimentares") == 1
+    assert count(file_pool, "itens_plano_alimentar") == 2
+
+def test_failure_rolls_back_every_repository(file_pool, ids):
+    paciente_id, alimento_id = ids
+    with pytest.raises(Exception):
+        with UnitOfWork(file_pool) as uow:
+            plano_id = uow.planos.add(PlanoAlimentar(paciente_id=paciente_id, nome_plano="Plano"))
+            uow.itens_plano.add_batch([novo_item(alimento_id, plano_id), novo_item(9999, plano_id)]) # FK inválida
+    assert count(file_pool, "planos_alimentares") == 0
+    assert count(file_pool, "itens_plano_alimentar") == 0
+
+def test_repositories_outside_session_participate(file_pool, ids):
+    paciente_id, _ = ids
+    plano_repo = PlanoAlimentarRepository(pool=file_pool)
+    with pytest.raises(RuntimeError):
+        with UnitOfWork(file_pool):
+            plano_repo.add(PlanoAlimentar(paciente_id=paciente_id, nome_plano="Plano"))
+            raise RuntimeError("cancelado")
+    assert plano_repo.get_by_paciente_id(paciente_id) == []
+
+def test_edit_replaces_items_atomically(file_pool, ids):
+    paciente_id, alimento_id = ids
+    with UnitOfWork(file_pool) as uow:
+        plano_id = uow.planos.add(PlanoAlimentar(paciente_id=paciente_id, nome_plano="Plano"))
+        uow.itens_plano.add_batch([novo_item(alimento_id, plano_id)])
+    with pytest.raises(Exception):
+        with UnitOfWork(file_pool) as uow:
+            uow.planos.update(PlanoAlimentar(id=plano_id, paciente_id=paciente_id, nome_plano="Editado"))
+            uow.itens_plano.delete_by_plano_id(plano_id)
+            uow.itens_plano.add_batch([novo_item(9999, plano_id)])
+    assert uow.planos.get_by_id(plano_id).nome_plano == "Plano"
+    assert len(uow.itens_plano.get_by_plano_id(plano_id)) == 1
@@ -0,0 +1,100 @@
+# tests/core/test_write_queue.py
+
+import pytest
+import os
+import sys
+import threading
+
+# Adiciona o diretório src ao sys.path
+src_path = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, src_path)
+
+from src.core import database
+from src.core.repositories import AlimentoRepository
+from src.core.models import Alimento
+from src.core.write_queue import WriteQueue
+
+@pytest.fixture
+def repo(file_pool):
+    return AlimentoRepository(pool=file_pool)
+
+def count_alimentos(file_pool):
+    with file_pool.connection() as conn:
+        return conn.execute("SELECT COUNT(*) AS n FROM alimentos").fetchone()["n"]
+
+# --- savepoint() ---
+
+def test_savepoint_defers_repository_commit(file_pool, repo):
+    conn = file_pool.acquire()
+    with pytest.raises(RuntimeError):
+        with database.savepoint(conn):
+            assert repo.add(Alimento(nome="Arroz")) is not None
+            raise RuntimeError("falha depois do commit do repositório")
+    assert count_alimentos(file_pool) == 0
+
+def test_savepoint_commits_on_release(file_pool, repo):
+    with database.savepoint(file_pool.acquire()):
+        repo.add(Alimento(nome="Arroz"))
+        repo.add(Alimento(nome="Feijão"))
+    file_pool.release()
+    assert count_alimentos(file_pool) == 2
+
+# --- WriteQueue ---
+
+def test_burst_is_grouped_into_few_transactions(file_pool, repo):
+    queue = WriteQueue(pool=file_pool, group_window_ms=50)
+    futures = [queue.submit(repo.add, Alimento(nome=f"Alimento {i}")) for i in range(200)]
+    ids = [f.result(timeout=5) for f in futures]
+    queue.close()
+    assert all(ids)
+    assert ids == sorted(ids) # Executados na ordem de envio
+    assert [f.sequence for f in futures] == list(range(1, 201))
+    assert queue.batches_committed < 10
+    assert count_alimentos(file_pool) == 200
+
+def test_failed_write_does_not_affect_batch(file_pool, repo):
+    queue = WriteQueue(pool=file_pool, group_window_ms=50)
+    def boom():
+        repo.add(Alimento(nome="Parcial"))
+        raise ValueError("erro no meio da escrita")
+    ok1 = queue.submit(repo.add, Alimento(nome="Arroz"))
+    bad = queue.submit(boom)
+    dup = queue.submit(repo.add, Alimento(nome="Arroz")) # Nome UNIQUE: repositório retorna None
+    ok2 = queue.submit(repo.add, Alimento(nome="Feijão"))
+    queue.close()
+    assert ok1.result() and ok2.result()
+    assert dup.result() is None
+    with pytest.raises(ValueError):
+        bad.result()
+    nomes = {a.nome for a in repo.get_all()}
+    assert nomes == {"Arroz", "Feijão"}
+
+def test_results_only_after_commit(file_pool, repo):
+    seen = []
+    def listener(future):
+        # O listener roda depois do COMMIT: outra conexão já enxerga a escrita
+        seen.append((future.result(), count_alimentos(file_pool)))
+    queue = WriteQueue(pool=file_pool, listener=listener)
+    queue.submit(repo.add, Alimento(nome="Arroz"))
+    queue.flush(timeout=5)
+    queue.close()
+    assert seen[0][1] == 1
+
+def test_submit_from_several_threads(file_pool, repo):
+    queue = WriteQueue(pool=file_pool)
+    def worker(n):
+        for i in range(25):
+            queue.submit(repo.add, Alimento(nome=f"T{n}-{i}"))
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    queue.close()
+    assert count_alimentos(file_pool) == 100
+
+def test_submit_after_close_raises(file_pool):
+    queue = WriteQueue(pool=file_pool)
+    queue.close()
+    with pytest.raises(RuntimeError):
+        queue.submit(lambda: None)